@@ -1,11 +1,13 @@
 # Copyright (c) 2022 Kyle Schouviller (https://github.com/kyle0654)
 
 from logging import Logger
+from typing import Callable, Optional
 
 import torch
 
 from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
 from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
 from invokeai.app.services.shared.sqlite.sqlite_util import init_db
 from invokeai.backend.stable_diffusion.diffusion.conditioning_data import ConditioningFieldData
 from invokeai.backend.util.logging import InvokeAILogger
@@ -21,6 +23,8 @@ from ..services.download import DownloadQueueService
 from ..services.image_files.image_files_disk import DiskImageFileStorage
 from ..services.image_records.image_records_sqlite import SqliteImageRecordStorage
 from ..services.images.images_default import ImageService
+from ..services.invocation_cache.invocation_cache_base import InvocationCacheBase
+from ..services.invocation_cache.invocation_cache_disk import DiskInvocationCache
 from ..services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
 from ..services.invocation_services import InvocationServices
 from ..services.invocation_stats.invocation_stats_default import InvocationStatsService
@@ -61,7 +65,12 @@ class ApiDependencies:
     invoker: Invoker
 
     @staticmethod
-    def initialize(config: InvokeAIAppConfig, event_handler_id: int, logger: Logger = logger) -> None:
+    def initialize(
+        config: InvokeAIAppConfig,
+        event_handler_id: int,
+        logger: Logger = logger,
+        has_queue_subscribers: Optional[Callable[[str], bool]] = None,
+    ) -> None:
         logger.info(f"InvokeAI version {__version__}")
         logger.info(f"Root directory = {str(config.root_path)}")
 
@@ -69,7 +78,12 @@ class ApiDependencies:
         if output_folder is None:
             raise ValueError("Output folder is not set")
 
-        image_files = DiskImageFileStorage(f"{output_folder}/images")
+        image_files = DiskImageFileStorage(
+            f"{output_folder}/images",
+            max_image_cache_size=int(config.image_cache * 2**30),
+            max_thumbnail_cache_size=int(config.thumbnail_cache * 2**30),
+            writer_threads=config.image_writer_threads,
+        )
 
         model_images_folder = config.models_path
 
@@ -82,11 +96,19 @@ class ApiDependencies:
         board_images = BoardImagesService()
         board_records = SqliteBoardRecordStorage(db=db)
         boards = BoardService()
-        events = FastAPIEventService(event_handler_id)
+        events = FastAPIEventService(event_handler_id, has_subscribers=has_queue_subscribers)
         bulk_download = BulkDownloadService()
         image_records = SqliteImageRecordStorage(db=db)
         images = ImageService()
-        invocation_cache = MemoryInvocationCache(max_cache_size=config.node_cache_size)
+        if config.node_cache_type == "disk" and config.node_cache_size > 0:
+            invocation_cache: InvocationCacheBase = DiskInvocationCache(
+                db=SqliteDatabase(config.node_cache_path / "invocation_cache.db", logger),
+                objects_dir=config.node_cache_path / "objects",
+                max_cache_size=config.node_cache_size,
+                max_cache_bytes=int(config.node_cache_disk_size * 2**30),
+            )
+        else:
+            invocation_cache = MemoryInvocationCache(max_cache_size=config.node_cache_size)
         tensors = ObjectSerializerForwardCache(
             ObjectSerializerDisk[torch.Tensor](output_folder / "tensors", ephemeral=True)
         )
@@ -103,7 +125,7 @@ class ApiDependencies:
         )
         names = SimpleNameService()
         performance_statistics = InvocationStatsService()
-        session_processor = DefaultSessionProcessor()
+        session_processor = DefaultSessionProcessor(thread_limit=config.session_processor_workers)
         session_queue = SqliteSessionQueue(db=db)
         urls = LocalUrlService()
         workflow_records = SqliteWorkflowRecordsStorage(db=db)
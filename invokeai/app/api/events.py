@@ -2,8 +2,8 @@
 
 import asyncio
 import threading
-from queue import Empty, Queue
-from typing import Any
+from collections import deque
+from typing import Any, Callable, Optional
 
 from fastapi_events.dispatcher import dispatch
 
@@ -11,42 +11,73 @@ from ..services.events.events_base import EventServiceBase
 
 
 class FastAPIEventService(EventServiceBase):
+    """Dispatches events to the FastAPI event handlers, on the event loop the service was created on.
+
+    Events are emitted from any thread. The first event emitted while the dispatcher is idle wakes the event loop;
+    events emitted before the dispatcher runs are drained with it as a single batch, in the order they were emitted.
+
+    :param event_handler_id: The ID of the FastAPI event handler middleware
+    :param has_subscribers: Checks whether anyone is subscribed to a queue's events. If omitted, assumes someone is.
+    """
+
     event_handler_id: int
-    __queue: Queue
-    __stop_event: threading.Event
+    __loop: asyncio.AbstractEventLoop
+    __queue: deque[Optional[tuple[str, Any]]]
+    __lock: threading.Lock
+    __wakeup_pending: bool
+    __ready: asyncio.Event
+    __has_subscribers: Optional[Callable[[str], bool]]
 
-    def __init__(self, event_handler_id: int) -> None:
+    def __init__(self, event_handler_id: int, has_subscribers: Optional[Callable[[str], bool]] = None) -> None:
         self.event_handler_id = event_handler_id
-        self.__queue = Queue()
-        self.__stop_event = threading.Event()
-        asyncio.create_task(self.__dispatch_from_queue(stop_event=self.__stop_event))
+        self.__has_subscribers = has_subscribers
+        self.__loop = asyncio.get_running_loop()
+        self.__queue = deque()
+        self.__lock = threading.Lock()
+        self.__wakeup_pending = False
+        self.__ready = asyncio.Event()
+        asyncio.create_task(self.__dispatch_from_queue())
 
         super().__init__()
 
     def stop(self, *args, **kwargs):
-        self.__stop_event.set()
-        self.__queue.put(None)
+        # Events emitted before stopping are still dispatched
+        self.__put(None)
 
     def dispatch(self, event_name: str, payload: Any) -> None:
-        self.__queue.put({"event_name": event_name, "payload": payload})
+        self.__put((event_name, payload))
+
+    def has_subscribers(self, queue_id: str) -> bool:
+        return self.__has_subscribers is None or self.__has_subscribers(queue_id)
 
-    async def __dispatch_from_queue(self, stop_event: threading.Event):
+    def __put(self, event: Optional[tuple[str, Any]]) -> None:
+        with self.__lock:
+            self.__queue.append(event)
+            if self.__wakeup_pending:
+                return
+            self.__wakeup_pending = True
+        try:
+            self.__loop.call_soon_threadsafe(self.__ready.set)
+        except RuntimeError:
+            # The event loop has closed, so there is no one left to receive the event
+            pass
+
+    async def __dispatch_from_queue(self):
         """Get events on from the queue and dispatch them, from the correct thread"""
-        while not stop_event.is_set():
-            try:
-                event = self.__queue.get(block=False)
-                if not event:  # Probably stopping
-                    continue
-
-                dispatch(
-                    event.get("event_name"),
-                    payload=event.get("payload"),
-                    middleware_id=self.event_handler_id,
-                )
-
-            except Empty:
-                await asyncio.sleep(0.1)
-                pass
-
-            except asyncio.CancelledError as e:
-                raise e  # Raise a proper error
+        while True:
+            await self.__ready.wait()
+            self.__ready.clear()
+            with self.__lock:
+                events = self.__queue
+                self.__queue = deque()
+                self.__wakeup_pending = False
+
+            for event in events:
+                if event is None:  # Stopping
+                    return
+                event_name, payload = event
+                # Handlers are scheduled as tasks, which start in the order they are created
+                dispatch(event_name, payload=payload, middleware_id=self.event_handler_id)
+
+            # Let the handlers for this batch run before draining the next
+            await asyncio.sleep(0)
@@ -11,6 +11,7 @@ from fastapi.routing import APIRouter
 from pydantic import BaseModel, Field
 
 from invokeai.app.invocations.upscale import ESRGAN_MODELS
+from invokeai.app.services.image_files.image_files_common import ImageFileCacheStatus
 from invokeai.app.services.invocation_cache.invocation_cache_common import InvocationCacheStatus
 from invokeai.backend.image_util.infill_methods.patchmatch import PatchMatch
 from invokeai.backend.image_util.safety_checker import SafetyChecker
@@ -186,3 +187,13 @@ async def disable_invocation_cache() -> None:
 async def get_invocation_cache_status() -> InvocationCacheStatus:
     """Clears the invocation cache"""
     return ApiDependencies.invoker.services.invocation_cache.get_status()
+
+
+@app_router.get(
+    "/image_file_cache/status",
+    operation_id="get_image_file_cache_status",
+    responses={200: {"model": ImageFileCacheStatus}},
+)
+async def get_image_file_cache_status() -> ImageFileCacheStatus:
+    """Gets the status of the decoded image and thumbnail caches"""
+    return ApiDependencies.invoker.services.image_files.get_cache_status()
@@ -9,9 +9,14 @@ from PIL import Image
 from pydantic import BaseModel, Field, ValidationError
 
 from invokeai.app.invocations.fields import MetadataField, MetadataFieldValidator
-from invokeai.app.services.image_records.image_records_common import ImageCategory, ImageRecordChanges, ResourceOrigin
+from invokeai.app.services.image_records.image_records_common import (
+    ImageCategory,
+    ImageRecordChanges,
+    InvalidImageCursorException,
+    ResourceOrigin,
+)
 from invokeai.app.services.images.images_common import ImageDTO, ImageUrlsDTO
-from invokeai.app.services.shared.pagination import OffsetPaginatedResults
+from invokeai.app.services.shared.pagination import KeysetPaginatedResults, OffsetPaginatedResults
 from invokeai.app.services.workflow_records.workflow_records_common import WorkflowWithoutID, WorkflowWithoutIDValidator
 
 from ..dependencies import ApiDependencies
@@ -314,6 +319,39 @@ async def list_image_dtos(
     return image_dtos
 
 
+@images_router.get(
+    "/cursor",
+    operation_id="list_image_dtos_by_cursor",
+    response_model=KeysetPaginatedResults[ImageDTO],
+)
+async def list_image_dtos_by_cursor(
+    image_origin: Optional[ResourceOrigin] = Query(default=None, description="The origin of images to list."),
+    categories: Optional[list[ImageCategory]] = Query(default=None, description="The categories of image to include."),
+    is_intermediate: Optional[bool] = Query(default=None, description="Whether to list intermediate images."),
+    board_id: Optional[str] = Query(
+        default=None,
+        description="The board id to filter by. Use 'none' to find images without a board.",
+    ),
+    cursor: Optional[str] = Query(default=None, description="The cursor of the page, from the previous page"),
+    limit: int = Query(default=10, description="The number of images per page"),
+    include_total: bool = Query(default=False, description="Whether to count the total number of images"),
+) -> KeysetPaginatedResults[ImageDTO]:
+    """Gets a page of image DTOs. Unlike list_image_dtos, deep pages are as fast as the first."""
+
+    try:
+        return ApiDependencies.invoker.services.images.get_many_by_cursor(
+            limit,
+            cursor,
+            image_origin,
+            categories,
+            is_intermediate,
+            board_id,
+            include_total,
+        )
+    except InvalidImageCursorException:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 class DeleteImagesFromListResult(BaseModel):
     deleted_images: list[str]
 
@@ -1,16 +1,97 @@
 # Copyright (c) 2022 Kyle Schouviller (https://github.com/kyle0654)
 
+import asyncio
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
 from fastapi import FastAPI
 from fastapi_events.handlers.local import local_handler
 from fastapi_events.typing import Event
 from socketio import ASGIApp, AsyncServer
 
+from invokeai.backend.util.logging import InvokeAILogger
+
 from ..services.events.events_base import EventServiceBase
 
+logger = InvokeAILogger.get_logger()
+
+# Events that only report progress, by the payload field identifying what they report the progress of. A pending
+# event is superseded by a newer one for the same thing. All other events are always delivered.
+SUPERSEDABLE_EVENTS = {"generator_progress": "queue_item_id", "batch_enqueue_progress": "batch_id"}
+
+
+class SocketOutbox:
+    """The events waiting to be sent to a single connection.
+
+    Events are sent in order, one at a time. While the connection is behind, a pending progress event is dropped
+    when a newer one arrives for the same queue item or batch, and the oldest pending progress events are dropped
+    to keep the outbox within its limit. Other events, including every terminal event, are never dropped.
+
+    :param send: Sends an event, returning once the connection is ready for the next one
+    :param max_size: The maximum number of pending events, unless they are all events that can't be dropped
+    """
+
+    def __init__(self, send: Callable[[str, Any], Awaitable[None]], max_size: int = 32):
+        self._send = send
+        self._max_size = max_size
+        # Progress events are keyed by what they report on, so they can be found and superseded
+        self._events: OrderedDict[Hashable, tuple[str, Any]] = OrderedDict()
+        self._ids = count()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._send_events())
+        self.dropped = 0
+
+    def put(self, event: str, data: Any) -> None:
+        field = SUPERSEDABLE_EVENTS.get(event)
+        key: Hashable = (event, data.get(field)) if field is not None else next(self._ids)
+        if self._events.pop(key, None) is not None:
+            self.dropped += 1
+        self._events[key] = (event, data)
+        if len(self._events) > self._max_size:
+            oldest_progress = next((k for k in self._events if isinstance(k, tuple)), None)
+            if oldest_progress is not None:
+                del self._events[oldest_progress]
+                self.dropped += 1
+        self._ready.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._events)
+
+    def close(self) -> None:
+        self._task.cancel()
+
+    async def _send_events(self) -> None:
+        while True:
+            await self._ready.wait()
+            while self._events:
+                _, (event, data) = self._events.popitem(last=False)
+                try:
+                    await self._send(event, data)
+                except Exception as e:
+                    # A failed send must not stop the outbox, or the connection would receive no more events
+                    logger.warning(f"Error sending {event} event: {e}")
+            self._ready.clear()
+
+
+async def wait_for_socket_queue(sio: AsyncServer, eio_sid: Optional[str]) -> None:
+    """Waits for a connection to take the packets queued for it.
+
+    Engine.io has no public API for this, so this waits on the queue of python-engineio's AsyncSocket. If that isn't
+    there, it returns immediately - events are then sent without waiting for slow connections.
+    """
+    sockets = getattr(sio.eio, "sockets", None)
+    socket = sockets.get(eio_sid) if isinstance(sockets, dict) else None
+    queue = getattr(socket, "queue", None)
+    if isinstance(queue, asyncio.Queue):
+        await queue.join()
+
 
 class SocketIO:
     __sio: AsyncServer
     __app: ASGIApp
+    __outboxes: dict[str, SocketOutbox]
 
     __sub_queue: str = "subscribe_queue"
     __unsub_queue: str = "unsubscribe_queue"
@@ -23,6 +104,9 @@ class SocketIO:
         self.__app = ASGIApp(socketio_server=self.__sio, socketio_path="/ws/socket.io")
         app.mount("/ws", self.__app)
 
+        self.__outboxes = {}
+        self.__sio.on("disconnect", handler=self._handle_disconnect)
+
         self.__sio.on(self.__sub_queue, handler=self._handle_sub_queue)
         self.__sio.on(self.__unsub_queue, handler=self._handle_unsub_queue)
         local_handler.register(event_name=EventServiceBase.queue_event, _func=self._handle_queue_event)
@@ -33,11 +117,26 @@ class SocketIO:
         local_handler.register(event_name=EventServiceBase.bulk_download_event, _func=self._handle_bulk_download_event)
 
     async def _handle_queue_event(self, event: Event):
-        await self.__sio.emit(
-            event=event[1]["event"],
-            data=event[1]["data"],
-            room=event[1]["data"]["queue_id"],
-        )
+        # Each subscriber receives queue events through its own outbox, so a slow one can't hold up the others
+        for sid, eio_sid in self.__sio.manager.get_participants("/", event[1]["data"]["queue_id"]):
+            outbox = self.__outboxes.get(sid)
+            if outbox is None:
+                outbox = SocketOutbox(lambda e, d, sid=sid, eio_sid=eio_sid: self._send_to(sid, eio_sid, e, d))
+                self.__outboxes[sid] = outbox
+            outbox.put(event[1]["event"], event[1]["data"])
+
+    def has_queue_subscribers(self, queue_id: str) -> bool:
+        return any(True for _ in self.__sio.manager.get_participants("/", queue_id))
+
+    async def _send_to(self, sid: str, eio_sid: Optional[str], event: str, data: Any) -> None:
+        await self.__sio.emit(event=event, data=data, to=sid)
+        # Wait for the connection to take the event, so later events wait in the outbox while the client is slow
+        await wait_for_socket_queue(self.__sio, eio_sid)
+
+    async def _handle_disconnect(self, sid, *args, **kwargs) -> None:
+        outbox = self.__outboxes.pop(sid, None)
+        if outbox is not None:
+            outbox.close()
 
     async def _handle_sub_queue(self, sid, data, *args, **kwargs) -> None:
         if "queue_id" in data:
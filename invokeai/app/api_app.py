@@ -70,7 +70,12 @@ logger.info(f"Using torch device: {torch_device_name}")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Add startup event to load dependencies
-    ApiDependencies.initialize(config=app_config, event_handler_id=event_handler_id, logger=logger)
+    ApiDependencies.initialize(
+        config=app_config,
+        event_handler_id=event_handler_id,
+        logger=logger,
+        has_queue_subscribers=socket_io.has_queue_subscribers,
+    )
     yield
     # Shut down threads
     ApiDependencies.shutdown()
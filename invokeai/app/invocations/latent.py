@@ -880,9 +880,10 @@ class DenoiseLatentsInvocation(BaseInvocation):
             assert isinstance(unet_info.model, UNet2DConditionModel)
             with (
                 ExitStack() as exit_stack,
+                # The unet is patched while it is locked, so that sessions in other workers can't use it patched
+                unet_info as unet,
                 ModelPatcher.apply_freeu(unet_info.model, self.unet.freeu_config),
                 set_seamless(unet_info.model, self.unet.seamless_axes),  # FIXME
-                unet_info as unet,
                 # Apply the LoRA after unet has been moved to its target device for faster patching.
                 ModelPatcher.apply_lora_unet(unet, _lora_loader()),
             ):
@@ -989,7 +990,8 @@ class LatentsToImageInvocation(BaseInvocation, WithMetadata, WithBoard):
 
         vae_info = context.models.load(self.vae.vae)
         assert isinstance(vae_info.model, (UNet2DConditionModel, AutoencoderKL, AutoencoderTiny))
-        with set_seamless(vae_info.model, self.vae.seamless_axes), vae_info as vae:
+        # The vae is patched while it is locked, so that sessions in other workers can't use it patched
+        with vae_info as vae, set_seamless(vae_info.model, self.vae.seamless_axes):
             assert isinstance(vae, torch.nn.Module)
             latents = latents.to(vae.device)
             if self.fp32:
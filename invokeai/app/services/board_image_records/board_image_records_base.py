@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import Optional
 
+from .board_image_records_common import BoardImageSummary
+
 
 class BoardImageRecordStorageBase(ABC):
     """Abstract base class for the one-to-many board-image relationship record storage."""
@@ -45,3 +47,12 @@ class BoardImageRecordStorageBase(ABC):
     ) -> int:
         """Gets the number of images for a board."""
         pass
+
+    @abstractmethod
+    def get_image_summaries_for_boards(
+        self,
+        board_ids: list[str],
+    ) -> dict[str, BoardImageSummary]:
+        """Gets the number of images and the most recent image for each of the boards, by board id. Boards that have
+        never had images may be omitted."""
+        pass
@@ -0,0 +1,10 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class BoardImageSummary(BaseModel):
+    """The number of images in a board, and its cover image."""
+
+    image_count: int = Field(default=0, description="The number of images in the board.")
+    cover_image_name: Optional[str] = Field(default=None, description="The name of the board's most recent image.")
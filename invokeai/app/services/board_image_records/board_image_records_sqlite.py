@@ -7,6 +7,7 @@ from invokeai.app.services.shared.pagination import OffsetPaginatedResults
 from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
 
 from .board_image_records_base import BoardImageRecordStorageBase
+from .board_image_records_common import BoardImageSummary
 
 
 class SqliteBoardImageRecordStorage(BoardImageRecordStorageBase):
@@ -16,6 +17,7 @@ class SqliteBoardImageRecordStorage(BoardImageRecordStorageBase):
 
     def __init__(self, db: SqliteDatabase) -> None:
         super().__init__()
+        self._db = db
         self._lock = db.lock
         self._conn = db.conn
         self._cursor = self._conn.cursor()
@@ -69,9 +71,8 @@ class SqliteBoardImageRecordStorage(BoardImageRecordStorageBase):
         limit: int = 10,
     ) -> OffsetPaginatedResults[ImageRecord]:
         # TODO: this isn't paginated yet?
-        try:
-            self._lock.acquire()
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT images.*
                 FROM board_images
@@ -81,27 +82,20 @@ class SqliteBoardImageRecordStorage(BoardImageRecordStorageBase):
                 """,
                 (board_id,),
             )
-            result = cast(list[sqlite3.Row], self._cursor.fetchall())
+            result = cast(list[sqlite3.Row], cursor.fetchall())
             images = [deserialize_image_record(dict(r)) for r in result]
 
-            self._cursor.execute(
+            cursor.execute(
                 """--sql
                 SELECT COUNT(*) FROM images WHERE 1=1;
                 """
             )
-            count = cast(int, self._cursor.fetchone()[0])
-
-        except sqlite3.Error as e:
-            self._conn.rollback()
-            raise e
-        finally:
-            self._lock.release()
+            count = cast(int, cursor.fetchone()[0])
         return OffsetPaginatedResults(items=images, offset=offset, limit=limit, total=count)
 
     def get_all_board_image_names_for_board(self, board_id: str) -> list[str]:
-        try:
-            self._lock.acquire()
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT image_name
                 FROM board_images
@@ -109,22 +103,16 @@ class SqliteBoardImageRecordStorage(BoardImageRecordStorageBase):
                 """,
                 (board_id,),
             )
-            result = cast(list[sqlite3.Row], self._cursor.fetchall())
+            result = cast(list[sqlite3.Row], cursor.fetchall())
             image_names = [r[0] for r in result]
             return image_names
-        except sqlite3.Error as e:
-            self._conn.rollback()
-            raise e
-        finally:
-            self._lock.release()
 
     def get_board_for_image(
         self,
         image_name: str,
     ) -> Optional[str]:
-        try:
-            self._lock.acquire()
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT board_id
                 FROM board_images
@@ -132,29 +120,38 @@ class SqliteBoardImageRecordStorage(BoardImageRecordStorageBase):
                 """,
                 (image_name,),
             )
-            result = self._cursor.fetchone()
+            result = cursor.fetchone()
             if result is None:
                 return None
             return cast(str, result[0])
-        except sqlite3.Error as e:
-            self._conn.rollback()
-            raise e
-        finally:
-            self._lock.release()
 
     def get_image_count_for_board(self, board_id: str) -> int:
-        try:
-            self._lock.acquire()
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT COUNT(*) FROM board_images WHERE board_id = ?;
                 """,
                 (board_id,),
             )
-            count = cast(int, self._cursor.fetchone()[0])
+            count = cast(int, cursor.fetchone()[0])
             return count
-        except sqlite3.Error as e:
-            self._conn.rollback()
-            raise e
-        finally:
-            self._lock.release()
+
+    def get_image_summaries_for_boards(self, board_ids: list[str]) -> dict[str, BoardImageSummary]:
+        summaries: dict[str, BoardImageSummary] = {}
+        with self._db.read_cursor() as cursor:
+            # Stay under SQLite's limit on the number of parameters
+            for i in range(0, len(board_ids), 500):
+                chunk = board_ids[i : i + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                # The summaries are maintained by triggers as images are added, moved, removed and starred
+                cursor.execute(
+                    f"""--sql
+                    SELECT board_id, image_count, cover_image_name
+                    FROM board_image_summaries
+                    WHERE board_id IN ({placeholders});
+                    """,
+                    chunk,
+                )
+                for row in cast(list[sqlite3.Row], cursor.fetchall()):
+                    summaries[row[0]] = BoardImageSummary(image_count=row[1], cover_image_name=row[2])
+        return summaries
@@ -32,6 +32,8 @@ ATTENTION_TYPE = Literal["auto", "normal", "xformers", "sliced", "torch-sdp"]
 ATTENTION_SLICE_SIZE = Literal["auto", "balanced", "max", 1, 2, 3, 4, 5, 6, 7, 8]
 LOG_FORMAT = Literal["plain", "color", "syslog", "legacy"]
 LOG_LEVEL = Literal["debug", "info", "warning", "error", "critical"]
+NODE_CACHE_TYPE = Literal["memory", "disk"]
+PROGRESS_IMAGE_FORMAT = Literal["jpeg", "webp"]
 CONFIG_SCHEMA_VERSION = "4.0.1"
 
 
@@ -90,6 +92,7 @@ class InvokeAIAppConfig(BaseSettings):
         db_dir: Path to InvokeAI databases directory.
         outputs_dir: Path to directory for outputs.
         custom_nodes_dir: Path to directory for custom nodes.
+        node_cache_dir: Path to the on-disk node cache directory, used when `node_cache_type` is `disk`.
         log_handlers: Log handler. Valid options are "console", "file=<path>", "syslog=path|address:host:port", "http=<url>".
         log_format: Log format. Use "plain" for text-only, "color" for colorized output, "legacy" for 2.3-style logging and "syslog" for syslog-style.<br>Valid values: `plain`, `color`, `syslog`, `legacy`
         log_level: Emit logging messages at this level or higher.<br>Valid values: `debug`, `info`, `warning`, `error`, `critical`
@@ -102,7 +105,10 @@ class InvokeAIAppConfig(BaseSettings):
         ram: Maximum memory amount used by memory model cache for rapid switching (GB).
         vram: Amount of VRAM reserved for model storage (GB).
         convert_cache: Maximum size of on-disk converted models cache (GB).
+        image_cache: Maximum memory used to cache decoded images (GB).
+        thumbnail_cache: Maximum memory used to cache decoded thumbnails (GB).
         lazy_offload: Keep models in VRAM until their space is needed.
+        prefetch_models: Load the models that the current and next queue items need into the RAM cache in the background, before their nodes run.
         log_memory_usage: If True, a memory snapshot will be captured before and after every model cache operation, and the result will be logged (at debug level). There is a time cost to capturing the memory snapshots, so it is recommended to only enable this feature if you are actively inspecting the model cache's behaviour.
         device: Preferred execution device. `auto` will choose the device depending on the hardware platform and the installed torch capabilities.<br>Valid values: `auto`, `cpu`, `cuda`, `cuda:1`, `mps`
         precision: Floating point precision. `float16` will consume half the memory of `float32` but produce slightly lower-quality images. The `auto` setting will guess the proper precision based on your video card and operating system.<br>Valid values: `auto`, `float16`, `bfloat16`, `float32`
@@ -111,10 +117,18 @@ class InvokeAIAppConfig(BaseSettings):
         attention_slice_size: Slice size, valid when attention_type=="sliced".<br>Valid values: `auto`, `balanced`, `max`, `1`, `2`, `3`, `4`, `5`, `6`, `7`, `8`
         force_tiled_decode: Whether to enable tiled VAE decode (reduces memory consumption with some performance penalty).
         pil_compress_level: The compress_level setting of PIL.Image.save(), used for PNG encoding. All settings are lossless. 0 = no compression, 1 = fastest with slightly larger filesize, 9 = slowest with smallest filesize. 1 is typically the best setting.
+        image_writer_threads: Number of threads that encode and write images in the background, so sessions continue while images are saved. If 0, images are written before the session continues.
         max_queue_size: Maximum number of items in the session queue.
+        session_processor_workers: Number of session processor workers. Each worker dequeues and executes queue items concurrently with the others. A model is only used by one worker at a time, so workers wait for each other when their sessions use the same model.
+        compress_queue: Compress the graphs and workflows stored in the session queue, reducing the size of the database at a small CPU cost when enqueueing and dequeueing.
+        progress_image_steps: Send a progress image every N denoising steps. Progress events for the other steps have no image.
+        progress_image_interval: Minimum time between progress images (ms).
+        progress_image_format: Format of progress images.<br>Valid values: `jpeg`, `webp`
         allow_nodes: List of nodes to allow. Omit to allow all.
         deny_nodes: List of nodes to deny. Omit to deny none.
         node_cache_size: How many cached nodes to keep in memory.
+        node_cache_type: Where to cache node outputs. The `disk` cache persists outputs, and the tensors and conditioning they reference, across restarts.<br>Valid values: `memory`, `disk`
+        node_cache_disk_size: Maximum size of the on-disk node cache (GB), used when `node_cache_type` is `disk`.
         hashing_algorithm: Model hashing algorthim for model installs. 'blake3_multi' is best for SSDs. 'blake3_single' is best for spinning disk HDDs. 'random' disables hashing, instead assigning a UUID to models. Useful when using a memory db to reduce model installation time, or if you don't care about storing stable hashes for models. Alternatively, any other hashlib algorithm is accepted, though these are not nearly as performant as blake3.<br>Valid values: `blake3_multi`, `blake3_single`, `random`, `md5`, `sha1`, `sha224`, `sha256`, `sha384`, `sha512`, `blake2b`, `blake2s`, `sha3_224`, `sha3_256`, `sha3_384`, `sha3_512`, `shake_128`, `shake_256`
         remote_api_tokens: List of regular expression and token pairs used when downloading models from URLs. The download URL is tested against the regex, and if it matches, the token is provided in as a Bearer token.
         scan_models_on_startup: Scan the models directory on startup, registering orphaned models. This is typically only used in conjunction with `use_memory_db` for testing purposes.
@@ -151,6 +165,7 @@ class InvokeAIAppConfig(BaseSettings):
     db_dir:                        Path = Field(default=Path("databases"),  description="Path to InvokeAI databases directory.")
     outputs_dir:                   Path = Field(default=Path("outputs"),    description="Path to directory for outputs.")
     custom_nodes_dir:              Path = Field(default=Path("nodes"),      description="Path to directory for custom nodes.")
+    node_cache_dir:                Path = Field(default=Path("node_cache"), description="Path to the on-disk node cache directory, used when `node_cache_type` is `disk`.")
 
     # LOGGING
     log_handlers:             list[str] = Field(default=["console"],        description='Log handler. Valid options are "console", "file=<path>", "syslog=path|address:host:port", "http=<url>".')
@@ -170,7 +185,10 @@ class InvokeAIAppConfig(BaseSettings):
     ram:                          float = Field(default_factory=get_default_ram_cache_size, gt=0, description="Maximum memory amount used by memory model cache for rapid switching (GB).")
     vram:                         float = Field(default=DEFAULT_VRAM_CACHE, ge=0, description="Amount of VRAM reserved for model storage (GB).")
     convert_cache:                float = Field(default=DEFAULT_CONVERT_CACHE, ge=0, description="Maximum size of on-disk converted models cache (GB).")
+    image_cache:                  float = Field(default=1.0, ge=0,          description="Maximum memory used to cache decoded images (GB).")
+    thumbnail_cache:              float = Field(default=0.125, ge=0,        description="Maximum memory used to cache decoded thumbnails (GB).")
     lazy_offload:                  bool = Field(default=True,               description="Keep models in VRAM until their space is needed.")
+    prefetch_models:               bool = Field(default=True,               description="Load the models that the current and next queue items need into the RAM cache in the background, before their nodes run.")
     log_memory_usage:              bool = Field(default=False,              description="If True, a memory snapshot will be captured before and after every model cache operation, and the result will be logged (at debug level). There is a time cost to capturing the memory snapshots, so it is recommended to only enable this feature if you are actively inspecting the model cache's behaviour.")
 
     # DEVICE
@@ -183,12 +201,20 @@ class InvokeAIAppConfig(BaseSettings):
     attention_slice_size: ATTENTION_SLICE_SIZE = Field(default="auto",      description='Slice size, valid when attention_type=="sliced".')
     force_tiled_decode:            bool = Field(default=False,              description="Whether to enable tiled VAE decode (reduces memory consumption with some performance penalty).")
     pil_compress_level:             int = Field(default=1,                  description="The compress_level setting of PIL.Image.save(), used for PNG encoding. All settings are lossless. 0 = no compression, 1 = fastest with slightly larger filesize, 9 = slowest with smallest filesize. 1 is typically the best setting.")
+    image_writer_threads:           int = Field(default=2, ge=0,            description="Number of threads that encode and write images in the background, so sessions continue while images are saved. If 0, images are written before the session continues.")
     max_queue_size:                 int = Field(default=10000, gt=0,        description="Maximum number of items in the session queue.")
+    session_processor_workers:      int = Field(default=1, ge=1,            description="Number of session processor workers. Each worker dequeues and executes queue items concurrently with the others. A model is only used by one worker at a time, so workers wait for each other when their sessions use the same model.")
+    compress_queue:                bool = Field(default=False,              description="Compress the graphs and workflows stored in the session queue, reducing the size of the database at a small CPU cost when enqueueing and dequeueing.")
+    progress_image_steps:           int = Field(default=1, ge=1,            description="Send a progress image every N denoising steps. Progress events for the other steps have no image.")
+    progress_image_interval:        int = Field(default=0, ge=0,            description="Minimum time between progress images (ms).")
+    progress_image_format: PROGRESS_IMAGE_FORMAT = Field(default="jpeg",    description="Format of progress images.")
 
     # NODES
     allow_nodes:    Optional[list[str]] = Field(default=None,               description="List of nodes to allow. Omit to allow all.")
     deny_nodes:     Optional[list[str]] = Field(default=None,               description="List of nodes to deny. Omit to deny none.")
     node_cache_size:                int = Field(default=512,                description="How many cached nodes to keep in memory.")
+    node_cache_type:    NODE_CACHE_TYPE = Field(default="memory",           description="Where to cache node outputs. The `disk` cache persists outputs, and the tensors and conditioning they reference, across restarts.")
+    node_cache_disk_size:         float = Field(default=10.0, ge=0,         description="Maximum size of the on-disk node cache (GB), used when `node_cache_type` is `disk`.")
 
     # MODEL INSTALL
     hashing_algorithm: HASHING_ALGORITHMS = Field(default="blake3_single",  description="Model hashing algorthim for model installs. 'blake3_multi' is best for SSDs. 'blake3_single' is best for spinning disk HDDs. 'random' disables hashing, instead assigning a UUID to models. Useful when using a memory db to reduce model installation time, or if you don't care about storing stable hashes for models. Alternatively, any other hashlib algorithm is accepted, though these are not nearly as performant as blake3.")
@@ -310,6 +336,11 @@ class InvokeAIAppConfig(BaseSettings):
         assert custom_nodes_path is not None
         return custom_nodes_path
 
+    @property
+    def node_cache_path(self) -> Path:
+        """Path to the on-disk node cache directory, resolved to an absolute path.."""
+        return self._resolve(self.node_cache_dir)
+
     @property
     def profiles_path(self) -> Path:
         """Path to the graph profiles directory, resolved to an absolute path.."""
@@ -7,7 +7,7 @@ from invokeai.app.services.session_processor.session_processor_common import Pro
 from invokeai.app.services.session_queue.session_queue_common import (
     BatchStatus,
     EnqueueBatchResult,
-    SessionQueueItem,
+    SessionQueueItemDTO,
     SessionQueueStatus,
 )
 from invokeai.app.util.misc import get_timestamp
@@ -26,6 +26,10 @@ class EventServiceBase:
     def dispatch(self, event_name: str, payload: Any) -> None:
         pass
 
+    def has_subscribers(self, queue_id: str) -> bool:
+        """Whether anyone receives the queue's events. Used to skip work that would only be sent in an event."""
+        return True
+
     def _emit_bulk_download_event(self, event_name: str, payload: dict) -> None:
         """Bulk download events are emitted to a room with queue_id as the room name"""
         payload["timestamp"] = get_timestamp()
@@ -238,7 +242,7 @@ class EventServiceBase:
 
     def emit_queue_item_status_changed(
         self,
-        session_queue_item: SessionQueueItem,
+        session_queue_item: SessionQueueItemDTO,
         batch_status: BatchStatus,
         queue_status: SessionQueueStatus,
     ) -> None:
@@ -275,6 +279,18 @@ class EventServiceBase:
             },
         )
 
+    def emit_batch_enqueue_progress(self, queue_id: str, batch_id: str, enqueued: int, total: int) -> None:
+        """Emitted when some of a batch's queue items have been enqueued"""
+        self.__emit_queue_event(
+            event_name="batch_enqueue_progress",
+            payload={
+                "queue_id": queue_id,
+                "batch_id": batch_id,
+                "enqueued": enqueued,
+                "total": total,
+            },
+        )
+
     def emit_queue_cleared(self, queue_id: str) -> None:
         """Emitted when the queue is cleared"""
         self.__emit_queue_event(
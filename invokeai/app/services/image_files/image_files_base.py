@@ -5,6 +5,7 @@ from typing import Optional
 from PIL.Image import Image as PILImageType
 
 from invokeai.app.invocations.fields import MetadataField
+from invokeai.app.services.image_files.image_files_common import ImageFileCacheStatus
 from invokeai.app.services.workflow_records.workflow_records_common import WorkflowWithoutID
 
 
@@ -36,10 +37,19 @@ class ImageFileStorageBase(ABC):
         metadata: Optional[MetadataField] = None,
         workflow: Optional[WorkflowWithoutID] = None,
         thumbnail_size: int = 256,
+        session_id: Optional[str] = None,
     ) -> None:
         """Saves an image and a 256x256 WEBP thumbnail. Returns a tuple of the image name, thumbnail name, and created timestamp."""
         pass
 
+    @abstractmethod
+    def flush(self, session_id: Optional[str] = None) -> None:
+        """
+        Waits until saved images have been written to storage - only those saved for the session, if one is given.
+        Raises an ImageFileSaveException if any of the session's images could not be written.
+        """
+        pass
+
     @abstractmethod
     def delete(self, image_name: str) -> None:
         """Deletes an image and its thumbnail (if one exists)."""
@@ -49,3 +59,8 @@ class ImageFileStorageBase(ABC):
     def get_workflow(self, image_name: str) -> Optional[WorkflowWithoutID]:
         """Gets the workflow of an image."""
         pass
+
+    @abstractmethod
+    def get_cache_status(self) -> ImageFileCacheStatus:
+        """Gets the status of the image and thumbnail caches."""
+        pass
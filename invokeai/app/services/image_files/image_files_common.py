@@ -1,3 +1,19 @@
+from pydantic import BaseModel, Field
+
+
+class ImageCacheStatus(BaseModel):
+    hits: int = Field(description="The number of cache hits")
+    misses: int = Field(description="The number of cache misses")
+    count: int = Field(description="The number of cached images")
+    size: int = Field(description="The estimated size of the cached images, in bytes")
+    max_size: int = Field(description="The maximum size of the cached images, in bytes")
+
+
+class ImageFileCacheStatus(BaseModel):
+    images: ImageCacheStatus = Field(description="The status of the full size image cache")
+    thumbnails: ImageCacheStatus = Field(description="The status of the thumbnail cache")
+
+
 # TODO: Should these excpetions subclass existing python exceptions?
 class ImageFileNotFoundException(Exception):
     """Raised when an image file is not found in storage."""
@@ -1,7 +1,9 @@
 # Copyright (c) 2022 Kyle Schouviller (https://github.com/kyle0654) and the InvokeAI Team
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from queue import Queue
-from typing import Dict, Optional, Union
+from threading import BoundedSemaphore, Lock
+from typing import Optional, Union
 
 from PIL import Image, PngImagePlugin
 from PIL.Image import Image as PILImageType
@@ -13,22 +15,107 @@ from invokeai.app.services.workflow_records.workflow_records_common import Workf
 from invokeai.app.util.thumbnails import get_thumbnail_name, make_thumbnail
 
 from .image_files_base import ImageFileStorageBase
-from .image_files_common import ImageFileDeleteException, ImageFileNotFoundException, ImageFileSaveException
+from .image_files_common import (
+    ImageCacheStatus,
+    ImageFileCacheStatus,
+    ImageFileDeleteException,
+    ImageFileNotFoundException,
+    ImageFileSaveException,
+)
+
+
+class ImageCache:
+    """A thread-safe LRU cache of decoded images, limited by the images' estimated size in bytes"""
+
+    def __init__(self, max_size: int):
+        self._cache: OrderedDict[Path, tuple[PILImageType, int]] = OrderedDict()
+        self._max_size = max_size
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
+
+    def get(self, path: Path) -> Optional[PILImageType]:
+        with self._lock:
+            item = self._cache.get(path)
+            if item is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._cache.move_to_end(path)
+            return item[0]
+
+    def set(self, path: Path, image: PILImageType) -> None:
+        # The decoded size - the compressed size on disk is irrelevant
+        size = image.width * image.height * len(image.getbands())
+        with self._lock:
+            self._delete(path)
+            if size > self._max_size:
+                return
+            self._cache[path] = (image, size)
+            self._size += size
+            while self._size > self._max_size:
+                _, (_, evicted_size) = self._cache.popitem(last=False)
+                self._size -= evicted_size
+
+    def delete(self, path: Path) -> None:
+        with self._lock:
+            self._delete(path)
+
+    def _delete(self, path: Path) -> None:
+        item = self._cache.pop(path, None)
+        if item is not None:
+            self._size -= item[1]
+
+    def get_status(self) -> ImageCacheStatus:
+        with self._lock:
+            return ImageCacheStatus(
+                hits=self._hits, misses=self._misses, count=len(self._cache), size=self._size, max_size=self._max_size
+            )
 
 
 class DiskImageFileStorage(ImageFileStorageBase):
-    """Stores images on disk"""
+    """Stores images on disk
+
+    Images may be written in the background. Until an image has been written, `get` returns it from memory, and
+    `get_path` waits for it to be written. If a session's image can't be written, `flush` raises the error for it.
+
+    :param output_folder: The folder where images and thumbnails are stored
+    :param max_image_cache_size: The maximum size of the full size image cache, in bytes
+    :param max_thumbnail_cache_size: The maximum size of the thumbnail cache, in bytes
+    :param writer_threads: The number of threads that encode and write images. If 0, images are written by `save`.
+    """
 
     __output_folder: Path
-    __cache_ids: Queue  # TODO: this is an incredibly naive cache
-    __cache: Dict[Path, PILImageType]
-    __max_cache_size: int
+    __image_cache: ImageCache
+    __thumbnail_cache: ImageCache
+    __writer: Optional[ThreadPoolExecutor]
+    __writer_slots: Optional[BoundedSemaphore]
+    __pending_writes: dict[str, tuple[PILImageType, Future[None], Optional[str]]]
+    __failed_writes: dict[str, list[tuple[str, Exception]]]
+    __pending_writes_lock: Lock
     __invoker: Invoker
 
-    def __init__(self, output_folder: Union[str, Path]):
-        self.__cache = {}
-        self.__cache_ids = Queue()
-        self.__max_cache_size = 10  # TODO: get this from config
+    def __init__(
+        self,
+        output_folder: Union[str, Path],
+        max_image_cache_size: int = 2**30,
+        max_thumbnail_cache_size: int = 2**27,
+        writer_threads: int = 0,
+    ):
+        self.__image_cache = ImageCache(max_image_cache_size)
+        self.__thumbnail_cache = ImageCache(max_thumbnail_cache_size)
+        self.__writer = (
+            ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="image_writer")
+            if writer_threads > 0
+            else None
+        )
+        # Limits the number of images held in memory while they wait to be written
+        self.__writer_slots = BoundedSemaphore(writer_threads * 2) if writer_threads > 0 else None
+        self.__pending_writes = {}
+        # The images that failed to be written, by the session they were saved for
+        self.__failed_writes = {}
+        self.__pending_writes_lock = Lock()
 
         self.__output_folder: Path = output_folder if isinstance(output_folder, Path) else Path(output_folder)
         self.__thumbnails_folder = self.__output_folder / "thumbnails"
@@ -38,16 +125,27 @@ class DiskImageFileStorage(ImageFileStorageBase):
     def start(self, invoker: Invoker) -> None:
         self.__invoker = invoker
 
+    def stop(self, invoker: Invoker) -> None:
+        if self.__writer is not None:
+            self.__writer.shutdown(wait=True)
+
     def get(self, image_name: str) -> PILImageType:
         try:
-            image_path = self.get_path(image_name)
+            image_path = self.__get_path(image_name)
 
-            cache_item = self.__get_cache(image_path)
-            if cache_item:
+            cache_item = self.__image_cache.get(image_path)
+            if cache_item is not None:
                 return cache_item
 
+            with self.__pending_writes_lock:
+                pending_write = self.__pending_writes.get(image_name)
+            if pending_write is not None:
+                return pending_write[0]
+
             image = Image.open(image_path)
-            self.__set_cache(image_path, image)
+            # Decode the image now, so the cached image is complete before it is shared
+            image.load()
+            self.__image_cache.set(image_path, image)
             return image
         except FileNotFoundError as e:
             raise ImageFileNotFoundException from e
@@ -59,10 +157,11 @@ class DiskImageFileStorage(ImageFileStorageBase):
         metadata: Optional[MetadataField] = None,
         workflow: Optional[WorkflowWithoutID] = None,
         thumbnail_size: int = 256,
+        session_id: Optional[str] = None,
     ) -> None:
         try:
             self.__validate_storage_folders()
-            image_path = self.get_path(image_name)
+            image_path = self.__get_path(image_name)
 
             pnginfo = PngImagePlugin.PngInfo()
             info_dict = {}
@@ -78,44 +177,113 @@ class DiskImageFileStorage(ImageFileStorageBase):
 
             # When saving the image, the image object's info field is not populated. We need to set it
             image.info = info_dict
-            image.save(
-                image_path,
-                "PNG",
-                pnginfo=pnginfo,
-                compress_level=self.__invoker.services.configuration.pil_compress_level,
-            )
 
-            thumbnail_name = get_thumbnail_name(image_name)
-            thumbnail_path = self.get_path(thumbnail_name, thumbnail=True)
-            thumbnail_image = make_thumbnail(image, thumbnail_size)
-            thumbnail_image.save(thumbnail_path)
+            if self.__writer is None or self.__writer_slots is None:
+                self.__write(image, image_name, pnginfo, thumbnail_size)
+                self.__image_cache.set(image_path, image)
+                return
 
-            self.__set_cache(image_path, image)
-            self.__set_cache(thumbnail_path, thumbnail_image)
+            self.__image_cache.set(image_path, image)
+            self.__writer_slots.acquire()
+            try:
+                with self.__pending_writes_lock:
+                    future = self.__writer.submit(
+                        self.__write_in_background, image, image_name, pnginfo, thumbnail_size, session_id
+                    )
+                    self.__pending_writes[image_name] = (image, future, session_id)
+            except Exception:
+                self.__image_cache.delete(image_path)
+                self.__writer_slots.release()
+                raise
         except Exception as e:
             raise ImageFileSaveException from e
 
+    def flush(self, session_id: Optional[str] = None) -> None:
+        with self.__pending_writes_lock:
+            futures = [
+                future
+                for _, future, image_session_id in self.__pending_writes.values()
+                if session_id is None or image_session_id == session_id
+            ]
+        wait(futures)
+        with self.__pending_writes_lock:
+            if session_id is None:
+                failed_writes = [
+                    f for session_failed_writes in self.__failed_writes.values() for f in session_failed_writes
+                ]
+                self.__failed_writes.clear()
+            else:
+                failed_writes = self.__failed_writes.pop(session_id, [])
+        if failed_writes:
+            image_names = ", ".join(image_name for image_name, _ in failed_writes)
+            raise ImageFileSaveException(f"Failed to save images {image_names}") from failed_writes[0][1]
+
+    def __write_in_background(
+        self,
+        image: PILImageType,
+        image_name: str,
+        pnginfo: PngImagePlugin.PngInfo,
+        thumbnail_size: int,
+        session_id: Optional[str],
+    ) -> None:
+        try:
+            self.__write(image, image_name, pnginfo, thumbnail_size)
+        except Exception as e:
+            self.__image_cache.delete(self.__get_path(image_name))
+            self.__invoker.services.logger.error(f"Failed to save image {image_name}: {e}")
+            # The session's flush raises the error, so the session fails instead of completing without the image
+            if session_id is not None:
+                with self.__pending_writes_lock:
+                    self.__failed_writes.setdefault(session_id, []).append((image_name, e))
+            raise
+        finally:
+            with self.__pending_writes_lock:
+                del self.__pending_writes[image_name]
+            if self.__writer_slots is not None:
+                self.__writer_slots.release()
+
+    def __write(
+        self, image: PILImageType, image_name: str, pnginfo: PngImagePlugin.PngInfo, thumbnail_size: int
+    ) -> None:
+        image.save(
+            self.__get_path(image_name),
+            "PNG",
+            pnginfo=pnginfo,
+            compress_level=self.__invoker.services.configuration.pil_compress_level,
+        )
+
+        thumbnail_path = self.__get_path(image_name, thumbnail=True)
+        thumbnail_image = make_thumbnail(image, thumbnail_size)
+        thumbnail_image.save(thumbnail_path)
+        self.__thumbnail_cache.set(thumbnail_path, thumbnail_image)
+
     def delete(self, image_name: str) -> None:
         try:
             image_path = self.get_path(image_name)
 
             if image_path.exists():
                 send2trash(image_path)
-            if image_path in self.__cache:
-                del self.__cache[image_path]
+            self.__image_cache.delete(image_path)
 
             thumbnail_name = get_thumbnail_name(image_name)
             thumbnail_path = self.get_path(thumbnail_name, True)
 
             if thumbnail_path.exists():
                 send2trash(thumbnail_path)
-            if thumbnail_path in self.__cache:
-                del self.__cache[thumbnail_path]
+            self.__thumbnail_cache.delete(thumbnail_path)
         except Exception as e:
             raise ImageFileDeleteException from e
 
-    # TODO: make this a bit more flexible for e.g. cloud storage
     def get_path(self, image_name: str, thumbnail: bool = False) -> Path:
+        # The caller will use the file directly, so it must have been written
+        with self.__pending_writes_lock:
+            pending_write = self.__pending_writes.get(image_name)
+        if pending_write is not None:
+            wait([pending_write[1]])
+        return self.__get_path(image_name, thumbnail)
+
+    # TODO: make this a bit more flexible for e.g. cloud storage
+    def __get_path(self, image_name: str, thumbnail: bool = False) -> Path:
         path = self.__output_folder / image_name
 
         if thumbnail:
@@ -136,20 +304,13 @@ class DiskImageFileStorage(ImageFileStorageBase):
             return WorkflowWithoutID.model_validate_json(workflow)
         return None
 
+    def get_cache_status(self) -> ImageFileCacheStatus:
+        return ImageFileCacheStatus(
+            images=self.__image_cache.get_status(), thumbnails=self.__thumbnail_cache.get_status()
+        )
+
     def __validate_storage_folders(self) -> None:
         """Checks if the required output folders exist and create them if they don't"""
         folders: list[Path] = [self.__output_folder, self.__thumbnails_folder]
         for folder in folders:
             folder.mkdir(parents=True, exist_ok=True)
-
-    def __get_cache(self, image_name: Path) -> Optional[PILImageType]:
-        return None if image_name not in self.__cache else self.__cache[image_name]
-
-    def __set_cache(self, image_name: Path, image: PILImageType):
-        if image_name not in self.__cache:
-            self.__cache[image_name] = image
-            self.__cache_ids.put(image_name)  # TODO: this should refresh position for LRU cache
-            if len(self.__cache) > self.__max_cache_size:
-                cache_id = self.__cache_ids.get()
-                if cache_id in self.__cache:
-                    del self.__cache[cache_id]
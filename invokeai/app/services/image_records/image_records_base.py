@@ -3,7 +3,7 @@ from datetime import datetime
 from typing import Optional
 
 from invokeai.app.invocations.fields import MetadataField
-from invokeai.app.services.shared.pagination import OffsetPaginatedResults
+from invokeai.app.services.shared.pagination import KeysetPaginatedResults, OffsetPaginatedResults
 
 from .image_records_common import ImageCategory, ImageRecord, ImageRecordChanges, ResourceOrigin
 
@@ -45,6 +45,24 @@ class ImageRecordStorageBase(ABC):
         """Gets a page of image records."""
         pass
 
+    @abstractmethod
+    def get_many_by_cursor(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        image_origin: Optional[ResourceOrigin] = None,
+        categories: Optional[list[ImageCategory]] = None,
+        is_intermediate: Optional[bool] = None,
+        board_id: Optional[str] = None,
+        include_total: bool = False,
+    ) -> KeysetPaginatedResults[ImageRecord]:
+        """Gets the page of image records after a cursor, or the first page if no cursor is given.
+
+        Unlike `get_many`, the cost of getting a page does not grow with its position. Counting the total number of
+        image records visits every matching record, so it is only done if `include_total` is set.
+        """
+        pass
+
     # TODO: The database has a nullable `deleted_at` column, currently unused.
     # Should we implement soft deletes? Would need coordination with ImageFileStorage.
     @abstractmethod
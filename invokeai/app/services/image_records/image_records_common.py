@@ -1,5 +1,6 @@
 # TODO: Should these excpetions subclass existing python exceptions?
 import datetime
+import json
 from enum import Enum
 from typing import Optional, Union
 
@@ -68,6 +69,16 @@ class InvalidImageCategoryException(ValueError):
         super().__init__(message)
 
 
+class InvalidImageCursorException(ValueError):
+    """Raised when a provided value is not a valid image cursor.
+
+    Subclasses `ValueError`.
+    """
+
+    def __init__(self, message="Invalid image cursor."):
+        super().__init__(message)
+
+
 class ImageRecordNotFoundException(Exception):
     """Raised when an image record is not found."""
 
@@ -172,6 +183,23 @@ class ImageRecordChanges(BaseModelExcludeNull, extra="allow"):
     """The image's new `starred` state."""
 
 
+def encode_image_cursor(starred: bool, created_at: str, image_name: str) -> str:
+    """Encodes the position of an image in the gallery's sort order as an opaque cursor.
+
+    The position is stored rather than only the image name, so the cursor stays valid if its image is deleted.
+    """
+    return json.dumps([int(starred), created_at, image_name])
+
+
+def decode_image_cursor(cursor: str) -> tuple[int, str, str]:
+    """Decodes a cursor into the `starred`, `created_at` and `image_name` of the image it was created from."""
+    try:
+        starred, created_at, image_name = json.loads(cursor)
+        return int(starred), str(created_at), str(image_name)
+    except (ValueError, TypeError) as e:
+        raise InvalidImageCursorException from e
+
+
 def deserialize_image_record(image_dict: dict) -> ImageRecord:
     """Deserializes an image record."""
 
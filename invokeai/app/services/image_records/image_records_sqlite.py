@@ -4,7 +4,7 @@ from datetime import datetime
 from typing import Optional, Union, cast
 
 from invokeai.app.invocations.fields import MetadataField, MetadataFieldValidator
-from invokeai.app.services.shared.pagination import OffsetPaginatedResults
+from invokeai.app.services.shared.pagination import KeysetPaginatedResults, OffsetPaginatedResults
 from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
 
 from .image_records_base import ImageRecordStorageBase
@@ -17,7 +17,9 @@ from .image_records_common import (
     ImageRecordNotFoundException,
     ImageRecordSaveException,
     ResourceOrigin,
+    decode_image_cursor,
     deserialize_image_record,
+    encode_image_cursor,
 )
 
 
@@ -28,28 +30,25 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
 
     def __init__(self, db: SqliteDatabase) -> None:
         super().__init__()
+        self._db = db
         self._lock = db.lock
         self._conn = db.conn
         self._cursor = self._conn.cursor()
 
     def get(self, image_name: str) -> ImageRecord:
         try:
-            self._lock.acquire()
-
-            self._cursor.execute(
-                f"""--sql
-                SELECT {IMAGE_DTO_COLS} FROM images
-                WHERE image_name = ?;
-                """,
-                (image_name,),
-            )
+            with self._db.read_cursor() as cursor:
+                cursor.execute(
+                    f"""--sql
+                    SELECT {IMAGE_DTO_COLS} FROM images
+                    WHERE image_name = ?;
+                    """,
+                    (image_name,),
+                )
 
-            result = cast(Optional[sqlite3.Row], self._cursor.fetchone())
+                result = cast(Optional[sqlite3.Row], cursor.fetchone())
         except sqlite3.Error as e:
-            self._conn.rollback()
             raise ImageRecordNotFoundException from e
-        finally:
-            self._lock.release()
 
         if not result:
             raise ImageRecordNotFoundException
@@ -58,29 +57,25 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
 
     def get_metadata(self, image_name: str) -> Optional[MetadataField]:
         try:
-            self._lock.acquire()
-
-            self._cursor.execute(
-                """--sql
-                SELECT metadata FROM images
-                WHERE image_name = ?;
-                """,
-                (image_name,),
-            )
+            with self._db.read_cursor() as cursor:
+                cursor.execute(
+                    """--sql
+                    SELECT metadata FROM images
+                    WHERE image_name = ?;
+                    """,
+                    (image_name,),
+                )
 
-            result = cast(Optional[sqlite3.Row], self._cursor.fetchone())
+                result = cast(Optional[sqlite3.Row], cursor.fetchone())
 
-            if not result:
-                raise ImageRecordNotFoundException
+                if not result:
+                    raise ImageRecordNotFoundException
 
-            as_dict = dict(result)
-            metadata_raw = cast(Optional[str], as_dict.get("metadata", None))
-            return MetadataFieldValidator.validate_json(metadata_raw) if metadata_raw is not None else None
+                as_dict = dict(result)
+                metadata_raw = cast(Optional[str], as_dict.get("metadata", None))
+                return MetadataFieldValidator.validate_json(metadata_raw) if metadata_raw is not None else None
         except sqlite3.Error as e:
-            self._conn.rollback()
             raise ImageRecordNotFoundException from e
-        finally:
-            self._lock.release()
 
     def update(
         self,
@@ -149,93 +144,163 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
         is_intermediate: Optional[bool] = None,
         board_id: Optional[str] = None,
     ) -> OffsetPaginatedResults[ImageRecord]:
-        try:
-            self._lock.acquire()
+        with self._db.read_cursor() as cursor:
+            query_conditions, query_params = self._get_query_conditions(
+                image_origin, categories, is_intermediate, board_id
+            )
 
-            # Manually build two queries - one for the count, one for the records
-            count_query = """--sql
-            SELECT COUNT(*)
-            FROM images
-            LEFT JOIN board_images ON board_images.image_name = images.image_name
-            WHERE 1=1
-            """
+            # Final images query with pagination
+            images_query = (
+                f"""--sql
+                SELECT {IMAGE_DTO_COLS}
+                FROM images
+                LEFT JOIN board_images ON board_images.image_name = images.image_name
+                WHERE 1=1
+                """
+                + query_conditions
+                + """--sql
+                ORDER BY images.starred DESC, images.created_at DESC, images.image_name DESC LIMIT ? OFFSET ?;
+                """
+            )
+            # Add the pagination parameters
+            images_params = [*query_params, limit, offset]
 
-            images_query = f"""--sql
-            SELECT {IMAGE_DTO_COLS}
-            FROM images
-            LEFT JOIN board_images ON board_images.image_name = images.image_name
-            WHERE 1=1
-            """
+            # Build the list of images, deserializing each row
+            cursor.execute(images_query, images_params)
+            result = cast(list[sqlite3.Row], cursor.fetchall())
+            images = [deserialize_image_record(dict(r)) for r in result]
 
-            query_conditions = ""
-            query_params: list[Union[int, str, bool]] = []
+            count = self._count(cursor, query_conditions, query_params, board_id)
 
-            if image_origin is not None:
-                query_conditions += """--sql
-                AND images.image_origin = ?
-                """
-                query_params.append(image_origin.value)
+        return OffsetPaginatedResults(items=images, offset=offset, limit=limit, total=count)
+
+    def get_many_by_cursor(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        image_origin: Optional[ResourceOrigin] = None,
+        categories: Optional[list[ImageCategory]] = None,
+        is_intermediate: Optional[bool] = None,
+        board_id: Optional[str] = None,
+        include_total: bool = False,
+    ) -> KeysetPaginatedResults[ImageRecord]:
+        with self._db.read_cursor() as db_cursor:
+            query_conditions, query_params = self._get_query_conditions(
+                image_origin, categories, is_intermediate, board_id
+            )
 
-            if categories is not None:
-                # Convert the enum values to unique list of strings
-                category_strings = [c.value for c in set(categories)]
-                # Create the correct length of placeholders
-                placeholders = ",".join("?" * len(category_strings))
+            # The page starts after the cursor's position in the sort order. The row value comparison and the
+            # ordering both match idx_images_starred_created_at_image_name, so SQLite seeks to the cursor in the
+            # index instead of stepping over every earlier image.
+            cursor_condition = ""
+            cursor_params: list[Union[int, str, bool]] = []
+            if cursor is not None:
+                cursor_condition = """--sql
+                AND (images.starred, images.created_at, images.image_name) < (?, ?, ?)
+                """
+                cursor_params.extend(decode_image_cursor(cursor))
 
-                query_conditions += f"""--sql
-                AND images.image_category IN ( {placeholders} )
+            images_query = (
+                f"""--sql
+                SELECT {IMAGE_DTO_COLS}
+                FROM images
+                LEFT JOIN board_images ON board_images.image_name = images.image_name
+                WHERE 1=1
+                """
+                + query_conditions
+                + cursor_condition
+                + """--sql
+                ORDER BY images.starred DESC, images.created_at DESC, images.image_name DESC LIMIT ?;
                 """
+            )
+            # Get one extra image to find out if there are more
+            db_cursor.execute(images_query, [*query_params, *cursor_params, limit + 1])
+            result = cast(list[sqlite3.Row], db_cursor.fetchall())
+
+            next_cursor = None
+            if len(result) > limit:
+                result = result[:limit]
+                last = result[-1]
+                next_cursor = encode_image_cursor(last["starred"], last["created_at"], last["image_name"])
+            images = [deserialize_image_record(dict(r)) for r in result]
 
-                # Unpack the included categories into the query params
-                for c in category_strings:
-                    query_params.append(c)
+            count = self._count(db_cursor, query_conditions, query_params, board_id) if include_total else None
 
-            if is_intermediate is not None:
-                query_conditions += """--sql
-                AND images.is_intermediate = ?
-                """
+        return KeysetPaginatedResults(items=images, limit=limit, next_cursor=next_cursor, total=count)
 
-                query_params.append(is_intermediate)
+    def _get_query_conditions(
+        self,
+        image_origin: Optional[ResourceOrigin],
+        categories: Optional[list[ImageCategory]],
+        is_intermediate: Optional[bool],
+        board_id: Optional[str],
+    ) -> tuple[str, list[Union[int, str, bool]]]:
+        """Builds the conditions and parameters that filter images, for a query that left joins board_images."""
+        query_conditions = ""
+        query_params: list[Union[int, str, bool]] = []
+
+        if image_origin is not None:
+            query_conditions += """--sql
+            AND images.image_origin = ?
+            """
+            query_params.append(image_origin.value)
 
-            # board_id of "none" is reserved for images without a board
-            if board_id == "none":
-                query_conditions += """--sql
-                AND board_images.board_id IS NULL
-                """
-            elif board_id is not None:
-                query_conditions += """--sql
-                AND board_images.board_id = ?
-                """
-                query_params.append(board_id)
+        if categories is not None:
+            # Convert the enum values to unique list of strings
+            category_strings = [c.value for c in set(categories)]
+            # Create the correct length of placeholders
+            placeholders = ",".join("?" * len(category_strings))
 
-            query_pagination = """--sql
-            ORDER BY images.starred DESC, images.created_at DESC LIMIT ? OFFSET ?
+            query_conditions += f"""--sql
+            AND images.image_category IN ( {placeholders} )
             """
 
-            # Final images query with pagination
-            images_query += query_conditions + query_pagination + ";"
-            # Add all the parameters
-            images_params = query_params.copy()
-            # Add the pagination parameters
-            images_params.extend([limit, offset])
+            # Unpack the included categories into the query params
+            for c in category_strings:
+                query_params.append(c)
 
-            # Build the list of images, deserializing each row
-            self._cursor.execute(images_query, images_params)
-            result = cast(list[sqlite3.Row], self._cursor.fetchall())
-            images = [deserialize_image_record(dict(r)) for r in result]
+        if is_intermediate is not None:
+            query_conditions += """--sql
+            AND images.is_intermediate = ?
+            """
 
-            # Set up and execute the count query, without pagination
-            count_query += query_conditions + ";"
-            count_params = query_params.copy()
-            self._cursor.execute(count_query, count_params)
-            count = cast(int, self._cursor.fetchone()[0])
-        except sqlite3.Error as e:
-            self._conn.rollback()
-            raise e
-        finally:
-            self._lock.release()
+            query_params.append(is_intermediate)
 
-        return OffsetPaginatedResults(items=images, offset=offset, limit=limit, total=count)
+        # board_id of "none" is reserved for images without a board
+        if board_id == "none":
+            query_conditions += """--sql
+            AND board_images.board_id IS NULL
+            """
+        elif board_id is not None:
+            query_conditions += """--sql
+            AND board_images.board_id = ?
+            """
+            query_params.append(board_id)
+
+        return query_conditions, query_params
+
+    def _count(
+        self,
+        cursor: sqlite3.Cursor,
+        query_conditions: str,
+        query_params: list[Union[int, str, bool]],
+        board_id: Optional[str],
+    ) -> int:
+        """Counts the images matching the conditions."""
+        # The join is only needed to filter by board
+        join = "LEFT JOIN board_images ON board_images.image_name = images.image_name" if board_id is not None else ""
+        cursor.execute(
+            f"""--sql
+            SELECT COUNT(*)
+            FROM images
+            {join}
+            WHERE 1=1
+            """
+            + query_conditions
+            + ";",
+            query_params,
+        )
+        return cast(int, cursor.fetchone()[0])
 
     def delete(self, image_name: str) -> None:
         try:
@@ -275,21 +340,17 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
 
     def get_intermediates_count(self) -> int:
         try:
-            self._lock.acquire()
-            self._cursor.execute(
-                """--sql
-                SELECT COUNT(*) FROM images
-                WHERE is_intermediate = TRUE;
-                """
-            )
-            count = cast(int, self._cursor.fetchone()[0])
-            self._conn.commit()
-            return count
+            with self._db.read_cursor() as cursor:
+                cursor.execute(
+                    """--sql
+                    SELECT COUNT(*) FROM images
+                    WHERE is_intermediate = TRUE;
+                    """
+                )
+                count = cast(int, cursor.fetchone()[0])
+                return count
         except sqlite3.Error as e:
-            self._conn.rollback()
             raise ImageRecordDeleteException from e
-        finally:
-            self._lock.release()
 
     def delete_intermediates(self) -> list[str]:
         try:
@@ -385,9 +446,8 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
             self._lock.release()
 
     def get_most_recent_image_for_board(self, board_id: str) -> Optional[ImageRecord]:
-        try:
-            self._lock.acquire()
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT images.*
                 FROM images
@@ -399,9 +459,7 @@ class SqliteImageRecordStorage(ImageRecordStorageBase):
                 (board_id,),
             )
 
-            result = cast(Optional[sqlite3.Row], self._cursor.fetchone())
-        finally:
-            self._lock.release()
+            result = cast(Optional[sqlite3.Row], cursor.fetchone())
         if result is None:
             return None
 
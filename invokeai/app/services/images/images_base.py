@@ -11,7 +11,7 @@ from invokeai.app.services.image_records.image_records_common import (
     ResourceOrigin,
 )
 from invokeai.app.services.images.images_common import ImageDTO
-from invokeai.app.services.shared.pagination import OffsetPaginatedResults
+from invokeai.app.services.shared.pagination import KeysetPaginatedResults, OffsetPaginatedResults
 from invokeai.app.services.workflow_records.workflow_records_common import WorkflowWithoutID
 
 
@@ -119,6 +119,20 @@ class ImageServiceABC(ABC):
         """Gets a paginated list of image DTOs."""
         pass
 
+    @abstractmethod
+    def get_many_by_cursor(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        image_origin: Optional[ResourceOrigin] = None,
+        categories: Optional[list[ImageCategory]] = None,
+        is_intermediate: Optional[bool] = None,
+        board_id: Optional[str] = None,
+        include_total: bool = False,
+    ) -> KeysetPaginatedResults[ImageDTO]:
+        """Gets the page of image DTOs after a cursor, or the first page if no cursor is given."""
+        pass
+
     @abstractmethod
     def delete(self, image_name: str):
         """Deletes an image."""
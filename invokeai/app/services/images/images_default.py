@@ -4,7 +4,7 @@ from PIL.Image import Image as PILImageType
 
 from invokeai.app.invocations.fields import MetadataField
 from invokeai.app.services.invoker import Invoker
-from invokeai.app.services.shared.pagination import OffsetPaginatedResults
+from invokeai.app.services.shared.pagination import KeysetPaginatedResults, OffsetPaginatedResults
 from invokeai.app.services.workflow_records.workflow_records_common import WorkflowWithoutID
 
 from ..image_files.image_files_common import (
@@ -75,7 +75,7 @@ class ImageService(ImageServiceABC):
             if board_id is not None:
                 self.__invoker.services.board_image_records.add_image_to_board(board_id=board_id, image_name=image_name)
             self.__invoker.services.image_files.save(
-                image_name=image_name, image=image, metadata=metadata, workflow=workflow
+                image_name=image_name, image=image, metadata=metadata, workflow=workflow, session_id=session_id
             )
             image_dto = self.get_dto(image_name)
 
@@ -227,6 +227,47 @@ class ImageService(ImageServiceABC):
             self.__invoker.services.logger.error("Problem getting paginated image DTOs")
             raise e
 
+    def get_many_by_cursor(
+        self,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        image_origin: Optional[ResourceOrigin] = None,
+        categories: Optional[list[ImageCategory]] = None,
+        is_intermediate: Optional[bool] = None,
+        board_id: Optional[str] = None,
+        include_total: bool = False,
+    ) -> KeysetPaginatedResults[ImageDTO]:
+        try:
+            results = self.__invoker.services.image_records.get_many_by_cursor(
+                limit,
+                cursor,
+                image_origin,
+                categories,
+                is_intermediate,
+                board_id,
+                include_total,
+            )
+
+            image_dtos = [
+                image_record_to_dto(
+                    image_record=r,
+                    image_url=self.__invoker.services.urls.get_image_url(r.image_name),
+                    thumbnail_url=self.__invoker.services.urls.get_image_url(r.image_name, True),
+                    board_id=self.__invoker.services.board_image_records.get_board_for_image(r.image_name),
+                )
+                for r in results.items
+            ]
+
+            return KeysetPaginatedResults[ImageDTO](
+                items=image_dtos,
+                limit=results.limit,
+                next_cursor=results.next_cursor,
+                total=results.total,
+            )
+        except Exception as e:
+            self.__invoker.services.logger.error("Problem getting paginated image DTOs")
+            raise e
+
     def delete(self, image_name: str):
         try:
             self.__invoker.services.image_files.delete(image_name)
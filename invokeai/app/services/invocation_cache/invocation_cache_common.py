@@ -1,5 +1,17 @@
+from typing import Any, Literal
+
+from blake3 import blake3
 from pydantic import BaseModel, Field
 
+from invokeai.app.invocations.baseinvocation import BaseInvocation
+from invokeai.app.invocations.fields import (
+    ConditioningField,
+    DenoiseMaskField,
+    ImageField,
+    LatentsField,
+    TensorField,
+)
+
 
 class InvocationCacheStatus(BaseModel):
     size: int = Field(description="The current size of the invocation cache")
@@ -7,3 +19,52 @@ class InvocationCacheStatus(BaseModel):
     misses: int = Field(description="The number of cache misses")
     enabled: bool = Field(description="Whether the invocation cache is enabled")
     max_size: int = Field(description="The maximum size of the invocation cache")
+
+
+def create_invocation_key(invocation: BaseInvocation) -> int:
+    """Creates a cache key for an invocation from its fields, excluding its id.
+
+    The key is a digest of the invocation's JSON, so unlike python's `hash`, it is the same in every process and may be
+    shared or persisted.
+    """
+    invocation_json = invocation.__pydantic_serializer__.to_json(invocation, exclude={"id"}, warnings=False)
+    return int.from_bytes(blake3(invocation_json).digest(length=8), "big")
+
+
+ReferencedObjectType = Literal["image", "tensor", "conditioning"]
+
+# The fields that reference stored objects by name, and the type of object they reference
+_REFERENCE_FIELDS: dict[type[BaseModel], tuple[ReferencedObjectType, tuple[str, ...]]] = {
+    ImageField: ("image", ("image_name",)),
+    LatentsField: ("tensor", ("latents_name",)),
+    TensorField: ("tensor", ("tensor_name",)),
+    DenoiseMaskField: ("tensor", ("mask_name", "masked_latents_name")),
+    ConditioningField: ("conditioning", ("conditioning_name",)),
+}
+
+
+def get_referenced_objects(value: Any) -> list[tuple[ReferencedObjectType, str]]:
+    """Gets the type and name of every image, tensor and conditioning object referenced by a value, e.g. an
+    invocation output."""
+    references: dict[tuple[ReferencedObjectType, str], None] = {}
+
+    def visit(v: Any) -> None:
+        if isinstance(v, BaseModel):
+            reference_fields = _REFERENCE_FIELDS.get(type(v))
+            if reference_fields is not None:
+                object_type, field_names = reference_fields
+                for field_name in field_names:
+                    name = getattr(v, field_name)
+                    if name is not None:
+                        references[(object_type, name)] = None
+            for field_name in v.model_fields:
+                visit(getattr(v, field_name))
+        elif isinstance(v, (list, tuple)):
+            for item in v:
+                visit(item)
+        elif isinstance(v, dict):
+            for item in v.values():
+                visit(item)
+
+    visit(value)
+    return list(references)
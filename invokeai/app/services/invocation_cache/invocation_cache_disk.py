@@ -0,0 +1,317 @@
+import sqlite3
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import torch
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
+from invokeai.app.services.invocation_cache.invocation_cache_base import InvocationCacheBase
+from invokeai.app.services.invocation_cache.invocation_cache_common import (
+    InvocationCacheStatus,
+    create_invocation_key,
+    get_referenced_objects,
+)
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.object_serializer.object_serializer_base import ObjectSerializerBase
+from invokeai.app.services.object_serializer.object_serializer_common import ObjectNotFoundError
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+
+
+class DiskInvocationCache(InvocationCacheBase):
+    """An invocation cache that persists outputs across restarts, indexed by an SQLite database.
+
+    Outputs reference images, tensors and conditioning by name. Images are stored permanently, but tensors and
+    conditioning only live as long as the process, so the cache keeps its own copy of each tensor and conditioning
+    object referenced by a cached output. After a restart, the first time an output is retrieved, its objects are
+    restored to the tensors and conditioning services and the output is updated to reference them by their new names.
+
+    When the cache exceeds either limit, the least recently used outputs are evicted.
+
+    :param db: The database used to index the cache. This should not be the app's database.
+    :param objects_dir: The folder where copies of referenced tensors and conditioning are stored
+    :param max_cache_size: The maximum number of cached outputs. If 0, the cache is disabled.
+    :param max_cache_bytes: The maximum total size of the cached outputs and their objects
+    """
+
+    def __init__(self, db: SqliteDatabase, objects_dir: Path, max_cache_size: int = 0, max_cache_bytes: int = 0):
+        self._db = db
+        self._objects_dir = objects_dir
+        self._max_cache_size = max_cache_size
+        self._max_cache_bytes = max_cache_bytes
+        self._disabled = False
+        self._hits = 0
+        self._misses = 0
+        # The tensors and conditioning known to the services in this process, by name
+        self._live_objects: set[str] = set()
+
+        if self._max_cache_size == 0:
+            return
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+        with self._db.lock:
+            cursor = self._db.conn.cursor()
+            cursor.execute(
+                """--sql
+                CREATE TABLE IF NOT EXISTS invocation_cache (
+                    key TEXT NOT NULL PRIMARY KEY,
+                    invocation_output TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_accessed INTEGER NOT NULL
+                );
+                """
+            )
+            cursor.execute(
+                """--sql
+                CREATE INDEX IF NOT EXISTS idx_invocation_cache_last_accessed ON invocation_cache(last_accessed);
+                """
+            )
+            cursor.execute(
+                """--sql
+                CREATE TABLE IF NOT EXISTS invocation_cache_objects (
+                    key TEXT NOT NULL REFERENCES invocation_cache(key) ON DELETE CASCADE,
+                    object_type TEXT NOT NULL,
+                    object_name TEXT NOT NULL,
+                    PRIMARY KEY (object_name, key)
+                );
+                """
+            )
+            cursor.execute(
+                """--sql
+                CREATE INDEX IF NOT EXISTS idx_invocation_cache_objects_key ON invocation_cache_objects(key);
+                """
+            )
+            self._db.conn.commit()
+
+            cursor.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(MAX(last_accessed), 0) FROM invocation_cache;"
+            )
+            self._count, self._total_bytes, self._clock = cursor.fetchone()
+
+            # Remove copies left behind by an interrupted write
+            cursor.execute("SELECT DISTINCT object_name FROM invocation_cache_objects;")
+            referenced = {row[0] for row in cursor.fetchall()}
+            for path in self._objects_dir.iterdir():
+                if path.name not in referenced:
+                    path.unlink(missing_ok=True)
+
+    def start(self, invoker: Invoker) -> None:
+        self._invoker = invoker
+        if self._max_cache_size == 0:
+            return
+        self._invoker.services.images.on_deleted(self._delete_by_match)
+        self._invoker.services.tensors.on_deleted(self._delete_by_match)
+        self._invoker.services.conditioning.on_deleted(self._delete_by_match)
+
+    def get(self, key: Union[int, str]) -> Optional[BaseInvocationOutput]:
+        with self._db.lock:
+            if self._max_cache_size == 0 or self._disabled:
+                return None
+            cursor = self._db.conn.cursor()
+            try:
+                cursor.execute("SELECT invocation_output FROM invocation_cache WHERE key = ?;", (str(key),))
+                row = cursor.fetchone()
+                if row is None:
+                    self._misses += 1
+                    return None
+                try:
+                    invocation_output_json = self._restore_objects(cursor, str(key), row[0])
+                except (FileNotFoundError, ObjectNotFoundError):
+                    # The copy of an object is missing, so the output is unusable
+                    self._delete(cursor, str(key))
+                    self._db.conn.commit()
+                    self._misses += 1
+                    return None
+                self._clock += 1
+                cursor.execute("UPDATE invocation_cache SET last_accessed = ? WHERE key = ?;", (self._clock, str(key)))
+                self._db.conn.commit()
+            except Exception:
+                self._db.conn.rollback()
+                raise
+            self._hits += 1
+            return BaseInvocationOutput.get_typeadapter().validate_json(invocation_output_json)
+
+    def save(self, key: Union[int, str], invocation_output: BaseInvocationOutput) -> None:
+        with self._db.lock:
+            if self._max_cache_size == 0 or self._disabled:
+                return
+            cursor = self._db.conn.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM invocation_cache WHERE key = ?;", (str(key),))
+                if cursor.fetchone() is not None:
+                    return
+
+                invocation_output_json = invocation_output.model_dump_json(warnings=False)
+                references = get_referenced_objects(invocation_output)
+                size = len(invocation_output_json)
+                for object_type, object_name in references:
+                    if object_type != "image":
+                        try:
+                            size += self._store_object(object_type, object_name)
+                        except ObjectNotFoundError:
+                            return  # Can't be restored later, so don't cache it
+
+                self._clock += 1
+                cursor.execute(
+                    """--sql
+                    INSERT INTO invocation_cache (key, invocation_output, size, last_accessed)
+                    VALUES (?, ?, ?, ?);
+                    """,
+                    (str(key), invocation_output_json, size, self._clock),
+                )
+                cursor.executemany(
+                    """--sql
+                    INSERT INTO invocation_cache_objects (key, object_type, object_name)
+                    VALUES (?, ?, ?);
+                    """,
+                    [(str(key), object_type, object_name) for object_type, object_name in references],
+                )
+                self._count += 1
+                self._total_bytes += size
+                self._evict(cursor)
+                self._db.conn.commit()
+            except Exception:
+                self._db.conn.rollback()
+                raise
+
+    def _store_object(self, object_type: str, object_name: str) -> int:
+        """Stores a copy of a tensor or conditioning object, returning its size in bytes"""
+        path = self._objects_dir / object_name
+        if not path.exists():
+            torch.save(self._get_object_service(object_type).load(object_name), path)
+        self._live_objects.add(object_name)
+        return path.stat().st_size
+
+    def _restore_objects(self, cursor: sqlite3.Cursor, key: str, invocation_output_json: str) -> str:
+        """Restores any objects referenced by an output that are unknown to this process, returning the updated output"""
+        cursor.execute(
+            """--sql
+            SELECT object_type, object_name FROM invocation_cache_objects
+            WHERE key = ? AND object_type != 'image';
+            """,
+            (key,),
+        )
+        for object_type, object_name in cursor.fetchall():
+            if object_name in self._live_objects:
+                continue
+            obj = torch.load(self._objects_dir / object_name)
+            restored_name = self._get_object_service(object_type).save(obj)
+            (self._objects_dir / object_name).rename(self._objects_dir / restored_name)
+            self._live_objects.add(restored_name)
+            # Other outputs may reference the same object. Names are unique, so they can be replaced verbatim.
+            cursor.execute(
+                """--sql
+                UPDATE invocation_cache SET invocation_output = replace(invocation_output, ?, ?)
+                WHERE key IN (SELECT key FROM invocation_cache_objects WHERE object_name = ?);
+                """,
+                (object_name, restored_name, object_name),
+            )
+            cursor.execute(
+                "UPDATE invocation_cache_objects SET object_name = ? WHERE object_name = ?;",
+                (restored_name, object_name),
+            )
+            invocation_output_json = invocation_output_json.replace(object_name, restored_name)
+        return invocation_output_json
+
+    def _get_object_service(self, object_type: str) -> ObjectSerializerBase[Any]:
+        if object_type == "tensor":
+            return self._invoker.services.tensors
+        return self._invoker.services.conditioning
+
+    def _evict(self, cursor: sqlite3.Cursor) -> None:
+        while self._count > self._max_cache_size or self._total_bytes > self._max_cache_bytes:
+            cursor.execute("SELECT key FROM invocation_cache ORDER BY last_accessed ASC LIMIT 1;")
+            row = cursor.fetchone()
+            if row is None:
+                break
+            self._delete(cursor, row[0])
+
+    def _delete(self, cursor: sqlite3.Cursor, key: str) -> None:
+        cursor.execute("SELECT size FROM invocation_cache WHERE key = ?;", (key,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        cursor.execute(
+            "SELECT object_name FROM invocation_cache_objects WHERE key = ? AND object_type != 'image';", (key,)
+        )
+        object_names = [r[0] for r in cursor.fetchall()]
+        cursor.execute("DELETE FROM invocation_cache WHERE key = ?;", (key,))
+        self._count -= 1
+        self._total_bytes -= row[0]
+        # Copies are shared by every output that references them
+        for object_name in object_names:
+            cursor.execute("SELECT 1 FROM invocation_cache_objects WHERE object_name = ? LIMIT 1;", (object_name,))
+            if cursor.fetchone() is None:
+                (self._objects_dir / object_name).unlink(missing_ok=True)
+
+    def delete(self, key: Union[int, str]) -> None:
+        with self._db.lock:
+            if self._max_cache_size == 0:
+                return
+            try:
+                self._delete(self._db.conn.cursor(), str(key))
+                self._db.conn.commit()
+            except Exception:
+                self._db.conn.rollback()
+                raise
+
+    def clear(self) -> None:
+        with self._db.lock:
+            if self._max_cache_size == 0:
+                return
+            try:
+                self._db.conn.execute("DELETE FROM invocation_cache;")
+                self._db.conn.commit()
+            except Exception:
+                self._db.conn.rollback()
+                raise
+            for path in self._objects_dir.iterdir():
+                path.unlink(missing_ok=True)
+            self._count = 0
+            self._total_bytes = 0
+            self._misses = 0
+            self._hits = 0
+
+    @staticmethod
+    def create_key(invocation: BaseInvocation) -> int:
+        return create_invocation_key(invocation)
+
+    def disable(self) -> None:
+        with self._db.lock:
+            if self._max_cache_size == 0:
+                return
+            self._disabled = True
+
+    def enable(self) -> None:
+        with self._db.lock:
+            if self._max_cache_size == 0:
+                return
+            self._disabled = False
+
+    def get_status(self) -> InvocationCacheStatus:
+        with self._db.lock:
+            return InvocationCacheStatus(
+                hits=self._hits,
+                misses=self._misses,
+                enabled=not self._disabled and self._max_cache_size > 0,
+                size=self._count if self._max_cache_size > 0 else 0,
+                max_size=self._max_cache_size,
+            )
+
+    def _delete_by_match(self, to_match: str) -> None:
+        with self._db.lock:
+            if self._max_cache_size == 0:
+                return
+            try:
+                cursor = self._db.conn.cursor()
+                cursor.execute("SELECT key FROM invocation_cache_objects WHERE object_name = ?;", (to_match,))
+                keys_to_delete = [row[0] for row in cursor.fetchall()]
+                if not keys_to_delete:
+                    return
+                for key in keys_to_delete:
+                    self._delete(cursor, key)
+                self._db.conn.commit()
+            except Exception:
+                self._db.conn.rollback()
+                raise
+            self._invoker.services.logger.debug(
+                f"Deleted {len(keys_to_delete)} cached invocation outputs for {to_match}"
+            )
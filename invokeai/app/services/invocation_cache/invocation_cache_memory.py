@@ -1,22 +1,28 @@
 from collections import OrderedDict
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from threading import Lock
 from typing import Optional, Union
 
 from invokeai.app.invocations.baseinvocation import BaseInvocation, BaseInvocationOutput
 from invokeai.app.services.invocation_cache.invocation_cache_base import InvocationCacheBase
-from invokeai.app.services.invocation_cache.invocation_cache_common import InvocationCacheStatus
+from invokeai.app.services.invocation_cache.invocation_cache_common import (
+    InvocationCacheStatus,
+    create_invocation_key,
+    get_referenced_objects,
+)
 from invokeai.app.services.invoker import Invoker
 
 
-@dataclass(order=True)
+@dataclass
 class CachedItem:
-    invocation_output: BaseInvocationOutput = field(compare=False)
-    invocation_output_json: str = field(compare=False)
+    invocation_output: BaseInvocationOutput
+    referenced_names: tuple[str, ...]
 
 
 class MemoryInvocationCache(InvocationCacheBase):
     _cache: OrderedDict[Union[int, str], CachedItem]
+    # The keys of the cached items that reference each image, tensor and conditioning object, by name
+    _keys_by_name: dict[str, set[Union[int, str]]]
     _max_cache_size: int
     _disabled: bool
     _hits: int
@@ -26,6 +32,7 @@ class MemoryInvocationCache(InvocationCacheBase):
 
     def __init__(self, max_cache_size: int = 0) -> None:
         self._cache = OrderedDict()
+        self._keys_by_name = {}
         self._max_cache_size = max_cache_size
         self._disabled = False
         self._hits = 0
@@ -59,21 +66,30 @@ class MemoryInvocationCache(InvocationCacheBase):
             # If the cache is full, we need to remove the least used
             number_to_delete = len(self._cache) + 1 - self._max_cache_size
             self._delete_oldest_access(number_to_delete)
-            self._cache[key] = CachedItem(
-                invocation_output,
-                invocation_output.model_dump_json(warnings=False, exclude_defaults=True, exclude_unset=True),
-            )
+            referenced_names = tuple(name for _, name in get_referenced_objects(invocation_output))
+            self._cache[key] = CachedItem(invocation_output, referenced_names)
+            for name in referenced_names:
+                self._keys_by_name.setdefault(name, set()).add(key)
 
     def _delete_oldest_access(self, number_to_delete: int) -> None:
         number_to_delete = min(number_to_delete, len(self._cache))
         for _ in range(number_to_delete):
-            self._cache.popitem(last=False)
+            key, item = self._cache.popitem(last=False)
+            self._unindex(key, item)
 
     def _delete(self, key: Union[int, str]) -> None:
         if self._max_cache_size == 0:
             return
-        if key in self._cache:
-            del self._cache[key]
+        item = self._cache.pop(key, None)
+        if item is not None:
+            self._unindex(key, item)
+
+    def _unindex(self, key: Union[int, str], item: CachedItem) -> None:
+        for name in item.referenced_names:
+            keys = self._keys_by_name[name]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_name[name]
 
     def delete(self, key: Union[int, str]) -> None:
         with self._lock:
@@ -84,12 +100,13 @@ class MemoryInvocationCache(InvocationCacheBase):
             if self._max_cache_size == 0:
                 return
             self._cache.clear()
+            self._keys_by_name.clear()
             self._misses = 0
             self._hits = 0
 
     @staticmethod
     def create_key(invocation: BaseInvocation) -> int:
-        return hash(invocation.model_dump_json(exclude={"id"}, warnings=False))
+        return create_invocation_key(invocation)
 
     def disable(self) -> None:
         with self._lock:
@@ -117,10 +134,7 @@ class MemoryInvocationCache(InvocationCacheBase):
         with self._lock:
             if self._max_cache_size == 0:
                 return
-            keys_to_delete = set()
-            for key, cached_item in self._cache.items():
-                if to_match in cached_item.invocation_output_json:
-                    keys_to_delete.add(key)
+            keys_to_delete = list(self._keys_by_name.get(to_match, ()))
             if not keys_to_delete:
                 return
             for key in keys_to_delete:
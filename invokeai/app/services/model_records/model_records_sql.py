@@ -189,30 +189,30 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
 
         Exceptions: UnknownModelException
         """
-        with self._db.lock:
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT config, strftime('%s',updated_at) FROM models
                 WHERE id=?;
                 """,
                 (key,),
             )
-            rows = self._cursor.fetchone()
+            rows = cursor.fetchone()
             if not rows:
                 raise UnknownModelException("model not found")
             model = ModelConfigFactory.make_config(json.loads(rows[0]), timestamp=rows[1])
         return model
 
     def get_model_by_hash(self, hash: str) -> AnyModelConfig:
-        with self._db.lock:
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT config, strftime('%s',updated_at) FROM models
                 WHERE hash=?;
                 """,
                 (hash,),
             )
-            rows = self._cursor.fetchone()
+            rows = cursor.fetchone()
             if not rows:
                 raise UnknownModelException("model not found")
             model = ModelConfigFactory.make_config(json.loads(rows[0]), timestamp=rows[1])
@@ -225,15 +225,15 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
         :param key: Unique key for the model to be deleted
         """
         count = 0
-        with self._db.lock:
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 select count(*) FROM models
                 WHERE id=?;
                 """,
                 (key,),
             )
-            count = self._cursor.fetchone()[0]
+            count = cursor.fetchone()[0]
         return count > 0
 
     def search_by_attr(
@@ -281,8 +281,8 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
             where_clause.append("format=?")
             bindings.append(model_format)
         where = f"WHERE {' AND '.join(where_clause)}" if where_clause else ""
-        with self._db.lock:
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 f"""--sql
                 SELECT config, strftime('%s',updated_at)
                 FROM models
@@ -291,40 +291,36 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
                 """,
                 tuple(bindings),
             )
-            result = self._cursor.fetchall()
+            result = cursor.fetchall()
             results = [ModelConfigFactory.make_config(json.loads(x[0]), timestamp=x[1]) for x in result]
         return results
 
     def search_by_path(self, path: Union[str, Path]) -> List[AnyModelConfig]:
         """Return models with the indicated path."""
         results = []
-        with self._db.lock:
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT config, strftime('%s',updated_at) FROM models
                 WHERE path=?;
                 """,
                 (str(path),),
             )
-            results = [
-                ModelConfigFactory.make_config(json.loads(x[0]), timestamp=x[1]) for x in self._cursor.fetchall()
-            ]
+            results = [ModelConfigFactory.make_config(json.loads(x[0]), timestamp=x[1]) for x in cursor.fetchall()]
         return results
 
     def search_by_hash(self, hash: str) -> List[AnyModelConfig]:
         """Return models with the indicated hash."""
         results = []
-        with self._db.lock:
-            self._cursor.execute(
+        with self._db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
                 SELECT config, strftime('%s',updated_at) FROM models
                 WHERE hash=?;
                 """,
                 (hash,),
             )
-            results = [
-                ModelConfigFactory.make_config(json.loads(x[0]), timestamp=x[1]) for x in self._cursor.fetchall()
-            ]
+            results = [ModelConfigFactory.make_config(json.loads(x[0]), timestamp=x[1]) for x in cursor.fetchall()]
         return results
 
     def list_models(
@@ -340,19 +336,19 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
             ModelRecordOrderBy.Format: "format",
         }
 
-        # Lock so that the database isn't updated while we're doing the two queries.
-        with self._db.lock:
+        # Both queries see the database as of the same point in time.
+        with self._db.read_cursor() as cursor:
             # query1: get the total number of model configs
-            self._cursor.execute(
+            cursor.execute(
                 """--sql
                 select count(*) from models;
                 """,
                 (),
             )
-            total = int(self._cursor.fetchone()[0])
+            total = int(cursor.fetchone()[0])
 
             # query2: fetch key fields
-            self._cursor.execute(
+            cursor.execute(
                 f"""--sql
                 SELECT config
                 FROM models
@@ -365,7 +361,7 @@ class ModelRecordServiceSQL(ModelRecordServiceBase):
                     page * per_page,
                 ),
             )
-            rows = self._cursor.fetchall()
+            rows = cursor.fetchall()
             items = [ModelSummary.model_validate(dict(x)) for x in rows]
             return PaginatedResults(
                 page=page, pages=ceil(total / per_page), per_page=per_page, total=total, items=items
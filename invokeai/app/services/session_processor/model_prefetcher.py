@@ -0,0 +1,167 @@
+from pathlib import Path
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+import networkx as nx
+from pydantic import BaseModel
+
+from invokeai.app.invocations.model import ModelIdentifierField
+from invokeai.app.services.session_queue.session_queue_common import SessionQueueItem
+from invokeai.app.services.shared.graph import Graph
+from invokeai.backend.model_manager import AnyModelConfig, BaseModelType, ModelType, SubModelType
+from invokeai.backend.model_manager.config import DiffusersConfigBase
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import GIG
+from invokeai.backend.model_manager.load.model_util import calc_model_size_by_fs
+
+if TYPE_CHECKING:
+    from invokeai.app.services.invocation_services import InvocationServices
+
+# The submodels that the main model loaders output, in the order the nodes using them usually run
+MAIN_SUBMODELS: dict[BaseModelType, list[SubModelType]] = {
+    BaseModelType.StableDiffusionXL: [
+        SubModelType.Tokenizer,
+        SubModelType.TextEncoder,
+        SubModelType.Tokenizer2,
+        SubModelType.TextEncoder2,
+        SubModelType.Scheduler,
+        SubModelType.UNet,
+        SubModelType.VAE,
+    ],
+    BaseModelType.StableDiffusionXLRefiner: [
+        SubModelType.Tokenizer2,
+        SubModelType.TextEncoder2,
+        SubModelType.Scheduler,
+        SubModelType.UNet,
+        SubModelType.VAE,
+    ],
+}
+DEFAULT_MAIN_SUBMODELS = [
+    SubModelType.Tokenizer,
+    SubModelType.TextEncoder,
+    SubModelType.Scheduler,
+    SubModelType.UNet,
+    SubModelType.VAE,
+]
+
+
+def get_model_identifiers(graph: Graph) -> list[ModelIdentifierField]:
+    """Gets the models a graph's nodes load, in the order the nodes run. Main models are expanded to their submodels."""
+    identifiers: dict[tuple[str, Optional[SubModelType]], ModelIdentifierField] = {}
+    for node_id in nx.topological_sort(graph.nx_graph()):
+        for identifier in _find_identifiers(graph.nodes[node_id]):
+            if identifier.type is ModelType.Main and identifier.submodel_type is None:
+                submodel_types = MAIN_SUBMODELS.get(identifier.base, DEFAULT_MAIN_SUBMODELS)
+                submodels = [identifier.model_copy(update={"submodel_type": s}) for s in submodel_types]
+            else:
+                submodels = [identifier]
+            for submodel in submodels:
+                identifiers.setdefault((submodel.key, submodel.submodel_type), submodel)
+    return list(identifiers.values())
+
+
+def _find_identifiers(value: Any) -> Iterator[ModelIdentifierField]:
+    if isinstance(value, ModelIdentifierField):
+        yield value
+    elif isinstance(value, BaseModel):
+        for field_name in value.model_fields:
+            yield from _find_identifiers(getattr(value, field_name))
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _find_identifiers(item)
+
+
+class ModelPrefetcher:
+    """Loads the models that the current and next queue items need into the RAM cache, on a background thread.
+
+    Models are loaded in the order the nodes need them, the current queue item's first. Models whose estimated size
+    would take the planned total over the RAM cache's size are skipped, so prefetching never evicts a model that was
+    prefetched for the same plan. A node that needs a model while it is prefetched waits for the same load.
+
+    :param services: The invocation services. Models are loaded with the model manager, as nodes load them.
+    """
+
+    def __init__(self, services: "InvocationServices") -> None:
+        self._services = services
+        self._condition = Condition()
+        self._pending: Optional[SessionQueueItem] = None
+        self._stopped = False
+        self._thread = Thread(name="model_prefetcher", target=self._run, daemon=True)
+        self._thread.start()
+
+    def prefetch(self, queue_item: SessionQueueItem) -> None:
+        """Prefetches the models for a queue item that is starting, and for the next item in its queue.
+
+        Replaces the models that are still waiting to be prefetched for the previous queue item.
+        """
+        with self._condition:
+            self._pending = queue_item
+            self._condition.notify()
+
+    def stop(self) -> None:
+        """Stops prefetching. A model that is being loaded finishes loading."""
+        with self._condition:
+            self._stopped = True
+            self._pending = None
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._stopped)
+                if self._stopped or self._pending is None:
+                    return
+                queue_item = self._pending
+                self._pending = None
+            try:
+                self._prefetch(queue_item)
+            except Exception as e:
+                self._services.logger.warning(
+                    f"Error while prefetching models for queue item {queue_item.item_id}: {e}"
+                )
+
+    def _prefetch(self, queue_item: SessionQueueItem) -> None:
+        identifiers = get_model_identifiers(queue_item.session.graph)
+        next_item = self._services.session_queue.get_next(queue_item.queue_id)
+        if next_item is not None:
+            identifiers.extend(i for i in get_model_identifiers(next_item.session.graph) if i not in identifiers)
+
+        model_manager = self._services.model_manager
+        budget = model_manager.load.ram_cache.max_cache_size * GIG
+        planned = 0
+        planned_checkpoints: set[str] = set()
+        for identifier in identifiers:
+            with self._condition:
+                # A new queue item has started, so its models come first
+                if self._pending is not None or self._stopped:
+                    return
+            try:
+                config = model_manager.store.get_model(identifier.key)
+                model_path = (self._services.configuration.models_path / Path(config.path)).resolve()
+                # All of a checkpoint's submodels are in its one file, which is counted for the first of them
+                if model_path.is_file() and config.key in planned_checkpoints:
+                    size = 0
+                else:
+                    size = self._estimate_size(model_path, config, identifier.submodel_type)
+                if planned + size > budget:
+                    self._services.logger.debug(f"RAM cache is too small to prefetch {identifier.name}")
+                    continue
+                planned += size
+                if model_path.is_file():
+                    planned_checkpoints.add(config.key)
+                if model_manager.load.ram_cache.exists(config.key, identifier.submodel_type):
+                    # Makes the model the most recently used, so that loading the plan's other models doesn't evict it
+                    model_manager.load.ram_cache.get(config.key, identifier.submodel_type)
+                    continue
+                self._services.logger.debug(f"Prefetching {identifier.name} ({identifier.submodel_type or 'model'})")
+                # The model stays in the RAM cache
+                model_manager.load.load_model(config, identifier.submodel_type)
+            except Exception as e:
+                # The node that needs the model reports the error, if it still happens when the node runs
+                self._services.logger.debug(f"Could not prefetch {identifier.name}: {e}")
+
+    def _estimate_size(self, model_path: Path, config: AnyModelConfig, submodel_type: Optional[SubModelType]) -> int:
+        return calc_model_size_by_fs(
+            model_path=model_path,
+            subfolder=submodel_type.value if submodel_type else None,
+            variant=config.repo_variant if isinstance(config, DiffusersConfigBase) else None,
+        )
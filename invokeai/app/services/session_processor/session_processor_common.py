@@ -1,9 +1,21 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
+class SessionProcessorWorkerStatus(BaseModel):
+    worker_id: int = Field(description="The id of the worker")
+    is_processing: bool = Field(description="Whether the worker is processing a session")
+    queue_item_id: Optional[int] = Field(default=None, description="The id of the queue item being processed")
+    session_id: Optional[str] = Field(default=None, description="The id of the session being processed")
+
+
 class SessionProcessorStatus(BaseModel):
     is_started: bool = Field(description="Whether the session processor is started")
     is_processing: bool = Field(description="Whether a session is being processed")
+    workers: list[SessionProcessorWorkerStatus] = Field(
+        default_factory=list, description="The status of each of the session processor's workers"
+    )
 
 
 class CanceledException(Exception):
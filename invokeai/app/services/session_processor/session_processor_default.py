@@ -1,6 +1,7 @@
 import traceback
 from contextlib import suppress
-from threading import BoundedSemaphore, Thread
+from dataclasses import dataclass, field
+from threading import BoundedSemaphore, Thread, current_thread
 from threading import Event as ThreadEvent
 from typing import Optional
 
@@ -16,74 +17,122 @@ from invokeai.app.services.shared.invocation_context import InvocationContextDat
 from invokeai.app.util.profiler import Profiler
 
 from ..invoker import Invoker
+from .model_prefetcher import ModelPrefetcher
 from .session_processor_base import SessionProcessorBase
-from .session_processor_common import SessionProcessorStatus
+from .session_processor_common import SessionProcessorStatus, SessionProcessorWorkerStatus
+
+
+@dataclass
+class WorkerSlot:
+    """An execution slot, owned by a single worker thread. Each slot executes at most one queue item at a time."""
+
+    worker_id: int
+    cancel_event: ThreadEvent = field(default_factory=ThreadEvent)
+    queue_item: Optional[SessionQueueItem] = None
+    invocation: Optional[BaseInvocation] = None
+    thread: Optional[Thread] = None
+
+    def get_status(self) -> SessionProcessorWorkerStatus:
+        queue_item = self.queue_item
+        return SessionProcessorWorkerStatus(
+            worker_id=self.worker_id,
+            is_processing=queue_item is not None,
+            queue_item_id=queue_item.item_id if queue_item else None,
+            session_id=queue_item.session_id if queue_item else None,
+        )
 
 
 class DefaultSessionProcessor(SessionProcessorBase):
-    def start(self, invoker: Invoker, thread_limit: int = 1, polling_interval: int = 1) -> None:
+    def __init__(self, thread_limit: int = 1, polling_interval: float = 1) -> None:
+        """
+        Initialize the session processor.
+
+        :param thread_limit: Number of workers. Each worker dequeues and executes queue items independently.
+        :param polling_interval: Maximum time (in seconds) an idle worker waits before polling the queue again.
+        """
+        super().__init__()
+        if thread_limit < 1:
+            raise ValueError(f"thread_limit must be at least 1, got {thread_limit}")
+        self._thread_limit = thread_limit
+        self._polling_interval = polling_interval
+
+    def start(self, invoker: Invoker) -> None:
         self._invoker: Invoker = invoker
-        self._queue_item: Optional[SessionQueueItem] = None
-        self._invocation: Optional[BaseInvocation] = None
+        self._slots = [WorkerSlot(worker_id=i) for i in range(self._thread_limit)]
 
         self._resume_event = ThreadEvent()
         self._stop_event = ThreadEvent()
-        self._poll_now_event = ThreadEvent()
-        self._cancel_event = ThreadEvent()
 
         local_handler.register(event_name=EventServiceBase.queue_event, _func=self._on_queue_event)
 
-        self._thread_limit = thread_limit
-        self._thread_semaphore = BoundedSemaphore(thread_limit)
-        self._polling_interval = polling_interval
+        self._thread_semaphore = BoundedSemaphore(self._thread_limit)
 
         # If profiling is enabled, create a profiler. The same profiler will be used for all sessions. Internally,
-        # the profiler will create a new profile for each session.
+        # the profiler will create a new profile for each session. cProfile can only profile one session at a time,
+        # so profiling is only supported with a single worker.
+        profile_graphs = self._invoker.services.configuration.profile_graphs
+        if profile_graphs and self._thread_limit > 1:
+            self._invoker.services.logger.warning("Graph profiling is only supported with a single worker, disabling")
         self._profiler = (
             Profiler(
                 logger=self._invoker.services.logger,
                 output_dir=self._invoker.services.configuration.profiles_path,
                 prefix=self._invoker.services.configuration.profile_prefix,
             )
-            if self._invoker.services.configuration.profile_graphs
+            if profile_graphs and self._thread_limit == 1
             else None
         )
 
-        self._thread = Thread(
-            name="session_processor",
-            target=self._process,
-            kwargs={
-                "stop_event": self._stop_event,
-                "poll_now_event": self._poll_now_event,
-                "resume_event": self._resume_event,
-                "cancel_event": self._cancel_event,
-            },
+        # Models the queued sessions need are loaded in the background, before their nodes run
+        self._prefetcher = (
+            ModelPrefetcher(self._invoker.services) if self._invoker.services.configuration.prefetch_models else None
         )
-        self._thread.start()
+
+        self._stop_event.clear()
+        self._resume_event.set()
+
+        for slot in self._slots:
+            slot.thread = Thread(
+                name="session_processor" if self._thread_limit == 1 else f"session_processor_{slot.worker_id}",
+                target=self._process,
+                kwargs={
+                    "slot": slot,
+                    "stop_event": self._stop_event,
+                    "resume_event": self._resume_event,
+                },
+            )
+            slot.thread.start()
 
     def stop(self, *args, **kwargs) -> None:
         self._stop_event.set()
+        if self._prefetcher is not None:
+            self._prefetcher.stop()
+        # Paused workers must wake up to stop
+        self._resume_event.set()
+        self._poll_now()
+        # Workers finish the sessions they are executing, so they don't use the other services after they've stopped
+        for slot in self._slots:
+            if slot.thread is not None and slot.thread is not current_thread():
+                slot.thread.join()
 
     def _poll_now(self) -> None:
-        self._poll_now_event.set()
+        self._invoker.services.session_queue.wakeup.notify()
 
     async def _on_queue_event(self, event: FastAPIEvent) -> None:
         event_name = event[1]["event"]
 
-        if (
-            event_name == "session_canceled"
-            and self._queue_item
-            and self._queue_item.item_id == event[1]["data"]["queue_item_id"]
-        ):
-            self._cancel_event.set()
-            self._poll_now()
-        elif (
-            event_name == "queue_cleared"
-            and self._queue_item
-            and self._queue_item.queue_id == event[1]["data"]["queue_id"]
-        ):
-            self._cancel_event.set()
-            self._poll_now()
+        if event_name == "session_canceled":
+            for slot in self._slots:
+                queue_item = slot.queue_item
+                if queue_item and queue_item.item_id == event[1]["data"]["queue_item_id"]:
+                    slot.cancel_event.set()
+                    self._poll_now()
+        elif event_name == "queue_cleared":
+            for slot in self._slots:
+                queue_item = slot.queue_item
+                if queue_item and queue_item.queue_id == event[1]["data"]["queue_id"]:
+                    slot.cancel_event.set()
+                    self._poll_now()
         elif event_name == "batch_enqueued":
             self._poll_now()
         elif event_name == "queue_item_status_changed" and event[1]["data"]["queue_item"]["status"] in [
@@ -104,98 +153,109 @@ class DefaultSessionProcessor(SessionProcessorBase):
         return self.get_status()
 
     def get_status(self) -> SessionProcessorStatus:
+        workers = [slot.get_status() for slot in self._slots]
         return SessionProcessorStatus(
             is_started=self._resume_event.is_set(),
-            is_processing=self._queue_item is not None,
+            is_processing=any(worker.is_processing for worker in workers),
+            workers=workers,
         )
 
     def _process(
         self,
+        slot: WorkerSlot,
         stop_event: ThreadEvent,
-        poll_now_event: ThreadEvent,
         resume_event: ThreadEvent,
-        cancel_event: ThreadEvent,
     ):
+        cancel_event = slot.cancel_event
+        # The queue notifies this when items are enqueued, so idle workers start on new items immediately. The polling
+        # interval is only a fallback, e.g. for items enqueued by another process.
+        wakeup = self._invoker.services.session_queue.wakeup
         # Outermost processor try block; any unhandled exception is a fatal processor error
         try:
             self._thread_semaphore.acquire()
-            stop_event.clear()
-            resume_event.set()
             cancel_event.clear()
 
             while not stop_event.is_set():
-                poll_now_event.clear()
+                # Observe the wakeup count before checking the queue, so a notification in between is never missed
+                wakeup_count = wakeup.count
                 # Middle processor try block; any unhandled exception is a non-fatal processor error
                 try:
                     # If we are paused, wait for resume event
                     resume_event.wait()
+                    if stop_event.is_set():
+                        break
 
-                    # Get the next session to process
-                    self._queue_item = self._invoker.services.session_queue.dequeue()
+                    # Get the next session to process. Dequeuing claims the item atomically, so workers never collide.
+                    slot.queue_item = self._invoker.services.session_queue.dequeue()
 
-                    if self._queue_item is None:
+                    if slot.queue_item is None:
                         # The queue was empty, wait for next polling interval or event to try again
                         self._invoker.services.logger.debug("Waiting for next polling interval or event")
-                        poll_now_event.wait(self._polling_interval)
+                        wakeup.wait(since=wakeup_count, timeout=self._polling_interval)
                         continue
 
-                    self._invoker.services.logger.debug(f"Executing queue item {self._queue_item.item_id}")
+                    self._invoker.services.logger.debug(
+                        f"Worker {slot.worker_id} executing queue item {slot.queue_item.item_id}"
+                    )
                     cancel_event.clear()
 
+                    if self._prefetcher is not None:
+                        self._prefetcher.prefetch(slot.queue_item)
+
                     # If profiling is enabled, start the profiler
                     if self._profiler is not None:
-                        self._profiler.start(profile_id=self._queue_item.session_id)
+                        self._profiler.start(profile_id=slot.queue_item.session_id)
 
                     # Prepare invocations and take the first
-                    self._invocation = self._queue_item.session.next()
+                    slot.invocation = slot.queue_item.session.next()
 
                     # Loop over invocations until the session is complete or canceled
-                    while self._invocation is not None and not cancel_event.is_set():
+                    while slot.invocation is not None and not cancel_event.is_set():
                         # get the source node id to provide to clients (the prepared node id is not as useful)
-                        source_invocation_id = self._queue_item.session.prepared_source_mapping[self._invocation.id]
+                        source_invocation_id = slot.queue_item.session.prepared_source_mapping[slot.invocation.id]
 
                         # Send starting event
                         self._invoker.services.events.emit_invocation_started(
-                            queue_batch_id=self._queue_item.batch_id,
-                            queue_item_id=self._queue_item.item_id,
-                            queue_id=self._queue_item.queue_id,
-                            graph_execution_state_id=self._queue_item.session_id,
-                            node=self._invocation.model_dump(),
+                            queue_batch_id=slot.queue_item.batch_id,
+                            queue_item_id=slot.queue_item.item_id,
+                            queue_id=slot.queue_item.queue_id,
+                            graph_execution_state_id=slot.queue_item.session_id,
+                            node=slot.invocation.model_dump(),
                             source_node_id=source_invocation_id,
                         )
 
                         # Innermost processor try block; any unhandled exception is an invocation error & will fail the graph
                         try:
                             with self._invoker.services.performance_statistics.collect_stats(
-                                self._invocation, self._queue_item.session.id
+                                slot.invocation, slot.queue_item.session.id
                             ):
                                 # Build invocation context (the node-facing API)
                                 data = InvocationContextData(
-                                    invocation=self._invocation,
+                                    invocation=slot.invocation,
                                     source_invocation_id=source_invocation_id,
-                                    queue_item=self._queue_item,
+                                    queue_item=slot.queue_item,
                                 )
                                 context = build_invocation_context(
                                     data=data,
                                     services=self._invoker.services,
-                                    cancel_event=self._cancel_event,
+                                    cancel_event=cancel_event,
                                 )
 
                                 # Invoke the node
-                                outputs = self._invocation.invoke_internal(
+                                outputs = slot.invocation.invoke_internal(
                                     context=context, services=self._invoker.services
                                 )
 
                                 # Save outputs and history
-                                self._queue_item.session.complete(self._invocation.id, outputs)
+                                slot.queue_item.session.complete(slot.invocation.id, outputs)
 
                                 # Send complete event
                                 self._invoker.services.events.emit_invocation_complete(
-                                    queue_batch_id=self._queue_item.batch_id,
-                                    queue_item_id=self._queue_item.item_id,
-                                    queue_id=self._queue_item.queue_id,
-                                    graph_execution_state_id=self._queue_item.session.id,
-                                    node=self._invocation.model_dump(),
+                                    queue_batch_id=slot.queue_item.batch_id,
+                                    queue_item_id=slot.queue_item.item_id,
+                                    queue_id=slot.queue_item.queue_id,
+                                    graph_execution_state_id=slot.queue_item.session.id,
+                                    node=slot.invocation.model_dump(),
                                     source_node_id=source_invocation_id,
                                     result=outputs.model_dump(),
                                 )
@@ -221,19 +281,19 @@ class DefaultSessionProcessor(SessionProcessorBase):
                             error = traceback.format_exc()
 
                             # Save error
-                            self._queue_item.session.set_node_error(self._invocation.id, error)
+                            slot.queue_item.session.set_node_error(slot.invocation.id, error)
                             self._invoker.services.logger.error(
-                                f"Error while invoking session {self._queue_item.session_id}, invocation {self._invocation.id} ({self._invocation.get_type()}):\n{e}"
+                                f"Error while invoking session {slot.queue_item.session_id}, invocation {slot.invocation.id} ({slot.invocation.get_type()}):\n{e}"
                             )
                             self._invoker.services.logger.error(error)
 
                             # Send error event
                             self._invoker.services.events.emit_invocation_error(
-                                queue_batch_id=self._queue_item.session_id,
-                                queue_item_id=self._queue_item.item_id,
-                                queue_id=self._queue_item.queue_id,
-                                graph_execution_state_id=self._queue_item.session.id,
-                                node=self._invocation.model_dump(),
+                                queue_batch_id=slot.queue_item.session_id,
+                                queue_item_id=slot.queue_item.item_id,
+                                queue_id=slot.queue_item.queue_id,
+                                graph_execution_state_id=slot.queue_item.session.id,
+                                node=slot.invocation.model_dump(),
                                 source_node_id=source_invocation_id,
                                 error_type=e.__class__.__name__,
                                 error=error,
@@ -241,58 +301,71 @@ class DefaultSessionProcessor(SessionProcessorBase):
                             pass
 
                         # The session is complete if the all invocations are complete or there was an error
-                        if self._queue_item.session.is_complete() or cancel_event.is_set():
+                        if slot.queue_item.session.is_complete() or cancel_event.is_set():
+                            # Images are written in the background - the session's images must be in storage before
+                            # it is reported as complete
+                            try:
+                                self._invoker.services.image_files.flush(session_id=slot.queue_item.session_id)
+                            except Exception:
+                                # An image is missing, so the queue item fails, as it would have if the node had
+                                # failed to save it
+                                error = traceback.format_exc()
+                                self._invoker.services.logger.error(
+                                    f"Error while saving images for session {slot.queue_item.session_id}:\n{error}"
+                                )
+                                self._invoker.services.session_queue.cancel_queue_item(
+                                    slot.queue_item.item_id, error=error
+                                )
                             # Send complete event
                             self._invoker.services.events.emit_graph_execution_complete(
-                                queue_batch_id=self._queue_item.batch_id,
-                                queue_item_id=self._queue_item.item_id,
-                                queue_id=self._queue_item.queue_id,
-                                graph_execution_state_id=self._queue_item.session.id,
+                                queue_batch_id=slot.queue_item.batch_id,
+                                queue_item_id=slot.queue_item.item_id,
+                                queue_id=slot.queue_item.queue_id,
+                                graph_execution_state_id=slot.queue_item.session.id,
                             )
                             # If we are profiling, stop the profiler and dump the profile & stats
                             if self._profiler:
                                 profile_path = self._profiler.stop()
                                 stats_path = profile_path.with_suffix(".json")
                                 self._invoker.services.performance_statistics.dump_stats(
-                                    graph_execution_state_id=self._queue_item.session.id, output_path=stats_path
+                                    graph_execution_state_id=slot.queue_item.session.id, output_path=stats_path
                                 )
                             # We'll get a GESStatsNotFoundError if we try to log stats for an untracked graph, but in the processor
                             # we don't care about that - suppress the error.
                             with suppress(GESStatsNotFoundError):
-                                self._invoker.services.performance_statistics.log_stats(self._queue_item.session.id)
-                                self._invoker.services.performance_statistics.reset_stats()
+                                self._invoker.services.performance_statistics.log_stats(slot.queue_item.session.id)
+                                self._invoker.services.performance_statistics.reset_stats(slot.queue_item.session.id)
 
                             # Set the invocation to None to prepare for the next session
-                            self._invocation = None
+                            slot.invocation = None
                         else:
                             # Prepare the next invocation
-                            self._invocation = self._queue_item.session.next()
-                    else:
-                        # The queue was empty, wait for next polling interval or event to try again
-                        self._invoker.services.logger.debug("Waiting for next polling interval or event")
-                        poll_now_event.wait(self._polling_interval)
-                        continue
+                            slot.invocation = slot.queue_item.session.next()
+
+                    # The session is done; release the slot before polling for the next queue item
+                    slot.queue_item = None
                 except Exception:
                     # Non-fatal error in processor
                     self._invoker.services.logger.error(
                         f"Non-fatal error in session processor:\n{traceback.format_exc()}"
                     )
                     # Cancel the queue item
-                    if self._queue_item is not None:
+                    if slot.queue_item is not None:
                         self._invoker.services.session_queue.cancel_queue_item(
-                            self._queue_item.item_id, error=traceback.format_exc()
+                            slot.queue_item.item_id, error=traceback.format_exc()
                         )
-                    # Reset the invocation to None to prepare for the next session
-                    self._invocation = None
-                    # Immediately poll for next queue item
-                    poll_now_event.wait(self._polling_interval)
+                    # Reset the slot to prepare for the next session
+                    slot.queue_item = None
+                    slot.invocation = None
+                    # Wait before polling for the next queue item, so an error that keeps happening (e.g. in
+                    # dequeue) doesn't make the worker spin. Enqueuing an item ends the wait early.
+                    wakeup.wait(since=wakeup_count, timeout=self._polling_interval)
                     continue
         except Exception:
             # Fatal error in processor, log and pass - we're done here
             self._invoker.services.logger.error(f"Fatal Error in session processor:\n{traceback.format_exc()}")
             pass
         finally:
-            stop_event.clear()
-            poll_now_event.clear()
-            self._queue_item = None
+            slot.queue_item = None
+            slot.invocation = None
             self._thread_semaphore.release()
@@ -15,6 +15,7 @@ from invokeai.app.services.session_queue.session_queue_common import (
     SessionQueueItem,
     SessionQueueItemDTO,
     SessionQueueStatus,
+    SessionQueueWakeup,
 )
 from invokeai.app.services.shared.pagination import CursorPaginatedResults
 
@@ -22,14 +23,22 @@ from invokeai.app.services.shared.pagination import CursorPaginatedResults
 class SessionQueueBase(ABC):
     """Base class for session queue"""
 
+    @property
+    @abstractmethod
+    def wakeup(self) -> SessionQueueWakeup:
+        """A wakeup primitive that is notified whenever items are enqueued. Consumers can wait on it instead of polling."""
+        pass
+
     @abstractmethod
     def dequeue(self) -> Optional[SessionQueueItem]:
-        """Dequeues the next session queue item."""
+        """Dequeues the next session queue item, marking it in progress. Each item is dequeued at most once, even when
+        called concurrently."""
         pass
 
     @abstractmethod
     def enqueue_batch(self, queue_id: str, batch: Batch, prepend: bool) -> EnqueueBatchResult:
-        """Enqueues all permutations of a batch for execution."""
+        """Enqueues all permutations of a batch for execution. Large batches may be enqueued in chunks, in which case
+        the first queue items may be dequeued before the rest are enqueued."""
         pass
 
     @abstractmethod
@@ -1,7 +1,10 @@
 import datetime
 import json
-from itertools import chain, product
-from typing import Generator, Iterable, Literal, NamedTuple, Optional, TypeAlias, Union, cast
+import threading
+import zlib
+from itertools import product
+from math import prod
+from typing import Generator, Iterator, Literal, NamedTuple, Optional, TypeAlias, Union, cast
 
 from pydantic import BaseModel, ConfigDict, Field, StrictStr, TypeAdapter, field_validator, model_validator
 from pydantic_core import to_jsonable_python
@@ -165,14 +168,40 @@ def get_field_values(queue_item_dict: dict) -> Optional[list[NodeFieldValue]]:
 GraphExecutionStateValidator = TypeAdapter(GraphExecutionState)
 
 
+def compress_json(json_str: str) -> bytes:
+    """
+    Compresses JSON to be stored in the session queue. Compressed JSON is stored as a BLOB and uncompressed JSON as
+    TEXT, so the two can be told apart when they are read.
+    """
+    return zlib.compress(json_str.encode("utf-8"))
+
+
+def decompress_json(json_raw: Union[str, bytes, None]) -> Union[str, bytes, None]:
+    """Decompresses JSON read from the session queue, if it was compressed."""
+    return zlib.decompress(json_raw) if isinstance(json_raw, bytes) else json_raw
+
+
 def get_session(queue_item_dict: dict) -> GraphExecutionState:
-    session_raw = queue_item_dict.get("session", "{}")
+    session_raw = decompress_json(queue_item_dict.get("session", "{}"))
+    batch_graph_raw = decompress_json(queue_item_dict.get("batch_graph", None))
+    if not session_raw:
+        if batch_graph_raw is None:
+            raise ValueError(f"Queue item {queue_item_dict.get('item_id')} has no session or batch graph")
+        # The session was never stored - populate it from the batch's graph
+        graph = json.loads(batch_graph_raw)
+        for field_value in json.loads(queue_item_dict.get("field_values", None) or "[]"):
+            node = graph["nodes"].get(field_value["node_path"])
+            if node is None:
+                continue
+            node[field_value["field_name"]] = field_value["value"]
+        session_dict = {"id": queue_item_dict["session_id"], "graph": graph}
+        return GraphExecutionStateValidator.validate_python(session_dict, strict=False)
     session = GraphExecutionStateValidator.validate_json(session_raw, strict=False)
     return session
 
 
 def get_workflow(queue_item_dict: dict) -> Optional[WorkflowWithoutID]:
-    workflow_raw = queue_item_dict.get("workflow", None)
+    workflow_raw = decompress_json(queue_item_dict.get("workflow", None) or queue_item_dict.get("batch_workflow", None))
     if workflow_raw is not None:
         workflow = WorkflowWithoutIDValidator.validate_json(workflow_raw, strict=False)
         return workflow
@@ -235,9 +264,12 @@ class SessionQueueItem(SessionQueueItemWithoutGraph):
     @classmethod
     def queue_item_from_dict(cls, queue_item_dict: dict) -> "SessionQueueItem":
         # must parse these manually
-        queue_item_dict["field_values"] = get_field_values(queue_item_dict)
+        # the session may be populated from the raw field values, so it must be parsed first
         queue_item_dict["session"] = get_session(queue_item_dict)
+        queue_item_dict["field_values"] = get_field_values(queue_item_dict)
         queue_item_dict["workflow"] = get_workflow(queue_item_dict)
+        queue_item_dict.pop("batch_graph", None)
+        queue_item_dict.pop("batch_workflow", None)
         return SessionQueueItem(**queue_item_dict)
 
     model_config = ConfigDict(
@@ -337,54 +369,63 @@ class IsFullResult(BaseModel):
 # region Util
 
 
-def populate_graph(graph: Graph, node_field_values: Iterable[NodeFieldValue]) -> Graph:
+class SessionQueueWakeup:
     """
-    Populates the given graph with the given batch data items.
-    """
-    graph_clone = graph.model_copy(deep=True)
-    for item in node_field_values:
-        node = graph_clone.get_node(item.node_path)
-        if node is None:
-            continue
-        setattr(node, item.field_name, item.value)
-        graph_clone.update_node(item.node_path, node)
-    return graph_clone
-
-
-def create_session_nfv_tuples(
-    batch: Batch, maximum: int
-) -> Generator[tuple[GraphExecutionState, list[NodeFieldValue], Optional[WorkflowWithoutID]], None, None]:
-    """
-    Create all graph permutations from the given batch data and graph. Yields tuples
-    of the form (graph, batch_data_items) where batch_data_items is the list of BatchDataItems
-    that was applied to the graph.
+    A wakeup primitive shared between the session queue and its consumers.
+
+    The queue notifies it whenever new items become available. A consumer records `count` *before* checking the queue,
+    then waits for the count to advance past it. This way, a notification that arrives between the check and the wait
+    is never lost, regardless of how many consumers there are.
     """
 
-    # TODO: Should this be a class method on Batch?
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._count = 0
+
+    @property
+    def count(self) -> int:
+        """The number of notifications so far."""
+        with self._condition:
+            return self._count
+
+    def notify(self) -> None:
+        """Wakes all waiting consumers."""
+        with self._condition:
+            self._count += 1
+            self._condition.notify_all()
+
+    def wait(self, since: int, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until there has been a notification after the `since` count, or the timeout elapses.
+        Returns True if a notification was received, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._count != since, timeout=timeout)
+
 
-    data: list[list[tuple[NodeFieldValue]]] = []
+def create_nfv_permutations(batch: Batch, maximum: int) -> Generator[list[NodeFieldValue], None, None]:
+    """
+    Create all permutations of the given batch data, without applying them to the graph. Yields the list of
+    NodeFieldValues for each session. Each list is created as it is yielded, so memory use is independent of the
+    number of permutations.
+    """
     batch_data_collection = batch.data if batch.data is not None else []
-    for batch_datum_list in batch_data_collection:
-        # each batch_datum_list needs to be convered to NodeFieldValues and then zipped
-
-        node_field_values_to_zip: list[list[NodeFieldValue]] = []
-        for batch_datum in batch_datum_list:
-            node_field_values = [
-                NodeFieldValue(node_path=batch_datum.node_path, field_name=batch_datum.field_name, value=item)
-                for item in batch_datum.items
-            ]
-            node_field_values_to_zip.append(node_field_values)
-        data.append(list(zip(*node_field_values_to_zip, strict=True)))  # type: ignore [arg-type]
+    # each batch_datum_list is zipped, so its items are selected by a single index
+    lengths = [len(batch_datum_list[0].items) if batch_datum_list else 0 for batch_datum_list in batch_data_collection]
 
-    # create generator to yield session,nfv tuples
+    # create generator to yield nfv lists
     count = 0
     for _ in range(batch.runs):
-        for d in product(*data):
+        for indices in product(*(range(length) for length in lengths)):
             if count >= maximum:
                 return
-            flat_node_field_values = list(chain.from_iterable(d))
-            graph = populate_graph(batch.graph, flat_node_field_values)
-            yield (GraphExecutionState(graph=graph), flat_node_field_values, batch.workflow)
+            yield [
+                NodeFieldValue(
+                    node_path=batch_datum.node_path, field_name=batch_datum.field_name, value=batch_datum.items[i]
+                )
+                for batch_datum_list, i in zip(batch_data_collection, indices, strict=True)
+                for batch_datum in batch_datum_list
+            ]
             count += 1
 
 
@@ -396,15 +437,9 @@ def calc_session_count(batch: Batch) -> int:
     # TODO: Should this be a class method on Batch?
     if not batch.data:
         return batch.runs
-    data = []
-    for batch_datum_list in batch.data:
-        to_zip = []
-        for batch_datum in batch_datum_list:
-            batch_data_items = range(len(batch_datum.items))
-            to_zip.append(batch_data_items)
-        data.append(list(zip(*to_zip, strict=True)))
-    data_product = list(product(*data))
-    return len(data_product) * batch.runs
+    # each batch_datum_list is zipped, so it contributes its items' length to the product
+    lengths = [len(batch_datum_list[0].items) if batch_datum_list else 0 for batch_datum_list in batch.data]
+    return prod(lengths) * batch.runs
 
 
 class SessionQueueValueToInsert(NamedTuple):
@@ -420,27 +455,49 @@ class SessionQueueValueToInsert(NamedTuple):
     workflow: Optional[str]  # workflow json
 
 
-ValuesToInsert: TypeAlias = list[SessionQueueValueToInsert]
-
-
-def prepare_values_to_insert(queue_id: str, batch: Batch, priority: int, max_new_queue_items: int) -> ValuesToInsert:
-    values_to_insert: ValuesToInsert = []
-    for session, field_values, workflow in create_session_nfv_tuples(batch, max_new_queue_items):
-        # sessions must have unique id
-        session.id = uuid_string()
-        values_to_insert.append(
-            SessionQueueValueToInsert(
-                queue_id,  # queue_id
-                session.model_dump_json(warnings=False, exclude_none=True),  # session (json)
-                session.id,  # session_id
-                batch.batch_id,  # batch_id
-                # must use pydantic_encoder bc field_values is a list of models
-                json.dumps(field_values, default=to_jsonable_python) if field_values else None,  # field_values (json)
-                priority,  # priority
-                json.dumps(workflow, default=to_jsonable_python) if workflow else None,  # workflow (json)
-            )
+class BatchValueToInsert(NamedTuple):
+    """A tuple of values to insert into the batches table"""
+
+    # Careful with the ordering of this - it must match the insert statement
+    batch_id: str  # batch_id
+    queue_id: str  # queue_id
+    graph: Union[str, bytes]  # graph json, which may be compressed
+    workflow: Union[str, bytes, None]  # workflow json, which may be compressed
+
+
+def prepare_batch_values_to_insert(
+    queue_id: str, batch: Batch, priority: int, max_new_queue_items: int, compress: bool = False
+) -> tuple[BatchValueToInsert, Iterator[SessionQueueValueToInsert]]:
+    """
+    Prepares the values to insert for a batch whose graph and workflow are stored once, in the batches table. The
+    queue items store only their field values, and their sessions are populated from the batch's graph when they are
+    retrieved. The queue items' sessions are empty strings.
+
+    The queue items' values are generated lazily, so they may be inserted in chunks. If `compress` is True, the graph
+    and workflow are compressed.
+    """
+    graph = batch.graph.model_dump_json(warnings=False, exclude_none=True)
+    workflow = json.dumps(batch.workflow, default=to_jsonable_python) if batch.workflow else None
+    batch_value_to_insert = BatchValueToInsert(
+        batch.batch_id,  # batch_id
+        queue_id,  # queue_id
+        compress_json(graph) if compress else graph,  # graph (json)
+        compress_json(workflow) if compress and workflow else workflow,  # workflow (json)
+    )
+    values_to_insert = (
+        SessionQueueValueToInsert(
+            queue_id,  # queue_id
+            "",  # session (populated from the batch's graph)
+            uuid_string(),  # session_id
+            batch.batch_id,  # batch_id
+            # must use pydantic_encoder bc field_values is a list of models
+            json.dumps(field_values, default=to_jsonable_python) if field_values else None,  # field_values (json)
+            priority,  # priority
+            None,  # workflow (stored with the batch)
         )
-    return values_to_insert
+        for field_values in create_nfv_permutations(batch, max_new_queue_items)
+    )
+    return batch_value_to_insert, values_to_insert
 
 
 # endregion Util
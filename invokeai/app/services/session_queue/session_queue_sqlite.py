@@ -1,6 +1,8 @@
 import sqlite3
 import threading
-from typing import Optional, Union, cast
+import traceback
+from itertools import islice
+from typing import Optional, Union, cast, get_args
 
 from fastapi_events.handlers.local import local_handler
 from fastapi_events.typing import Event as FastAPIEvent
@@ -24,12 +26,19 @@ from invokeai.app.services.session_queue.session_queue_common import (
     SessionQueueItemDTO,
     SessionQueueItemNotFoundError,
     SessionQueueStatus,
+    SessionQueueWakeup,
     calc_session_count,
-    prepare_values_to_insert,
+    prepare_batch_values_to_insert,
 )
 from invokeai.app.services.shared.pagination import CursorPaginatedResults
 from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
 
+_SQLITE_SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+# The number of queue items inserted per transaction when enqueueing a batch
+_ENQUEUE_CHUNK_SIZE = 1000
+# The statuses counted for each batch and queue, in the order of their columns
+_STATUSES: list[str] = list(get_args(QUEUE_ITEM_STATUS))
+
 
 class SqliteSessionQueue(SessionQueueBase):
     __invoker: Invoker
@@ -41,15 +50,23 @@ class SqliteSessionQueue(SessionQueueBase):
         self.__invoker = invoker
         self._set_in_progress_to_canceled()
         prune_result = self.prune(DEFAULT_QUEUE_ID)
+        if not self.check_status_counts(repair=True):
+            self.__invoker.services.logger.warning("Repaired inconsistent session queue status counts")
         local_handler.register(event_name=EventServiceBase.queue_event, _func=self._on_session_event)
         if prune_result.deleted > 0:
             self.__invoker.services.logger.info(f"Pruned {prune_result.deleted} finished queue items")
 
     def __init__(self, db: SqliteDatabase) -> None:
         super().__init__()
+        self.__db = db
         self.__lock = db.lock
         self.__conn = db.conn
         self.__cursor = self.__conn.cursor()
+        self.__wakeup = SessionQueueWakeup()
+
+    @property
+    def wakeup(self) -> SessionQueueWakeup:
+        return self.__wakeup
 
     def _match_event_name(self, event: FastAPIEvent, match_in: list[str]) -> bool:
         return event[1]["event"] in match_in
@@ -119,17 +136,20 @@ class SqliteSessionQueue(SessionQueueBase):
 
     def _get_current_queue_size(self, queue_id: str) -> int:
         """Gets the current number of pending queue items"""
-        self.__cursor.execute(
+        return self._get_queue_counts(self.__cursor, queue_id).get("pending", 0)
+
+    def _get_queue_counts(self, cursor: sqlite3.Cursor, queue_id: str) -> dict[str, int]:
+        """Gets the number of queue items in each status, from the counts maintained by triggers"""
+        cursor.execute(
             """--sql
-            SELECT count(*)
-            FROM session_queue
-            WHERE
-              queue_id = ?
-              AND status = 'pending'
+            SELECT pending, in_progress, completed, failed, canceled
+            FROM session_queue_counts
+            WHERE queue_id = ?
             """,
             (queue_id,),
         )
-        return cast(int, self.__cursor.fetchone()[0])
+        result = cast(Union[sqlite3.Row, None], cursor.fetchone())
+        return dict(result) if result is not None else {}
 
     def _get_highest_priority(self, queue_id: str) -> int:
         """Gets the highest priority value in the queue"""
@@ -157,32 +177,62 @@ class SqliteSessionQueue(SessionQueueBase):
             priority = 0
             if prepend:
                 priority = self._get_highest_priority(queue_id) + 1
-
-            requested_count = calc_session_count(batch)
-            values_to_insert = prepare_values_to_insert(
-                queue_id=queue_id,
-                batch=batch,
-                priority=priority,
-                max_new_queue_items=max_new_queue_items,
-            )
-            enqueued_count = len(values_to_insert)
-
-            if requested_count > enqueued_count:
-                values_to_insert = values_to_insert[:max_new_queue_items]
-
-            self.__cursor.executemany(
-                """--sql
-                INSERT INTO session_queue (queue_id, session, session_id, batch_id, field_values, priority, workflow)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                values_to_insert,
-            )
-            self.__conn.commit()
         except Exception:
             self.__conn.rollback()
             raise
         finally:
             self.__lock.release()
+
+        requested_count = calc_session_count(batch)
+        batch_value_to_insert, values_to_insert = prepare_batch_values_to_insert(
+            queue_id=queue_id,
+            batch=batch,
+            priority=priority,
+            max_new_queue_items=max_new_queue_items,
+            compress=self.__invoker.services.configuration.compress_queue,
+        )
+        total_count = max(0, min(requested_count, max_new_queue_items))
+        enqueued_count = 0
+
+        # Large batches are inserted in chunks, releasing the lock between them, so that other queue operations aren't
+        # blocked until the whole batch is inserted. Consumers may start on the first chunk while the rest are inserted.
+        while chunk := list(islice(values_to_insert, _ENQUEUE_CHUNK_SIZE)):
+            try:
+                self.__lock.acquire()
+                # Other enqueues may have filled the queue while the lock was released
+                chunk = chunk[: max(0, max_queue_size - self._get_current_queue_size(queue_id))]
+                if not chunk:
+                    break
+                # The graph and workflow are stored once for the whole batch. The row is inserted with every chunk, in
+                # case the queue was cleared or pruned since the previous chunk, deleting it.
+                self.__cursor.execute(
+                    """--sql
+                    INSERT OR IGNORE INTO batches (batch_id, queue_id, graph, workflow)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    batch_value_to_insert,
+                )
+                self.__cursor.executemany(
+                    """--sql
+                    INSERT INTO session_queue (queue_id, session, session_id, batch_id, field_values, priority, workflow)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    chunk,
+                )
+                self.__conn.commit()
+            except Exception:
+                self.__conn.rollback()
+                raise
+            finally:
+                self.__lock.release()
+            enqueued_count += len(chunk)
+            # Wake consumers directly - waiting for the batch_enqueued event to make the round trip through the event
+            # service adds latency, and there may be no event service at all in headless use.
+            self.__wakeup.notify()
+            self.__invoker.services.events.emit_batch_enqueue_progress(
+                queue_id=queue_id, batch_id=batch.batch_id, enqueued=enqueued_count, total=total_count
+            )
+
         enqueue_result = EnqueueBatchResult(
             queue_id=queue_id,
             requested=requested_count,
@@ -193,12 +243,42 @@ class SqliteSessionQueue(SessionQueueBase):
         self.__invoker.services.events.emit_batch_enqueued(enqueue_result)
         return enqueue_result
 
-    def dequeue(self) -> Optional[SessionQueueItem]:
-        try:
-            self.__lock.acquire()
+    def _claim_next_pending_item(self) -> Optional[int]:
+        """
+        Atomically claims the next pending queue item, setting it to in progress. Returns its id, or None if there
+        are no pending items.
+
+        The claim is a single conditional UPDATE, so it is safe across threads, connections and processes - an item
+        can only ever be claimed once. Must be called while holding the lock.
+        """
+        if _SQLITE_SUPPORTS_RETURNING:
+            self.__cursor.execute(
+                """--sql
+                UPDATE session_queue
+                SET status = 'in_progress'
+                WHERE
+                  status = 'pending'
+                  AND item_id = (
+                    SELECT item_id
+                    FROM session_queue
+                    WHERE status = 'pending'
+                    ORDER BY
+                      priority DESC,
+                      item_id ASC
+                    LIMIT 1
+                  )
+                RETURNING item_id;
+                """
+            )
+            claimed = self.__cursor.fetchall()
+            return cast(int, claimed[0][0]) if claimed else None
+
+        # RETURNING requires SQLite 3.35.0. Fall back to compare-and-set: select a candidate, then claim it only if it
+        # is still pending. If another connection claimed it first, try the next candidate.
+        while True:
             self.__cursor.execute(
                 """--sql
-                SELECT *
+                SELECT item_id
                 FROM session_queue
                 WHERE status = 'pending'
                 ORDER BY
@@ -207,65 +287,113 @@ class SqliteSessionQueue(SessionQueueBase):
                 LIMIT 1
                 """
             )
-            result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+            candidate = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
+            if candidate is None:
+                return None
+            self.__cursor.execute(
+                """--sql
+                UPDATE session_queue
+                SET status = 'in_progress'
+                WHERE
+                  item_id = ?
+                  AND status = 'pending'
+                """,
+                (candidate[0],),
+            )
+            if self.__cursor.rowcount == 1:
+                return cast(int, candidate[0])
+
+    def dequeue(self) -> Optional[SessionQueueItem]:
+        try:
+            self.__lock.acquire()
+            item_id = self._claim_next_pending_item()
+            self.__conn.commit()
         except Exception:
             self.__conn.rollback()
             raise
         finally:
             self.__lock.release()
-        if result is None:
+        if item_id is None:
             return None
-        queue_item = SessionQueueItem.queue_item_from_dict(dict(result))
-        queue_item = self._set_queue_item_status(item_id=queue_item.item_id, status="in_progress")
+        try:
+            queue_item = self.get_queue_item(item_id)
+        except Exception:
+            # The item is claimed, so no other worker will run it. Fail it instead of leaving it in progress forever.
+            self._fail_claimed_queue_item(item_id, error=traceback.format_exc())
+            raise
+        self._emit_queue_item_status_changed(SessionQueueItemDTO.model_validate(queue_item, from_attributes=True))
         return queue_item
 
-    def get_next(self, queue_id: str) -> Optional[SessionQueueItem]:
+    def _fail_claimed_queue_item(self, item_id: int, error: str) -> None:
+        """Sets a claimed queue item whose session could not be loaded to failed"""
         try:
             self.__lock.acquire()
             self.__cursor.execute(
                 """--sql
-                SELECT *
+                UPDATE session_queue
+                SET status = 'failed', error = ?
+                WHERE item_id = ?
+                """,
+                (error, item_id),
+            )
+            self.__conn.commit()
+        except Exception:
+            self.__conn.rollback()
+            raise
+        finally:
+            self.__lock.release()
+        with self.__db.read_cursor() as cursor:
+            # The session and field values are not loaded, as they may be what failed
+            cursor.execute(
+                """--sql
+                SELECT item_id, status, priority, error, created_at, updated_at, completed_at, started_at, session_id,
+                  batch_id, queue_id
                 FROM session_queue
+                WHERE item_id = ?
+                """,
+                (item_id,),
+            )
+            result = cast(Union[sqlite3.Row, None], cursor.fetchone())
+        if result is not None:
+            self._emit_queue_item_status_changed(SessionQueueItemDTO.queue_item_dto_from_dict(dict(result)))
+
+    def get_next(self, queue_id: str) -> Optional[SessionQueueItem]:
+        with self.__db.read_cursor() as cursor:
+            cursor.execute(
+                """--sql
+                SELECT session_queue.*, batches.graph AS batch_graph, batches.workflow AS batch_workflow
+                FROM session_queue
+                LEFT JOIN batches ON batches.batch_id = session_queue.batch_id
                 WHERE
-                  queue_id = ?
+                  session_queue.queue_id = ?
                   AND status = 'pending'
                 ORDER BY
                   priority DESC,
-                  created_at ASC
+                  session_queue.created_at ASC
                 LIMIT 1
                 """,
                 (queue_id,),
             )
-            result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
+            result = cast(Union[sqlite3.Row, None], cursor.fetchone())
         if result is None:
             return None
         return SessionQueueItem.queue_item_from_dict(dict(result))
 
     def get_current(self, queue_id: str) -> Optional[SessionQueueItem]:
-        try:
-            self.__lock.acquire()
-            self.__cursor.execute(
+        with self.__db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
-                SELECT *
+                SELECT session_queue.*, batches.graph AS batch_graph, batches.workflow AS batch_workflow
                 FROM session_queue
+                LEFT JOIN batches ON batches.batch_id = session_queue.batch_id
                 WHERE
-                  queue_id = ?
+                  session_queue.queue_id = ?
                   AND status = 'in_progress'
                 LIMIT 1
                 """,
                 (queue_id,),
             )
-            result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
+            result = cast(Union[sqlite3.Row, None], cursor.fetchone())
         if result is None:
             return None
         return SessionQueueItem.queue_item_from_dict(dict(result))
@@ -290,6 +418,10 @@ class SqliteSessionQueue(SessionQueueBase):
         finally:
             self.__lock.release()
         queue_item = self.get_queue_item(item_id)
+        self._emit_queue_item_status_changed(SessionQueueItemDTO.model_validate(queue_item, from_attributes=True))
+        return queue_item
+
+    def _emit_queue_item_status_changed(self, queue_item: SessionQueueItemDTO) -> None:
         batch_status = self.get_batch_status(queue_id=queue_item.queue_id, batch_id=queue_item.batch_id)
         queue_status = self.get_queue_status(queue_id=queue_item.queue_id)
         self.__invoker.services.events.emit_queue_item_status_changed(
@@ -297,45 +429,16 @@ class SqliteSessionQueue(SessionQueueBase):
             batch_status=batch_status,
             queue_status=queue_status,
         )
-        return queue_item
 
     def is_empty(self, queue_id: str) -> IsEmptyResult:
-        try:
-            self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                SELECT count(*)
-                FROM session_queue
-                WHERE queue_id = ?
-                """,
-                (queue_id,),
-            )
-            is_empty = cast(int, self.__cursor.fetchone()[0]) == 0
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
+        with self.__db.read_cursor() as cursor:
+            is_empty = sum(self._get_queue_counts(cursor, queue_id).values()) == 0
         return IsEmptyResult(is_empty=is_empty)
 
     def is_full(self, queue_id: str) -> IsFullResult:
-        try:
-            self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                SELECT count(*)
-                FROM session_queue
-                WHERE queue_id = ?
-                """,
-                (queue_id,),
-            )
+        with self.__db.read_cursor() as cursor:
             max_queue_size = self.__invoker.services.configuration.max_queue_size
-            is_full = cast(int, self.__cursor.fetchone()[0]) >= max_queue_size
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
+            is_full = sum(self._get_queue_counts(cursor, queue_id).values()) >= max_queue_size
         return IsFullResult(is_full=is_full)
 
     def delete_queue_item(self, item_id: int) -> SessionQueueItem:
@@ -378,6 +481,7 @@ class SqliteSessionQueue(SessionQueueBase):
                 """,
                 (queue_id,),
             )
+            self._delete_unreferenced_batches()
             self.__conn.commit()
         except Exception:
             self.__conn.rollback()
@@ -416,6 +520,7 @@ class SqliteSessionQueue(SessionQueueBase):
                 """,
                 (queue_id,),
             )
+            self._delete_unreferenced_batches()
             self.__conn.commit()
         except Exception:
             self.__conn.rollback()
@@ -424,6 +529,16 @@ class SqliteSessionQueue(SessionQueueBase):
             self.__lock.release()
         return PruneResult(deleted=count)
 
+    def _delete_unreferenced_batches(self) -> None:
+        """Deletes batches that no longer have any queue items. Must be called while holding the lock."""
+        self.__cursor.execute(
+            """--sql
+            DELETE
+            FROM batches
+            WHERE pending + in_progress + completed + failed + canceled = 0;
+            """
+        )
+
     def cancel_queue_item(self, item_id: int, error: Optional[str] = None) -> SessionQueueItem:
         queue_item = self.get_queue_item(item_id)
         if queue_item.status not in ["canceled", "failed", "completed"]:
@@ -439,7 +554,6 @@ class SqliteSessionQueue(SessionQueueBase):
 
     def cancel_by_batch_ids(self, queue_id: str, batch_ids: list[str]) -> CancelByBatchIDsResult:
         try:
-            current_queue_item = self.get_current(queue_id)
             self.__lock.acquire()
             placeholders = ", ".join(["?" for _ in batch_ids])
             where = f"""--sql
@@ -460,6 +574,17 @@ class SqliteSessionQueue(SessionQueueBase):
                 tuple(params),
             )
             count = self.__cursor.fetchone()[0]
+            # With several workers, any number of the items may be in progress
+            self.__cursor.execute(
+                f"""--sql
+                SELECT item_id
+                FROM session_queue
+                {where}
+                  AND status = 'in_progress';
+                """,
+                tuple(params),
+            )
+            in_progress_item_ids = [row[0] for row in self.__cursor.fetchall()]
             self.__cursor.execute(
                 f"""--sql
                 UPDATE session_queue
@@ -469,30 +594,16 @@ class SqliteSessionQueue(SessionQueueBase):
                 tuple(params),
             )
             self.__conn.commit()
-            if current_queue_item is not None and current_queue_item.batch_id in batch_ids:
-                self.__invoker.services.events.emit_session_canceled(
-                    queue_item_id=current_queue_item.item_id,
-                    queue_id=current_queue_item.queue_id,
-                    queue_batch_id=current_queue_item.batch_id,
-                    graph_execution_state_id=current_queue_item.session_id,
-                )
-                batch_status = self.get_batch_status(queue_id=queue_id, batch_id=current_queue_item.batch_id)
-                queue_status = self.get_queue_status(queue_id=queue_id)
-                self.__invoker.services.events.emit_queue_item_status_changed(
-                    session_queue_item=current_queue_item,
-                    batch_status=batch_status,
-                    queue_status=queue_status,
-                )
         except Exception:
             self.__conn.rollback()
             raise
         finally:
             self.__lock.release()
+        self._emit_in_progress_items_canceled(in_progress_item_ids)
         return CancelByBatchIDsResult(canceled=count)
 
     def cancel_by_queue_id(self, queue_id: str) -> CancelByQueueIDResult:
         try:
-            current_queue_item = self.get_current(queue_id)
             self.__lock.acquire()
             where = """--sql
                 WHERE
@@ -511,6 +622,17 @@ class SqliteSessionQueue(SessionQueueBase):
                 tuple(params),
             )
             count = self.__cursor.fetchone()[0]
+            # With several workers, any number of the items may be in progress
+            self.__cursor.execute(
+                f"""--sql
+                SELECT item_id
+                FROM session_queue
+                {where}
+                  AND status = 'in_progress';
+                """,
+                tuple(params),
+            )
+            in_progress_item_ids = [row[0] for row in self.__cursor.fetchall()]
             self.__cursor.execute(
                 f"""--sql
                 UPDATE session_queue
@@ -520,44 +642,42 @@ class SqliteSessionQueue(SessionQueueBase):
                 tuple(params),
             )
             self.__conn.commit()
-            if current_queue_item is not None and current_queue_item.queue_id == queue_id:
-                self.__invoker.services.events.emit_session_canceled(
-                    queue_item_id=current_queue_item.item_id,
-                    queue_id=current_queue_item.queue_id,
-                    queue_batch_id=current_queue_item.batch_id,
-                    graph_execution_state_id=current_queue_item.session_id,
-                )
-                batch_status = self.get_batch_status(queue_id=queue_id, batch_id=current_queue_item.batch_id)
-                queue_status = self.get_queue_status(queue_id=queue_id)
-                self.__invoker.services.events.emit_queue_item_status_changed(
-                    session_queue_item=current_queue_item,
-                    batch_status=batch_status,
-                    queue_status=queue_status,
-                )
         except Exception:
             self.__conn.rollback()
             raise
         finally:
             self.__lock.release()
+        self._emit_in_progress_items_canceled(in_progress_item_ids)
         return CancelByQueueIDResult(canceled=count)
 
+    def _emit_in_progress_items_canceled(self, item_ids: list[int]) -> None:
+        """Emits the events for canceled queue items that were in progress, so the workers running them stop"""
+        for item_id in item_ids:
+            try:
+                queue_item = self.get_queue_item(item_id)
+            except SessionQueueItemNotFoundError:
+                continue
+            self.__invoker.services.events.emit_session_canceled(
+                queue_item_id=queue_item.item_id,
+                queue_id=queue_item.queue_id,
+                queue_batch_id=queue_item.batch_id,
+                graph_execution_state_id=queue_item.session_id,
+            )
+            self._emit_queue_item_status_changed(SessionQueueItemDTO.model_validate(queue_item, from_attributes=True))
+
     def get_queue_item(self, item_id: int) -> SessionQueueItem:
-        try:
-            self.__lock.acquire()
-            self.__cursor.execute(
+        with self.__db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
-                SELECT * FROM session_queue
+                SELECT session_queue.*, batches.graph AS batch_graph, batches.workflow AS batch_workflow
+                FROM session_queue
+                LEFT JOIN batches ON batches.batch_id = session_queue.batch_id
                 WHERE
                   item_id = ?
                 """,
                 (item_id,),
             )
-            result = cast(Union[sqlite3.Row, None], self.__cursor.fetchone())
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
+            result = cast(Union[sqlite3.Row, None], cursor.fetchone())
         if result is None:
             raise SessionQueueItemNotFoundError(f"No queue item with id {item_id}")
         return SessionQueueItem.queue_item_from_dict(dict(result))
@@ -570,9 +690,8 @@ class SqliteSessionQueue(SessionQueueBase):
         cursor: Optional[int] = None,
         status: Optional[QUEUE_ITEM_STATUS] = None,
     ) -> CursorPaginatedResults[SessionQueueItemDTO]:
-        try:
-            item_id = cursor
-            self.__lock.acquire()
+        item_id = cursor
+        with self.__db.read_cursor() as db_cursor:
             query = """--sql
                 SELECT item_id,
                     status,
@@ -610,43 +729,72 @@ class SqliteSessionQueue(SessionQueueBase):
                 LIMIT ?
                 """
             params.append(limit + 1)
-            self.__cursor.execute(query, params)
-            results = cast(list[sqlite3.Row], self.__cursor.fetchall())
+            db_cursor.execute(query, params)
+            results = cast(list[sqlite3.Row], db_cursor.fetchall())
             items = [SessionQueueItemDTO.queue_item_dto_from_dict(dict(result)) for result in results]
             has_more = False
             if len(items) > limit:
                 # remove the extra item
                 items.pop()
                 has_more = True
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
         return CursorPaginatedResults(items=items, limit=limit, has_more=has_more)
 
-    def get_queue_status(self, queue_id: str) -> SessionQueueStatus:
+    def check_status_counts(self, repair: bool = False) -> bool:
+        """
+        Checks that the batch and queue status counts match the queue items, returning True if they do. The counts are
+        maintained by triggers, so they only differ if the database was changed without them, e.g. by another version
+        of the app. If `repair` is True, the counts are recounted from the queue items.
+        """
+        sums = ", ".join(f"SUM(status = '{status}')" for status in _STATUSES)
+        columns = ", ".join(_STATUSES)
         try:
             self.__lock.acquire()
-            self.__cursor.execute(
-                """--sql
-                SELECT status, count(*)
-                FROM session_queue
-                WHERE queue_id = ?
-                GROUP BY status
-                """,
-                (queue_id,),
+            self.__cursor.execute(f"SELECT queue_id, {sums} FROM session_queue GROUP BY queue_id;")
+            queue_counts = {row[0]: tuple(row[1:]) for row in self.__cursor.fetchall()}
+            self.__cursor.execute(f"SELECT queue_id, {columns} FROM session_queue_counts;")
+            stored_queue_counts = {row[0]: tuple(row[1:]) for row in self.__cursor.fetchall() if any(row[1:])}
+            self.__cursor.execute(f"SELECT batch_id, queue_id, {sums} FROM session_queue GROUP BY batch_id;")
+            batch_counts = {row[0]: (row[1], tuple(row[2:])) for row in self.__cursor.fetchall()}
+            self.__cursor.execute(f"SELECT batch_id, {columns} FROM batches;")
+            stored_batch_counts = {row[0]: tuple(row[1:]) for row in self.__cursor.fetchall() if any(row[1:])}
+
+            is_consistent = (
+                queue_counts == stored_queue_counts
+                and {batch_id: counts for batch_id, (_, counts) in batch_counts.items()} == stored_batch_counts
+            )
+            if is_consistent or not repair:
+                return is_consistent
+
+            placeholders = ", ".join("?" for _ in _STATUSES)
+            assignments = ", ".join(f"{status} = ?" for status in _STATUSES)
+            self.__cursor.execute("DELETE FROM session_queue_counts;")
+            self.__cursor.executemany(
+                f"INSERT INTO session_queue_counts (queue_id, {columns}) VALUES (?, {placeholders});",
+                [(queue_id, *counts) for queue_id, counts in queue_counts.items()],
+            )
+            self.__cursor.execute(f"UPDATE batches SET {', '.join(f'{status} = 0' for status in _STATUSES)};")
+            self.__cursor.executemany(
+                "INSERT OR IGNORE INTO batches (batch_id, queue_id, graph) VALUES (?, ?, '');",
+                [(batch_id, queue_id) for batch_id, (queue_id, _) in batch_counts.items()],
+            )
+            self.__cursor.executemany(
+                f"UPDATE batches SET {assignments} WHERE batch_id = ?;",
+                [(*counts, batch_id) for batch_id, (_, counts) in batch_counts.items()],
             )
-            counts_result = cast(list[sqlite3.Row], self.__cursor.fetchall())
+            self.__conn.commit()
         except Exception:
             self.__conn.rollback()
             raise
         finally:
             self.__lock.release()
+        return False
+
+    def get_queue_status(self, queue_id: str) -> SessionQueueStatus:
+        with self.__db.read_cursor() as cursor:
+            counts = self._get_queue_counts(cursor, queue_id)
 
         current_item = self.get_current(queue_id=queue_id)
-        total = sum(row[1] for row in counts_result)
-        counts: dict[str, int] = {row[0]: row[1] for row in counts_result}
+        total = sum(counts.values())
         return SessionQueueStatus(
             queue_id=queue_id,
             item_id=current_item.item_id if current_item else None,
@@ -661,27 +809,20 @@ class SqliteSessionQueue(SessionQueueBase):
         )
 
     def get_batch_status(self, queue_id: str, batch_id: str) -> BatchStatus:
-        try:
-            self.__lock.acquire()
-            self.__cursor.execute(
+        with self.__db.read_cursor() as cursor:
+            cursor.execute(
                 """--sql
-                SELECT status, count(*)
-                FROM session_queue
+                SELECT pending, in_progress, completed, failed, canceled
+                FROM batches
                 WHERE
                   queue_id = ?
                   AND batch_id = ?
-                GROUP BY status
                 """,
                 (queue_id, batch_id),
             )
-            result = cast(list[sqlite3.Row], self.__cursor.fetchall())
-            total = sum(row[1] for row in result)
-            counts: dict[str, int] = {row[0]: row[1] for row in result}
-        except Exception:
-            self.__conn.rollback()
-            raise
-        finally:
-            self.__lock.release()
+            result = cast(Union[sqlite3.Row, None], cursor.fetchone())
+            counts: dict[str, int] = dict(result) if result is not None else {}
+            total = sum(counts.values())
 
         return BatchStatus(
             batch_id=batch_id,
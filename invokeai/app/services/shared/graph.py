@@ -2,12 +2,26 @@
 
 import copy
 import itertools
-from typing import Annotated, Any, Optional, TypeVar, Union, get_args, get_origin, get_type_hints
+from functools import lru_cache
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Hashable,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
 import networkx as nx
 from pydantic import (
     BaseModel,
     GetJsonSchemaHandler,
+    PrivateAttr,
     field_validator,
 )
 from pydantic.fields import Field
@@ -50,16 +64,27 @@ class Edge(BaseModel):
     destination: EdgeConnection = Field(description="The connection for the edge's to node and field")
 
 
+# Resolving type hints is slow, and invocation and output classes do not change once they are defined
+@lru_cache(maxsize=None)
+def _get_input_type_hints(node_type: type[BaseInvocation]) -> dict[str, Any]:
+    return get_type_hints(node_type)
+
+
+@lru_cache(maxsize=None)
+def _get_output_type_hints(node_type: type[BaseInvocation]) -> dict[str, Any]:
+    return get_type_hints(node_type.get_output_annotation())
+
+
 def get_output_field(node: BaseInvocation, field: str) -> Any:
     node_type = type(node)
-    node_outputs = get_type_hints(node_type.get_output_annotation())
+    node_outputs = _get_output_type_hints(node_type)
     node_output_field = node_outputs.get(field) or None
     return node_output_field
 
 
 def get_input_field(node: BaseInvocation, field: str) -> Any:
     node_type = type(node)
-    node_inputs = get_type_hints(node_type)
+    node_inputs = _get_input_type_hints(node_type)
     node_input_field = node_inputs.get(field) or None
     return node_input_field
 
@@ -252,6 +277,16 @@ class Graph(BaseModel):
         default_factory=list,
     )
 
+    # NetworkX views of the graph, which are cached until the graph is modified
+    _version: int = PrivateAttr(default=0)
+    _nx_graph_cache: dict[str, tuple[Hashable, nx.DiGraph]] = PrivateAttr(default_factory=dict)
+
+    def __eq__(self, other: object) -> bool:
+        # pydantic also compares private attributes, but the cached views don't affect equality
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
     @field_validator("nodes", mode="plain")
     @classmethod
     def validate_nodes(cls, v: dict[str, Any]):
@@ -320,6 +355,7 @@ class Graph(BaseModel):
             raise NodeAlreadyInGraphError()
 
         self.nodes[node.id] = node
+        self._version += 1
 
     def delete_node(self, node_id: str) -> None:
         """Deletes a node from a graph"""
@@ -336,6 +372,7 @@ class Graph(BaseModel):
                 self.delete_edge(edge)
 
             del self.nodes[node_id]
+            self._version += 1
 
         except NodeNotFoundError:
             pass  # Ignore, not doesn't exist (should this throw?)
@@ -349,6 +386,7 @@ class Graph(BaseModel):
         self._validate_edge(edge)
         if edge not in self.edges:
             self.edges.append(edge)
+            self._version += 1
         else:
             raise InvalidEdgeError()
 
@@ -357,6 +395,7 @@ class Graph(BaseModel):
 
         try:
             self.edges.remove(edge)
+            self._version += 1
         except KeyError:
             pass
 
@@ -480,10 +519,13 @@ class Graph(BaseModel):
                 f"Edge to node {edge.destination.node_id} field {edge.destination.field} already exists"
             )
 
-        # Validate that no cycles would be created
+        # Validate that no cycles would be created, i.e. the destination does not already lead to the source
         g = self.nx_graph_flat()
-        g.add_edge(edge.source.node_id, edge.destination.node_id)
-        if not nx.is_directed_acyclic_graph(g):
+        if edge.source.node_id == edge.destination.node_id or (
+            edge.source.node_id in g
+            and edge.destination.node_id in g
+            and nx.has_path(g, edge.destination.node_id, edge.source.node_id)
+        ):
             raise InvalidEdgeError(
                 f"Edge creates a cycle in the graph: {edge.source.node_id} -> {edge.destination.node_id}"
             )
@@ -562,6 +604,7 @@ class Graph(BaseModel):
 
         # Set the new node in the graph
         self.nodes[new_node.id] = new_node
+        self._version += 1
         if new_node.id != node.id:
             input_edges = self._get_input_edges(node_id)
             output_edges = self._get_output_edges(node_id)
@@ -690,23 +733,49 @@ class Graph(BaseModel):
 
         return True
 
+    def _get_cached_nx_graph(self, name: str, build: Callable[[], nx.DiGraph]) -> nx.DiGraph:
+        # The node and edge counts catch most direct edits of `nodes` and `edges`, which bypass the version
+        key = (self._version, len(self.nodes), len(self.edges))
+        cached = self._nx_graph_cache.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, nx.freeze(build()))
+            self._nx_graph_cache[name] = cached
+        return cached[1]
+
     def nx_graph(self) -> nx.DiGraph:
-        """Returns a NetworkX DiGraph representing the layout of this graph"""
-        # TODO: Cache this?
+        """Returns a NetworkX DiGraph representing the layout of this graph.
+
+        The DiGraph is cached until the graph is modified, and is frozen - copy it to make changes."""
+        return self._get_cached_nx_graph("nx_graph", self._build_nx_graph)
+
+    def _build_nx_graph(self) -> nx.DiGraph:
         g = nx.DiGraph()
         g.add_nodes_from(list(self.nodes.keys()))
         g.add_edges_from({(e.source.node_id, e.destination.node_id) for e in self.edges})
         return g
 
     def nx_graph_with_data(self) -> nx.DiGraph:
-        """Returns a NetworkX DiGraph representing the data and layout of this graph"""
+        """Returns a NetworkX DiGraph representing the data and layout of this graph.
+
+        The DiGraph is cached until the graph is modified, and is frozen - copy it to make changes."""
+        return self._get_cached_nx_graph("nx_graph_with_data", self._build_nx_graph_with_data)
+
+    def _build_nx_graph_with_data(self) -> nx.DiGraph:
         g = nx.DiGraph()
         g.add_nodes_from(list(self.nodes.items()))
         g.add_edges_from({(e.source.node_id, e.destination.node_id) for e in self.edges})
         return g
 
     def nx_graph_flat(self, nx_graph: Optional[nx.DiGraph] = None) -> nx.DiGraph:
-        """Returns a flattened NetworkX DiGraph, including all subgraphs (but not with iterations expanded)"""
+        """Returns a flattened NetworkX DiGraph, including all subgraphs (but not with iterations expanded).
+
+        If `nx_graph` is given, the nodes and edges are added to it. Otherwise, the DiGraph is cached until the graph
+        is modified, and is frozen - copy it to make changes."""
+        if nx_graph is not None:
+            return self._build_nx_graph_flat(nx_graph)
+        return self._get_cached_nx_graph("nx_graph_flat", self._build_nx_graph_flat)
+
+    def _build_nx_graph_flat(self, nx_graph: Optional[nx.DiGraph] = None) -> nx.DiGraph:
         g = nx_graph or nx.DiGraph()
 
         # Add all nodes from this graph except graph/iteration nodes
@@ -719,6 +788,173 @@ class Graph(BaseModel):
         return g
 
 
+class _SourceGraphIndex:
+    """Structural facts about a source graph that are needed to prepare its nodes.
+
+    The source graph does not change while it is being executed, so these are computed once rather than on every
+    call to `GraphExecutionState._prepare`.
+    """
+
+    def __init__(self, graph: Graph):
+        self.nx_graph = graph.nx_graph_flat()
+        self.sorted_nodes: list[str] = list(nx.topological_sort(self.nx_graph))
+        self.parents: dict[str, list[str]] = {n: [e[0] for e in self.nx_graph.in_edges(n)] for n in self.sorted_nodes}
+        self.iterators: set[str] = {n for n in self.sorted_nodes if isinstance(graph.get_node(n), IterateInvocation)}
+
+        # The iterate ancestors of every node, and the subset of those that is still active for the node (iterations
+        # are collapsed by collectors, so iterators upstream of a collector are not active downstream of it)
+        self.iterate_ancestors: dict[str, frozenset[str]] = {}
+        self.active_iterators: dict[str, frozenset[str]] = {}
+        for n in self.sorted_nodes:
+            parents = self.parents[n]
+            self.iterate_ancestors[n] = self._union(parents, self.iterate_ancestors)
+            if isinstance(graph.get_node(n), CollectInvocation):
+                self.active_iterators[n] = frozenset()
+            else:
+                self.active_iterators[n] = self._union(parents, self.active_iterators)
+
+    def _union(self, parents: list[str], ancestors: dict[str, frozenset[str]]) -> frozenset[str]:
+        result = frozenset(itertools.chain.from_iterable(ancestors[p] for p in parents))
+        return result.union(p for p in parents if p in self.iterators)
+
+
+class _ReadySetScheduler:
+    """Incrementally tracks which nodes of an execution graph are ready to execute, and which of them executes next.
+
+    The next node is the ready node that a depth-first post-order traversal of the execution graph reaches first, with
+    the descendants of iterate nodes taking priority in iteration order. Instead of traversing the whole graph on every
+    step, this keeps a count of unexecuted parents and the set of iterate ancestors for each node, and maintains the
+    post-order of the graph as nodes are added. Children are visited in the order they were added.
+    """
+
+    # Gap between adjacent post-order labels when (re)labelling - new nodes are labelled between their neighbors
+    _LABEL_GAP = 1 << 32
+
+    def __init__(self) -> None:
+        self.iterate_ancestors: dict[str, frozenset[str]] = {}
+        self._children: dict[str, list[str]] = {}
+        self._iterate_indexes: dict[str, int] = {}
+        self._unexecuted_parent_counts: dict[str, int] = {}
+        self._executed: set[str] = set()
+        self._ready: dict[str, None] = {}
+
+        # The post-order of the graph, as a linked list of labels that increase along the list
+        self._labels: dict[str, int] = {}
+        self._prev: dict[str, Optional[str]] = {}
+        self._next: dict[str, Optional[str]] = {}
+        self._head: Optional[str] = None
+        self._tail: Optional[str] = None
+
+    def add_node(self, node_id: str, parents: list[str], iterate_index: Optional[int] = None) -> None:
+        """Adds a node to the graph. Its parents must already have been added."""
+        for p in parents:
+            self._children[p].append(node_id)
+        self._children[node_id] = []
+        if iterate_index is not None:
+            self._iterate_indexes[node_id] = iterate_index
+
+        if len(parents) == 1 and parents[0] not in self._iterate_indexes:
+            self.iterate_ancestors[node_id] = self.iterate_ancestors[parents[0]]
+        else:
+            ancestors = frozenset(itertools.chain.from_iterable(self.iterate_ancestors[p] for p in parents))
+            self.iterate_ancestors[node_id] = ancestors.union(p for p in parents if p in self._iterate_indexes)
+
+        self._unexecuted_parent_counts[node_id] = sum(1 for p in parents if p not in self._executed)
+        if self._unexecuted_parent_counts[node_id] == 0:
+            self._ready[node_id] = None
+
+        # A new node has no children and is the last child of each of its parents, so it is visited right before the
+        # first of its parents finishes, or last if it has no parents.
+        if parents:
+            self._insert_before(node_id, min(parents, key=self._labels.__getitem__))
+        else:
+            self._append(node_id)
+
+    def mark_executed(self, node_id: str) -> None:
+        """Marks a node as executed, readying any children that have no other unexecuted parents"""
+        if node_id not in self._children or node_id in self._executed:
+            return
+        self._executed.add(node_id)
+        self._ready.pop(node_id, None)
+        for child in self._children[node_id]:
+            self._unexecuted_parent_counts[child] -= 1
+            if self._unexecuted_parent_counts[child] == 0 and child not in self._executed:
+                self._ready[child] = None
+
+    def next_node(self) -> Optional[str]:
+        """Gets the id of the next node to execute, or None if no nodes are ready"""
+        if len(self._ready) <= 1:
+            return next(iter(self._ready), None)
+
+        # Iterate nodes that are ready themselves or have ready descendants, the earliest iteration of which wins
+        iterators: set[str] = set()
+        for n in self._ready:
+            iterators.update(self.iterate_ancestors[n])
+            if n in self._iterate_indexes:
+                iterators.add(n)
+        if iterators:
+            iterator = min(iterators, key=lambda n: (self._iterate_indexes[n], self._labels[n]))
+            if iterator in self._ready:
+                return iterator
+            return self._get_first_ready_descendant(iterator)
+
+        return min(self._ready, key=self._labels.__getitem__)
+
+    def _get_first_ready_descendant(self, node_id: str) -> Optional[str]:
+        """Gets the first ready node in a depth-first post-order traversal from the given executed node"""
+        # Nothing below an unexecuted node can be ready, so the search only needs to descend into executed nodes
+        visited = {node_id}
+        stack = [iter(self._children[node_id])]
+        while stack:
+            for child in stack[-1]:
+                if child in visited:
+                    continue
+                visited.add(child)
+                if child in self._executed:
+                    stack.append(iter(self._children[child]))
+                    break
+                if child in self._ready:
+                    return child
+            else:
+                stack.pop()
+        return None
+
+    def _append(self, node_id: str) -> None:
+        self._labels[node_id] = 0 if self._tail is None else self._labels[self._tail] + self._LABEL_GAP
+        self._prev[node_id] = self._tail
+        self._next[node_id] = None
+        if self._tail is None:
+            self._head = node_id
+        else:
+            self._next[self._tail] = node_id
+        self._tail = node_id
+
+    def _insert_before(self, node_id: str, successor: str) -> None:
+        if self._label_space_before(successor) < 2:
+            self._relabel()
+        prev = self._prev[successor]
+        self._labels[node_id] = self._labels[successor] - self._label_space_before(successor) // 2
+        self._prev[node_id] = prev
+        self._next[node_id] = successor
+        self._prev[successor] = node_id
+        if prev is None:
+            self._head = node_id
+        else:
+            self._next[prev] = node_id
+
+    def _label_space_before(self, node_id: str) -> int:
+        prev = self._prev[node_id]
+        return self._LABEL_GAP if prev is None else self._labels[node_id] - self._labels[prev]
+
+    def _relabel(self) -> None:
+        node_id = self._head
+        label = 0
+        while node_id is not None:
+            self._labels[node_id] = label
+            label += self._LABEL_GAP
+            node_id = self._next[node_id]
+
+
 class GraphExecutionState(BaseModel):
     """Tracks the state of a graph execution"""
 
@@ -757,6 +993,16 @@ class GraphExecutionState(BaseModel):
         default_factory=dict,
     )
 
+    # Derived from the graph and execution graph, and rebuilt on demand (e.g. after deserialization)
+    _source_index: Optional[_SourceGraphIndex] = PrivateAttr(default=None)
+    _scheduler: Optional[_ReadySetScheduler] = PrivateAttr(default=None)
+
+    def __eq__(self, other: object) -> bool:
+        # pydantic also compares private attributes, but the derived index and scheduler don't affect equality
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+
     @field_validator("results", mode="plain")
     @classmethod
     def validate_results(cls, v: dict[str, BaseInvocationOutput]):
@@ -835,6 +1081,7 @@ class GraphExecutionState(BaseModel):
         # Mark node as executed
         self.executed.add(node_id)
         self.results[node_id] = output
+        self._get_scheduler().mark_executed(node_id)
 
         # Check if source node is complete (all prepared nodes are complete)
         source_node = self.prepared_source_mapping[node_id]
@@ -850,17 +1097,39 @@ class GraphExecutionState(BaseModel):
 
     def is_complete(self) -> bool:
         """Returns true if the graph is complete"""
-        node_ids = set(self.graph.nx_graph_flat().nodes)
+        node_ids = self._get_source_index().sorted_nodes
         return self.has_error() or all((k in self.executed for k in node_ids))
 
     def has_error(self) -> bool:
         """Returns true if the graph has any errors"""
         return len(self.errors) > 0
 
+    def _get_source_index(self) -> _SourceGraphIndex:
+        # The graph's cached nx graph is replaced whenever the graph is modified
+        if self._source_index is None or self._source_index.nx_graph is not self.graph.nx_graph_flat():
+            self._source_index = _SourceGraphIndex(self.graph)
+        return self._source_index
+
+    def _get_scheduler(self) -> _ReadySetScheduler:
+        if self._scheduler is None:
+            scheduler = _ReadySetScheduler()
+            parents: dict[str, dict[str, None]] = {n: {} for n in self.execution_graph.nodes}
+            for edge in self.execution_graph.edges:
+                parents[edge.destination.node_id][edge.source.node_id] = None
+            # Nodes are stored in the order they were prepared, so parents are always added before their children
+            for n, node in self.execution_graph.nodes.items():
+                scheduler.add_node(n, list(parents[n]), node.index if isinstance(node, IterateInvocation) else None)
+            for n in self.execution_graph.nodes:
+                if n in self.executed:
+                    scheduler.mark_executed(n)
+            self._scheduler = scheduler
+        return self._scheduler
+
     def _create_execution_node(self, node_id: str, iteration_node_map: list[tuple[str, str]]) -> list[str]:
         """Prepares an iteration node and connects all edges, returning the new node id"""
 
         node = self.graph.get_node(node_id)
+        scheduler = self._get_scheduler()
 
         self_iteration_count = -1
 
@@ -913,60 +1182,50 @@ class GraphExecutionState(BaseModel):
                 self.source_prepared_mapping[node_id] = set()
             self.source_prepared_mapping[node_id].add(new_node.id)
 
-            # Add new edges to execution graph
+            # Add new edges to execution graph. These mirror edges of the source graph, which have already been
+            # validated, and lead into a new node with no outputs, so they cannot create a cycle - validating each one
+            # again would make preparing large iterations quadratic.
             for edge in new_edges:
                 new_edge = Edge(
                     source=edge.source,
                     destination=EdgeConnection(node_id=new_node.id, field=edge.destination.field),
                 )
-                self.execution_graph.add_edge(new_edge)
+                self.execution_graph.edges.append(new_edge)
 
+            scheduler.add_node(
+                new_node.id,
+                list(dict.fromkeys(e.source.node_id for e in new_edges)),
+                new_node.index if isinstance(new_node, IterateInvocation) else None,
+            )
             new_nodes.append(new_node.id)
 
         return new_nodes
 
-    def _iterator_graph(self) -> nx.DiGraph:
-        """Gets a DiGraph with edges to collectors removed so an ancestor search produces all active iterators for any node"""
-        g = self.graph.nx_graph_flat()
-        collectors = (n for n in self.graph.nodes if isinstance(self.graph.get_node(n), CollectInvocation))
-        for c in collectors:
-            g.remove_edges_from(list(g.in_edges(c)))
-        return g
-
     def _get_node_iterators(self, node_id: str) -> list[str]:
         """Gets iterators for a node"""
-        g = self._iterator_graph()
-        iterators = [n for n in nx.ancestors(g, node_id) if isinstance(self.graph.get_node(n), IterateInvocation)]
-        return iterators
+        source_index = self._get_source_index()
+        return [n for n in source_index.sorted_nodes if n in source_index.active_iterators[node_id]]
 
     def _prepare(self) -> Optional[str]:
-        # Get flattened source graph
-        g = self.graph.nx_graph_flat()
+        source_index = self._get_source_index()
 
         # Find next node that:
         # - was not already prepared
         # - is not an iterate node whose inputs have not been executed
         # - does not have an unexecuted iterate ancestor
-        sorted_nodes = nx.topological_sort(g)
         next_node_id = next(
             (
                 n
-                for n in sorted_nodes
+                for n in source_index.sorted_nodes
                 # exclude nodes that have already been prepared
                 if n not in self.source_prepared_mapping
                 # exclude iterate nodes whose inputs have not been executed
                 and not (
-                    isinstance(self.graph.get_node(n), IterateInvocation)  # `n` is an iterate node...
-                    and not all((e[0] in self.executed for e in g.in_edges(n)))  # ...that has unexecuted inputs
+                    n in source_index.iterators  # `n` is an iterate node...
+                    and not all((p in self.executed for p in source_index.parents[n]))  # ...that has unexecuted inputs
                 )
                 # exclude nodes who have unexecuted iterate ancestors
-                and not any(
-                    (
-                        isinstance(self.graph.get_node(a), IterateInvocation)  # `a` is an iterate ancestor of `n`...
-                        and a not in self.executed  # ...that is not executed
-                        for a in nx.ancestors(g, n)  # for all ancestors `a` of node `n`
-                    )
-                )
+                and not any((a not in self.executed for a in source_index.iterate_ancestors[n]))
             ),
             None,
         )
@@ -975,7 +1234,7 @@ class GraphExecutionState(BaseModel):
             return None
 
         # Get all parents of the next node
-        next_node_parents = [e[0] for e in g.in_edges(next_node_id)]
+        next_node_parents = source_index.parents[next_node_id]
 
         # Create execution nodes
         next_node = self.graph.get_node(next_node_id)
@@ -999,9 +1258,8 @@ class GraphExecutionState(BaseModel):
             # Select the correct prepared parents for each iteration
             # For every iterator, the parent must either not be a child of that iterator, or must match the prepared iteration for that iterator
             # TODO: Handle a node mapping to none
-            eg = self.execution_graph.nx_graph_flat()
             prepared_parent_mappings = [
-                [(n, self._get_iteration_node(n, g, eg, it)) for n in next_node_parents]
+                [(n, self._get_iteration_node(n, it)) for n in next_node_parents]
                 for it in iterator_node_prepared_combinations
             ]  # type: ignore
 
@@ -1013,13 +1271,7 @@ class GraphExecutionState(BaseModel):
 
         return next(iter(new_node_ids), None)
 
-    def _get_iteration_node(
-        self,
-        source_node_id: str,
-        graph: nx.DiGraph,
-        execution_graph: nx.DiGraph,
-        prepared_iterator_nodes: list[str],
-    ) -> Optional[str]:
+    def _get_iteration_node(self, source_node_id: str, prepared_iterator_nodes: Sequence[str]) -> Optional[str]:
         """Gets the prepared version of the specified source node that matches every iteration specified"""
         prepared_nodes = self.source_prepared_mapping[source_node_id]
         if len(prepared_nodes) == 1:
@@ -1032,43 +1284,26 @@ class GraphExecutionState(BaseModel):
 
         # Filter to only iterator nodes that are a parent of the specified node, in tuple format (prepared, source)
         iterator_source_node_mapping = [(n, self.prepared_source_mapping[n]) for n in prepared_iterator_nodes]
-        parent_iterators = [itn for itn in iterator_source_node_mapping if nx.has_path(graph, itn[1], source_node_id)]
+        source_iterators = self._get_source_index().iterate_ancestors[source_node_id]
+        parent_iterators = [
+            itn for itn in iterator_source_node_mapping if itn[1] == source_node_id or itn[1] in source_iterators
+        ]
 
+        # An iterator leads to a prepared node if it is one of its (prepared) iterate ancestors
+        prepared_iterators = self._get_scheduler().iterate_ancestors
         return next(
-            (n for n in prepared_nodes if all(nx.has_path(execution_graph, pit[0], n) for pit in parent_iterators)),
+            (
+                n
+                for n in prepared_nodes
+                if all(pit[0] == n or pit[0] in prepared_iterators[n] for pit in parent_iterators)
+            ),
             None,
         )
 
     def _get_next_node(self) -> Optional[BaseInvocation]:
         """Gets the deepest node that is ready to be executed"""
-        g = self.execution_graph.nx_graph()
-
-        # Perform a topological sort using depth-first search
-        topo_order = list(nx.dfs_postorder_nodes(g))
-
-        # Get all IterateInvocation nodes
-        iterate_nodes = [n for n in topo_order if isinstance(self.execution_graph.nodes[n], IterateInvocation)]
-
-        # Sort the IterateInvocation nodes based on their index attribute
-        iterate_nodes.sort(key=lambda x: self.execution_graph.nodes[x].index)
-
-        # Prioritize IterateInvocation nodes and their children
-        for iterate_node in iterate_nodes:
-            if iterate_node not in self.executed and all((e[0] in self.executed for e in g.in_edges(iterate_node))):
-                return self.execution_graph.nodes[iterate_node]
-
-            # Check the children of the IterateInvocation node
-            for child_node in nx.dfs_postorder_nodes(g, iterate_node):
-                if child_node not in self.executed and all((e[0] in self.executed for e in g.in_edges(child_node))):
-                    return self.execution_graph.nodes[child_node]
-
-        # If no IterateInvocation node or its children are ready, return the first ready node in the topological order
-        for node in topo_order:
-            if node not in self.executed and all((e[0] in self.executed for e in g.in_edges(node))):
-                return self.execution_graph.nodes[node]
-
-        # If no node is found, return None
-        return None
+        next_node_id = self._get_scheduler().next_node()
+        return self.execution_graph.nodes[next_node_id] if next_node_id is not None else None
 
     def _prepare_inputs(self, node: BaseInvocation):
         input_edges = [e for e in self.execution_graph.edges if e.destination.node_id == node.id]
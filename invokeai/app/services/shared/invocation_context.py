@@ -14,7 +14,7 @@ from invokeai.app.services.image_records.image_records_common import ImageCatego
 from invokeai.app.services.images.images_common import ImageDTO
 from invokeai.app.services.invocation_services import InvocationServices
 from invokeai.app.services.model_records.model_records_base import UnknownModelException
-from invokeai.app.util.step_callback import stable_diffusion_step_callback
+from invokeai.app.util.step_callback import ProgressImagePolicy, stable_diffusion_step_callback
 from invokeai.backend.model_manager.config import AnyModelConfig, BaseModelType, ModelFormat, ModelType, SubModelType
 from invokeai.backend.model_manager.load.load_base import LoadedModel
 from invokeai.backend.stable_diffusion.diffusers_pipeline import PipelineIntermediateState
@@ -444,6 +444,11 @@ class UtilInterface(InvocationContextInterface):
     ) -> None:
         super().__init__(services, data)
         self._cancel_event = cancel_event
+        self._progress_image_policy = ProgressImagePolicy(
+            step_interval=services.configuration.progress_image_steps,
+            min_interval_ms=services.configuration.progress_image_interval,
+            image_format=services.configuration.progress_image_format.upper(),
+        )
 
     def is_canceled(self) -> bool:
         """Checks if the current session has been canceled.
@@ -471,6 +476,7 @@ class UtilInterface(InvocationContextInterface):
             base_model=base_model,
             events=self._services.events,
             is_canceled=self.is_canceled,
+            progress_image_policy=self._progress_image_policy,
         )
 
 
@@ -1,4 +1,4 @@
-from typing import Generic, TypeVar
+from typing import Generic, Optional, TypeVar
 
 from pydantic import BaseModel, Field
 
@@ -16,6 +16,20 @@ class CursorPaginatedResults(BaseModel, Generic[GenericBaseModel]):
     items: list[GenericBaseModel] = Field(..., description="Items")
 
 
+class KeysetPaginatedResults(BaseModel, Generic[GenericBaseModel]):
+    """
+    Keyset-paginated results, where each page starts after the last item of the previous page
+    Generic must be a Pydantic model
+    """
+
+    limit: int = Field(description="Limit of items to get")
+    next_cursor: Optional[str] = Field(
+        default=None, description="The cursor from which to get the next page, or None if there are no more items"
+    )
+    total: Optional[int] = Field(default=None, description="Total number of items in result, if requested")
+    items: list[GenericBaseModel] = Field(description="Items")
+
+
 class OffsetPaginatedResults(BaseModel, Generic[GenericBaseModel]):
     """
     Offset-paginated results
@@ -1,7 +1,9 @@
 import sqlite3
 import threading
+from contextlib import contextmanager
 from logging import Logger
 from pathlib import Path
+from typing import Iterator
 
 from invokeai.app.services.shared.sqlite.sqlite_common import sqlite_memory
 
@@ -13,23 +15,31 @@ class SqliteDatabase:
     :param db_path: Path to the database file. If None, an in-memory database is used.
     :param logger: Logger to use for logging.
     :param verbose: Whether to log SQL statements. Provides `logger.debug` as the SQLite trace callback.
+    :param read_connections: The maximum number of connections used for reads. Unused if the database is in-memory.
 
     This is a light wrapper around the `sqlite3` module, providing a few conveniences:
     - The database file is written to disk if it does not exist.
     - Foreign key constraints are enabled by default.
     - The connection is configured to use the `sqlite3.Row` row factory.
+    - File databases use write-ahead logging, so reads are not blocked by writes and writes are not blocked by reads.
 
     In addition to the constructor args, the instance provides the following attributes and methods:
     - `conn`: A `sqlite3.Connection` object. Note that the connection must never be closed if the database is in-memory.
-    - `lock`: A shared re-entrant lock, used to approximate thread safety.
+      This is the only connection that writes to the database.
+    - `lock`: A shared re-entrant lock, used to approximate thread safety. It must be held while using `conn`.
+    - `read_cursor()`: Provides a cursor for queries that only read, from a pool of read-only connections.
     - `clean()`: Runs the SQL `VACUUM;` command and reports on the freed space.
     """
 
-    def __init__(self, db_path: Path | None, logger: Logger, verbose: bool = False) -> None:
+    def __init__(self, db_path: Path | None, logger: Logger, verbose: bool = False, read_connections: int = 4) -> None:
         """Initializes the database. This is used internally by the class constructor."""
         self.logger = logger
         self.db_path = db_path
         self.verbose = verbose
+        self._read_conns: list[sqlite3.Connection] = []
+        self._read_conns_lock = threading.Lock()
+        self._read_slots = threading.BoundedSemaphore(max(read_connections, 1))
+        self._use_read_conns = self.db_path is not None and read_connections > 0
 
         if not self.db_path:
             logger.info("Initializing in-memory database")
@@ -45,6 +55,65 @@ class SqliteDatabase:
             self.conn.set_trace_callback(self.logger.debug)
 
         self.conn.execute("PRAGMA foreign_keys = ON;")
+        if self.db_path:
+            # The journal mode is stored in the database file. The other pragmas apply to this connection.
+            self.conn.execute("PRAGMA journal_mode = WAL;")
+            # In WAL mode, this is still safe from corruption. Only the most recent commits may be lost on power loss.
+            self.conn.execute("PRAGMA synchronous = NORMAL;")
+            self._configure_connection(self.conn)
+
+    def _configure_connection(self, conn: sqlite3.Connection) -> None:
+        """Sets the per-connection pragmas that speed up queries on a file database."""
+        conn.execute("PRAGMA mmap_size = 268435456;")  # 256MB
+        conn.execute("PRAGMA cache_size = -65536;")  # 64MB
+        conn.execute("PRAGMA temp_store = MEMORY;")
+
+    def _connect_read(self) -> sqlite3.Connection:
+        """Opens a connection that can only read from the database."""
+        assert self.db_path is not None
+        conn = sqlite3.connect(database=self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.verbose:
+            conn.set_trace_callback(self.logger.debug)
+        conn.execute("PRAGMA query_only = ON;")
+        self._configure_connection(conn)
+        return conn
+
+    @contextmanager
+    def read_cursor(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Provides a cursor for queries that only read from the database.
+
+        The cursor's connection does not see uncommitted changes made with `conn`, so it must not be used while a write
+        is in progress on the same thread. All queries with the cursor see the database as of the same commit.
+
+        If the database is in-memory, there is only one connection, so the cursor is from `conn` and `lock` is held.
+        """
+        if not self._use_read_conns:
+            with self.lock:
+                cursor = self.conn.cursor()
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+            return
+
+        with self._read_slots:
+            with self._read_conns_lock:
+                conn = self._read_conns.pop() if self._read_conns else None
+            if conn is None:
+                conn = self._connect_read()
+            cursor = conn.cursor()
+            try:
+                # The queries share a read transaction, so they see the same snapshot of the database
+                cursor.execute("BEGIN;")
+                yield cursor
+            finally:
+                # Ending the read transaction allows the write-ahead log to be reset
+                cursor.close()
+                conn.rollback()
+                with self._read_conns_lock:
+                    self._read_conns.append(conn)
 
     def clean(self) -> None:
         """
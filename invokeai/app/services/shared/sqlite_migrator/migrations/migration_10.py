@@ -0,0 +1,38 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration10Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_session_queue_dequeue_index(cursor)
+
+    def _add_session_queue_dequeue_index(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds a composite index matching the dequeue query's filter and sort order, so finding the next pending item
+        is a single index seek regardless of how many finished items are in the queue.
+
+        The old single-column status index is a prefix of the new index, so it is dropped.
+        """
+
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_session_queue_status_priority_item_id ON session_queue(status, priority DESC, item_id ASC);"
+        )
+        cursor.execute("DROP INDEX IF EXISTS idx_session_queue_created_status;")
+
+
+def build_migration_10() -> Migration:
+    """
+    Build the migration from database version 9 to 10.
+
+    This migration does the following:
+    - Adds a composite `(status, priority DESC, item_id ASC)` index on the session queue, used to dequeue items.
+    - Drops the now-redundant single-column `status` index on the session queue.
+    """
+    migration_10 = Migration(
+        from_version=9,
+        to_version=10,
+        callback=Migration10Callback(),
+    )
+
+    return migration_10
@@ -0,0 +1,44 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration11Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._create_batches(cursor)
+
+    def _create_batches(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Creates the batches table, which stores each batch's graph and workflow once. Queue items reference their
+        batch's graph, and their sessions are populated from it with their field values when they are retrieved.
+
+        Queue items created before this migration keep their fully-populated sessions.
+        """
+
+        cursor.execute(
+            """--sql
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT NOT NULL PRIMARY KEY,
+                queue_id TEXT NOT NULL, -- identifier of the queue this batch belongs to
+                graph TEXT NOT NULL, -- the graph, without the batch's field values
+                workflow TEXT, -- NULL if no workflow is associated with this batch
+                created_at DATETIME NOT NULL DEFAULT(STRFTIME('%Y-%m-%d %H:%M:%f', 'NOW'))
+            );
+            """
+        )
+
+
+def build_migration_11() -> Migration:
+    """
+    Build the migration from database version 10 to 11.
+
+    This migration does the following:
+    - Adds the `batches` table, which stores each batch's graph and workflow once, instead of in every queue item.
+    """
+    migration_11 = Migration(
+        from_version=10,
+        to_version=11,
+        callback=Migration11Callback(),
+    )
+
+    return migration_11
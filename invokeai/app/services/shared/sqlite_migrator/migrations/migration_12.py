@@ -0,0 +1,144 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+_STATUSES = ["pending", "in_progress", "completed", "failed", "canceled"]
+
+
+class Migration12Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._add_batch_status_counts(cursor)
+        self._create_session_queue_counts(cursor)
+        self._populate_status_counts(cursor)
+        self._create_status_count_triggers(cursor)
+
+    def _add_batch_status_counts(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Adds a count of the batch's queue items for each status to the batches table.
+
+        Batches enqueued before migration 11 have no row in the batches table. They are given one with an empty graph,
+        so every batch has its counts. Their queue items have fully-populated sessions, so the graph is never used.
+        """
+
+        for status in _STATUSES:
+            cursor.execute(f"ALTER TABLE batches ADD COLUMN {status} INTEGER NOT NULL DEFAULT 0;")
+        cursor.execute(
+            """--sql
+            INSERT OR IGNORE INTO batches (batch_id, queue_id, graph)
+            SELECT batch_id, queue_id, ''
+            FROM session_queue
+            GROUP BY batch_id;
+            """
+        )
+
+    def _create_session_queue_counts(self, cursor: sqlite3.Cursor) -> None:
+        """Creates the session_queue_counts table, which has a count of each queue's items for each status."""
+
+        cursor.execute(
+            """--sql
+            CREATE TABLE IF NOT EXISTS session_queue_counts (
+                queue_id TEXT NOT NULL PRIMARY KEY,
+                pending INTEGER NOT NULL DEFAULT 0,
+                in_progress INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                canceled INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def _populate_status_counts(self, cursor: sqlite3.Cursor) -> None:
+        """Counts the existing queue items for each batch and queue."""
+
+        sums = ", ".join(f"SUM(status = '{status}')" for status in _STATUSES)
+        columns = ", ".join(_STATUSES)
+        cursor.execute(
+            f"""--sql
+            INSERT INTO session_queue_counts (queue_id, {columns})
+            SELECT queue_id, {sums}
+            FROM session_queue
+            GROUP BY queue_id;
+            """
+        )
+        cursor.execute(
+            f"""--sql
+            UPDATE batches
+            SET ({columns}) = (
+              SELECT {sums}
+              FROM session_queue
+              WHERE session_queue.batch_id = batches.batch_id
+            )
+            WHERE batch_id IN (SELECT batch_id FROM session_queue);
+            """
+        )
+
+    def _create_status_count_triggers(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Creates triggers that keep the batch and queue status counts up to date as queue items are inserted, updated
+        and deleted. Triggers run in the same transaction as the change to the queue item, so the counts are always
+        consistent with the queue items.
+
+        A batch's row is created by its first queue item, if it doesn't already exist.
+        """
+
+        increments = ", ".join(f"{status} = {status} + (NEW.status = '{status}')" for status in _STATUSES)
+        decrements = ", ".join(f"{status} = {status} - (OLD.status = '{status}')" for status in _STATUSES)
+        changes = ", ".join(
+            f"{status} = {status} + (NEW.status = '{status}') - (OLD.status = '{status}')" for status in _STATUSES
+        )
+
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_counts_insert
+            AFTER INSERT ON session_queue
+            FOR EACH ROW
+            BEGIN
+                INSERT OR IGNORE INTO session_queue_counts (queue_id) VALUES (NEW.queue_id);
+                UPDATE session_queue_counts SET {increments} WHERE queue_id = NEW.queue_id;
+                INSERT OR IGNORE INTO batches (batch_id, queue_id, graph) VALUES (NEW.batch_id, NEW.queue_id, '');
+                UPDATE batches SET {increments} WHERE batch_id = NEW.batch_id;
+            END;
+            """
+        )
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_counts_update
+            AFTER UPDATE OF status ON session_queue
+            FOR EACH ROW
+            WHEN NEW.status != OLD.status
+            BEGIN
+                UPDATE session_queue_counts SET {changes} WHERE queue_id = NEW.queue_id;
+                UPDATE batches SET {changes} WHERE batch_id = NEW.batch_id;
+            END;
+            """
+        )
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_session_queue_counts_delete
+            AFTER DELETE ON session_queue
+            FOR EACH ROW
+            BEGIN
+                UPDATE session_queue_counts SET {decrements} WHERE queue_id = OLD.queue_id;
+                UPDATE batches SET {decrements} WHERE batch_id = OLD.batch_id;
+            END;
+            """
+        )
+
+
+def build_migration_12() -> Migration:
+    """
+    Build the migration from database version 11 to 12.
+
+    This migration does the following:
+    - Adds a count of the batch's queue items for each status to the `batches` table, and adds a row for each batch
+      enqueued before migration 11.
+    - Adds the `session_queue_counts` table, with a count of each queue's items for each status.
+    - Adds triggers that keep both sets of counts up to date as queue items are inserted, updated and deleted.
+    """
+    migration_12 = Migration(
+        from_version=11,
+        to_version=12,
+        callback=Migration12Callback(),
+    )
+
+    return migration_12
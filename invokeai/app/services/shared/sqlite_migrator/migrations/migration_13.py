@@ -0,0 +1,149 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+# The most recent image in a board, preferring starred images. This is the board's cover image.
+_COVER_IMAGE_NAME = """
+    SELECT images.image_name
+    FROM board_images
+    JOIN images ON images.image_name = board_images.image_name
+    WHERE board_images.board_id = {board_id}
+    ORDER BY images.starred DESC, images.created_at DESC
+    LIMIT 1
+"""
+
+# Sorts images in the same order as the cover image query
+_SORT_KEY = "(SELECT starred || created_at FROM images WHERE image_name = {image_name})"
+
+
+class Migration13Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._create_board_image_summaries(cursor)
+        self._populate_board_image_summaries(cursor)
+        self._create_board_image_summary_triggers(cursor)
+
+    def _create_board_image_summaries(self, cursor: sqlite3.Cursor) -> None:
+        """Creates the board_image_summaries table, which has the number of images and the cover image of each board."""
+
+        cursor.execute(
+            """--sql
+            CREATE TABLE IF NOT EXISTS board_image_summaries (
+                board_id TEXT NOT NULL PRIMARY KEY,
+                image_count INTEGER NOT NULL DEFAULT 0,
+                cover_image_name TEXT,
+                FOREIGN KEY (board_id) REFERENCES boards (board_id) ON DELETE CASCADE
+            );
+            """
+        )
+
+    def _populate_board_image_summaries(self, cursor: sqlite3.Cursor) -> None:
+        """Summarizes the existing images of each board."""
+
+        cursor.execute(
+            f"""--sql
+            INSERT INTO board_image_summaries (board_id, image_count, cover_image_name)
+            SELECT board_id, COUNT(*), ({_COVER_IMAGE_NAME.format(board_id="outer_board_images.board_id")})
+            FROM board_images AS outer_board_images
+            GROUP BY board_id;
+            """
+        )
+
+    def _create_board_image_summary_triggers(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Creates triggers that keep the board image summaries up to date as images are added to, moved between and
+        removed from boards, and as they are starred and unstarred. Triggers run in the same transaction as the change,
+        so the summaries are always consistent with the board's images.
+
+        A board's row is created when its first image is added. The cover image is only searched for when the current
+        cover image is removed or changes its starred state; otherwise, an added image is compared with the current
+        cover image.
+        """
+
+        add_image = f"""
+            INSERT OR IGNORE INTO board_image_summaries (board_id) VALUES (NEW.board_id);
+            UPDATE board_image_summaries
+            SET
+              image_count = image_count + 1,
+              cover_image_name = CASE
+                WHEN cover_image_name IS NULL
+                  OR {_SORT_KEY.format(image_name="NEW.image_name")} >= {_SORT_KEY.format(image_name="cover_image_name")}
+                THEN NEW.image_name
+                ELSE cover_image_name
+              END
+            WHERE board_id = NEW.board_id;
+        """
+        remove_image = f"""
+            UPDATE board_image_summaries
+            SET
+              image_count = image_count - 1,
+              cover_image_name = CASE
+                WHEN cover_image_name = OLD.image_name
+                THEN ({_COVER_IMAGE_NAME.format(board_id="OLD.board_id")})
+                ELSE cover_image_name
+              END
+            WHERE board_id = OLD.board_id;
+        """
+
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_board_image_summaries_insert
+            AFTER INSERT ON board_images
+            FOR EACH ROW
+            BEGIN
+                {add_image}
+            END;
+            """
+        )
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_board_image_summaries_update
+            AFTER UPDATE OF board_id ON board_images
+            FOR EACH ROW
+            WHEN NEW.board_id != OLD.board_id
+            BEGIN
+                {remove_image}
+                {add_image}
+            END;
+            """
+        )
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_board_image_summaries_delete
+            AFTER DELETE ON board_images
+            FOR EACH ROW
+            BEGIN
+                {remove_image}
+            END;
+            """
+        )
+        cursor.execute(
+            f"""--sql
+            CREATE TRIGGER IF NOT EXISTS tg_board_image_summaries_starred
+            AFTER UPDATE OF starred ON images
+            FOR EACH ROW
+            WHEN NEW.starred != OLD.starred
+            BEGIN
+                UPDATE board_image_summaries
+                SET cover_image_name = ({_COVER_IMAGE_NAME.format(board_id="board_image_summaries.board_id")})
+                WHERE board_id = (SELECT board_id FROM board_images WHERE image_name = NEW.image_name);
+            END;
+            """
+        )
+
+
+def build_migration_13() -> Migration:
+    """
+    Build the migration from database version 12 to 13.
+
+    This migration does the following:
+    - Adds the `board_image_summaries` table, with the number of images and the cover image of each board.
+    - Adds triggers that keep the summaries up to date as board images are inserted, updated and deleted, and as images
+      are starred and unstarred.
+    """
+    migration_13 = Migration(
+        from_version=12,
+        to_version=13,
+        callback=Migration13Callback(),
+    )
+
+    return migration_13
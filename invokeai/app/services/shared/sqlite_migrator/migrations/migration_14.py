@@ -0,0 +1,53 @@
+import sqlite3
+
+from invokeai.app.services.shared.sqlite_migrator.sqlite_migrator_common import Migration
+
+
+class Migration14Callback:
+    def __call__(self, cursor: sqlite3.Cursor) -> None:
+        self._create_image_listing_indices(cursor)
+
+    def _create_image_listing_indices(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Creates indices for listing images in the gallery's sort order.
+
+        The images index is in the sort order, followed by the columns images are filtered by. Pages are read in order
+        from the index, and images that don't match the filters are skipped without reading their rows. The
+        board_images index covers the lookup of each image's board, and listing the images in a board.
+        """
+
+        cursor.execute(
+            """--sql
+            CREATE INDEX IF NOT EXISTS idx_images_starred_created_at_image_name
+            ON images (starred, created_at, image_name, image_category, is_intermediate, image_origin);
+            """
+        )
+        cursor.execute(
+            """--sql
+            CREATE INDEX IF NOT EXISTS idx_board_images_image_name_board_id
+            ON board_images (image_name, board_id);
+            """
+        )
+        cursor.execute(
+            """--sql
+            CREATE INDEX IF NOT EXISTS idx_board_images_board_id_image_name
+            ON board_images (board_id, image_name);
+            """
+        )
+
+
+def build_migration_14() -> Migration:
+    """
+    Build the migration from database version 13 to 14.
+
+    This migration does the following:
+    - Adds an index on `images` in the gallery's sort order, which also covers the columns images are filtered by.
+    - Adds indices on `board_images` that cover the lookups of an image's board and a board's images.
+    """
+    migration_14 = Migration(
+        from_version=13,
+        to_version=14,
+        callback=Migration14Callback(),
+    )
+
+    return migration_14
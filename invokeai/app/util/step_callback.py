@@ -1,4 +1,6 @@
-from typing import TYPE_CHECKING, Callable
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Optional
 
 import torch
 from PIL import Image
@@ -29,12 +31,79 @@ def sample_to_lowres_estimated_image(samples, latent_rgb_factors, smooth_matrix=
     return Image.fromarray(latents_ubyte.numpy())
 
 
+# fast latents preview matrix for sdxl
+# generated by @StAlKeR7779
+SDXL_LATENT_RGB_FACTORS = [
+    #   R        G        B
+    [0.3816, 0.4930, 0.5320],
+    [-0.3753, 0.1631, 0.1739],
+    [0.1770, 0.3588, -0.2048],
+    [-0.4350, -0.2644, -0.4289],
+]
+
+SDXL_SMOOTH_MATRIX = [
+    [0.0358, 0.0964, 0.0358],
+    [0.0964, 0.4711, 0.0964],
+    [0.0358, 0.0964, 0.0358],
+]
+
+# origingally adapted from code by @erucipe and @keturn here:
+# https://discuss.huggingface.co/t/decoding-latents-to-rgb-without-upscaling/23204/7
+
+# these updated numbers for v1.5 are from @torridgristle
+SD1_5_LATENT_RGB_FACTORS = [
+    #    R        G        B
+    [0.3444, 0.1385, 0.0670],  # L1
+    [0.1247, 0.4027, 0.1494],  # L2
+    [-0.3192, 0.2513, 0.2103],  # L3
+    [-0.1307, -0.1874, -0.7445],  # L4
+]
+
+
+@lru_cache(maxsize=16)
+def get_latent_rgb_factors(
+    base_model: BaseModelType, dtype: torch.dtype, device: torch.device
+) -> tuple[torch.Tensor, Optional[torch.Tensor]]:
+    """Gets the latent to RGB factors and the smoothing matrix for a base model, created once on the given device"""
+    if base_model in [BaseModelType.StableDiffusionXL, BaseModelType.StableDiffusionXLRefiner]:
+        return (
+            torch.tensor(SDXL_LATENT_RGB_FACTORS, dtype=dtype, device=device),
+            torch.tensor(SDXL_SMOOTH_MATRIX, dtype=dtype, device=device),
+        )
+    return torch.tensor(SD1_5_LATENT_RGB_FACTORS, dtype=dtype, device=device), None
+
+
+class ProgressImagePolicy:
+    """Decides which denoising steps get a progress image.
+
+    :param step_interval: Send a progress image every this many steps
+    :param min_interval_ms: The minimum time between progress images
+    :param image_format: The format progress images are encoded in
+    """
+
+    def __init__(self, step_interval: int = 1, min_interval_ms: int = 0, image_format: str = "JPEG"):
+        self.step_interval = step_interval
+        self.min_interval_ms = min_interval_ms
+        self.image_format = image_format
+        self._last_sent: Optional[float] = None
+
+    def should_send(self, step: int) -> bool:
+        if step % self.step_interval != 0:
+            return False
+        now = time.monotonic()
+        if self._last_sent is not None and (now - self._last_sent) * 1000 < self.min_interval_ms:
+            return False
+        self._last_sent = now
+        return True
+
+
 def stable_diffusion_step_callback(
     context_data: "InvocationContextData",
     intermediate_state: PipelineIntermediateState,
     base_model: BaseModelType,
     events: "EventServiceBase",
     is_canceled: Callable[[], bool],
+    progress_image_policy: Optional[ProgressImagePolicy] = None,
 ) -> None:
     if is_canceled():
         raise CanceledException
@@ -60,58 +129,19 @@ def stable_diffusion_step_callback(
     #     latents = sample
     #     step = intermediate_state.step
 
-    # TODO: only output a preview image when requested
-
-    if base_model in [BaseModelType.StableDiffusionXL, BaseModelType.StableDiffusionXLRefiner]:
-        # fast latents preview matrix for sdxl
-        # generated by @StAlKeR7779
-        sdxl_latent_rgb_factors = torch.tensor(
-            [
-                #   R        G        B
-                [0.3816, 0.4930, 0.5320],
-                [-0.3753, 0.1631, 0.1739],
-                [0.1770, 0.3588, -0.2048],
-                [-0.4350, -0.2644, -0.4289],
-            ],
-            dtype=sample.dtype,
-            device=sample.device,
-        )
-
-        sdxl_smooth_matrix = torch.tensor(
-            [
-                [0.0358, 0.0964, 0.0358],
-                [0.0964, 0.4711, 0.0964],
-                [0.0358, 0.0964, 0.0358],
-            ],
-            dtype=sample.dtype,
-            device=sample.device,
-        )
-
-        image = sample_to_lowres_estimated_image(sample, sdxl_latent_rgb_factors, sdxl_smooth_matrix)
-    else:
-        # origingally adapted from code by @erucipe and @keturn here:
-        # https://discuss.huggingface.co/t/decoding-latents-to-rgb-without-upscaling/23204/7
-
-        # these updated numbers for v1.5 are from @torridgristle
-        v1_5_latent_rgb_factors = torch.tensor(
-            [
-                #    R        G        B
-                [0.3444, 0.1385, 0.0670],  # L1
-                [0.1247, 0.4027, 0.1494],  # L2
-                [-0.3192, 0.2513, 0.2103],  # L3
-                [-0.1307, -0.1874, -0.7445],  # L4
-            ],
-            dtype=sample.dtype,
-            device=sample.device,
-        )
-
-        image = sample_to_lowres_estimated_image(sample, v1_5_latent_rgb_factors)
+    policy = progress_image_policy or ProgressImagePolicy()
+    progress_image = None
+    # Nobody would see the image if no one is subscribed to the queue
+    if events.has_subscribers(context_data.queue_item.queue_id) and policy.should_send(intermediate_state.step):
+        latent_rgb_factors, smooth_matrix = get_latent_rgb_factors(base_model, sample.dtype, sample.device)
+        image = sample_to_lowres_estimated_image(sample, latent_rgb_factors, smooth_matrix)
 
-    (width, height) = image.size
-    width *= 8
-    height *= 8
+        (width, height) = image.size
+        width *= 8
+        height *= 8
 
-    dataURL = image_to_dataURL(image, image_format="JPEG")
+        dataURL = image_to_dataURL(image, image_format=policy.image_format)
+        progress_image = ProgressImage(width=width, height=height, dataURL=dataURL)
 
     events.emit_generator_progress(
         queue_id=context_data.queue_item.queue_id,
@@ -120,7 +150,7 @@ def stable_diffusion_step_callback(
         graph_execution_state_id=context_data.queue_item.session_id,
         node_id=context_data.invocation.id,
         source_node_id=context_data.source_invocation_id,
-        progress_image=ProgressImage(width=width, height=height, dataURL=dataURL),
+        progress_image=progress_image,
         step=intermediate_state.step,
         order=intermediate_state.order,
         total_steps=intermediate_state.total_steps,
@@ -6,10 +6,10 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union
 
 import torch
-from safetensors.torch import load_file
 from typing_extensions import Self
 
 from invokeai.backend.model_manager import BaseModelType
+from invokeai.backend.model_manager.util.model_util import read_checkpoint
 
 from .raw_model import RawModel
 
@@ -476,10 +476,7 @@ class LoRAModelRaw(RawModel):  # (torch.nn.Module):
             layers={},
         )
 
-        if file_path.suffix == ".safetensors":
-            sd = load_file(file_path.absolute().as_posix(), device="cpu")
-        else:
-            sd = torch.load(file_path, map_location="cpu")
+        sd = read_checkpoint(file_path)
 
         state_dict = cls._group_state(sd)
 
@@ -30,7 +30,9 @@ def convert_ldm_vae_to_diffusers(
     converted_vae_checkpoint = convert_ldm_vae_checkpoint(checkpoint, vae_config)
 
     vae = AutoencoderKL(**vae_config)
-    vae.load_state_dict(converted_vae_checkpoint)
+    # The converted tensors become the model's weights instead of being copied into them, so weights read from a
+    # memory-mapped checkpoint stay mapped
+    vae.load_state_dict(converted_vae_checkpoint, assign=True)
     vae.to(precision)
 
     if dump_path:
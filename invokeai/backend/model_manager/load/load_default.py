@@ -1,9 +1,11 @@
 # Copyright (c) 2024, Lincoln D. Stein and the InvokeAI Development Team
 """Default implementation of model loading in InvokeAI."""
 
+import threading
+from concurrent.futures import Future
 from logging import Logger
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from invokeai.app.services.config import InvokeAIAppConfig
 from invokeai.backend.model_manager import (
@@ -20,8 +22,11 @@ from invokeai.backend.model_manager.load.model_util import calc_model_size_by_da
 from invokeai.backend.model_manager.load.optimizations import skip_torch_weight_init
 from invokeai.backend.util.devices import TorchDevice
 
+# The models being converted, by model key. Loaders are created for each load, so these are shared between them.
+_converting: Dict[str, Future[None]] = {}
+_converting_lock = threading.Lock()
+
 
-# TO DO: The loader is not thread safe!
 class ModelLoader(ModelLoaderBase):
     """Default implementation of ModelLoaderBase."""
 
@@ -79,27 +84,19 @@ class ModelLoader(ModelLoaderBase):
     def _convert_and_load(
         self, config: AnyModelConfig, model_path: Path, submodel_type: Optional[SubModelType] = None
     ) -> ModelLockerBase:
-        try:
-            return self._ram_cache.get(config.key, submodel_type)
-        except IndexError:
-            pass
-
-        cache_path: Path = self._convert_cache.cache_path(config.key)
-        if self._needs_conversion(config, model_path, cache_path):
-            loaded_model = self._do_convert(config, model_path, cache_path, submodel_type)
-        else:
-            config.path = str(cache_path) if cache_path.exists() else str(self._get_model_path(config))
-            loaded_model = self._load_model(config, submodel_type)
-
-        self._ram_cache.put(
-            config.key,
-            submodel_type=submodel_type,
-            model=loaded_model,
-            size=calc_model_size_by_data(loaded_model),
-        )
-
-        return self._ram_cache.get(
+        def load() -> Tuple[AnyModel, int]:
+            cache_path: Path = self._convert_cache.cache_path(config.key)
+            if self._needs_conversion(config, model_path, cache_path):
+                loaded_model = self._convert_once(config, model_path, cache_path, submodel_type)
+            else:
+                config.path = str(cache_path) if cache_path.exists() else str(self._get_model_path(config))
+                loaded_model = self._load_model(config, submodel_type)
+            return loaded_model, calc_model_size_by_data(loaded_model)
+
+        # Concurrent requests for the same model wait for a single load
+        return self._ram_cache.load(
             key=config.key,
+            loader=load,
             submodel_type=submodel_type,
             stats_name=":".join([config.base, config.type, config.name, (submodel_type or "")]),
         )
@@ -114,6 +111,43 @@ class ModelLoader(ModelLoaderBase):
             variant=config.repo_variant if isinstance(config, DiffusersConfigBase) else None,
         )
 
+    def _convert_once(
+        self, config: AnyModelConfig, model_path: Path, cache_path: Path, submodel_type: Optional[SubModelType] = None
+    ) -> AnyModel:
+        """
+        Convert the model, unless it is already being converted - in which case, wait for that conversion and use its
+        result. Converting a checkpoint produces all of its submodels at once, so concurrent requests for different
+        submodels of the same model must wait for a single conversion.
+        """
+        while True:
+            with _converting_lock:
+                future = _converting.get(config.key)
+                if future is None:
+                    future = Future()
+                    _converting[config.key] = future
+                    break
+            # If the conversion fails, this raises its exception
+            future.result()
+            # The conversion put the other submodels in the RAM cache, and saved the model in the convert cache if it
+            # is enabled. If the submodel has since been evicted and wasn't saved, this thread converts the model again.
+            if self._ram_cache.exists(config.key, submodel_type):
+                return self._ram_cache.get(config.key, submodel_type).model
+            if not self._needs_conversion(config, model_path, cache_path):
+                config.path = str(cache_path)
+                return self._load_model(config, submodel_type)
+
+        try:
+            model = self._do_convert(config, model_path, cache_path, submodel_type)
+        except BaseException as e:
+            with _converting_lock:
+                del _converting[config.key]
+            future.set_exception(e)
+            raise
+        with _converting_lock:
+            del _converting[config.key]
+        future.set_result(None)
+        return model
+
     def _do_convert(
         self, config: AnyModelConfig, model_path: Path, cache_path: Path, submodel_type: Optional[SubModelType] = None
     ) -> AnyModel:
@@ -7,10 +7,11 @@ grows larger than a preset maximum, then the least recently used
 model will be cleared and (re)loaded from disk when next needed.
 """
 
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from logging import Logger
-from typing import Dict, Generic, Optional, TypeVar
+from typing import Callable, Dict, Generic, Optional, Tuple, TypeVar
 
 import torch
 
@@ -22,7 +23,7 @@ class ModelLockerBase(ABC):
 
     @abstractmethod
     def lock(self) -> AnyModel:
-        """Lock the contained model and move it into VRAM."""
+        """Lock the contained model and move it into VRAM. Until it is unlocked, no other thread can lock it."""
         pass
 
     @abstractmethod
@@ -49,6 +50,11 @@ class CacheRecord(Generic[T]):
     size: int
     loaded: bool = False
     _locks: int = 0
+    # Held while the model is moved between devices, and its `loaded` flag updated. The cache's lock is not held then.
+    device_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    # Held by the thread that has locked the model. Patches such as LoRAs change the model in place, so sessions in
+    # other workers must not use it until they are removed.
+    use_lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
 
     def lock(self) -> None:
         """Lock this record."""
@@ -99,6 +105,12 @@ class ModelCacheBase(ABC, Generic[T]):
         """Return true if the cache is configured to lazily offload models in VRAM."""
         pass
 
+    @property
+    @abstractmethod
+    def lock(self) -> threading.RLock:
+        """Return the lock that must be held while reading or changing the cache's records."""
+        pass
+
     @property
     @abstractmethod
     def max_cache_size(self) -> float:
@@ -133,6 +145,16 @@ class ModelCacheBase(ABC, Generic[T]):
         """Return the logger used by the cache."""
         pass
 
+    @abstractmethod
+    def lock_record(self, cache_entry: CacheRecord[AnyModel]) -> None:
+        """Lock a record, so that its model is not evicted or offloaded while it is in use."""
+        pass
+
+    @abstractmethod
+    def unlock_record(self, cache_entry: CacheRecord[AnyModel]) -> None:
+        """Unlock a record."""
+        pass
+
     @abstractmethod
     def make_room(self, size: int) -> None:
         """Make enough room in the cache to accommodate a new model of indicated size."""
@@ -168,6 +190,27 @@ class ModelCacheBase(ABC, Generic[T]):
         """
         pass
 
+    @abstractmethod
+    def load(
+        self,
+        key: str,
+        loader: Callable[[], Tuple[T, int]],
+        submodel_type: Optional[SubModelType] = None,
+        stats_name: Optional[str] = None,
+    ) -> ModelLockerBase:
+        """
+        Retrieve model using key and optional submodel_type, loading it first if it is not in the cache.
+
+        :param key: Opaque model key
+        :param loader: Loads the model, returning it and its size in bytes
+        :param submodel_type: Type of the submodel to fetch
+        :param stats_name: A human-readable id for the model for the purposes of
+        stats reporting.
+
+        Only one thread loads a given model at a time. Other threads that request it wait for that load.
+        """
+        pass
+
     @abstractmethod
     def exists(
         self,
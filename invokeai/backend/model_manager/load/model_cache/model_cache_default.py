@@ -21,10 +21,13 @@ context. Use like this:
 import gc
 import math
 import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from contextlib import suppress
 from logging import Logger
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import torch
 
@@ -49,6 +52,9 @@ GIG = 1073741824
 # Size of a MB in bytes.
 MB = 2**20
 
+# Clearing less than this from the RAM cache does not justify the cost of a full garbage collection
+GC_COLLECT_THRESHOLD = 256 * MB
+
 
 class ModelCache(ModelCacheBase[AnyModel]):
     """Implementation of ModelCacheBase."""
@@ -92,7 +98,14 @@ class ModelCache(ModelCacheBase[AnyModel]):
         self._stats: Optional[CacheStats] = None
 
         self._cached_models: Dict[str, CacheRecord[AnyModel]] = {}
-        self._cache_stack: List[str] = []
+        # The keys of the records that can be evicted, least recently used first. Locked records are left out, and
+        # are added back as the most recently used when they are unlocked.
+        self._lru: OrderedDict[str, None] = OrderedDict()
+        self._cache_size = 0
+        # Guards the records. Re-entrant, because evicting or moving a model may delete its record.
+        self._lock = threading.RLock()
+        # The models being loaded, by cache key. Threads that request a model being loaded wait on its future.
+        self._loading: Dict[str, Future[None]] = {}
 
     @property
     def logger(self) -> Logger:
@@ -114,6 +127,11 @@ class ModelCache(ModelCacheBase[AnyModel]):
         """Return the exection device (e.g. "cuda" for VRAM)."""
         return self._execution_device
 
+    @property
+    def lock(self) -> threading.RLock:
+        """Return the lock that must be held while reading or changing the cache's records."""
+        return self._lock
+
     @property
     def max_cache_size(self) -> float:
         """Return the cap on cache size."""
@@ -136,10 +154,7 @@ class ModelCache(ModelCacheBase[AnyModel]):
 
     def cache_size(self) -> int:
         """Get the total size of the models currently cached."""
-        total = 0
-        for cache_record in self._cached_models.values():
-            total += cache_record.size
-        return total
+        return self._cache_size
 
     def exists(
         self,
@@ -148,7 +163,8 @@ class ModelCache(ModelCacheBase[AnyModel]):
     ) -> bool:
         """Return true if the model identified by key and submodel_type is in the cache."""
         key = self._make_cache_key(key, submodel_type)
-        return key in self._cached_models
+        with self._lock:
+            return key in self._cached_models
 
     def put(
         self,
@@ -159,12 +175,14 @@ class ModelCache(ModelCacheBase[AnyModel]):
     ) -> None:
         """Store model under key and optional submodel_type."""
         key = self._make_cache_key(key, submodel_type)
-        if key in self._cached_models:
-            return
-        self.make_room(size)
-        cache_record = CacheRecord(key, model, size)
-        self._cached_models[key] = cache_record
-        self._cache_stack.append(key)
+        with self._lock:
+            if key in self._cached_models:
+                return
+            self.make_room(size)
+            cache_record = CacheRecord(key, model, size)
+            self._cached_models[key] = cache_record
+            self._lru[key] = None
+            self._cache_size += size
 
     def get(
         self,
@@ -183,34 +201,98 @@ class ModelCache(ModelCacheBase[AnyModel]):
         This may raise an IndexError if the model is not in the cache.
         """
         key = self._make_cache_key(key, submodel_type)
-        if key in self._cached_models:
-            if self.stats:
-                self.stats.hits += 1
-        else:
+        with self._lock:
+            if key in self._cached_models:
+                if self.stats:
+                    self.stats.hits += 1
+            else:
+                if self.stats:
+                    self.stats.misses += 1
+                raise IndexError(f"The model with key {key} is not in the cache.")
+
+            cache_entry = self._cached_models[key]
+
+            # more stats
             if self.stats:
-                self.stats.misses += 1
-            raise IndexError(f"The model with key {key} is not in the cache.")
-
-        cache_entry = self._cached_models[key]
-
-        # more stats
-        if self.stats:
-            stats_name = stats_name or key
-            self.stats.cache_size = int(self._max_cache_size * GIG)
-            self.stats.high_watermark = max(self.stats.high_watermark, self.cache_size())
-            self.stats.in_cache = len(self._cached_models)
-            self.stats.loaded_model_sizes[stats_name] = max(
-                self.stats.loaded_model_sizes.get(stats_name, 0), cache_entry.size
+                stats_name = stats_name or key
+                self.stats.cache_size = int(self._max_cache_size * GIG)
+                self.stats.high_watermark = max(self.stats.high_watermark, self.cache_size())
+                self.stats.in_cache = len(self._cached_models)
+                self.stats.loaded_model_sizes[stats_name] = max(
+                    self.stats.loaded_model_sizes.get(stats_name, 0), cache_entry.size
+                )
+
+            # this makes the entry the most recently used
+            if key in self._lru:
+                self._lru.move_to_end(key)
+            return ModelLocker(
+                cache=self,
+                cache_entry=cache_entry,
             )
 
-        # this moves the entry to the top (right end) of the stack
-        with suppress(Exception):
-            self._cache_stack.remove(key)
-        self._cache_stack.append(key)
-        return ModelLocker(
-            cache=self,
-            cache_entry=cache_entry,
-        )
+    def load(
+        self,
+        key: str,
+        loader: Callable[[], Tuple[AnyModel, int]],
+        submodel_type: Optional[SubModelType] = None,
+        stats_name: Optional[str] = None,
+    ) -> ModelLockerBase:
+        """
+        Retrieve model using key and optional submodel_type, loading it first if it is not in the cache.
+
+        :param key: Opaque model key
+        :param loader: Loads the model, returning it and its size in bytes
+        :param submodel_type: Type of the submodel to fetch
+        :param stats_name: A human-readable id for the model for the purposes of
+        stats reporting.
+
+        Only one thread loads a given model at a time. Other threads that request it wait for that load. Different
+        models are loaded in parallel - the cache is not locked while a model loads.
+        """
+        cache_key = self._make_cache_key(key, submodel_type)
+        while True:
+            with self._lock:
+                if cache_key in self._cached_models:
+                    return self.get(key, submodel_type, stats_name)
+                future = self._loading.get(cache_key)
+                if future is None:
+                    if self.stats:
+                        self.stats.misses += 1
+                    future = Future()
+                    self._loading[cache_key] = future
+                    break
+            # If the load fails, this raises its exception. If it succeeds, the model is in the cache, unless it has
+            # already been evicted - in which case, this thread loads it again.
+            future.result()
+
+        try:
+            model, size = loader()
+            # Put and get together, so the model can't be evicted before it is returned
+            with self._lock:
+                self.put(key, model, size, submodel_type)
+                locker = self.get(key, submodel_type, stats_name)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[cache_key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[cache_key]
+        future.set_result(None)
+        return locker
+
+    def lock_record(self, cache_entry: CacheRecord[AnyModel]) -> None:
+        """Lock a record, so that its model is not evicted or offloaded while it is in use."""
+        with self._lock:
+            cache_entry.lock()
+            self._lru.pop(cache_entry.key, None)
+
+    def unlock_record(self, cache_entry: CacheRecord[AnyModel]) -> None:
+        """Unlock a record. Once it has no locks, it is the most recently used record that can be evicted."""
+        with self._lock:
+            cache_entry.unlock()
+            if not cache_entry.locked and self._cached_models.get(cache_entry.key) is cache_entry:
+                self._lru[cache_entry.key] = None
 
     def _capture_memory_snapshot(self) -> Optional[MemorySnapshot]:
         if self._log_memory_usage:
@@ -227,19 +309,23 @@ class ModelCache(ModelCacheBase[AnyModel]):
         """Move any unused models from VRAM."""
         reserved = self._max_vram_cache_size * GIG
         vram_in_use = torch.cuda.memory_allocated() + size_required
-        self.logger.debug(f"{(vram_in_use/GIG):.2f}GB VRAM needed for models; max allowed={(reserved/GIG):.2f}GB")
-        for _, cache_entry in sorted(self._cached_models.items(), key=lambda x: x[1].size):
+        self.logger.debug(f"{(vram_in_use / GIG):.2f}GB VRAM needed for models; max allowed={(reserved / GIG):.2f}GB")
+        with self._lock:
+            cache_entries = sorted(self._cached_models.values(), key=lambda x: x.size)
+        # The models are moved without locking the cache
+        for cache_entry in cache_entries:
             if vram_in_use <= reserved:
                 break
-            if not cache_entry.loaded:
-                continue
-            if not cache_entry.locked:
+            with cache_entry.device_lock:
+                # Another thread may have locked the record since, in which case it waits to move the model back
+                if not cache_entry.loaded or cache_entry.locked:
+                    continue
                 self.move_model_to_device(cache_entry, self.storage_device)
                 cache_entry.loaded = False
-                vram_in_use = torch.cuda.memory_allocated() + size_required
-                self.logger.debug(
-                    f"Removing {cache_entry.key} from VRAM to free {(cache_entry.size/GIG):.2f}GB; vram free = {(torch.cuda.memory_allocated()/GIG):.2f}GB"
-                )
+            vram_in_use = torch.cuda.memory_allocated() + size_required
+            self.logger.debug(
+                f"Removing {cache_entry.key} from VRAM to free {(cache_entry.size / GIG):.2f}GB; vram free = {(torch.cuda.memory_allocated() / GIG):.2f}GB"
+            )
 
         TorchDevice.empty_cache()
 
@@ -249,7 +335,7 @@ class ModelCache(ModelCacheBase[AnyModel]):
         :param cache_entry: The CacheRecord for the model
         :param target_device: The torch.device to move the model into
 
-        May raise a torch.cuda.OutOfMemoryError
+        Must be called while holding the record's device_lock. May raise a torch.cuda.OutOfMemoryError
         """
         # These attributes are not in the base ModelMixin class but in various derived classes.
         # Some models don't have these attributes, in which case they run in RAM/CPU.
@@ -276,8 +362,8 @@ class ModelCache(ModelCacheBase[AnyModel]):
         end_model_to_time = time.time()
         self.logger.debug(
             f"Moved model '{cache_entry.key}' from {source_device} to"
-            f" {target_device} in {(end_model_to_time-start_model_to_time):.2f}s."
-            f"Estimated model size: {(cache_entry.size/GIG):.3f} GB."
+            f" {target_device} in {(end_model_to_time - start_model_to_time):.2f}s."
+            f"Estimated model size: {(cache_entry.size / GIG):.3f} GB."
             f"{get_pretty_snapshot_diff(snapshot_before, snapshot_after)}"
         )
 
@@ -300,120 +386,147 @@ class ModelCache(ModelCacheBase[AnyModel]):
                     f"Moving model '{cache_entry.key}' from {source_device} to"
                     f" {target_device} caused an unexpected change in VRAM usage. The model's"
                     " estimated size may be incorrect. Estimated model size:"
-                    f" {(cache_entry.size/GIG):.3f} GB.\n"
+                    f" {(cache_entry.size / GIG):.3f} GB.\n"
                     f"{get_pretty_snapshot_diff(snapshot_before, snapshot_after)}"
                 )
 
     def print_cuda_stats(self) -> None:
         """Log CUDA diagnostics."""
-        vram = "%4.2fG" % (torch.cuda.memory_allocated() / GIG)
-        ram = "%4.2fG" % (self.cache_size() / GIG)
-
-        in_ram_models = 0
-        in_vram_models = 0
-        locked_in_vram_models = 0
-        for cache_record in self._cached_models.values():
-            if hasattr(cache_record.model, "device"):
-                if cache_record.model.device == self.storage_device:
-                    in_ram_models += 1
-                else:
-                    in_vram_models += 1
-                if cache_record.locked:
-                    locked_in_vram_models += 1
+        with self._lock:
+            vram = "%4.2fG" % (torch.cuda.memory_allocated() / GIG)
+            ram = "%4.2fG" % (self.cache_size() / GIG)
+
+            in_ram_models = 0
+            in_vram_models = 0
+            locked_in_vram_models = 0
+            for cache_record in self._cached_models.values():
+                if hasattr(cache_record.model, "device"):
+                    if cache_record.model.device == self.storage_device:
+                        in_ram_models += 1
+                    else:
+                        in_vram_models += 1
+                    if cache_record.locked:
+                        locked_in_vram_models += 1
 
-                self.logger.debug(
-                    f"Current VRAM/RAM usage: {vram}/{ram}; models_in_ram/models_in_vram(locked) ="
-                    f" {in_ram_models}/{in_vram_models}({locked_in_vram_models})"
-                )
+                    self.logger.debug(
+                        f"Current VRAM/RAM usage: {vram}/{ram}; models_in_ram/models_in_vram(locked) ="
+                        f" {in_ram_models}/{in_vram_models}({locked_in_vram_models})"
+                    )
 
     def make_room(self, size: int) -> None:
         """Make enough room in the cache to accommodate a new model of indicated size."""
-        # calculate how much memory this model will require
-        # multiplier = 2 if self.precision==torch.float32 else 1
-        bytes_needed = size
-        maximum_size = self.max_cache_size * GIG  # stored in GB, convert to bytes
-        current_size = self.cache_size()
-
-        if current_size + bytes_needed > maximum_size:
-            self.logger.debug(
-                f"Max cache size exceeded: {(current_size/GIG):.2f}/{self.max_cache_size:.2f} GB, need an additional"
-                f" {(bytes_needed/GIG):.2f} GB"
-            )
-
-        self.logger.debug(f"Before making_room: cached_models={len(self._cached_models)}")
-
-        pos = 0
-        models_cleared = 0
-        while current_size + bytes_needed > maximum_size and pos < len(self._cache_stack):
-            model_key = self._cache_stack[pos]
-            cache_entry = self._cached_models[model_key]
-
-            refs = sys.getrefcount(cache_entry.model)
-
-            # HACK: This is a workaround for a memory-management issue that we haven't tracked down yet. We are directly
-            # going against the advice in the Python docs by using `gc.get_referrers(...)` in this way:
-            # https://docs.python.org/3/library/gc.html#gc.get_referrers
-
-            # manualy clear local variable references of just finished function calls
-            # for some reason python don't want to collect it even by gc.collect() immidiately
-            if refs > 2:
-                while True:
-                    cleared = False
-                    for referrer in gc.get_referrers(cache_entry.model):
-                        if type(referrer).__name__ == "frame":
-                            # RuntimeError: cannot clear an executing frame
-                            with suppress(RuntimeError):
-                                referrer.clear()
-                                cleared = True
-                                # break
-
-                    # repeat if referrers changes(due to frame clear), else exit loop
-                    if cleared:
-                        gc.collect()
-                    else:
-                        break
+        with self._lock:
+            # calculate how much memory this model will require
+            # multiplier = 2 if self.precision==torch.float32 else 1
+            bytes_needed = size
+            maximum_size = self.max_cache_size * GIG  # stored in GB, convert to bytes
 
-            device = cache_entry.model.device if hasattr(cache_entry.model, "device") else None
-            self.logger.debug(
-                f"Model: {model_key}, locks: {cache_entry._locks}, device: {device}, loaded: {cache_entry.loaded},"
-                f" refs: {refs}"
-            )
-
-            # Expected refs:
-            # 1 from cache_entry
-            # 1 from getrefcount function
-            # 1 from onnx runtime object
-            if not cache_entry.locked and refs <= (3 if "onnx" in model_key else 2):
+            if self._cache_size + bytes_needed > maximum_size:
                 self.logger.debug(
-                    f"Removing {model_key} from RAM cache to free at least {(size/GIG):.2f} GB (-{(cache_entry.size/GIG):.2f} GB)"
+                    f"Max cache size exceeded: {(self._cache_size / GIG):.2f}/{self.max_cache_size:.2f} GB, need an"
+                    f" additional {(bytes_needed / GIG):.2f} GB"
                 )
-                current_size -= cache_entry.size
-                models_cleared += 1
-                self._delete_cache_entry(cache_entry)
-                del cache_entry
 
+            self.logger.debug(f"Before making_room: cached_models={len(self._cached_models)}")
+
+            models_cleared = 0
+            bytes_cleared = 0
+            # Records whose models are still referenced outside the cache, least recently used first
+            referenced: List[CacheRecord[AnyModel]] = []
+            while self._cache_size + bytes_needed > maximum_size and self._lru:
+                model_key, _ = self._lru.popitem(last=False)
+                cache_entry = self._cached_models[model_key]
+                if self._is_referenced(cache_entry):
+                    referenced.append(cache_entry)
+                    continue
+                self._evict(cache_entry, size)
+                models_cleared += 1
+                bytes_cleared += cache_entry.size
+
+            # Only if that wasn't enough, try to release the other references to the models
+            for cache_entry in referenced:
+                if self._cache_size + bytes_needed <= maximum_size:
+                    break
+                self._clear_frame_references(cache_entry.model)
+                if not self._is_referenced(cache_entry):
+                    self._evict(cache_entry, size)
+                    models_cleared += 1
+                    bytes_cleared += cache_entry.size
+
+            # The referenced records that weren't evicted go back to where they were, as the least recently used
+            for cache_entry in reversed(referenced):
+                if cache_entry.key in self._cached_models:
+                    self._lru[cache_entry.key] = None
+                    self._lru.move_to_end(cache_entry.key, last=False)
+
+            if models_cleared > 0:
+                if self.stats:
+                    self.stats.cleared = models_cleared
+                # There would likely be some 'garbage' to be collected regardless of whether a model was cleared or
+                # not, but there is a significant time cost to calling `gc.collect()`, so we want to use it sparingly.
+                # (The time cost is high even if no garbage gets collected.)
+                #
+                # Calling gc.collect(...) when a large amount of memory was cleared seems like a good middle-ground:
+                # - If models had to be cleared, it's a signal that we are close to our memory limit.
+                # - If large models were cleared, there's a good chance that there's a significant amount of garbage
+                #   to be collected. Small models, like LoRAs and embeddings, are cleared often and leave little.
+                #
+                # Keep in mind that gc is only responsible for handling reference cycles. Most objects should be
+                # cleaned up immediately when their reference count hits 0.
+                if bytes_cleared >= GC_COLLECT_THRESHOLD:
+                    gc.collect()
+
+            TorchDevice.empty_cache()
+            self.logger.debug(f"After making room: cached_models={len(self._cached_models)}")
+
+    def _is_referenced(self, cache_entry: CacheRecord[AnyModel]) -> bool:
+        """Return true if the record's model is referenced anywhere other than the cache."""
+        refs = sys.getrefcount(cache_entry.model)
+        device = cache_entry.model.device if hasattr(cache_entry.model, "device") else None
+        self.logger.debug(
+            f"Model: {cache_entry.key}, locks: {cache_entry._locks}, device: {device}, loaded: {cache_entry.loaded},"
+            f" refs: {refs}"
+        )
+        # Expected refs:
+        # 1 from cache_entry
+        # 1 from getrefcount function
+        # 1 from onnx runtime object
+        return refs > (3 if "onnx" in cache_entry.key else 2)
+
+    def _clear_frame_references(self, model: AnyModel) -> None:
+        # HACK: This is a workaround for a memory-management issue that we haven't tracked down yet. We are directly
+        # going against the advice in the Python docs by using `gc.get_referrers(...)` in this way:
+        # https://docs.python.org/3/library/gc.html#gc.get_referrers
+
+        # manualy clear local variable references of just finished function calls
+        # for some reason python don't want to collect it even by gc.collect() immidiately
+        while True:
+            cleared = False
+            for referrer in gc.get_referrers(model):
+                if type(referrer).__name__ == "frame":
+                    # RuntimeError: cannot clear an executing frame
+                    with suppress(RuntimeError):
+                        referrer.clear()
+                        cleared = True
+
+            # repeat if referrers changes(due to frame clear), else exit loop
+            if cleared:
+                gc.collect()
             else:
-                pos += 1
-
-        if models_cleared > 0:
-            # There would likely be some 'garbage' to be collected regardless of whether a model was cleared or not, but
-            # there is a significant time cost to calling `gc.collect()`, so we want to use it sparingly. (The time cost
-            # is high even if no garbage gets collected.)
-            #
-            # Calling gc.collect(...) when a model is cleared seems like a good middle-ground:
-            # - If models had to be cleared, it's a signal that we are close to our memory limit.
-            # - If models were cleared, there's a good chance that there's a significant amount of garbage to be
-            #   collected.
-            #
-            # Keep in mind that gc is only responsible for handling reference cycles. Most objects should be cleaned up
-            # immediately when their reference count hits 0.
-            if self.stats:
-                self.stats.cleared = models_cleared
-            gc.collect()
+                break
 
-        TorchDevice.empty_cache()
-        self.logger.debug(f"After making room: cached_models={len(self._cached_models)}")
+    def _evict(self, cache_entry: CacheRecord[AnyModel], size: int) -> None:
+        self.logger.debug(
+            f"Removing {cache_entry.key} from RAM cache to free at least {(size / GIG):.2f} GB"
+            f" (-{(cache_entry.size / GIG):.2f} GB)"
+        )
+        self._delete_cache_entry(cache_entry)
 
     def _delete_cache_entry(self, cache_entry: CacheRecord[AnyModel]) -> None:
-        self._cache_stack.remove(cache_entry.key)
-        del self._cached_models[cache_entry.key]
+        with self._lock:
+            # A model that failed to move may have been evicted meanwhile
+            if self._cached_models.get(cache_entry.key) is not cache_entry:
+                return
+            self._lru.pop(cache_entry.key, None)
+            del self._cached_models[cache_entry.key]
+            self._cache_size -= cache_entry.size
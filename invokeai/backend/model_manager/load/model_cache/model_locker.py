@@ -33,22 +33,28 @@ class ModelLocker(ModelLockerBase):
             return self.model
 
         # NOTE that the model has to have the to() method in order for this code to move it into GPU!
-        self._cache_entry.lock()
+        # The locked record can't be evicted or offloaded. The cache isn't locked while models are moved, so that other
+        # threads can use it meanwhile. Another thread may have locked and patched the model, so wait until it unlocks it.
+        self._cache_entry.use_lock.acquire()
+        self._cache.lock_record(self._cache_entry)
         try:
             if self._cache.lazy_offloading:
                 self._cache.offload_unlocked_models(self._cache_entry.size)
 
-            self._cache.move_model_to_device(self._cache_entry, self._cache.execution_device)
-            self._cache_entry.loaded = True
+            with self._cache_entry.device_lock:
+                self._cache.move_model_to_device(self._cache_entry, self._cache.execution_device)
+                self._cache_entry.loaded = True
 
             self._cache.logger.debug(f"Locking {self._cache_entry.key} in {self._cache.execution_device}")
             self._cache.print_cuda_stats()
         except torch.cuda.OutOfMemoryError:
             self._cache.logger.warning("Insufficient GPU memory to load model. Aborting")
-            self._cache_entry.unlock()
+            self._cache.unlock_record(self._cache_entry)
+            self._cache_entry.use_lock.release()
             raise
         except Exception:
-            self._cache_entry.unlock()
+            self._cache.unlock_record(self._cache_entry)
+            self._cache_entry.use_lock.release()
             raise
 
         return self.model
@@ -58,7 +64,10 @@ class ModelLocker(ModelLockerBase):
         if not hasattr(self.model, "to"):
             return
 
-        self._cache_entry.unlock()
-        if not self._cache.lazy_offloading:
-            self._cache.offload_unlocked_models(self._cache_entry.size)
-            self._cache.print_cuda_stats()
+        try:
+            self._cache.unlock_record(self._cache_entry)
+            if not self._cache.lazy_offloading:
+                self._cache.offload_unlocked_models(self._cache_entry.size)
+                self._cache.print_cuda_stats()
+        finally:
+            self._cache_entry.use_lock.release()
@@ -5,6 +5,7 @@ import sys
 from pathlib import Path
 from typing import Any, Optional
 
+import torch
 from diffusers.configuration_utils import ConfigMixin
 from diffusers.models.modeling_utils import ModelMixin
 
@@ -38,17 +39,29 @@ class GenericDiffusersLoader(ModelLoader):
             raise Exception(f"There are no submodels in models of type {model_class}")
         repo_variant = config.repo_variant if isinstance(config, DiffusersConfigBase) else None
         variant = repo_variant.value if repo_variant else None
+        kwargs = self._from_pretrained_kwargs(model_class)
         try:
-            result: AnyModel = model_class.from_pretrained(model_path, torch_dtype=self._torch_dtype, variant=variant)
+            result: AnyModel = model_class.from_pretrained(
+                model_path, torch_dtype=self._torch_dtype, variant=variant, **kwargs
+            )
         except OSError as e:
             if variant and "no file named" in str(
                 e
             ):  # try without the variant, just in case user's preferences changed
-                result = model_class.from_pretrained(model_path, torch_dtype=self._torch_dtype)
+                result = model_class.from_pretrained(model_path, torch_dtype=self._torch_dtype, **kwargs)
             else:
                 raise e
         return result
 
+    def _from_pretrained_kwargs(self, load_class: Any) -> dict[str, Any]:
+        """Get the extra arguments for the load class's from_pretrained()."""
+        if not issubclass(load_class, torch.nn.Module):
+            return {}
+        # Models are created without weights, which are then set to the tensors read from the (memory-mapped)
+        # safetensors files rather than copied from them, unless they are converted to another dtype. diffusers does
+        # this by default, transformers does not.
+        return {"low_cpu_mem_usage": True}
+
     # TO DO: Add exception handling
     def get_hf_load_class(self, model_path: Path, submodel_type: Optional[SubModelType] = None) -> ModelMixin:
         """Given the model path and submodel, returns the diffusers ModelMixin subclass needed to load."""
@@ -55,17 +55,19 @@ class StableDiffusionDiffusersModel(GenericDiffusersLoader):
         repo_variant = config.repo_variant if isinstance(config, DiffusersConfigBase) else None
         variant = repo_variant.value if repo_variant else None
         model_path = model_path / submodel_type.value
+        kwargs = self._from_pretrained_kwargs(load_class)
         try:
             result: AnyModel = load_class.from_pretrained(
                 model_path,
                 torch_dtype=self._torch_dtype,
                 variant=variant,
+                **kwargs,
             )
         except OSError as e:
             if variant and "no file named" in str(
                 e
             ):  # try without the variant, just in case user's preferences changed
-                result = load_class.from_pretrained(model_path, torch_dtype=self._torch_dtype)
+                result = load_class.from_pretrained(model_path, torch_dtype=self._torch_dtype, **kwargs)
             else:
                 raise e
 
@@ -4,9 +4,7 @@
 from pathlib import Path
 from typing import Optional
 
-import torch
 from omegaconf import DictConfig, OmegaConf
-from safetensors.torch import load_file as safetensors_load_file
 
 from invokeai.backend.model_manager import (
     AnyModelConfig,
@@ -16,6 +14,7 @@ from invokeai.backend.model_manager import (
 )
 from invokeai.backend.model_manager.config import AnyModel, CheckpointConfigBase
 from invokeai.backend.model_manager.convert_ckpt_to_diffusers import convert_ldm_vae_to_diffusers
+from invokeai.backend.model_manager.util.model_util import read_checkpoint
 
 from .. import ModelLoaderRegistry
 from .generic_diffusers import GenericDiffusersLoader
@@ -47,10 +46,7 @@ class VAELoader(GenericDiffusersLoader):
             assert isinstance(config, CheckpointConfigBase)
             config_file = self._app_config.legacy_conf_path / config.config_path
 
-        if model_path.suffix == ".safetensors":
-            checkpoint = safetensors_load_file(model_path, device="cpu")
-        else:
-            checkpoint = torch.load(model_path, map_location="cpu")
+        checkpoint = read_checkpoint(model_path)
 
         # sometimes weights are hidden under "state_dict", and sometimes not
         if "state_dict" in checkpoint:
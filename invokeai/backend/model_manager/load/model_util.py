@@ -10,6 +10,7 @@ from diffusers import DiffusionPipeline
 
 from invokeai.backend.model_manager.config import AnyModel
 from invokeai.backend.onnx.onnx_runtime import IAIOnnxRuntimeModel
+from invokeai.backend.raw_model import RawModel
 
 
 def calc_model_size_by_data(model: AnyModel) -> int:
@@ -20,6 +21,8 @@ def calc_model_size_by_data(model: AnyModel) -> int:
         return _calc_model_by_data(model)
     elif isinstance(model, IAIOnnxRuntimeModel):
         return _calc_onnx_model_by_data(model)
+    elif isinstance(model, RawModel):
+        return model.calc_size()
     else:
         return 0
 
@@ -2,7 +2,7 @@
 
 import json
 from pathlib import Path
-from typing import Dict, Optional, Union
+from typing import Dict, Optional, Union, cast
 
 import safetensors
 import torch
@@ -41,6 +41,25 @@ def _fast_safetensors_reader(path: str) -> Dict[str, torch.Tensor]:
     return checkpoint
 
 
+def read_checkpoint(path: Union[str, Path]) -> Dict[str, torch.Tensor]:
+    """Read a safetensors or pickle checkpoint into CPU tensors.
+
+    The tensors are backed by the file's pages in the OS page cache instead of copies in process memory. Pages are read
+    from disk when first accessed, and are shared by every process that maps the same file. Writing to a tensor copies
+    only the pages that are written. Pickle files in the legacy format are copied.
+
+    :param path: Path to a .safetensors, .ckpt, .pt or .bin file
+    """
+    path = Path(path)
+    if path.suffix == ".safetensors":
+        return safetensors.torch.load_file(path, device="cpu")
+    try:
+        return cast(Dict[str, torch.Tensor], torch.load(str(path), map_location="cpu", mmap=True))
+    except RuntimeError:
+        # Only files saved in the zipfile format, which torch.save() has used since torch 1.6, can be mapped
+        return cast(Dict[str, torch.Tensor], torch.load(path, map_location="cpu"))
+
+
 def read_checkpoint_meta(path: Union[str, Path], scan: bool = False) -> Dict[str, torch.Tensor]:
     if str(path).endswith(".safetensors"):
         try:
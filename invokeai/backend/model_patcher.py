@@ -4,6 +4,8 @@
 from __future__ import annotations
 
 import pickle
+import threading
+import weakref
 from contextlib import contextmanager
 from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
@@ -17,7 +19,7 @@ from invokeai.backend.model_manager import AnyModel
 from invokeai.backend.model_manager.load.optimizations import skip_torch_weight_init
 from invokeai.backend.onnx.onnx_runtime import IAIOnnxRuntimeModel
 
-from .lora import LoRAModelRaw
+from .lora import AnyLoRALayer, LoRAModelRaw
 from .textual_inversion import TextualInversionManager, TextualInversionModelRaw
 
 """
@@ -31,9 +33,22 @@ with LoRAHelper.apply_lora_unet(unet, loras):
 
 """
 
+# The maximum size of the LoRA layers that are moved to a model's device together while patching it
+LORA_TRANSFER_BATCH_SIZE = 256 * 2**20
+
+# Batches of the modules that a LoRA patches, and the LoRA layers that patch them
+LoRAPatchPlan = List[List[Tuple[str, torch.nn.Module, AnyLoRALayer]]]
+
 
 # TODO: rename smth like ModelPatcher and add TI method?
 class ModelPatcher:
+    # The patch plans for each model, LoRA and prefix
+    _lora_patch_plans: weakref.WeakKeyDictionary[
+        torch.nn.Module, weakref.WeakKeyDictionary[LoRAModelRaw, Dict[str, LoRAPatchPlan]]
+    ] = weakref.WeakKeyDictionary()
+    # Models are patched by several session processor workers, so plans are looked up and made under a lock
+    _lora_patch_plans_lock = threading.Lock()
+
     @staticmethod
     def _resolve_lora_key(model: torch.nn.Module, lora_key: str, prefix: str) -> Tuple[str, torch.nn.Module]:
         assert "." not in lora_key
@@ -113,48 +128,42 @@ class ModelPatcher:
             with torch.no_grad():
                 for lora, lora_weight in loras:
                     # assert lora.device.type == "cpu"
-                    for layer_key, layer in lora.layers.items():
-                        if not layer_key.startswith(prefix):
-                            continue
-
-                        # TODO(ryand): A non-negligible amount of time is currently spent resolving LoRA keys. This
-                        # should be improved in the following ways:
-                        # 1. The key mapping could be more-efficiently pre-computed. This would save time every time a
-                        #    LoRA model is applied.
-                        # 2. From an API perspective, there's no reason that the `ModelPatcher` should be aware of the
-                        #    intricacies of Stable Diffusion key resolution. It should just expect the input LoRA
-                        #    weights to have valid keys.
-                        assert isinstance(model, torch.nn.Module)
-                        module_key, module = cls._resolve_lora_key(model, layer_key, prefix)
-
+                    assert isinstance(model, torch.nn.Module)
+                    for batch in cls._get_lora_patch_plan(model, lora, prefix):
                         # All of the LoRA weight calculations will be done on the same device as the module weight.
-                        # (Performance will be best if this is a CUDA device.)
-                        device = module.weight.device
-                        dtype = module.weight.dtype
-
-                        if module_key not in original_weights:
-                            original_weights[module_key] = module.weight.detach().to(device="cpu", copy=True)
-
-                        layer_scale = layer.alpha / layer.rank if (layer.alpha and layer.rank) else 1.0
-
-                        # We intentionally move to the target device first, then cast. Experimentally, this was found to
-                        # be significantly faster for 16-bit CPU tensors being moved to a CUDA device than doing the
-                        # same thing in a single call to '.to(...)'.
-                        layer.to(device=device)
-                        layer.to(dtype=torch.float32)
-                        # TODO(ryand): Using torch.autocast(...) over explicit casting may offer a speed benefit on CUDA
-                        # devices here. Experimentally, it was found to be very slow on CPU. More investigation needed.
-                        layer_weight = layer.get_weight(module.weight) * (lora_weight * layer_scale)
-                        layer.to(device=torch.device("cpu"))
-
-                        assert isinstance(layer_weight, torch.Tensor)  # mypy thinks layer_weight is a float|Any ??!
-                        if module.weight.shape != layer_weight.shape:
-                            # TODO: debug on lycoris
-                            assert hasattr(layer_weight, "reshape")
-                            layer_weight = layer_weight.reshape(module.weight.shape)
-
-                        assert isinstance(layer_weight, torch.Tensor)  # mypy thinks layer_weight is a float|Any ??!
-                        module.weight += layer_weight.to(dtype=dtype)
+                        # (Performance will be best if this is a CUDA device.) The batch's layers are moved to the
+                        # device before any weights are calculated, and back after, so that the transfers aren't
+                        # interleaved with the calculations.
+                        for _, module, layer in batch:
+                            # We intentionally move to the target device first, then cast. Experimentally, this was
+                            # found to be significantly faster for 16-bit CPU tensors being moved to a CUDA device than
+                            # doing the same thing in a single call to '.to(...)'.
+                            layer.to(device=module.weight.device)
+                            layer.to(dtype=torch.float32)
+
+                        for module_key, module, layer in batch:
+                            if module_key not in original_weights:
+                                original_weights[module_key] = module.weight.detach().to(device="cpu", copy=True)
+
+                            layer_scale = layer.alpha / layer.rank if (layer.alpha and layer.rank) else 1.0
+
+                            # TODO(ryand): Using torch.autocast(...) over explicit casting may offer a speed benefit on
+                            # CUDA devices here. Experimentally, it was found to be very slow on CPU. More investigation
+                            # needed.
+                            layer_weight = layer.get_weight(module.weight)
+
+                            assert isinstance(layer_weight, torch.Tensor)  # mypy thinks layer_weight is a float|Any ??!
+                            if module.weight.shape != layer_weight.shape:
+                                # TODO: debug on lycoris
+                                assert hasattr(layer_weight, "reshape")
+                                layer_weight = layer_weight.reshape(module.weight.shape)
+
+                            # The float32 layer weight is scaled and cast to the module's dtype as it is added, without
+                            # intermediate tensors
+                            module.weight.add_(layer_weight, alpha=lora_weight * layer_scale)
+
+                        for _, _, layer in batch:
+                            layer.to(device=torch.device("cpu"))
 
             yield  # wait for context manager exit
 
@@ -164,6 +173,42 @@ class ModelPatcher:
                 for module_key, weight in original_weights.items():
                     model.get_submodule(module_key).weight.copy_(weight)
 
+    @classmethod
+    def _get_lora_patch_plan(cls, model: torch.nn.Module, lora: LoRAModelRaw, prefix: str) -> LoRAPatchPlan:
+        """Get the modules that a LoRA's layers with the given prefix patch, in batches of layers to move to the
+        model's device together.
+
+        Plans are cached for as long as both the model and the LoRA exist, so the LoRA's keys are only resolved the
+        first time it is applied to the model.
+        """
+        with cls._lora_patch_plans_lock:
+            lora_plans = cls._lora_patch_plans.setdefault(model, weakref.WeakKeyDictionary())
+            plans = lora_plans.setdefault(lora, {})
+            if prefix in plans:
+                return plans[prefix]
+
+            # TODO(ryand): From an API perspective, there's no reason that the `ModelPatcher` should be aware of the
+            # intricacies of Stable Diffusion key resolution. It should just expect the input LoRA weights to have valid
+            # keys.
+            plan: LoRAPatchPlan = []
+            batch: List[Tuple[str, torch.nn.Module, AnyLoRALayer]] = []
+            batch_size = 0
+            for layer_key, layer in lora.layers.items():
+                if not layer_key.startswith(prefix):
+                    continue
+                module_key, module = cls._resolve_lora_key(model, layer_key, prefix)
+                layer_size = layer.calc_size()
+                if batch and batch_size + layer_size > LORA_TRANSFER_BATCH_SIZE:
+                    plan.append(batch)
+                    batch, batch_size = [], 0
+                batch.append((module_key, module, layer))
+                batch_size += layer_size
+            if batch:
+                plan.append(batch)
+
+            plans[prefix] = plan
+            return plan
+
     @classmethod
     @contextmanager
     def apply_ti(
@@ -13,3 +13,7 @@ that adds additional methods and attributes.
 
 class RawModel:
     """Base class for 'Raw' model wrappers."""
+
+    def calc_size(self) -> int:
+        """Get the size of the model's tensors in memory in bytes."""
+        return 0
@@ -5,7 +5,6 @@ from typing import Dict, List, Optional, Union
 
 import torch
 from compel.embeddings_provider import BaseTextualInversionManager
-from safetensors.torch import load_file
 from transformers import CLIPTokenizer
 from typing_extensions import Self
 
@@ -28,10 +27,10 @@ class TextualInversionModelRaw(RawModel):
 
         result = cls()  # TODO:
 
-        if file_path.suffix == ".safetensors":
-            state_dict = load_file(file_path.absolute().as_posix(), device="cpu")
-        else:
-            state_dict = torch.load(file_path, map_location="cpu")
+        # workaround for circular import
+        from invokeai.backend.model_manager.util.model_util import read_checkpoint
+
+        state_dict = read_checkpoint(file_path)
 
         # both v1 and v2 format embeddings
         # difference mostly in metadata
@@ -65,6 +64,9 @@ class TextualInversionModelRaw(RawModel):
 
         return result
 
+    def calc_size(self) -> int:
+        return sum(t.nelement() * t.element_size() for t in [self.embedding, self.embedding_2] if t is not None)
+
 
 # no type hints for BaseTextualInversionManager?
 class TextualInversionManager(BaseTextualInversionManager):  # type: ignore
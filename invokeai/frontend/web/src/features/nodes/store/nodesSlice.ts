@@ -764,7 +764,8 @@ export const nodesSlice = createSlice({
       if (node) {
         node.status = zNodeStatus.enum.IN_PROGRESS;
         node.progress = (step + 1) / total_steps;
-        node.progressImage = progress_image ?? null;
+        // Progress images may be skipped for some steps - keep showing the last one
+        node.progressImage = progress_image ?? node.progressImage;
       }
     });
     builder.addCase(socketQueueItemStatusChanged, (state, action) => {
@@ -124,7 +124,8 @@ export const systemSlice = createSlice({
         total_steps,
         order,
         percentage: calculateStepPercentage(step, total_steps, order),
-        progress_image,
+        // Progress images may be skipped for some steps - keep showing the last one
+        progress_image: progress_image ?? state.denoiseProgress?.progress_image,
         session_id,
         batch_id,
       };
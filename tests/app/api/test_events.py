@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi_events import handler_store
+from fastapi_events.handlers.base import BaseEventHandler
+from fastapi_events.typing import Event
+
+from invokeai.app.api.events import FastAPIEventService
+
+
+class RecordingHandler(BaseEventHandler):
+    """Stands in for the socket handler, recording each event's `enqueued` count and when it arrived"""
+
+    def __init__(self) -> None:
+        self.received: list[tuple[int, float]] = []
+
+    async def handle(self, event: Event) -> None:
+        self.received.append((event[1]["data"]["enqueued"], time.perf_counter()))
+
+
+async def wait_for(handler: RecordingHandler, count: int, timeout: float = 10) -> None:
+    deadline = time.perf_counter() + timeout
+    while len(handler.received) < count:
+        assert time.perf_counter() < deadline, "timed out waiting for events"
+        await asyncio.sleep(0.001)
+
+
+def run_with_service(test) -> RecordingHandler:
+    """Runs an async test with an event service whose only handler is a `RecordingHandler`"""
+    handler = RecordingHandler()
+
+    async def main() -> None:
+        events = FastAPIEventService(id(handler))
+        handler_store[id(handler)] = [handler]
+        try:
+            await test(events, handler)
+        finally:
+            events.stop()
+            del handler_store[id(handler)]
+
+    asyncio.run(main())
+    return handler
+
+
+def test_events_from_other_threads_are_dispatched_in_order():
+    async def test(events: FastAPIEventService, handler: RecordingHandler) -> None:
+        def emit() -> None:
+            for i in range(1000):
+                events.emit_batch_enqueue_progress("default", "batch", i, 1000)
+
+        thread = threading.Thread(target=emit)
+        thread.start()
+        await wait_for(handler, 1000)
+        thread.join()
+
+    handler = run_with_service(test)
+    assert [enqueued for enqueued, _ in handler.received] == list(range(1000))
+
+
+def test_events_from_the_event_loop_are_dispatched():
+    async def test(events: FastAPIEventService, handler: RecordingHandler) -> None:
+        events.emit_batch_enqueue_progress("default", "batch", 0, 1)
+        await wait_for(handler, 1)
+
+    assert len(run_with_service(test).received) == 1
+
+
+@pytest.mark.slow
+def test_dispatch_latency_benchmark():
+    count = 500
+    emitted: list[float] = []
+
+    async def test(events: FastAPIEventService, handler: RecordingHandler) -> None:
+        def emit() -> None:
+            # Single events, as progress arrives between steps, then a burst
+            for i in range(count):
+                emitted.append(time.perf_counter())
+                events.emit_batch_enqueue_progress("default", "batch", i, count)
+                if i < count // 2:
+                    time.sleep(0.005)
+
+        thread = threading.Thread(target=emit)
+        thread.start()
+        await wait_for(handler, count, timeout=60)
+        thread.join()
+
+    handler = run_with_service(test)
+    latencies: dict[str, list[float]] = {"steady": [], "burst": []}
+    for i, received in handler.received:
+        latencies["steady" if i < count // 2 else "burst"].append((received - emitted[i]) * 1000)
+    buckets = [0.1, 0.5, 1, 5, 10, 50, 100, float("inf")]
+    for name, timings in latencies.items():
+        timings.sort()
+        n = len(timings)
+        print(
+            f"\n{name} emit to handler latency over {n} events: "
+            f"p50={timings[n // 2]:.3f}ms p99={timings[int(n * 0.99)]:.3f}ms max={timings[-1]:.3f}ms"
+        )
+        lower = 0.0
+        for bucket in buckets:
+            print(f"  {lower}-{bucket}ms: {sum(1 for t in timings if lower < t <= bucket)}")
+            lower = bucket
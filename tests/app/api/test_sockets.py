@@ -0,0 +1,165 @@
+import asyncio
+import random
+import time
+from typing import Any
+
+import pytest
+from engineio.async_socket import AsyncSocket
+from engineio.packet import MESSAGE, Packet
+from socketio import AsyncServer
+
+from invokeai.app.api.sockets import SocketOutbox, wait_for_socket_queue
+
+
+class SlowSubscriber:
+    """Records the events it receives, taking `delay` seconds to receive each one"""
+
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.received: list[tuple[str, Any]] = []
+        self.outbox = SocketOutbox(self.send, max_size=8)
+
+    async def send(self, event: str, data: Any) -> None:
+        self.received.append((event, data))
+        await asyncio.sleep(self.delay)
+
+
+def progress(queue_item_id: int, step: int) -> dict[str, Any]:
+    return {"queue_item_id": queue_item_id, "step": step}
+
+
+def test_pending_progress_is_superseded():
+    async def main() -> SlowSubscriber:
+        subscriber = SlowSubscriber(delay=0.01)
+        subscriber.outbox.put("generator_progress", progress(1, 0))
+        await asyncio.sleep(0)
+        # The rest wait while the subscriber receives the first
+        for step in range(1, 5):
+            subscriber.outbox.put("generator_progress", progress(1, step))
+        subscriber.outbox.put("generator_progress", progress(2, 0))
+        subscriber.outbox.put("invocation_complete", {"queue_item_id": 1})
+        subscriber.outbox.put("generator_progress", progress(1, 5))
+        await asyncio.sleep(0.1)
+        subscriber.outbox.close()
+        return subscriber
+
+    subscriber = asyncio.run(main())
+    assert subscriber.received == [
+        ("generator_progress", progress(1, 0)),
+        ("generator_progress", progress(2, 0)),
+        ("invocation_complete", {"queue_item_id": 1}),
+        ("generator_progress", progress(1, 5)),
+    ]
+    assert subscriber.outbox.dropped == 4
+
+
+def test_limit_drops_oldest_progress_but_not_other_events():
+    async def main() -> SlowSubscriber:
+        subscriber = SlowSubscriber(delay=0.01)
+        for queue_item_id in range(20):
+            subscriber.outbox.put("generator_progress", progress(queue_item_id, 0))
+            if queue_item_id == 0:
+                await asyncio.sleep(0)
+            subscriber.outbox.put("invocation_complete", {"queue_item_id": queue_item_id})
+        assert subscriber.outbox.pending == 20
+        await asyncio.sleep(0.5)
+        subscriber.outbox.close()
+        return subscriber
+
+    subscriber = asyncio.run(main())
+    completed = [data["queue_item_id"] for event, data in subscriber.received if event == "invocation_complete"]
+    assert completed == list(range(20))
+    # Only the first progress event was sent before the outbox filled with events that can't be dropped
+    assert [e for e, _ in subscriber.received].count("generator_progress") == 1
+
+
+def test_failed_send_does_not_stop_the_outbox():
+    class FlakySubscriber(SlowSubscriber):
+        async def send(self, event: str, data: Any) -> None:
+            if data["queue_item_id"] == 0:
+                raise ConnectionError("connection reset")
+            await super().send(event, data)
+
+    async def main() -> SlowSubscriber:
+        subscriber = FlakySubscriber()
+        for queue_item_id in range(3):
+            subscriber.outbox.put("invocation_complete", {"queue_item_id": queue_item_id})
+        await asyncio.sleep(0.1)
+        subscriber.outbox.close()
+        return subscriber
+
+    subscriber = asyncio.run(main())
+    assert subscriber.received == [("invocation_complete", {"queue_item_id": i}) for i in (1, 2)]
+
+
+def test_wait_for_socket_queue_waits_for_the_connection_to_take_its_packets():
+    # This relies on python-engineio's internals, which this checks against the installed version
+    async def main() -> None:
+        sio = AsyncServer(async_mode="asgi")
+        socket = AsyncSocket(sio.eio, "eio_sid")
+        sio.eio.sockets["eio_sid"] = socket
+        await socket.send(Packet(MESSAGE, "event"))
+        wait = asyncio.create_task(wait_for_socket_queue(sio, "eio_sid"))
+        await asyncio.sleep(0.05)
+        assert not wait.done()
+        # The client polls, taking the packet
+        assert len(await socket.poll()) == 1
+        await asyncio.wait_for(wait, timeout=1)
+
+    asyncio.run(main())
+
+
+def test_wait_for_socket_queue_does_not_wait_without_a_socket():
+    async def main() -> None:
+        sio = AsyncServer(async_mode="asgi")
+        await asyncio.wait_for(wait_for_socket_queue(sio, "unknown"), timeout=1)
+        await asyncio.wait_for(wait_for_socket_queue(sio, None), timeout=1)
+
+    asyncio.run(main())
+
+
+@pytest.mark.slow
+def test_slow_subscribers_load():
+    subscriber_count = 50
+    queue_items = 4
+    steps = 50
+    image_size = 100_000
+
+    async def main() -> tuple[list[SlowSubscriber], int, float]:
+        random.seed(0)
+        # From subscribers that keep up to ones that can only take a few events a second
+        subscribers = [SlowSubscriber(delay=random.choice([0, 0.005, 0.05, 0.2])) for _ in range(subscriber_count)]
+        peak_pending = 0
+        start = time.perf_counter()
+        for queue_item_id in range(queue_items):
+            for step in range(steps):
+                for subscriber in subscribers:
+                    subscriber.outbox.put(
+                        "generator_progress", {**progress(queue_item_id, step), "image": "x" * image_size}
+                    )
+                peak_pending = max(peak_pending, max(s.outbox.pending for s in subscribers))
+                await asyncio.sleep(0.01)
+            for subscriber in subscribers:
+                subscriber.outbox.put("invocation_complete", {"queue_item_id": queue_item_id})
+        while any(s.outbox.pending for s in subscribers):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        for subscriber in subscribers:
+            subscriber.outbox.close()
+        return subscribers, peak_pending, elapsed
+
+    subscribers, peak_pending, elapsed = asyncio.run(main())
+    for subscriber in subscribers:
+        completed = [data["queue_item_id"] for event, data in subscriber.received if event == "invocation_complete"]
+        assert completed == list(range(queue_items))
+
+    print(
+        f"\n{subscriber_count} subscribers, {queue_items * steps} progress events of {image_size // 1000}KB: "
+        f"drained in {elapsed:.2f}s, peak pending per subscriber={peak_pending} "
+        f"({peak_pending * image_size / 1e6:.1f}MB, unbounded would be up to "
+        f"{queue_items * steps * image_size / 1e6:.1f}MB)"
+    )
+    for delay in sorted({s.delay for s in subscribers}):
+        group = [s for s in subscribers if s.delay == delay]
+        received = sum(1 for s in group for e, _ in s.received if e == "generator_progress") / len(group)
+        print(f"  {delay * 1000:.0f}ms per event: {received:.0f} progress events received, all terminal events")
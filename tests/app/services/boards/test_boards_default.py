@@ -0,0 +1,137 @@
+import logging
+import time
+from typing import Optional
+
+import pytest
+
+from invokeai.app.services.board_image_records.board_image_records_sqlite import SqliteBoardImageRecordStorage
+from invokeai.app.services.board_records.board_records_sqlite import SqliteBoardRecordStorage
+from invokeai.app.services.boards.boards_common import BoardDTO, board_record_to_dto
+from invokeai.app.services.boards.boards_default import BoardService
+from invokeai.app.services.image_records.image_records_common import ImageCategory, ImageRecordChanges, ResourceOrigin
+from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+@pytest.fixture
+def db(mock_services: InvocationServices) -> SqliteDatabase:
+    return create_mock_sqlite_database(mock_services.configuration, logging.getLogger())
+
+
+@pytest.fixture
+def boards(mock_services: InvocationServices, db: SqliteDatabase) -> BoardService:
+    mock_services.board_records = SqliteBoardRecordStorage(db=db)
+    mock_services.board_image_records = SqliteBoardImageRecordStorage(db=db)
+    mock_services.image_records = SqliteImageRecordStorage(db=db)
+    mock_services.boards = BoardService()
+    Invoker(services=mock_services)
+    return mock_services.boards
+
+
+def add_images(db: SqliteDatabase, board_id: str, count: int, starred: bool = False) -> list[str]:
+    image_names = [f"{board_id}_{i}_{starred}.png" for i in range(count)]
+    with db.lock:
+        for image_name in image_names:
+            # Images are created in order, so the last is the most recent
+            db.conn.execute(
+                """--sql
+                INSERT INTO images (image_name, image_origin, image_category, width, height, starred, has_workflow)
+                VALUES (?, ?, ?, 512, 512, ?, FALSE);
+                """,
+                (image_name, ResourceOrigin.INTERNAL.value, ImageCategory.GENERAL.value, starred),
+            )
+            db.conn.execute("INSERT INTO board_images (board_id, image_name) VALUES (?, ?);", (board_id, image_name))
+            time.sleep(0.001)
+        db.conn.commit()
+    return image_names
+
+
+def test_get_many(mock_services: InvocationServices, boards: BoardService, db: SqliteDatabase):
+    board_ids = [boards.create(f"Board {i}").board_id for i in range(3)]
+    image_names = add_images(db, board_ids[0], 3)
+    starred_image_names = add_images(db, board_ids[1], 1, starred=True)
+    add_images(db, board_ids[1], 2)
+
+    result = boards.get_many(offset=0, limit=2)
+    # The total is the number of boards, not the size of the page
+    assert result.total == 3
+    assert len(result.items) == 2
+    dtos = {dto.board_id: dto for dto in boards.get_all()}
+    assert (dtos[board_ids[0]].image_count, dtos[board_ids[0]].cover_image_name) == (3, image_names[-1])
+    # Starred images are preferred as the cover image
+    assert (dtos[board_ids[1]].image_count, dtos[board_ids[1]].cover_image_name) == (3, starred_image_names[0])
+    assert (dtos[board_ids[2]].image_count, dtos[board_ids[2]].cover_image_name) == (0, None)
+    assert boards.get_dto(board_ids[0]) == dtos[board_ids[0]]
+
+
+def test_summaries_follow_image_changes(mock_services: InvocationServices, boards: BoardService, db: SqliteDatabase):
+    board_ids = [boards.create(f"Board {i}").board_id for i in range(2)]
+    image_names = add_images(db, board_ids[0], 3)
+
+    def summary(board_id: str) -> tuple[int, Optional[str]]:
+        dto = boards.get_dto(board_id)
+        return dto.image_count, dto.cover_image_name
+
+    # Moving the cover image to another board
+    mock_services.board_image_records.add_image_to_board(board_ids[1], image_names[2])
+    assert summary(board_ids[0]) == (2, image_names[1])
+    assert summary(board_ids[1]) == (1, image_names[2])
+    # Starring and unstarring an image
+    mock_services.image_records.update(image_names[0], ImageRecordChanges(starred=True))
+    assert summary(board_ids[0]) == (2, image_names[0])
+    mock_services.image_records.update(image_names[0], ImageRecordChanges(starred=False))
+    assert summary(board_ids[0]) == (2, image_names[1])
+    # Removing an image from its board, and deleting an image
+    mock_services.board_image_records.remove_image_from_board(image_names[1])
+    assert summary(board_ids[0]) == (1, image_names[0])
+    mock_services.image_records.delete(image_names[0])
+    assert summary(board_ids[0]) == (0, None)
+
+
+@pytest.mark.slow
+def test_get_many_benchmark(mock_services: InvocationServices, boards: BoardService, db: SqliteDatabase):
+    board_count, image_count = 100, 2000
+    board_ids = [boards.create(f"Board {i}").board_id for i in range(board_count)]
+    with db.lock:
+        # Each image has a distinct creation time, so there is a single most recent image in each board
+        db.conn.executemany(
+            """--sql
+            INSERT INTO images (image_name, image_origin, image_category, width, height, has_workflow, created_at)
+            VALUES (?, ?, ?, 512, 512, FALSE, DATETIME('2024-01-01', ? || ' seconds'));
+            """,
+            [
+                (f"{board_id}_{i}.png", ResourceOrigin.INTERNAL.value, ImageCategory.GENERAL.value, i)
+                for board_id in board_ids
+                for i in range(image_count)
+            ],
+        )
+        db.conn.executemany(
+            "INSERT INTO board_images (board_id, image_name) VALUES (?, ?);",
+            [(board_id, f"{board_id}_{i}.png") for board_id in board_ids for i in range(image_count)],
+        )
+        db.conn.commit()
+
+    def legacy_get_many() -> list[BoardDTO]:
+        # One query for the cover image and one for the image count of each board
+        board_dtos = []
+        for r in mock_services.board_records.get_many(0, board_count).items:
+            cover_image = mock_services.image_records.get_most_recent_image_for_board(r.board_id)
+            image_count = mock_services.board_image_records.get_image_count_for_board(r.board_id)
+            board_dtos.append(board_record_to_dto(r, cover_image.image_name if cover_image else None, image_count))
+        return board_dtos
+
+    for name, get_many in [("legacy", legacy_get_many), ("current", lambda: boards.get_many(0, board_count).items)]:
+        timings: list[float] = []
+        for _ in range(10):
+            start = time.perf_counter()
+            board_dtos = get_many()
+            timings.append(time.perf_counter() - start)
+        assert len(board_dtos) == board_count
+        print(
+            f"\n{name} get_many of {board_count} boards with {image_count} images each: "
+            f"{sum(timings) / len(timings) * 1000:.1f}ms"
+        )
+    assert legacy_get_many() == boards.get_many(0, board_count).items
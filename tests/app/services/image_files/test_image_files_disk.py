@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from PIL import Image
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import SleepTestInvocation, TestEventService, wait_until  # isort: split
+
+from invokeai.app.invocations.fields import ImageField
+from invokeai.app.invocations.image import ImageBlurInvocation
+from invokeai.app.services.image_files.image_files_common import ImageFileSaveException
+from invokeai.app.services.image_files.image_files_disk import DiskImageFileStorage, ImageCache
+from invokeai.app.services.image_records.image_records_common import ImageCategory, ResourceOrigin
+from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.names.names_default import SimpleNameService
+from invokeai.app.services.session_processor.session_processor_default import DefaultSessionProcessor
+from invokeai.app.services.session_queue.session_queue_common import Batch
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
+from invokeai.app.services.shared.graph import Graph
+from invokeai.app.services.shared.invocation_context import ImagesInterface
+from invokeai.app.services.urls.urls_default import LocalUrlService
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+def create_image_files(
+    mock_services: InvocationServices, tmp_path: Path, max_image_cache_size: int = 2**30, writer_threads: int = 0
+) -> DiskImageFileStorage:
+    image_files = DiskImageFileStorage(
+        tmp_path / "images", max_image_cache_size=max_image_cache_size, writer_threads=writer_threads
+    )
+    mock_services.image_files = image_files
+    Invoker(services=mock_services)
+    return image_files
+
+
+def test_image_cache_evicts_least_recently_used_by_size():
+    # Each 10x10 RGB image is 300 bytes
+    cache = ImageCache(max_size=650)
+    images = [Image.new("RGB", (10, 10)) for _ in range(3)]
+    cache.set(Path("0.png"), images[0])
+    cache.set(Path("1.png"), images[1])
+    assert cache.get(Path("0.png")) is images[0]
+    cache.set(Path("2.png"), images[2])
+    assert cache.get(Path("1.png")) is None
+    assert cache.get(Path("0.png")) is images[0]
+    assert cache.get(Path("2.png")) is images[2]
+    status = cache.get_status()
+    assert (status.hits, status.misses, status.count, status.size) == (3, 1, 2, 600)
+
+
+def test_image_cache_skips_images_larger_than_the_cache():
+    cache = ImageCache(max_size=100)
+    cache.set(Path("0.png"), Image.new("RGB", (10, 10)))
+    assert cache.get(Path("0.png")) is None
+    assert cache.get_status().size == 0
+
+
+def test_get_uses_cache(mock_services: InvocationServices, tmp_path: Path):
+    image_files = create_image_files(mock_services, tmp_path)
+    image_files.save(Image.new("RGB", (64, 64)), "image.png")
+    image = image_files.get("image.png")
+    assert image_files.get("image.png") is image
+    status = image_files.get_cache_status()
+    assert (status.images.hits, status.images.count, status.images.size) == (2, 1, 64 * 64 * 3)
+    # Thumbnails are cached separately
+    assert status.thumbnails.count == 1
+
+    image_files.delete("image.png")
+    status = image_files.get_cache_status()
+    assert (status.images.count, status.thumbnails.count) == (0, 0)
+
+
+def test_get_without_cache(mock_services: InvocationServices, tmp_path: Path):
+    image_files = create_image_files(mock_services, tmp_path, max_image_cache_size=0)
+    image_files.save(Image.new("RGB", (64, 64)), "image.png")
+    assert image_files.get("image.png") is not image_files.get("image.png")
+    assert image_files.get_cache_status().images.misses == 2
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("max_image_cache_size", [0, 2**30])
+def test_get_pil_tiled_upscale_benchmark(mock_services: InvocationServices, tmp_path: Path, max_image_cache_size: int):
+    image_files = create_image_files(mock_services, tmp_path, max_image_cache_size=max_image_cache_size)
+    image_files.save(Image.effect_noise((2048, 2048), 64).convert("RGB"), "source.png")
+    images = ImagesInterface(mock_services, None)  # type: ignore
+
+    # Each tile reads the source image, then saves its own output, as a tiled upscale graph would
+    get_pil_time = 0.0
+    for i in range(64):
+        start = time.perf_counter()
+        source = images.get_pil("source.png", "RGB")
+        get_pil_time += time.perf_counter() - start
+        tile = source.crop(((i % 8) * 256, (i // 8) * 256, (i % 8 + 1) * 256, (i // 8 + 1) * 256))
+        image_files.save(tile, f"tile_{i}.png")
+
+    status = image_files.get_cache_status()
+    print(
+        f"\nget_pil x64 (cache={max_image_cache_size}B): {get_pil_time * 1000:.1f}ms "
+        f"hits={status.images.hits} misses={status.images.misses}"
+    )
+
+
+def test_save_in_background(mock_services: InvocationServices, tmp_path: Path):
+    image_files = create_image_files(mock_services, tmp_path, max_image_cache_size=0, writer_threads=1)
+    images = [Image.effect_noise((512, 512), 64) for _ in range(4)]
+    for i, image in enumerate(images):
+        image_files.save(image, f"{i}.png")
+    # Images are readable before they are written
+    assert image_files.get("3.png") is images[3]
+    # Paths are only given out for written images
+    assert image_files.get_path("0.png").exists()
+    assert image_files.get_path("0.png", thumbnail=True).exists()
+
+    image_files.flush()
+    for i in range(4):
+        assert image_files.get_path(f"{i}.png").exists()
+    assert image_files.get("3.png") is not images[3]
+
+
+def test_flush_waits_only_for_the_sessions_images(mock_services: InvocationServices, tmp_path: Path):
+    image_files = create_image_files(mock_services, tmp_path, writer_threads=2)
+    # Another session's image is still being written
+    release = threading.Event()
+    blocked_image = Image.new("RGB", (64, 64))
+    blocked_image.save = lambda *args, **kwargs: release.wait(timeout=5)  # type: ignore
+    image_files.save(blocked_image, "other.png", session_id="other")
+    image_files.save(Image.new("RGB", (64, 64)), "image.png", session_id="session")
+
+    start = time.perf_counter()
+    image_files.flush(session_id="session")
+    assert time.perf_counter() - start < 1
+    assert (tmp_path / "images" / "image.png").exists()
+    release.set()
+    image_files.flush()
+
+
+def test_flush_raises_the_sessions_failed_writes(mock_services: InvocationServices, tmp_path: Path):
+    image_files = create_image_files(mock_services, tmp_path, writer_threads=2)
+    failing_image = Image.new("RGB", (64, 64))
+    failing_image.save = MagicMock(side_effect=OSError("disk full"))  # type: ignore
+    image_files.save(failing_image, "failed.png", session_id="session")
+    image_files.save(Image.new("RGB", (64, 64)), "image.png", session_id="other")
+
+    image_files.flush(session_id="other")
+    with pytest.raises(ImageFileSaveException, match="failed.png"):
+        image_files.flush(session_id="session")
+    # The failure is only raised once
+    image_files.flush(session_id="session")
+
+
+def test_failed_submit_releases_writer_slot(
+    mock_services: InvocationServices, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    image_files = create_image_files(mock_services, tmp_path, writer_threads=1)
+    writer = image_files._DiskImageFileStorage__writer  # type: ignore
+    submit = writer.submit
+    monkeypatch.setattr(writer, "submit", MagicMock(side_effect=RuntimeError("cannot schedule new futures")))
+    # More failures than there are slots
+    for i in range(4):
+        with pytest.raises(ImageFileSaveException):
+            image_files.save(Image.new("RGB", (64, 64)), f"{i}.png")
+    monkeypatch.setattr(writer, "submit", submit)
+    image_files.save(Image.new("RGB", (64, 64)), "image.png")
+    image_files.flush()
+    assert (tmp_path / "images" / "image.png").exists()
+
+
+def test_delete_waits_for_background_save(mock_services: InvocationServices, tmp_path: Path):
+    image_files = create_image_files(mock_services, tmp_path, writer_threads=1)
+    image_files.save(Image.effect_noise((512, 512), 64), "image.png")
+    image_files.delete("image.png")
+    image_files.flush()
+    assert not (tmp_path / "images" / "image.png").exists()
+
+
+def create_session_services(mock_services: InvocationServices, tmp_path: Path, writer_threads: int) -> Invoker:
+    db = create_mock_sqlite_database(mock_services.configuration, logging.getLogger())
+    mock_services.image_files = DiskImageFileStorage(tmp_path / "images", writer_threads=writer_threads)
+    mock_services.image_records = SqliteImageRecordStorage(db=db)
+    mock_services.names = SimpleNameService()
+    mock_services.urls = LocalUrlService()
+    mock_services.events = TestEventService()
+    mock_services.session_queue = SqliteSessionQueue(db=db)
+    # The processor is started below, once the graph is enqueued
+    mock_services.session_processor = None  # type: ignore
+    mock_services.model_manager = MagicMock()
+    return Invoker(services=mock_services)
+
+
+def run_session(mock_services: InvocationServices, tmp_path: Path, writer_threads: int) -> float:
+    """Runs a session that alternates between waiting and blurring then saving a large image, as a denoise on the GPU
+    followed by a decode and save would, returning the wall time until it completes."""
+    invoker = create_session_services(mock_services, tmp_path, writer_threads)
+    source = mock_services.images.create(
+        Image.effect_noise((2048, 2048), 64).convert("RGB"), ResourceOrigin.INTERNAL, ImageCategory.GENERAL
+    )
+
+    graph = Graph()
+    for i in range(8):
+        graph.add_node(SleepTestInvocation(id=f"sleep_{i}", duration=0.3))
+        graph.add_node(ImageBlurInvocation(id=f"blur_{i}", image=ImageField(image_name=source.image_name), radius=2))
+    mock_services.session_queue.enqueue_batch("default", Batch(graph=graph), prepend=False)
+    processor = DefaultSessionProcessor(thread_limit=1, polling_interval=0.05)
+    mock_services.session_processor = processor
+    events = mock_services.events
+    assert isinstance(events, TestEventService)
+    start = time.perf_counter()
+    processor.start(invoker)
+    try:
+        wait_until(
+            lambda: any(e.event_name == "graph_execution_state_complete" for e in events.events),
+            timeout=60,
+            interval=0.001,
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        processor.stop()
+    # Every image was written before the session was reported as complete
+    for event in events.events:
+        if event.event_name == "invocation_complete" and "image" in event.payload["result"]:
+            assert (tmp_path / "images" / event.payload["result"]["image"]["image_name"]).exists()
+    return elapsed
+
+
+def test_session_fails_if_its_images_cannot_be_written(
+    mock_services: InvocationServices, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    invoker = create_session_services(mock_services, tmp_path, writer_threads=2)
+    source = mock_services.images.create(Image.new("RGB", (64, 64)), ResourceOrigin.INTERNAL, ImageCategory.GENERAL)
+    mock_services.image_files.flush()
+    monkeypatch.setattr(
+        mock_services.image_files, "_DiskImageFileStorage__write", MagicMock(side_effect=OSError("disk full"))
+    )
+
+    graph = Graph()
+    graph.add_node(ImageBlurInvocation(id="blur", image=ImageField(image_name=source.image_name)))
+    mock_services.session_queue.enqueue_batch("default", Batch(graph=graph), prepend=False)
+    processor = DefaultSessionProcessor(thread_limit=1, polling_interval=0.05)
+    mock_services.session_processor = processor
+    processor.start(invoker)
+    try:
+        wait_until(lambda: mock_services.session_queue.get_queue_status("default").failed == 1, timeout=10)
+    finally:
+        processor.stop()
+    assert "disk full" in (mock_services.session_queue.get_queue_item(1).error or "")
+
+
+@pytest.mark.slow
+def test_session_time_with_background_saves_benchmark(mock_services: InvocationServices, tmp_path: Path):
+    sync_time = run_session(mock_services, tmp_path / "sync", writer_threads=0)
+    background_time = run_session(mock_services, tmp_path / "background", writer_threads=2)
+    print(f"\nsession of 8 x (0.3s wait, blur+save 2048x2048): sync={sync_time:.3f}s background={background_time:.3f}s")
@@ -0,0 +1,102 @@
+import logging
+import time
+
+import pytest
+
+from invokeai.app.services.config.config_default import InvokeAIAppConfig
+from invokeai.app.services.image_records.image_records_common import (
+    ImageCategory,
+    InvalidImageCursorException,
+    ResourceOrigin,
+)
+from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+@pytest.fixture
+def db() -> SqliteDatabase:
+    return create_mock_sqlite_database(InvokeAIAppConfig(use_memory_db=True), logging.getLogger())
+
+
+def add_images(db: SqliteDatabase, count: int) -> None:
+    """Adds images with distinct creation times. Every tenth image is starred, and every third is in a board."""
+    with db.lock:
+        db.conn.execute("INSERT INTO boards (board_id, board_name) VALUES ('board', 'Board');")
+        db.conn.executemany(
+            """--sql
+            INSERT INTO images (image_name, image_origin, image_category, width, height, starred, has_workflow, created_at)
+            VALUES (?, ?, ?, 512, 512, ?, FALSE, DATETIME('2024-01-01', ? || ' seconds'));
+            """,
+            [
+                (f"{i:06}.png", ResourceOrigin.INTERNAL.value, ImageCategory.GENERAL.value, i % 10 == 0, i)
+                for i in range(count)
+            ],
+        )
+        db.conn.executemany(
+            "INSERT INTO board_images (board_id, image_name) VALUES ('board', ?);",
+            [(f"{i:06}.png",) for i in range(0, count, 3)],
+        )
+        db.conn.commit()
+
+
+@pytest.mark.parametrize("board_id", [None, "none", "board"])
+def test_get_many_by_cursor(db: SqliteDatabase, board_id: str):
+    add_images(db, 100)
+    image_records = SqliteImageRecordStorage(db=db)
+    expected = [r.image_name for r in image_records.get_many(0, 100, board_id=board_id).items]
+
+    image_names: list[str] = []
+    cursor = None
+    while True:
+        page = image_records.get_many_by_cursor(limit=7, cursor=cursor, board_id=board_id)
+        assert page.total is None
+        image_names.extend(r.image_name for r in page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert image_names == expected
+    assert image_records.get_many_by_cursor(limit=7, board_id=board_id, include_total=True).total == len(expected)
+
+
+def test_cursor_survives_deletion(db: SqliteDatabase):
+    add_images(db, 10)
+    image_records = SqliteImageRecordStorage(db=db)
+    first_page = image_records.get_many_by_cursor(limit=5)
+    assert first_page.next_cursor is not None
+    image_records.delete(first_page.items[-1].image_name)
+    second_page = image_records.get_many_by_cursor(limit=5, cursor=first_page.next_cursor)
+    assert [r.image_name for r in second_page.items] == [r.image_name for r in image_records.get_many(4, 5).items]
+
+    with pytest.raises(InvalidImageCursorException):
+        image_records.get_many_by_cursor(cursor="000001.png")
+
+
+@pytest.mark.slow
+def test_scroll_benchmark(db: SqliteDatabase):
+    limit, pages = 40, 5000
+    add_images(db, limit * pages)
+    image_records = SqliteImageRecordStorage(db=db)
+
+    # Scrolling with offsets is quadratic, so only a few pages are timed
+    for page in [1, 1000, 5000]:
+        start = time.perf_counter()
+        offset_page = image_records.get_many((page - 1) * limit, limit)
+        print(f"\noffset page {page}: {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    timings: list[float] = []
+    cursor = None
+    for _ in range(pages):
+        start = time.perf_counter()
+        cursor_page = image_records.get_many_by_cursor(limit, cursor)
+        timings.append(time.perf_counter() - start)
+        cursor = cursor_page.next_cursor
+    assert cursor_page.items == offset_page.items
+    print(
+        f"cursor scroll to page {pages}: total={sum(timings):.2f}s "
+        f"page 1={timings[0] * 1000:.2f}ms page {pages}={timings[-1] * 1000:.2f}ms max={max(timings) * 1000:.2f}ms"
+    )
+
+    start = time.perf_counter()
+    image_records.get_many_by_cursor(limit, include_total=True)
+    print(f"cursor page 1 with total: {(time.perf_counter() - start) * 1000:.2f}ms")
@@ -0,0 +1,183 @@
+import logging
+import time
+from pathlib import Path
+
+import pytest
+import torch
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import PromptTestInvocation  # isort: split
+
+from invokeai.app.invocations.fields import ImageField
+from invokeai.app.invocations.primitives import ConditioningOutput, ImageOutput, LatentsOutput, StringOutput
+from invokeai.app.services.invocation_cache.invocation_cache_disk import DiskInvocationCache
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+
+
+def create_cache(
+    mock_services: InvocationServices, tmp_path: Path, max_cache_size: int = 10, max_cache_bytes: int = 2**30
+) -> DiskInvocationCache:
+    """Creates a cache and fresh tensor and conditioning services, as if the app had just started."""
+    cache = DiskInvocationCache(
+        db=SqliteDatabase(tmp_path / "node_cache" / "invocation_cache.db", logging.getLogger()),
+        objects_dir=tmp_path / "node_cache" / "objects",
+        max_cache_size=max_cache_size,
+        max_cache_bytes=max_cache_bytes,
+    )
+    mock_services.tensors = ObjectSerializerForwardCache(
+        ObjectSerializerDisk[torch.Tensor](tmp_path / "tensors", ephemeral=True)
+    )
+    mock_services.conditioning = ObjectSerializerForwardCache(
+        ObjectSerializerDisk[torch.Tensor](tmp_path / "conditioning", ephemeral=True)
+    )
+    mock_services.invocation_cache = cache
+    Invoker(services=mock_services)
+    return cache
+
+
+def save_latents(mock_services: InvocationServices, cache: DiskInvocationCache, prompt: str) -> LatentsOutput:
+    latents = torch.rand(1, 4, 64, 64)
+    output = LatentsOutput.build(mock_services.tensors.save(latents), latents)
+    cache.save(cache.create_key(PromptTestInvocation(prompt=prompt)), output)
+    return output
+
+
+def test_create_key_is_stable_and_ignores_id():
+    key = DiskInvocationCache.create_key(PromptTestInvocation(id="1", prompt="Banana sushi"))
+    assert key == DiskInvocationCache.create_key(PromptTestInvocation(id="2", prompt="Banana sushi"))
+    assert key != DiskInvocationCache.create_key(PromptTestInvocation(id="1", prompt="Sushi banana"))
+
+
+def test_save_and_get(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path)
+    output = StringOutput(value="Banana sushi")
+    cache.save(1, output)
+    assert cache.get(1) == output
+    assert cache.get(2) is None
+    status = cache.get_status()
+    assert (status.hits, status.misses, status.size) == (1, 1, 1)
+
+
+def test_disabled_when_max_cache_size_is_zero(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path, max_cache_size=0)
+    cache.save(1, StringOutput(value="Banana sushi"))
+    assert cache.get(1) is None
+    assert not cache.get_status().enabled
+    assert not (tmp_path / "node_cache" / "objects").exists()
+
+
+def test_evicts_least_recently_used(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path, max_cache_size=2)
+    cache.save(1, StringOutput(value="1"))
+    cache.save(2, StringOutput(value="2"))
+    assert cache.get(1) is not None
+    cache.save(3, StringOutput(value="3"))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(3) is not None
+
+
+def test_evicts_to_stay_under_byte_limit(mock_services: InvocationServices, tmp_path: Path):
+    latents_size = 4 * 64 * 64 * 4
+    cache = create_cache(mock_services, tmp_path, max_cache_bytes=int(latents_size * 2.5))
+    outputs = [save_latents(mock_services, cache, str(i)) for i in range(3)]
+    assert cache.get(cache.create_key(PromptTestInvocation(prompt="0"))) is None
+    assert cache.get(cache.create_key(PromptTestInvocation(prompt="2"))) == outputs[2]
+    # The evicted output's copy of its latents is removed with it
+    objects = {p.name for p in (tmp_path / "node_cache" / "objects").iterdir()}
+    assert objects == {o.latents.latents_name for o in outputs[1:]}
+
+
+def test_deleting_referenced_object_invalidates(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path)
+    latents_output = save_latents(mock_services, cache, "latents")
+    image_output = ImageOutput(image=ImageField(image_name="image.png"), width=8, height=8)
+    cache.save(2, image_output)
+    cache.save(3, StringOutput(value="image.png"))
+
+    mock_services.tensors.delete(latents_output.latents.latents_name)
+    assert cache.get(cache.create_key(PromptTestInvocation(prompt="latents"))) is None
+    cache._delete_by_match("image.png")
+    assert cache.get(2) is None
+    # Only outputs that reference the object by name are invalidated
+    assert cache.get(3) is not None
+
+
+def test_persists_across_restarts(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path)
+    latents = torch.rand(1, 4, 8, 8)
+    latents_output = LatentsOutput.build(mock_services.tensors.save(latents), latents)
+    conditioning = torch.rand(1, 77, 768)
+    conditioning_output = ConditioningOutput.build(mock_services.conditioning.save(conditioning))
+    cache.save(1, latents_output)
+    cache.save(2, conditioning_output)
+    cache.save(3, StringOutput(value="Banana sushi"))
+    del cache
+
+    # The tensors and conditioning from the previous run are gone, so they must be restored from the cache's copies
+    cache = create_cache(mock_services, tmp_path)
+    assert cache.get_status().size == 3
+    assert cache.get(3) == StringOutput(value="Banana sushi")
+    restored_latents = cache.get(1)
+    assert isinstance(restored_latents, LatentsOutput)
+    assert restored_latents.latents.latents_name != latents_output.latents.latents_name
+    assert torch.equal(mock_services.tensors.load(restored_latents.latents.latents_name), latents)
+    restored_conditioning = cache.get(2)
+    assert isinstance(restored_conditioning, ConditioningOutput)
+    assert torch.equal(
+        mock_services.conditioning.load(restored_conditioning.conditioning.conditioning_name), conditioning
+    )
+    # Restored objects are only restored once
+    assert cache.get(1) == restored_latents
+
+    # Deleting a restored object invalidates the outputs that reference it
+    mock_services.tensors.delete(restored_latents.latents.latents_name)
+    assert cache.get(1) is None
+
+
+def test_missing_copy_is_a_miss(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path)
+    latents_output = save_latents(mock_services, cache, "latents")
+    del cache
+    cache = create_cache(mock_services, tmp_path)
+    (tmp_path / "node_cache" / "objects" / latents_output.latents.latents_name).unlink()
+    assert cache.get(cache.create_key(PromptTestInvocation(prompt="latents"))) is None
+    assert cache.get_status().size == 0
+
+
+def test_clear(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path)
+    save_latents(mock_services, cache, "latents")
+    cache.clear()
+    assert cache.get_status().size == 0
+    assert list((tmp_path / "node_cache" / "objects").iterdir()) == []
+
+
+@pytest.mark.slow
+def test_disk_invocation_cache_benchmark(mock_services: InvocationServices, tmp_path: Path):
+    count = 500
+    prompts = [f"prompt {i}" for i in range(count)]
+    cache = create_cache(mock_services, tmp_path, max_cache_size=count)
+    for prompt in prompts:
+        save_latents(mock_services, cache, prompt)
+
+    # A cold start is the first lookup after a restart, which restores the latents; a warm start is any later one
+    cache = create_cache(mock_services, tmp_path, max_cache_size=count)
+    for start_type in ["cold", "warm"]:
+        hits = cache.get_status().hits
+        timings: list[float] = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            assert cache.get(cache.create_key(PromptTestInvocation(prompt=prompt))) is not None
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        hit_rate = (cache.get_status().hits - hits) / count
+        print(
+            f"\n{start_type} start: hit rate={hit_rate:.0%} "
+            f"mean={sum(timings) / count * 1000:.3f}ms p99={timings[int(count * 0.99)] * 1000:.3f}ms"
+        )
+        assert hit_rate == 1
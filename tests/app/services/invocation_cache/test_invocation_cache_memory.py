@@ -0,0 +1,118 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+import torch
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import PromptTestInvocation  # isort: split
+
+from invokeai.app.invocations.baseinvocation import BaseInvocation
+from invokeai.app.invocations.fields import ImageField
+from invokeai.app.invocations.primitives import ImageOutput, LatentsOutput, StringInvocation, StringOutput
+from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.object_serializer.object_serializer_disk import ObjectSerializerDisk
+from invokeai.app.services.object_serializer.object_serializer_forward_cache import ObjectSerializerForwardCache
+
+
+def test_create_key_ignores_id():
+    key = MemoryInvocationCache.create_key(PromptTestInvocation(id="1", prompt="Banana sushi"))
+    assert key == MemoryInvocationCache.create_key(PromptTestInvocation(id="2", prompt="Banana sushi"))
+    assert key != MemoryInvocationCache.create_key(PromptTestInvocation(id="1", prompt="Sushi banana"))
+    assert key != MemoryInvocationCache.create_key(PromptTestInvocation(id="1", prompt="Banana sushi", use_cache=False))
+
+
+def test_create_key_is_stable_across_processes():
+    script = (
+        "from invokeai.app.invocations.primitives import StringInvocation;"
+        "from invokeai.app.services.invocation_cache.invocation_cache_memory import MemoryInvocationCache;"
+        "print(MemoryInvocationCache.create_key(StringInvocation(id='1', value='Banana sushi')))"
+    )
+    # Python's `hash` is randomized per process, so the key must not depend on it
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "PYTHONHASHSEED": "1"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    key = MemoryInvocationCache.create_key(StringInvocation(id="2", value="Banana sushi"))
+    assert result.stdout.splitlines()[-1] == str(key)
+
+
+@pytest.mark.slow
+def test_create_key_benchmark():
+    # Every registered invocation type, with its default field values
+    invocations = [invocation_type.model_construct() for invocation_type in BaseInvocation.get_invocations()]
+
+    def legacy_create_key(invocation: BaseInvocation) -> int:
+        return hash(invocation.model_dump_json(exclude={"id"}, warnings=False))
+
+    for name, create_key in [("legacy", legacy_create_key), ("current", MemoryInvocationCache.create_key)]:
+        start = time.perf_counter()
+        for _ in range(100):
+            for invocation in invocations:
+                create_key(invocation)
+        per_key_us = (time.perf_counter() - start) / (100 * len(invocations)) * 1e6
+        print(f"\n{name} create_key over {len(invocations)} invocation types: {per_key_us:.2f}us per key")
+
+
+def create_cache(mock_services: InvocationServices, tmp_path: Path, max_cache_size: int) -> MemoryInvocationCache:
+    cache = MemoryInvocationCache(max_cache_size=max_cache_size)
+    mock_services.tensors = ObjectSerializerForwardCache(ObjectSerializerDisk[torch.Tensor](tmp_path / "tensors"))
+    mock_services.conditioning = ObjectSerializerForwardCache(
+        ObjectSerializerDisk[torch.Tensor](tmp_path / "conditioning")
+    )
+    mock_services.invocation_cache = cache
+    Invoker(services=mock_services)
+    return cache
+
+
+def test_deleting_referenced_object_invalidates(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path, max_cache_size=10)
+    latents = torch.rand(1, 4, 8, 8)
+    latents_name = mock_services.tensors.save(latents)
+    cache.save(1, LatentsOutput.build(latents_name, latents))
+    cache.save(2, ImageOutput(image=ImageField(image_name="image.png"), width=8, height=8))
+    cache.save(3, ImageOutput(image=ImageField(image_name="image.png"), width=16, height=16))
+    cache.save(4, StringOutput(value="image.png"))
+
+    mock_services.tensors.delete(latents_name)
+    assert cache.get(1) is None
+    cache._delete_by_match("image.png")
+    assert cache.get(2) is None
+    assert cache.get(3) is None
+    # Only outputs that reference the object by name are invalidated
+    assert cache.get(4) is not None
+    assert cache._keys_by_name == {}
+
+
+def test_evicted_items_are_removed_from_index(mock_services: InvocationServices, tmp_path: Path):
+    cache = create_cache(mock_services, tmp_path, max_cache_size=1)
+    cache.save(1, ImageOutput(image=ImageField(image_name="1.png"), width=8, height=8))
+    cache.save(2, ImageOutput(image=ImageField(image_name="2.png"), width=8, height=8))
+    assert cache._keys_by_name == {"2.png": {2}}
+    cache.delete(2)
+    assert cache._keys_by_name == {}
+
+
+@pytest.mark.slow
+def test_delete_by_match_benchmark(mock_services: InvocationServices, tmp_path: Path):
+    count = 10_000
+    cache = create_cache(mock_services, tmp_path, max_cache_size=count)
+    image_names = [f"{uuid.uuid4()}.png" for _ in range(count)]
+    for i, image_name in enumerate(image_names):
+        cache.save(i, ImageOutput(image=ImageField(image_name=image_name), width=512, height=512))
+
+    start = time.perf_counter()
+    for image_name in image_names:
+        cache._delete_by_match(image_name)
+    elapsed = time.perf_counter() - start
+    print(f"\ndeleted {count} images against a {count} entry cache: {elapsed:.3f}s")
+    assert cache.get_status().size == 0
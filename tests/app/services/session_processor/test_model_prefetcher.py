@@ -0,0 +1,271 @@
+import logging
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+from invokeai.app.invocations.model import (
+    LoRALoaderInvocation,
+    MainModelLoaderInvocation,
+    ModelIdentifierField,
+    VAELoaderInvocation,
+)
+from invokeai.app.invocations.sdxl import SDXLModelLoaderInvocation
+from invokeai.app.services.session_processor.model_prefetcher import ModelPrefetcher, get_model_identifiers
+from invokeai.app.services.shared.graph import Edge, EdgeConnection, Graph
+from invokeai.backend.model_manager import BaseModelType, ModelType, SubModelType
+from invokeai.backend.model_manager.load import LoadedModel
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import ModelCache
+
+GB = 2**30
+
+# Sizes of the files of each fake model, in GB. Tokenizers and schedulers have no weights.
+MAIN_MODEL_FILES = {"text_encoder": 0.25, "unet": 1.6, "vae": 0.16}
+
+
+def identifier(key: str, type: ModelType, base: BaseModelType = BaseModelType.StableDiffusion1) -> ModelIdentifierField:
+    return ModelIdentifierField(key=key, hash=key, name=key, base=base, type=type)
+
+
+def txt2img_graph(main: str, lora: Optional[str] = None) -> Graph:
+    graph = Graph()
+    graph.add_node(MainModelLoaderInvocation(id="main", model=identifier(main, ModelType.Main)))
+    if lora is not None:
+        graph.add_node(LoRALoaderInvocation(id="lora", lora=identifier(lora, ModelType.LoRA)))
+        graph.add_edge(
+            Edge(
+                source=EdgeConnection(node_id="main", field="unet"),
+                destination=EdgeConnection(node_id="lora", field="unet"),
+            )
+        )
+    return graph
+
+
+def queue_item(item_id: int, graph: Graph) -> Any:
+    return SimpleNamespace(item_id=item_id, queue_id="default", session=SimpleNamespace(graph=graph))
+
+
+class FakeModelLoader:
+    """Loads models through a real RAM cache, taking `seconds_per_gb` to read each one from a single disk"""
+
+    def __init__(self, ram_cache: ModelCache, seconds_per_gb: float) -> None:
+        self.ram_cache = ram_cache
+        self.seconds_per_gb = seconds_per_gb
+        self.loads: Counter[tuple[str, Optional[SubModelType]]] = Counter()
+        self.load_order: list[tuple[str, Optional[SubModelType]]] = []
+        self._disk = threading.Lock()
+
+    def load_model(self, config: Any, submodel_type: Optional[SubModelType] = None, context_data: Any = None) -> Any:
+        path = Path(config.path) / submodel_type.value if submodel_type else Path(config.path)
+        if path.is_dir():
+            size = sum(f.stat().st_size for f in path.glob("*.safetensors"))
+        else:
+            size = path.stat().st_size if path.exists() else 0
+
+        def load() -> tuple[torch.nn.Module, int]:
+            with self._disk:
+                self.loads[(config.key, submodel_type)] += 1
+                self.load_order.append((config.key, submodel_type))
+                time.sleep(size / GB * self.seconds_per_gb)
+            return torch.nn.Linear(1, 1), size
+
+        return LoadedModel(config=config, _locker=self.ram_cache.load(config.key, load, submodel_type))
+
+
+def create_models(tmp_path: Path, mains: list[str], loras: list[str]) -> dict[str, Any]:
+    """Creates sparse model files, returning the configs by key"""
+    configs: dict[str, Any] = {}
+    for key in mains:
+        for subfolder, size in MAIN_MODEL_FILES.items():
+            (tmp_path / key / subfolder).mkdir(parents=True)
+            with open(tmp_path / key / subfolder / "model.safetensors", "wb") as f:
+                f.truncate(int(size * GB))
+        configs[key] = SimpleNamespace(key=key, name=key, path=str(tmp_path / key))
+    for key in loras:
+        with open(tmp_path / f"{key}.safetensors", "wb") as f:
+            f.truncate(int(0.15 * GB))
+        configs[key] = SimpleNamespace(key=key, name=key, path=str(tmp_path / f"{key}.safetensors"))
+    return configs
+
+
+def create_services(tmp_path: Path, configs: dict[str, Any], ram: float, seconds_per_gb: float) -> Any:
+    ram_cache = ModelCache(
+        max_cache_size=ram,
+        max_vram_cache_size=0,
+        execution_device=torch.device("cpu"),
+        storage_device=torch.device("cpu"),
+    )
+    services = MagicMock()
+    services.logger = logging.getLogger()
+    services.configuration.models_path = tmp_path
+    services.model_manager.store.get_model = lambda key: configs[key]
+    services.model_manager.load = FakeModelLoader(ram_cache, seconds_per_gb)
+    services.session_queue.get_next.return_value = None
+    return services
+
+
+def wait_for_loads(loader: FakeModelLoader, count: int, timeout: float = 10) -> None:
+    deadline = time.perf_counter() + timeout
+    while len(loader.load_order) < count:
+        assert time.perf_counter() < deadline, "timed out waiting for prefetch"
+        time.sleep(0.01)
+
+
+def test_model_identifiers_are_in_execution_order():
+    graph = Graph()
+    graph.add_node(VAELoaderInvocation(id="vae", vae_model=identifier("vae", ModelType.VAE)))
+    graph.add_node(
+        SDXLModelLoaderInvocation(id="main", model=identifier("sdxl", ModelType.Main, BaseModelType.StableDiffusionXL))
+    )
+    graph.add_node(LoRALoaderInvocation(id="lora", lora=identifier("lora", ModelType.LoRA)))
+    graph.add_edge(
+        Edge(
+            source=EdgeConnection(node_id="main", field="unet"),
+            destination=EdgeConnection(node_id="lora", field="unet"),
+        )
+    )
+    # The VAE loader has no edges, so it may run before or after the others
+    identifiers = [(i.key, i.submodel_type) for i in get_model_identifiers(graph) if i.key != "vae"]
+    assert identifiers == [
+        ("sdxl", SubModelType.Tokenizer),
+        ("sdxl", SubModelType.TextEncoder),
+        ("sdxl", SubModelType.Tokenizer2),
+        ("sdxl", SubModelType.TextEncoder2),
+        ("sdxl", SubModelType.Scheduler),
+        ("sdxl", SubModelType.UNet),
+        ("sdxl", SubModelType.VAE),
+        ("lora", None),
+    ]
+
+
+def test_prefetch_loads_current_then_next_item_within_the_cache_budget(tmp_path: Path):
+    configs = create_models(tmp_path, mains=["sd-1", "sd-2"], loras=["lora-1"])
+    # Room for sd-1 and its LoRA, and sd-2's text encoder and VAE, but not sd-2's UNet as well
+    services = create_services(tmp_path, configs, ram=2.6, seconds_per_gb=0)
+    services.session_queue.get_next.return_value = queue_item(2, txt2img_graph("sd-2"))
+    loader = services.model_manager.load
+    prefetcher = ModelPrefetcher(services)
+    try:
+        prefetcher.prefetch(queue_item(1, txt2img_graph("sd-1", lora="lora-1")))
+        wait_for_loads(loader, 10)
+        time.sleep(0.1)
+    finally:
+        prefetcher.stop()
+    submodels = [SubModelType.Tokenizer, SubModelType.TextEncoder, SubModelType.Scheduler]
+    assert loader.load_order == [
+        *[("sd-1", s) for s in submodels],
+        ("sd-1", SubModelType.UNet),
+        ("sd-1", SubModelType.VAE),
+        ("lora-1", None),
+        *[("sd-2", s) for s in submodels],
+        ("sd-2", SubModelType.VAE),
+    ]
+
+
+def test_prefetch_counts_a_checkpoint_file_once(tmp_path: Path):
+    with open(tmp_path / "sd-1.safetensors", "wb") as f:
+        f.truncate(2 * GB)
+    configs = {"sd-1": SimpleNamespace(key="sd-1", name="sd-1", path=str(tmp_path / "sd-1.safetensors"))}
+    # Room for the checkpoint once, but not once for each of its submodels
+    services = create_services(tmp_path, configs, ram=2.5, seconds_per_gb=0)
+    loader = services.model_manager.load
+    prefetcher = ModelPrefetcher(services)
+    try:
+        prefetcher.prefetch(queue_item(1, txt2img_graph("sd-1")))
+        wait_for_loads(loader, 5)
+    finally:
+        prefetcher.stop()
+    assert loader.load_order == [
+        ("sd-1", s)
+        for s in [
+            SubModelType.Tokenizer,
+            SubModelType.TextEncoder,
+            SubModelType.Scheduler,
+            SubModelType.UNet,
+            SubModelType.VAE,
+        ]
+    ]
+
+
+def test_prefetch_keeps_cached_models_of_the_plan(tmp_path: Path):
+    configs = create_models(tmp_path, mains=["sd-1", "sd-2"], loras=[])
+    # Room for sd-1's text encoder and UNet, but not sd-2's VAE as well
+    services = create_services(tmp_path, configs, ram=2.0, seconds_per_gb=0)
+    loader = services.model_manager.load
+    for key, submodel_type in [("sd-1", SubModelType.TextEncoder), ("sd-2", SubModelType.VAE)]:
+        with loader.load_model(configs[key], submodel_type):
+            pass
+    prefetcher = ModelPrefetcher(services)
+    try:
+        prefetcher.prefetch(queue_item(1, txt2img_graph("sd-1")))
+        wait_for_loads(loader, 5)
+        time.sleep(0.1)
+    finally:
+        prefetcher.stop()
+    # Loading the UNet evicted the model the plan doesn't use, rather than the least recently loaded one
+    assert loader.ram_cache.exists("sd-1", SubModelType.TextEncoder)
+    assert loader.ram_cache.exists("sd-1", SubModelType.UNet)
+    assert not loader.ram_cache.exists("sd-2", SubModelType.VAE)
+
+
+def run_queue_item(services: Any, item: Any, prefetcher: Optional[ModelPrefetcher], main: str, lora: str) -> float:
+    """Runs the nodes of a txt2img session as the session processor would, returning its time to first step"""
+    loader = services.model_manager.load
+
+    def load(key: str, submodel_type: Optional[SubModelType] = None) -> None:
+        with loader.load_model(services.model_manager.store.get_model(key), submodel_type):
+            pass
+
+    start = time.perf_counter()
+    if prefetcher is not None:
+        prefetcher.prefetch(item)
+    # Prompt encoding
+    load(main, SubModelType.Tokenizer)
+    load(main, SubModelType.TextEncoder)
+    time.sleep(0.05)
+    # Denoising
+    load(main, SubModelType.Scheduler)
+    load(main, SubModelType.UNet)
+    load(lora)
+    time_to_first_step = time.perf_counter() - start
+    time.sleep(1)
+    # Decoding
+    load(main, SubModelType.VAE)
+    time.sleep(0.1)
+    return time_to_first_step
+
+
+@pytest.mark.slow
+def test_time_to_first_step_benchmark(tmp_path: Path):
+    # Each item uses a different model than the one before, as when comparing models
+    models = [("sd-1", "lora-1"), ("sd-2", "lora-2"), ("sd-3", "lora-3")]
+    items = models * 2
+    configs = create_models(tmp_path, mains=[m for m, _ in models], loras=[lora for _, lora in models])
+    graphs = [txt2img_graph(main, lora) for main, lora in items]
+    for prefetch in [False, True]:
+        # Room for two of the models, reading at 4GB/s
+        services = create_services(tmp_path, configs, ram=4.5, seconds_per_gb=0.25)
+        prefetcher = ModelPrefetcher(services) if prefetch else None
+        timings: list[float] = []
+        try:
+            for i, (main, lora) in enumerate(items):
+                next_item = queue_item(i + 2, graphs[i + 1]) if i + 1 < len(items) else None
+                services.session_queue.get_next.return_value = next_item
+                timings.append(run_queue_item(services, queue_item(i + 1, graphs[i]), prefetcher, main, lora))
+        finally:
+            if prefetcher is not None:
+                prefetcher.stop()
+        loader: FakeModelLoader = services.model_manager.load
+        # The cache can't hold all three models, so each is loaded once per use - but never twice at once
+        assert set(loader.loads.values()) == {2}
+        print(
+            f"\n{'with' if prefetch else 'without'} prefetch: time to first step "
+            + ", ".join(f"{t:.2f}s" for t in timings)
+            + f" (mean {sum(timings) / len(timings):.2f}s)"
+        )
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import SleepTestInvocation, TestEventService, wait_until  # isort: split
+
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.session_processor.session_processor_default import DefaultSessionProcessor
+from invokeai.app.services.session_queue.session_queue_common import Batch
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
+from invokeai.app.services.shared.graph import Graph
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+def create_invoker(mock_services: InvocationServices) -> Invoker:
+    db = create_mock_sqlite_database(mock_services.configuration, logging.getLogger())
+    mock_services.session_queue = SqliteSessionQueue(db=db)
+    mock_services.events = TestEventService()
+    # Processors are started explicitly by each test - the invoker must not (re)start a previous test's processor
+    mock_services.session_processor = None  # type: ignore
+    # The stats service records model cache stats, which requires a model manager
+    mock_services.model_manager = MagicMock()
+    # The processor flushes image writes when each session completes
+    mock_services.image_files = MagicMock()
+    return Invoker(services=mock_services)
+
+
+@pytest.fixture
+def invoker(mock_services: InvocationServices) -> Invoker:
+    return create_invoker(mock_services)
+
+
+def enqueue_sleep_graphs(invoker: Invoker, count: int, duration: float) -> None:
+    graph = Graph()
+    graph.add_node(SleepTestInvocation(id="sleep", duration=duration))
+    invoker.services.session_queue.enqueue_batch("default", Batch(graph=graph, runs=count), prepend=False)
+
+
+def count_completed_sessions(invoker: Invoker) -> int:
+    assert isinstance(invoker.services.events, TestEventService)
+    return len([e for e in invoker.services.events.events if e.event_name == "graph_execution_state_complete"])
+
+
+def run_processor(invoker: Invoker, thread_limit: int, count: int, duration: float) -> float:
+    """Enqueues `count` independent graphs and returns the wall time taken by the processor to execute them."""
+    enqueue_sleep_graphs(invoker, count, duration)
+    processor = DefaultSessionProcessor(thread_limit=thread_limit, polling_interval=0.05)
+    invoker.services.session_processor = processor
+    start = time.perf_counter()
+    processor.start(invoker)
+    try:
+        wait_until(lambda: count_completed_sessions(invoker) == count, timeout=30, interval=0.01)
+        return time.perf_counter() - start
+    finally:
+        processor.stop()
+
+
+def test_processor_rejects_invalid_thread_limit():
+    with pytest.raises(ValueError):
+        DefaultSessionProcessor(thread_limit=0)
+
+
+def test_processor_executes_all_items_with_multiple_workers(invoker: Invoker):
+    run_processor(invoker, thread_limit=3, count=7, duration=0.0)
+    assert isinstance(invoker.services.events, TestEventService)
+    completed_item_ids = [
+        e.payload["queue_item_id"]
+        for e in invoker.services.events.events
+        if e.event_name == "graph_execution_state_complete"
+    ]
+    # Every item is executed exactly once
+    assert sorted(completed_item_ids) == list(range(1, 8))
+
+
+def test_processor_reports_per_worker_status(invoker: Invoker):
+    processor = DefaultSessionProcessor(thread_limit=2, polling_interval=0.05)
+    invoker.services.session_processor = processor
+    processor.start(invoker)
+    try:
+        enqueue_sleep_graphs(invoker, count=1, duration=1.0)
+        wait_until(lambda: processor.get_status().is_processing, timeout=5, interval=0.01)
+        status = processor.get_status()
+        assert [w.worker_id for w in status.workers] == [0, 1]
+        busy = [w for w in status.workers if w.is_processing]
+        assert len(busy) == 1
+        assert busy[0].queue_item_id == 1
+    finally:
+        processor.stop()
+
+
+def test_processor_cancels_only_the_matching_slot(invoker: Invoker):
+    processor = DefaultSessionProcessor(thread_limit=2, polling_interval=0.05)
+    invoker.services.session_processor = processor
+    processor.start(invoker)
+    try:
+        enqueue_sleep_graphs(invoker, count=2, duration=1.0)
+        wait_until(lambda: all(w.is_processing for w in processor.get_status().workers), timeout=5, interval=0.01)
+        event = ("queue", {"event": "session_canceled", "data": {"queue_item_id": 1}})
+        asyncio.run(processor._on_queue_event(event))
+        canceled = [s for s in processor._slots if s.cancel_event.is_set()]
+        assert len(canceled) == 1
+        assert canceled[0].queue_item is not None
+        assert canceled[0].queue_item.item_id == 1
+    finally:
+        processor.stop()
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("workers", [2, 4])
+def test_processor_workers_scale_wall_time(mock_services: InvocationServices, workers: int):
+    # Each graph sleeps (releasing the GIL), so N workers should finish N graphs in roughly 1/N of the serial time.
+    duration = 0.5
+    serial = run_processor(create_invoker(mock_services), thread_limit=1, count=workers, duration=duration)
+    parallel = run_processor(create_invoker(mock_services), thread_limit=workers, count=workers, duration=duration)
+    print(f"\n{workers} graphs: serial={serial:.3f}s parallel={parallel:.3f}s speedup={serial / parallel:.2f}x")
+    assert serial >= workers * duration
+    assert parallel < (serial / workers) * 1.5
+
+
+def test_processor_wakes_on_enqueue_without_event_service(invoker: Invoker):
+    # With a very long polling interval, the item can only start promptly if the queue wakes the processor directly
+    processor = DefaultSessionProcessor(thread_limit=1, polling_interval=30)
+    invoker.services.session_processor = processor
+    processor.start(invoker)
+    try:
+        time.sleep(0.1)  # let the worker find the queue empty and start waiting
+        enqueue_sleep_graphs(invoker, count=1, duration=0.0)
+        wait_until(lambda: count_completed_sessions(invoker) == 1, timeout=2, interval=0.01)
+    finally:
+        processor.stop()
+
+
+def test_processor_stop_waits_for_workers(invoker: Invoker):
+    processor = DefaultSessionProcessor(thread_limit=2, polling_interval=30)
+    invoker.services.session_processor = processor
+    processor.start(invoker)
+    enqueue_sleep_graphs(invoker, count=1, duration=0.2)
+    wait_until(lambda: processor.get_status().is_processing, timeout=5, interval=0.01)
+    processor.pause()
+    processor.stop()
+    # The busy worker finished its session, and the idle one stopped although it was paused
+    assert count_completed_sessions(invoker) == 1
+    assert not any(slot.thread is not None and slot.thread.is_alive() for slot in processor._slots)
+
+
+class TimestampedEventService(TestEventService):
+    __test__ = False  # not a pytest test case
+
+    def __init__(self):
+        super().__init__()
+        self.timestamps: list[tuple[str, float]] = []
+
+    def dispatch(self, event_name: str, payload: Any) -> None:
+        self.timestamps.append((payload["event"], time.perf_counter()))
+        super().dispatch(event_name, payload)
+
+
+@pytest.mark.slow
+def test_enqueue_to_start_latency_benchmark(invoker: Invoker):
+    events = TimestampedEventService()
+    invoker.services.events = events
+    processor = DefaultSessionProcessor(thread_limit=1, polling_interval=1)
+    invoker.services.session_processor = processor
+    processor.start(invoker)
+    latencies: list[float] = []
+    try:
+        for i in range(50):
+            time.sleep(0.02)  # let the worker go idle
+            start = time.perf_counter()
+            enqueue_sleep_graphs(invoker, count=1, duration=0.0)
+            wait_until(lambda i=i: count_completed_sessions(invoker) == i + 1, timeout=5, interval=0.001)
+            started = [t for name, t in events.timestamps if name == "invocation_started"][-1]
+            latencies.append((started - start) * 1000)
+    finally:
+        processor.stop()
+    latencies.sort()
+    median = statistics.median(latencies)
+    print(f"\nenqueue-to-start latency: median={median:.2f}ms p95={latencies[int(len(latencies) * 0.95)]:.2f}ms")
+    assert median < 10
@@ -0,0 +1,564 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+
+import psutil
+import pytest
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import PromptTestInvocation, TestEventService  # isort: split
+
+from invokeai.app.services.config.config_default import InvokeAIAppConfig
+from invokeai.app.services.invocation_services import InvocationServices
+from invokeai.app.services.invoker import Invoker
+from invokeai.app.services.session_queue import session_queue_sqlite
+from invokeai.app.services.session_queue.session_queue_common import Batch, BatchDatum
+from invokeai.app.services.session_queue.session_queue_sqlite import SqliteSessionQueue
+from invokeai.app.services.shared.graph import Edge, EdgeConnection, Graph, GraphExecutionState
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from invokeai.app.services.workflow_records.workflow_records_common import WorkflowWithoutID
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+@pytest.fixture
+def db(mock_services: InvocationServices) -> SqliteDatabase:
+    return create_mock_sqlite_database(mock_services.configuration, logging.getLogger())
+
+
+@pytest.fixture
+def session_queue(mock_services: InvocationServices, db: SqliteDatabase) -> SqliteSessionQueue:
+    session_queue = SqliteSessionQueue(db=db)
+    mock_services.session_queue = session_queue
+    Invoker(services=mock_services)
+    return session_queue
+
+
+@pytest.fixture
+def batch() -> Batch:
+    graph = Graph()
+    graph.add_node(PromptTestInvocation(id="1", prompt="Banana sushi"))
+    return Batch(graph=graph, runs=20)
+
+
+def dequeue_all(session_queue: SqliteSessionQueue) -> list[int]:
+    item_ids: list[int] = []
+    while (queue_item := session_queue.dequeue()) is not None:
+        item_ids.append(queue_item.item_id)
+    return item_ids
+
+
+def test_enqueue_notifies_wakeup(session_queue: SqliteSessionQueue, batch: Batch):
+    seen = session_queue.wakeup.count
+    session_queue.enqueue_batch("default", batch, prepend=False)
+    assert session_queue.wakeup.wait(since=seen, timeout=0)
+
+
+def test_dequeue_respects_priority(session_queue: SqliteSessionQueue, batch: Batch):
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 2}), prepend=False)
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 2}), prepend=True)
+    assert dequeue_all(session_queue) == [3, 4, 1, 2]
+    assert session_queue.get_queue_status("default").in_progress == 4
+
+
+def test_dequeue_without_returning(session_queue: SqliteSessionQueue, batch: Batch, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(session_queue_sqlite, "_SQLITE_SUPPORTS_RETURNING", False)
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 2}), prepend=False)
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 2}), prepend=True)
+    assert dequeue_all(session_queue) == [3, 4, 1, 2]
+    assert session_queue.dequeue() is None
+
+
+def test_dequeue_is_atomic_across_threads(session_queue: SqliteSessionQueue, batch: Batch):
+    session_queue.enqueue_batch("default", batch, prepend=False)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: dequeue_all(session_queue), range(8)))
+    item_ids = [item_id for result in results for item_id in result]
+    assert sorted(item_ids) == list(range(1, 21))
+
+
+def test_dequeue_is_atomic_across_connections(mock_services: InvocationServices, tmp_path: Path, batch: Batch):
+    # Each queue gets its own connection and lock, as if they were in separate processes
+    config = InvokeAIAppConfig(db_dir=tmp_path, node_cache_size=0)
+    queues = [SqliteSessionQueue(db=create_mock_sqlite_database(config, logging.getLogger())) for _ in range(4)]
+    mock_services.configuration = config
+    mock_services.session_queue = queues[0]
+    invoker = Invoker(services=mock_services)
+    for queue in queues[1:]:
+        queue.start(invoker)
+
+    queues[0].enqueue_batch("default", batch, prepend=False)
+    with ThreadPoolExecutor(max_workers=len(queues)) as executor:
+        results = list(executor.map(dequeue_all, queues))
+    item_ids = [item_id for result in results for item_id in result]
+    assert sorted(item_ids) == list(range(1, 21))
+
+
+def test_dequeue_populates_session_from_batch(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    workflow = WorkflowWithoutID.model_validate(
+        {
+            **dict.fromkeys(["name", "author", "description", "version", "contact", "tags", "notes"], ""),
+            "exposedFields": [],
+            "meta": {"version": "2.0.0"},
+            "nodes": [],
+            "edges": [],
+        }
+    )
+    data = [[BatchDatum(node_path="1", field_name="prompt", items=["Strawberry sushi", "Orange sushi"])]]
+    batch = batch.model_copy(update={"data": data, "workflow": workflow, "runs": 1})
+    session_queue.enqueue_batch("default", batch, prepend=False)
+
+    # The graph and workflow are stored once, not in each queue item
+    with db.lock:
+        assert db.conn.execute("SELECT COUNT(*) FROM batches;").fetchone()[0] == 1
+        rows = db.conn.execute("SELECT DISTINCT session, workflow FROM session_queue;").fetchall()
+        assert [tuple(row) for row in rows] == [("", None)]
+
+    for prompt in ["Strawberry sushi", "Orange sushi"]:
+        queue_item = session_queue.dequeue()
+        assert queue_item is not None
+        assert queue_item.session.id == queue_item.session_id
+        assert queue_item.session.graph.get_node("1").prompt == prompt  # type: ignore
+        assert queue_item.workflow == workflow
+    # The batch's graph is unchanged
+    assert batch.graph.get_node("1").prompt == "Banana sushi"  # type: ignore
+
+
+def test_compressed_batches_are_loaded(
+    mock_services: InvocationServices, session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch
+):
+    mock_services.configuration.compress_queue = True
+    data = [[BatchDatum(node_path="1", field_name="prompt", items=["Strawberry sushi"])]]
+    session_queue.enqueue_batch("default", batch.model_copy(update={"data": data, "runs": 1}), prepend=False)
+    with db.lock:
+        assert db.conn.execute("SELECT typeof(graph) FROM batches;").fetchone()[0] == "blob"
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    assert queue_item.session.graph.get_node("1").prompt == "Strawberry sushi"  # type: ignore
+
+
+def test_fully_populated_sessions_are_loaded(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    # Queue items enqueued before batches were stored separately have their own sessions
+    insert_rows(db, batch, 1, "pending")
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    assert queue_item.session.graph.get_node("1").prompt == "Banana sushi"  # type: ignore
+
+
+def test_dequeue_fails_items_that_cannot_be_loaded(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    events = session_queue._SqliteSessionQueue__invoker.services.events  # type: ignore
+    assert isinstance(events, TestEventService)
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 2}), prepend=False)
+    with db.lock:
+        db.conn.execute("UPDATE batches SET graph = '{';")
+        db.conn.commit()
+    with pytest.raises(ValueError):
+        session_queue.dequeue()
+    # The claimed item is failed rather than left in progress, and the next item can still be claimed
+    assert count_statuses(db) == {"failed": 1, "pending": 1}
+    (changed,) = [e.payload for e in events.events if e.event_name == "queue_item_status_changed"]
+    assert changed["queue_item"]["status"] == "failed"
+    assert "Traceback" in changed["queue_item"]["error"]
+
+
+def test_prune_deletes_unreferenced_batches(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 1}), prepend=False)
+    pending_batch = batch.model_copy(update={"runs": 1, "batch_id": "pending"})
+    session_queue.enqueue_batch("default", pending_batch, prepend=False)
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    session_queue.cancel_queue_item(queue_item.item_id)
+    session_queue.prune("default")
+    with db.lock:
+        assert [row[0] for row in db.conn.execute("SELECT batch_id FROM batches;")] == ["pending"]
+    session_queue.clear("default")
+    with db.lock:
+        assert db.conn.execute("SELECT batch_id FROM batches;").fetchall() == []
+
+
+@pytest.mark.parametrize("cancel_by", ["batch_ids", "queue_id"])
+def test_cancel_emits_events_for_every_in_progress_item(
+    session_queue: SqliteSessionQueue, batch: Batch, cancel_by: str
+):
+    events = session_queue._SqliteSessionQueue__invoker.services.events  # type: ignore
+    assert isinstance(events, TestEventService)
+    session_queue.enqueue_batch("default", batch.model_copy(update={"runs": 3}), prepend=False)
+    # Two workers are running items
+    assert session_queue.dequeue() is not None
+    assert session_queue.dequeue() is not None
+    events.events.clear()
+    if cancel_by == "batch_ids":
+        assert session_queue.cancel_by_batch_ids("default", [batch.batch_id]).canceled == 3
+    else:
+        assert session_queue.cancel_by_queue_id("default").canceled == 3
+    canceled = [e.payload["queue_item_id"] for e in events.events if e.event_name == "session_canceled"]
+    assert canceled == [1, 2]
+    changed = [e.payload for e in events.events if e.event_name == "queue_item_status_changed"]
+    assert [(p["queue_item"]["item_id"], p["queue_item"]["status"]) for p in changed] == [
+        (1, "canceled"),
+        (2, "canceled"),
+    ]
+
+
+def test_enqueue_batch_in_chunks(session_queue: SqliteSessionQueue, batch: Batch, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(session_queue_sqlite, "_ENQUEUE_CHUNK_SIZE", 8)
+    events = session_queue._SqliteSessionQueue__invoker.services.events  # type: ignore
+    assert isinstance(events, TestEventService)
+    seen = session_queue.wakeup.count
+    result = session_queue.enqueue_batch("default", batch, prepend=False)
+    assert result.enqueued == 20
+    progress = [e.payload for e in events.events if e.event_name == "batch_enqueue_progress"]
+    assert [(p["enqueued"], p["total"]) for p in progress] == [(8, 20), (16, 20), (20, 20)]
+    # Consumers are woken for each chunk
+    assert session_queue.wakeup.count == seen + 3
+    assert [e.event_name for e in events.events][-1] == "batch_enqueued"
+
+
+def test_enqueue_batch_survives_clear_between_chunks(
+    session_queue: SqliteSessionQueue, batch: Batch, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(session_queue_sqlite, "_ENQUEUE_CHUNK_SIZE", 8)
+    events = session_queue._SqliteSessionQueue__invoker.services.events  # type: ignore
+    emit_batch_enqueue_progress = events.emit_batch_enqueue_progress
+
+    def clear_after_first_chunk(**kwargs: Any) -> None:
+        emit_batch_enqueue_progress(**kwargs)
+        if kwargs["enqueued"] == 8:
+            session_queue.clear("default")
+
+    monkeypatch.setattr(events, "emit_batch_enqueue_progress", clear_after_first_chunk)
+    assert session_queue.enqueue_batch("default", batch, prepend=False).enqueued == 20
+    # The remaining chunks still have their batch's graph
+    assert len(dequeue_all(session_queue)) == 12
+
+
+def test_enqueue_batch_rechecks_queue_size_for_each_chunk(
+    mock_services: InvocationServices, session_queue: SqliteSessionQueue, batch: Batch, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(session_queue_sqlite, "_ENQUEUE_CHUNK_SIZE", 8)
+    monkeypatch.setattr(mock_services.configuration, "max_queue_size", 20)
+    events = session_queue._SqliteSessionQueue__invoker.services.events  # type: ignore
+    emit_batch_enqueue_progress = events.emit_batch_enqueue_progress
+    other_batch = batch.model_copy(update={"batch_id": "other", "runs": 10})
+
+    def enqueue_other_batch_after_first_chunk(**kwargs: Any) -> None:
+        emit_batch_enqueue_progress(**kwargs)
+        if kwargs["batch_id"] == batch.batch_id and kwargs["enqueued"] == 8:
+            session_queue.enqueue_batch("default", other_batch, prepend=False)
+
+    monkeypatch.setattr(events, "emit_batch_enqueue_progress", enqueue_other_batch_after_first_chunk)
+    # Only 2 more items fit after the other batch's 10
+    assert session_queue.enqueue_batch("default", batch, prepend=False).enqueued == 10
+    assert session_queue.get_queue_status("default").pending == 20
+
+
+def test_enqueue_batch_memory_is_bounded(
+    mock_services: InvocationServices, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    # The database is on disk, so the enqueued items themselves don't use the process's memory
+    count = 20_000
+    config = InvokeAIAppConfig(db_dir=tmp_path, node_cache_size=0, max_queue_size=count)
+    db = create_mock_sqlite_database(config, logging.getLogger())
+    # SQLite's page cache and memory map are bounded separately. Shrink them, so only the enqueue's memory is measured.
+    db.conn.execute("PRAGMA cache_size = -2000;")
+    db.conn.execute("PRAGMA mmap_size = 0;")
+    session_queue = SqliteSessionQueue(db=db)
+    mock_services.configuration = config
+    mock_services.session_queue = session_queue
+    Invoker(services=mock_services)
+    graph = Graph()
+    for i in range(20):
+        graph.add_node(PromptTestInvocation(id=str(i), prompt="Banana sushi"))
+    data = [[BatchDatum(node_path="0", field_name="prompt", items=[f"Banana sushi {i}" for i in range(count)])]]
+    batch = Batch(graph=graph, data=data)
+
+    # Sample the process's memory after each chunk is inserted
+    process = psutil.Process()
+    rss_samples: list[int] = []
+    emit_batch_enqueue_progress = mock_services.events.emit_batch_enqueue_progress
+
+    def sample_rss(**kwargs: Any) -> None:
+        rss_samples.append(process.memory_info().rss)
+        emit_batch_enqueue_progress(**kwargs)
+
+    monkeypatch.setattr(mock_services.events, "emit_batch_enqueue_progress", sample_rss)
+    baseline_rss = process.memory_info().rss
+    assert session_queue.enqueue_batch("default", batch, prepend=False).enqueued == count
+    peak_growth = max(rss_samples) - baseline_rss
+    print(f"peak rss growth: {peak_growth / 2**20:.2f}MiB")
+    assert peak_growth < 6 * 2**20
+
+
+def insert_rows(db: SqliteDatabase, batch: Batch, count: int, status: str) -> None:
+    session = GraphExecutionState(graph=batch.graph).model_dump_json(warnings=False, exclude_none=True)
+    rows = (("default", session, str(uuid.uuid4()), batch.batch_id, None, 0, None, status) for _ in range(count))
+    with db.lock:
+        db.conn.executemany(
+            """--sql
+            INSERT INTO session_queue (queue_id, session, session_id, batch_id, field_values, priority, workflow, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+        db.conn.commit()
+
+
+def count_statuses(db: SqliteDatabase, batch_id: Optional[str] = None) -> dict[str, int]:
+    with db.lock:
+        rows = db.conn.execute(
+            "SELECT status, COUNT(*) FROM session_queue WHERE batch_id = ? OR ? IS NULL GROUP BY status;",
+            (batch_id, batch_id),
+        ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def test_status_counts_are_maintained(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    other_batch = batch.model_copy(update={"batch_id": "other", "runs": 5})
+    session_queue.enqueue_batch("default", batch, prepend=False)
+    session_queue.enqueue_batch("default", other_batch, prepend=False)
+    # Queue items enqueued before batches were stored separately are counted too
+    insert_rows(db, batch.model_copy(update={"batch_id": "legacy"}), 3, "completed")
+
+    def assert_counts_match() -> None:
+        queue_status = session_queue.get_queue_status("default").model_dump()
+        assert {status: queue_status[status] for status in count_statuses(db)} == count_statuses(db)
+        assert queue_status["total"] == sum(count_statuses(db).values())
+        for batch_id in [batch.batch_id, "other", "legacy"]:
+            batch_status = session_queue.get_batch_status("default", batch_id).model_dump()
+            assert {status: batch_status[status] for status in count_statuses(db, batch_id)} == count_statuses(
+                db, batch_id
+            )
+            assert batch_status["total"] == sum(count_statuses(db, batch_id).values())
+        assert session_queue.check_status_counts()
+
+    assert_counts_match()
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    session_queue._set_queue_item_status(queue_item.item_id, "completed")
+    queue_item = session_queue.dequeue()
+    assert queue_item is not None
+    session_queue.cancel_queue_item(queue_item.item_id, error="error")
+    assert_counts_match()
+    session_queue.cancel_by_batch_ids("default", ["other"])
+    session_queue.delete_queue_item(5)
+    assert_counts_match()
+    session_queue.prune("default")
+    assert_counts_match()
+    assert session_queue.get_batch_status("default", "other").total == 0
+    session_queue.clear("default")
+    assert_counts_match()
+    assert session_queue.is_empty("default").is_empty
+
+
+def test_check_status_counts_repairs(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    session_queue.enqueue_batch("default", batch, prepend=False)
+    with db.lock:
+        db.conn.execute("UPDATE session_queue_counts SET pending = 0, canceled = 3;")
+        db.conn.execute("UPDATE batches SET pending = 1;")
+        db.conn.commit()
+    assert not session_queue.check_status_counts()
+    assert not session_queue.check_status_counts(repair=True)
+    assert session_queue.check_status_counts()
+    assert session_queue.get_queue_status("default").pending == 20
+    assert session_queue.get_queue_status("default").canceled == 0
+    assert session_queue.get_batch_status("default", batch.batch_id).pending == 20
+
+
+def summarize(timings: list[float]) -> str:
+    timings = sorted(timings)
+    mean_ms = sum(timings) / len(timings) * 1000
+    p99_ms = timings[int(len(timings) * 0.99)] * 1000
+    return f"mean={mean_ms:.3f}ms p99={p99_ms:.3f}ms"
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("use_returning", [True, False])
+def test_dequeue_latency_benchmark(
+    session_queue: SqliteSessionQueue,
+    db: SqliteDatabase,
+    batch: Batch,
+    monkeypatch: pytest.MonkeyPatch,
+    use_returning: bool,
+):
+    monkeypatch.setattr(session_queue_sqlite, "_SQLITE_SUPPORTS_RETURNING", use_returning)
+    # 100k rows, the vast majority of which are finished - the typical shape of a long-lived queue
+    insert_rows(db, batch, 99_600, "completed")
+    insert_rows(db, batch, 400, "pending")
+
+    # The claim alone - the part of dequeue that finds and locks the next item
+    claim_timings: list[float] = []
+    for _ in range(200):
+        start = time.perf_counter()
+        with db.lock:
+            item_id = session_queue._claim_next_pending_item()
+            db.conn.commit()
+        claim_timings.append(time.perf_counter() - start)
+        assert item_id is not None
+
+    # The full dequeue, which also loads the item and emits a status changed event
+    dequeue_timings: list[float] = []
+    queue_item: Optional[object] = object()
+    while queue_item is not None:
+        start = time.perf_counter()
+        queue_item = session_queue.dequeue()
+        dequeue_timings.append(time.perf_counter() - start)
+
+    print(f"\nclaim over 100k rows (returning={use_returning}): {summarize(claim_timings)}")
+    print(f"dequeue over 100k rows (returning={use_returning}): {summarize(dequeue_timings)}")
+    assert len(dequeue_timings) == 201
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("count", [10, 1_000, 10_000])
+def test_enqueue_batch_benchmark(session_queue: SqliteSessionQueue, db: SqliteDatabase, count: int):
+    # A graph the size of a typical generation graph, with one of its fields varied by the batch
+    graph = Graph()
+    for i in range(20):
+        graph.add_node(PromptTestInvocation(id=str(i), prompt="Banana sushi"))
+    data = [[BatchDatum(node_path="0", field_name="prompt", items=[f"Banana sushi {i}" for i in range(count)])]]
+    batch = Batch(graph=graph, data=data)
+
+    # Poll the queue status while the batch is enqueued, as the UI does
+    done = threading.Event()
+    poll_timings: list[float] = []
+
+    def poll() -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            session_queue.get_queue_status("default")
+            poll_timings.append(time.perf_counter() - start)
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    start = time.perf_counter()
+    result = session_queue.enqueue_batch("default", batch, prepend=False)
+    elapsed = time.perf_counter() - start
+    done.set()
+    poller.join()
+    with db.lock:
+        ((page_count,),) = db.conn.execute("PRAGMA page_count;").fetchall()
+        ((page_size,),) = db.conn.execute("PRAGMA page_size;").fetchall()
+    print(
+        f"\nenqueue {count} items: {elapsed * 1000:.1f}ms, db size={page_count * page_size / 2**20:.2f}MiB, "
+        f"max status poll={max(poll_timings) * 1000:.1f}ms"
+    )
+    assert result.enqueued == count
+
+
+@pytest.mark.slow
+def test_status_benchmark(session_queue: SqliteSessionQueue, db: SqliteDatabase, batch: Batch):
+    # 500k rows across 500 batches, the vast majority of which are finished
+    for i in range(500):
+        insert_rows(db, batch.model_copy(update={"batch_id": str(i)}), 999, "completed")
+        insert_rows(db, batch.model_copy(update={"batch_id": str(i)}), 1, "pending")
+
+    def legacy_get_queue_status() -> None:
+        with db.lock:
+            db.conn.execute(
+                "SELECT status, count(*) FROM session_queue WHERE queue_id = ? GROUP BY status;", ("default",)
+            ).fetchall()
+
+    def legacy_get_batch_status() -> None:
+        with db.lock:
+            db.conn.execute(
+                "SELECT status, count(*) FROM session_queue WHERE queue_id = ? AND batch_id = ? GROUP BY status;",
+                ("default", "250"),
+            ).fetchall()
+
+    for name, get_status in [
+        ("legacy queue status", legacy_get_queue_status),
+        ("queue status", lambda: session_queue.get_queue_status("default")),
+        ("legacy batch status", legacy_get_batch_status),
+        ("batch status", lambda: session_queue.get_batch_status("default", "250")),
+    ]:
+        timings: list[float] = []
+        for _ in range(20):
+            start = time.perf_counter()
+            get_status()
+            timings.append(time.perf_counter() - start)
+        print(f"\n{name} over 500k rows: {summarize(timings)}")
+
+    start = time.perf_counter()
+    assert session_queue.check_status_counts()
+    print(f"check_status_counts over 500k rows: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("compress_queue", [False, True])
+def test_queue_storage_benchmark(
+    mock_services: InvocationServices, session_queue: SqliteSessionQueue, db: SqliteDatabase, compress_queue: bool
+):
+    mock_services.configuration.compress_queue = compress_queue
+    count = 1000
+    # A 40 node graph and its workflow, with one of its fields varied by the batch
+    graph = Graph()
+    workflow_nodes: list[dict[str, Any]] = []
+    for i in range(40):
+        graph.add_node(PromptTestInvocation(id=str(i), prompt=f"A photograph of banana sushi, course {i}"))
+        if i > 0:
+            graph.add_edge(
+                Edge(
+                    source=EdgeConnection(node_id=str(i - 1), field="prompt"),
+                    destination=EdgeConnection(node_id=str(i), field="prompt"),
+                )
+            )
+        workflow_nodes.append(
+            {
+                "id": str(i),
+                "type": "invocation",
+                "position": {"x": i * 400.0, "y": 120.0},
+                "data": {
+                    "id": str(i),
+                    "type": "test_prompt",
+                    "version": "1.0.0",
+                    "label": "",
+                    "notes": "",
+                    "isOpen": True,
+                    "isIntermediate": True,
+                    "useCache": True,
+                    "inputs": {
+                        "prompt": {"name": "prompt", "label": "", "value": f"A photograph of banana sushi, course {i}"}
+                    },
+                },
+            }
+        )
+    workflow = WorkflowWithoutID.model_validate(
+        {
+            **dict.fromkeys(["name", "author", "description", "version", "contact", "tags", "notes"], ""),
+            "exposedFields": [],
+            "meta": {"version": "2.0.0"},
+            "nodes": workflow_nodes,
+            "edges": [],
+        }
+    )
+    data = [[BatchDatum(node_path="0", field_name="prompt", items=[f"Banana sushi {i}" for i in range(count)])]]
+    batch = Batch(graph=graph, data=data, workflow=workflow)
+
+    def get_db_size() -> int:
+        with db.lock:
+            ((page_count,),) = db.conn.execute("PRAGMA page_count;").fetchall()
+            ((page_size,),) = db.conn.execute("PRAGMA page_size;").fetchall()
+        return page_count * page_size
+
+    db_size = get_db_size()
+    start = time.perf_counter()
+    session_queue.enqueue_batch("default", batch, prepend=False)
+    store_time = time.perf_counter() - start
+    db_size = get_db_size() - db_size
+    with db.lock:
+        ((stored_size,),) = db.conn.execute(
+            "SELECT SUM(LENGTH(graph) + COALESCE(LENGTH(workflow), 0)) FROM batches;"
+        ).fetchall()
+    load_timings: list[float] = []
+    for item_id in range(1, 201):
+        start = time.perf_counter()
+        session_queue.get_queue_item(item_id)
+        load_timings.append(time.perf_counter() - start)
+    print(
+        f"\n{count} items (compress_queue={compress_queue}): graph+workflow={stored_size}B, "
+        f"db bytes/item={db_size / count:.0f}, store={store_time / count * 1e6:.1f}us/item, "
+        f"load {summarize(load_timings)}"
+    )
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from invokeai.app.services.config.config_default import InvokeAIAppConfig
+from invokeai.app.services.image_records.image_records_common import ImageCategory, ImageRecordChanges, ResourceOrigin
+from invokeai.app.services.image_records.image_records_sqlite import SqliteImageRecordStorage
+from invokeai.app.services.shared.sqlite.sqlite_database import SqliteDatabase
+from tests.fixtures.sqlite_database import create_mock_sqlite_database
+
+
+def create_table(db: SqliteDatabase) -> None:
+    with db.lock:
+        db.conn.execute("CREATE TABLE items (value INTEGER NOT NULL);")
+        db.conn.execute("INSERT INTO items (value) VALUES (1);")
+        db.conn.commit()
+
+
+def test_reads_are_not_blocked_by_writes(tmp_path: Path):
+    db = SqliteDatabase(tmp_path / "test.db", logging.getLogger())
+    create_table(db)
+    assert db.conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+
+    values: list[int] = []
+
+    def read() -> None:
+        with db.read_cursor() as cursor:
+            values.append(cursor.execute("SELECT value FROM items;").fetchone()[0])
+
+    # A write is in progress, but reads see the last commit without waiting for it
+    with db.lock:
+        db.conn.execute("UPDATE items SET value = 2;")
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join(timeout=1)
+        assert values == [1]
+        db.conn.commit()
+    read()
+    assert values == [1, 2]
+
+    with db.read_cursor() as cursor, pytest.raises(Exception, match="readonly"):
+        cursor.execute("UPDATE items SET value = 3;")
+
+
+def test_memory_database_reads_use_the_connection():
+    db = SqliteDatabase(None, logging.getLogger())
+    create_table(db)
+    with db.lock:
+        db.conn.execute("UPDATE items SET value = 2;")
+        # The lock is re-entrant, so the thread writing can read its own changes
+        with db.read_cursor() as cursor:
+            assert cursor.execute("SELECT value FROM items;").fetchone()[0] == 2
+        db.conn.rollback()
+
+
+def run_mixed_load(db: SqliteDatabase, duration: float) -> tuple[list[float], int]:
+    """Runs 12 threads that list images and 4 that add and star an image every 10ms, as the API would with a busy
+    gallery while the queue generates images. Returns the latency of each read and the number of writes."""
+    image_records = SqliteImageRecordStorage(db=db)
+    read_latencies: list[float] = []
+    writes = [0]
+    stop = threading.Event()
+
+    def read() -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            page = image_records.get_many_by_cursor(limit=40, categories=[ImageCategory.GENERAL])
+            for record in page.items[:5]:
+                image_records.get(record.image_name)
+            read_latencies.append(time.perf_counter() - start)
+
+    def write(thread: int) -> None:
+        i = 0
+        while not stop.is_set():
+            image_name = f"{thread}_{i}.png"
+            image_records.save(image_name, ResourceOrigin.INTERNAL, ImageCategory.GENERAL, 512, 512, False)
+            image_records.update(image_name, ImageRecordChanges(starred=i % 2 == 0))
+            writes[0] += 2
+            i += 1
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=read) for _ in range(12)]
+    threads += [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return read_latencies, writes[0]
+
+
+@pytest.mark.slow
+def test_mixed_load_benchmark(tmp_path: Path):
+    for name in ["legacy", "current"]:
+        config = InvokeAIAppConfig(db_dir=tmp_path / name, node_cache_size=0)
+        db = create_mock_sqlite_database(config, logging.getLogger())
+        if name == "legacy":
+            # A single connection with SQLite's default journal and pragmas
+            db._use_read_conns = False
+            db.conn.execute("PRAGMA journal_mode = DELETE;")
+            db.conn.execute("PRAGMA synchronous = FULL;")
+            db.conn.execute("PRAGMA cache_size = -2000;")
+            db.conn.execute("PRAGMA mmap_size = 0;")
+        read_latencies, writes = run_mixed_load(db, duration=5)
+        read_latencies.sort()
+        print(
+            f"\n{name} 16 threads for 5s: {len(read_latencies)} reads "
+            f"p50={read_latencies[len(read_latencies) // 2] * 1000:.2f}ms "
+            f"p99={read_latencies[int(len(read_latencies) * 0.99)] * 1000:.2f}ms, {writes} writes"
+        )
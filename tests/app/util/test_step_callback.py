@@ -0,0 +1,116 @@
+import time
+from typing import Optional
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+# This import must happen before other invoke imports or test in other files(!!) break
+from tests.test_nodes import TestEventService  # isort: split
+
+from invokeai.app.util.step_callback import (
+    ProgressImagePolicy,
+    get_latent_rgb_factors,
+    stable_diffusion_step_callback,
+)
+from invokeai.backend.model_manager.config import BaseModelType
+from invokeai.backend.stable_diffusion import PipelineIntermediateState
+
+
+class UnsubscribedEventService(TestEventService):
+    def has_subscribers(self, queue_id: str) -> bool:
+        return False
+
+
+def run_steps(
+    events: TestEventService,
+    steps: int,
+    base_model: BaseModelType = BaseModelType.StableDiffusion1,
+    latents_size: int = 64,
+    policy: Optional[ProgressImagePolicy] = None,
+    rebuild_factors: bool = False,
+) -> None:
+    context_data = MagicMock()
+    latents = torch.randn(1, 4, latents_size, latents_size)
+    for step in range(steps):
+        if rebuild_factors:
+            get_latent_rgb_factors.cache_clear()
+        stable_diffusion_step_callback(
+            context_data=context_data,
+            intermediate_state=PipelineIntermediateState(
+                step=step, order=1, total_steps=steps, timestep=0, latents=latents
+            ),
+            base_model=base_model,
+            events=events,
+            is_canceled=lambda: False,
+            progress_image_policy=policy,
+        )
+
+
+def steps_with_images(events: TestEventService) -> list[int]:
+    return [e.payload["step"] for e in events.events if e.payload["progress_image"] is not None]
+
+
+def test_progress_image_every_nth_step():
+    events = TestEventService()
+    run_steps(events, 10, policy=ProgressImagePolicy(step_interval=3))
+    assert len(events.events) == 10
+    assert steps_with_images(events) == [0, 3, 6, 9]
+
+
+def test_progress_image_min_interval():
+    events = TestEventService()
+    run_steps(events, 10, policy=ProgressImagePolicy(min_interval_ms=60_000))
+    assert steps_with_images(events) == [0]
+
+
+def test_no_progress_image_without_subscribers():
+    events = UnsubscribedEventService()
+    run_steps(events, 3)
+    assert len(events.events) == 3
+    assert steps_with_images(events) == []
+
+
+def test_webp_progress_image():
+    events = TestEventService()
+    run_steps(events, 1, policy=ProgressImagePolicy(image_format="WEBP"))
+    progress_image = events.events[0].payload["progress_image"]
+    assert progress_image["dataURL"].startswith("data:image/webp;base64,")
+    assert (progress_image["width"], progress_image["height"]) == (512, 512)
+
+
+def test_latent_rgb_factors_are_cached():
+    factors = get_latent_rgb_factors(BaseModelType.StableDiffusionXL, torch.float32, torch.device("cpu"))
+    assert factors is get_latent_rgb_factors(BaseModelType.StableDiffusionXL, torch.float32, torch.device("cpu"))
+    assert factors[1] is not None
+    assert get_latent_rgb_factors(BaseModelType.StableDiffusion1, torch.float32, torch.device("cpu"))[1] is None
+
+
+@pytest.mark.slow
+def test_step_callback_benchmark():
+    steps = 100
+    # SD1.5 at 512x512 and SDXL at 1024x1024
+    for base_model, latents_size in [(BaseModelType.StableDiffusion1, 64), (BaseModelType.StableDiffusionXL, 128)]:
+        # Warm up the encoders
+        run_steps(TestEventService(), 2, base_model=base_model, latents_size=latents_size)
+        for name, events, policy in [
+            ("legacy", TestEventService(), ProgressImagePolicy()),
+            ("jpeg every step", TestEventService(), ProgressImagePolicy()),
+            ("webp every step", TestEventService(), ProgressImagePolicy(image_format="WEBP")),
+            ("jpeg every 5th step", TestEventService(), ProgressImagePolicy(step_interval=5)),
+            ("no subscribers", UnsubscribedEventService(), ProgressImagePolicy()),
+        ]:
+            start = time.perf_counter()
+            run_steps(
+                events,
+                steps,
+                base_model=base_model,
+                latents_size=latents_size,
+                policy=policy,
+                # Before the factors were cached, they were created for every step
+                rebuild_factors=name == "legacy",
+            )
+            per_step_ms = (time.perf_counter() - start) / steps * 1000
+            progress_image = events.events[0].payload["progress_image"]
+            payload_size = len(progress_image["dataURL"]) if progress_image is not None else 0
+            print(f"\n{base_model.value} {name}: {per_step_ms:.3f}ms per step, image payload={payload_size}B")
@@ -0,0 +1,307 @@
+"""
+Test the model cache
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional
+
+import pytest
+import torch
+
+from invokeai.app.services.config import InvokeAIAppConfig
+from invokeai.backend.model_manager import SubModelType
+from invokeai.backend.model_manager.load.convert_cache import ModelConvertCache
+from invokeai.backend.model_manager.load.load_default import ModelLoader
+from invokeai.backend.model_manager.load.model_cache.model_cache_default import ModelCache
+from invokeai.backend.model_manager.load.model_util import calc_model_size_by_data
+
+
+def create_cache(max_cache_size: float = 1.0) -> ModelCache:
+    return ModelCache(
+        max_cache_size=max_cache_size,
+        max_vram_cache_size=0,
+        execution_device=torch.device("cpu"),
+        storage_device=torch.device("cpu"),
+    )
+
+
+class CountingLoader:
+    """Loads tiny torch modules, recording how many times each key is loaded and how many loads overlap"""
+
+    def __init__(self, load_time: float = 0.01):
+        self.load_time = load_time
+        self.loads: Counter[str] = Counter()
+        self.loading: set[str] = set()
+        self.max_concurrent_loads = 0
+        self.duplicate_loads = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, key: str) -> tuple[torch.nn.Module, int]:
+        with self._lock:
+            if key in self.loading:
+                self.duplicate_loads += 1
+            self.loading.add(key)
+            self.loads[key] += 1
+            self.max_concurrent_loads = max(self.max_concurrent_loads, len(self.loading))
+        time.sleep(self.load_time)
+        model = torch.nn.Linear(16, 16)
+        with self._lock:
+            self.loading.discard(key)
+        return model, calc_model_size_by_data(model)
+
+
+def test_concurrent_loads_of_a_model_load_it_once():
+    cache = create_cache()
+    loader = CountingLoader(load_time=0.1)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        lockers = list(executor.map(lambda _: cache.load("model", lambda: loader("model")), range(8)))
+    assert loader.loads["model"] == 1
+    assert all(locker.model is lockers[0].model for locker in lockers)
+
+
+def test_different_models_load_in_parallel():
+    cache = create_cache()
+    loader = CountingLoader(load_time=0.1)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: cache.load(f"model_{i}", lambda: loader(f"model_{i}")), range(4)))
+    assert loader.max_concurrent_loads == 4
+
+
+def test_failed_load_is_raised_to_every_waiting_thread():
+    cache = create_cache()
+    calls = 0
+
+    def failing_loader() -> tuple[torch.nn.Module, int]:
+        nonlocal calls
+        calls += 1
+        time.sleep(0.1)
+        raise ValueError("corrupt model")
+
+    def load() -> None:
+        with pytest.raises(ValueError, match="corrupt model"):
+            cache.load("model", failing_loader)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for future in [executor.submit(load) for _ in range(4)]:
+            future.result()
+    assert calls == 1
+    # The failure is not cached
+    cache.load("model", lambda: (torch.nn.Linear(1, 1), 8))
+    assert cache.exists("model")
+
+
+class ConvertingLoader(ModelLoader):
+    """Converts a fake checkpoint into a pipeline of tiny torch modules, counting the conversions"""
+
+    def __init__(self, ram_cache: ModelCache, convert_cache: ModelConvertCache, conversions: Counter[str]):
+        super().__init__(
+            app_config=InvokeAIAppConfig(),
+            logger=logging.getLogger(),
+            ram_cache=ram_cache,
+            convert_cache=convert_cache,
+        )
+        self.conversions = conversions
+
+    def _needs_conversion(self, config: Any, model_path: Path, dest_path: Path) -> bool:
+        return True
+
+    def _convert_model(self, config: Any, model_path: Path, output_path: Optional[Path] = None) -> Any:
+        self.conversions[config.key] += 1
+        time.sleep(0.1)
+        return SimpleNamespace(unet=torch.nn.Linear(16, 16), vae=torch.nn.Linear(16, 16))
+
+
+def test_concurrent_loads_of_submodels_convert_the_model_once(tmp_path: Path):
+    cache = create_cache()
+    convert_cache = ModelConvertCache(tmp_path / "convert_cache", max_size=0)
+    model_path = tmp_path / "model.safetensors"
+    model_path.write_bytes(b"checkpoint")
+    config = SimpleNamespace(key="model", base="sd-1", type="main", name="model")
+    conversions: Counter[str] = Counter()
+
+    def load(submodel_type: SubModelType) -> Any:
+        loader = ConvertingLoader(cache, convert_cache, conversions)
+        return loader._convert_and_load(config, model_path, submodel_type).model  # type: ignore
+
+    submodel_types = [SubModelType.UNet, SubModelType.VAE] * 4
+    with ThreadPoolExecutor(max_workers=len(submodel_types)) as executor:
+        models = list(executor.map(load, submodel_types))
+    assert conversions["model"] == 1
+    assert all(m is models[0] for m in models[::2]) and all(m is models[1] for m in models[1::2])
+    assert models[0] is not models[1]
+
+
+# With room for 4, models are evicted and reloaded while other threads use them
+@pytest.mark.parametrize("cache_room", [12, 4])
+def test_overlapping_keys_stress(cache_room: int):
+    model_size = calc_model_size_by_data(torch.nn.Linear(16, 16))
+    cache = create_cache(max_cache_size=model_size * (cache_room + 0.5) / 2**30)
+    loader = CountingLoader(load_time=0.001)
+    keys = [f"model_{i}" for i in range(12)]
+    errors: list[Exception] = []
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(25):
+            key = rng.choice(keys)
+            try:
+                locker = cache.load(key, lambda key=key: loader(key))
+                model = locker.lock()
+                try:
+                    model(torch.zeros(1, 16))
+                finally:
+                    del model
+                    locker.unlock()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert loader.duplicate_loads == 0
+    if cache_room < len(keys):
+        assert sum(loader.loads.values()) > len(keys)
+    else:
+        assert sum(loader.loads.values()) == len(keys)
+    # Models in use by other threads can't be evicted, so the cache may briefly hold more than its limit
+    assert len(cache._cached_models) <= cache_room + 8
+    # Nothing is locked any more, so every model can be evicted
+    assert sorted(cache._lru) == sorted(cache._cached_models)
+    assert cache.cache_size() == sum(record.size for record in cache._cached_models.values())
+
+
+class SlowMovingModel(torch.nn.Module):
+    """A model whose moves between devices block until released"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.device = torch.device("cpu")
+        self.moving = threading.Event()
+        self.release = threading.Event()
+
+    def to(self, device: torch.device) -> "SlowMovingModel":  # type: ignore
+        self.moving.set()
+        assert self.release.wait(timeout=5)
+        self.device = torch.device(device)
+        return self
+
+
+def test_models_are_moved_without_locking_the_cache():
+    cache = ModelCache(max_vram_cache_size=0, execution_device=torch.device("cuda"), storage_device=torch.device("cpu"))
+    model = SlowMovingModel()
+    cache.put("slow", model, size=8)
+    locker = cache.get("slow")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        try:
+            lock_future = executor.submit(locker.lock)
+            assert model.moving.wait(timeout=5)
+            # Other threads can use the cache while the model moves
+            with ThreadPoolExecutor(max_workers=1) as other_executor:
+                other_executor.submit(cache.put, "other", torch.nn.Linear(1, 1), 8).result(timeout=1)
+        finally:
+            model.release.set()
+        assert lock_future.result() is model
+        assert model.device == torch.device("cuda")
+        # The model is unlocked by the thread that locked it
+        executor.submit(locker.unlock).result()
+    assert model.device == torch.device("cpu")
+    assert sorted(cache._lru) == ["other", "slow"]
+
+
+def test_locked_model_is_not_used_by_other_threads():
+    cache = create_cache()
+    cache.put("model", torch.nn.Linear(1, 1), 8)
+    locker = cache.get("model")
+    # The thread that locked the model can lock it again, e.g. to patch it
+    locker.lock()
+    locker.lock()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other_lock = executor.submit(cache.get("model").lock)
+        locker.unlock()
+        time.sleep(0.1)
+        assert not other_lock.done()
+        locker.unlock()
+        other_lock.result(timeout=5)
+        executor.submit(cache.get("model").unlock).result()
+    assert list(cache._lru) == ["model"]
+
+
+def put_models(cache: ModelCache, keys: list[str], size: int) -> None:
+    for key in keys:
+        cache.make_room(size)
+        cache.put(key, torch.nn.Linear(1, 1), size)
+
+
+def test_least_recently_used_model_is_evicted():
+    cache = create_cache(max_cache_size=3.5 * 2**20 / 2**30)
+    put_models(cache, ["a", "b", "c"], 2**20)
+    cache.get("a")
+    put_models(cache, ["d"], 2**20)
+    assert sorted(cache._cached_models) == ["a", "c", "d"]
+    assert cache.cache_size() == 3 * 2**20
+
+
+def test_locked_model_is_not_evicted():
+    cache = create_cache(max_cache_size=2.5 * 2**20 / 2**30)
+    put_models(cache, ["a", "b"], 2**20)
+    locker = cache.get("a")
+    locker.lock()
+    put_models(cache, ["c", "d"], 2**20)
+    assert sorted(cache._cached_models) == ["a", "d"]
+    # Once unlocked, it is the most recently used
+    locker.unlock()
+    put_models(cache, ["e"], 2**20)
+    assert sorted(cache._cached_models) == ["a", "e"]
+
+
+def test_referenced_model_is_evicted_after_unreferenced_ones():
+    cache = create_cache(max_cache_size=3.5 * 2**20 / 2**30)
+    put_models(cache, ["a", "b", "c"], 2**20)
+    model = cache.get("a").model
+    cache.get("b")
+    cache.get("c")
+    put_models(cache, ["d"], 2**20)
+    assert sorted(cache._cached_models) == ["a", "c", "d"]
+    assert list(cache._lru) == ["a", "c", "d"]
+    del model
+    put_models(cache, ["e"], 2**20)
+    assert sorted(cache._cached_models) == ["c", "d", "e"]
+
+
+@pytest.mark.slow
+def test_cache_operations_benchmark():
+    count = 4000
+    size = 2**20
+    rng = random.Random(0)
+    # Room for half of the models, so every other put evicts one
+    cache = create_cache(max_cache_size=(count / 2 + 0.5) * size / 2**30)
+    keys = [f"model_{i}" for i in range(count)]
+
+    start = time.perf_counter()
+    put_models(cache, keys[: count // 2], size)
+    fill_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(count):
+        cache.get(rng.choice(keys[: count // 2]))
+    get_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    put_models(cache, keys[count // 2 :], size)
+    evict_time = time.perf_counter() - start
+
+    assert len(cache._cached_models) == count // 2
+    for name, elapsed in [("put", fill_time), ("get", get_time), ("put with eviction", evict_time)]:
+        ops = count if name == "get" else count // 2
+        print(f"\n{name}: {elapsed / ops * 1e6:.1f}us per operation over {ops} operations")
@@ -2,9 +2,14 @@
 
 # test that LoRA patching works on both CPU and CUDA
 
+import gc
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 import torch
 
+from invokeai.backend import model_patcher
 from invokeai.backend.lora import LoRALayer, LoRAModelRaw
 from invokeai.backend.model_patcher import ModelPatcher
 
@@ -100,3 +105,128 @@ def test_apply_lora_change_device():
     # After unpatching, the original model weights should have been restored on the GPU.
     assert model["linear_layer_1"].weight.data.device.type == "cuda"
     torch.testing.assert_close(model["linear_layer_1"].weight.data, orig_linear_weight, check_device=False)
+
+
+def linear_lora(name: str, layer_keys: list[str], in_features: int, out_features: int, rank: int = 2) -> LoRAModelRaw:
+    layers = {
+        key: LoRALayer(
+            layer_key=key,
+            values={
+                "lora_down.weight": torch.ones((rank, in_features)),
+                "lora_up.weight": torch.ones((out_features, rank)),
+            },
+        )
+        for key in layer_keys
+    }
+    return LoRAModelRaw(name, layers)
+
+
+@torch.no_grad()
+def test_apply_lora_caches_patch_plan(monkeypatch: pytest.MonkeyPatch):
+    """Test that a LoRA's keys are resolved the first time it is applied to a model, and that the plan is dropped with
+    the LoRA.
+    """
+    model = torch.nn.ModuleDict({"linear_1": torch.nn.Linear(4, 8), "linear_2": torch.nn.Linear(4, 8)})
+    lora = linear_lora("lora_name", ["lora_unet_linear_1", "lora_unet_linear_2", "lora_te_linear_1"], 4, 8)
+
+    resolved: list[str] = []
+    resolve_lora_key = ModelPatcher._resolve_lora_key
+    monkeypatch.setattr(
+        ModelPatcher, "_resolve_lora_key", lambda *args: resolved.append(args[1]) or resolve_lora_key(*args)
+    )
+
+    for _ in range(2):
+        with ModelPatcher.apply_lora(model, [(lora, 1.0)], prefix="lora_unet_"):
+            pass
+    with ModelPatcher.apply_lora(model, [(lora, 1.0)], prefix="lora_te_"):
+        pass
+    assert resolved == ["lora_unet_linear_1", "lora_unet_linear_2", "lora_te_linear_1"]
+
+    del lora
+    gc.collect()
+    assert len(ModelPatcher._lora_patch_plans[model]) == 0
+
+
+def test_lora_patch_plan_is_made_once_by_concurrent_threads(monkeypatch: pytest.MonkeyPatch):
+    model = torch.nn.ModuleDict({"linear_1": torch.nn.Linear(4, 8), "linear_2": torch.nn.Linear(4, 8)})
+    lora = linear_lora("lora_name", ["linear_1", "linear_2"], 4, 8)
+
+    resolved: list[str] = []
+    resolve_lora_key = ModelPatcher._resolve_lora_key
+
+    def slow_resolve_lora_key(*args):
+        resolved.append(args[1])
+        time.sleep(0.05)
+        return resolve_lora_key(*args)
+
+    monkeypatch.setattr(ModelPatcher, "_resolve_lora_key", slow_resolve_lora_key)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        plans = list(executor.map(lambda _: ModelPatcher._get_lora_patch_plan(model, lora, ""), range(4)))
+    assert resolved == ["linear_1", "linear_2"]
+    assert all(plan is plans[0] for plan in plans)
+
+
+@torch.no_grad()
+def test_apply_lora_in_batches(monkeypatch: pytest.MonkeyPatch):
+    """Test that stacked LoRAs are applied and removed correctly when their layers are moved to the device in several
+    batches.
+    """
+    # Room for two of the 128 byte layers in each batch
+    monkeypatch.setattr(model_patcher, "LORA_TRANSFER_BATCH_SIZE", 256)
+    model = torch.nn.ModuleDict({f"linear_{i}": torch.nn.Linear(8, 8) for i in range(5)})
+    loras = [linear_lora(f"lora_{j}", [f"linear_{i}" for i in range(5)], 8, 8) for j in range(3)]
+    orig_weights = {key: module.weight.detach().clone() for key, module in model.items()}
+
+    assert [len(batch) for batch in ModelPatcher._get_lora_patch_plan(model, loras[0], "")] == [2, 2, 1]
+    with ModelPatcher.apply_lora(model, [(lora, 0.5) for lora in loras], prefix=""):
+        for key, module in model.items():
+            torch.testing.assert_close(module.weight, orig_weights[key] + 3 * 2 * 0.5)
+    for key, module in model.items():
+        torch.testing.assert_close(module.weight, orig_weights[key])
+
+
+@pytest.mark.slow
+@torch.no_grad()
+def test_apply_lora_benchmark():
+    from diffusers import UNet2DConditionModel
+
+    torch.manual_seed(0)
+    # A UNet with the SD-1 layout and a fifth of its channels, patched by rank 16 LoRAs of its attention layers
+    unet = UNet2DConditionModel(block_out_channels=(64, 128, 256, 256))
+    attention_layers = [
+        (key, module)
+        for key, module in unet.named_modules()
+        if isinstance(module, torch.nn.Linear) and (".attn" in key or ".proj_" in key or ".ff." in key)
+    ]
+    loras = []
+    for i in range(10):
+        layers = {}
+        for key, module in attention_layers:
+            layer_key = "lora_unet_" + key.replace(".", "_")
+            layers[layer_key] = LoRALayer(
+                layer_key=layer_key,
+                values={
+                    "lora_down.weight": torch.randn((16, module.weight.shape[1])),
+                    "lora_up.weight": torch.randn((module.weight.shape[0], 16)),
+                    "alpha": torch.tensor(8.0),
+                },
+            )
+        loras.append(LoRAModelRaw(f"lora_{i}", layers))
+
+    for lora_count in [1, 5, 10]:
+        applied = [(lora, 0.5) for lora in loras[:lora_count]]
+        for name in ["first use", "cached"]:
+            patch_times, unpatch_times = [], []
+            for _ in range(5):
+                if name == "first use":
+                    ModelPatcher._lora_patch_plans.clear()
+                start = time.perf_counter()
+                with ModelPatcher.apply_lora_unet(unet, applied):
+                    patched = time.perf_counter()
+                patch_times.append(patched - start)
+                unpatch_times.append(time.perf_counter() - patched)
+            print(
+                f"\n{lora_count} LoRAs ({len(attention_layers)} layers each), {name}:"
+                f" patch {min(patch_times) * 1000:.0f}ms, unpatch {min(unpatch_times) * 1000:.0f}ms"
+            )
@@ -0,0 +1,227 @@
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+from diffusers import AutoencoderKL
+from omegaconf import OmegaConf
+from safetensors.torch import save_file
+
+import invokeai.configs as model_configs
+from invokeai.backend.lora import LoRAModelRaw
+from invokeai.backend.model_manager.convert_ckpt_to_diffusers import convert_ldm_vae_to_diffusers
+from invokeai.backend.model_manager.load.model_util import calc_model_size_by_data
+from invokeai.backend.model_manager.util.model_util import read_checkpoint
+from invokeai.backend.textual_inversion import TextualInversionModelRaw
+
+MB = 2**20
+
+requires_proc = pytest.mark.skipif(not Path("/proc/self/status").exists(), reason="requires /proc")
+
+
+def private_memory() -> int:
+    """The process's anonymous (private) resident memory, in bytes"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("RssAnon not found")
+
+
+def vae_config(ch: int, ch_mult: list[int], num_res_blocks: int):
+    config = OmegaConf.load(Path(model_configs.__path__[0]) / "stable-diffusion/v1-inference.yaml")
+    ddconfig = config.model.params.first_stage_config.params.ddconfig
+    ddconfig.ch, ddconfig.ch_mult, ddconfig.num_res_blocks = ch, ch_mult, num_res_blocks
+    return config
+
+
+def ldm_vae_checkpoint(vae: AutoencoderKL) -> dict[str, torch.Tensor]:
+    """Renames a diffusers VAE's weights to the original (LDM) format"""
+    num_blocks = len(vae.config.block_out_channels)
+    checkpoint = {}
+    for key, value in vae.state_dict().items():
+        key = key.replace("conv_norm_out", "norm_out").replace("conv_shortcut", "nin_shortcut")
+        key = re.sub(r"down_blocks\.(\d+)\.resnets\.", r"down.\1.block.", key)
+        key = re.sub(r"down_blocks\.(\d+)\.downsamplers\.0\.", r"down.\1.downsample.", key)
+        key = re.sub(r"up_blocks\.(\d+)\.resnets\.", lambda m: f"up.{num_blocks - 1 - int(m[1])}.block.", key)
+        key = re.sub(r"up_blocks\.(\d+)\.upsamplers\.0\.", lambda m: f"up.{num_blocks - 1 - int(m[1])}.upsample.", key)
+        key = re.sub(r"mid_block\.resnets\.(\d+)\.", lambda m: f"mid.block_{int(m[1]) + 1}.", key)
+        if "mid_block.attentions.0." in key:
+            key = key.replace("mid_block.attentions.0.", "mid.attn_1.").replace("group_norm", "norm")
+            key = key.replace("to_q", "q").replace("to_k", "k").replace("to_v", "v").replace("to_out.0", "proj_out")
+            # The attention projections are 1x1 convolutions
+            if key.endswith("weight") and not key.endswith("norm.weight"):
+                value = value[:, :, None, None]
+        checkpoint[f"first_stage_model.{key}"] = value.contiguous()
+    return checkpoint
+
+
+@requires_proc
+@pytest.mark.parametrize("suffix", [".safetensors", ".pt"])
+def test_read_checkpoint_maps_the_file(tmp_path: Path, suffix: str):
+    tensors = {f"weight_{i}": torch.randn(1024, 1024) for i in range(16)}
+    path = tmp_path / f"model{suffix}"
+    save_file(tensors, path) if suffix == ".safetensors" else torch.save(tensors, path)
+
+    before = private_memory()
+    mapped = read_checkpoint(path)
+    assert all(torch.equal(mapped[k], v) for k, v in tensors.items())
+    # The 64MB of weights were read from the page cache, not copied into process memory
+    assert private_memory() - before < 16 * MB
+
+
+def test_read_checkpoint_copies_legacy_pickles(tmp_path: Path):
+    tensors = {"weight": torch.randn(4, 4)}
+    torch.save(tensors, tmp_path / "model.ckpt", _use_new_zipfile_serialization=False)
+    assert torch.equal(read_checkpoint(tmp_path / "model.ckpt")["weight"], tensors["weight"])
+
+
+def test_converted_vae_uses_the_checkpoint_tensors(tmp_path: Path):
+    config = vae_config(ch=32, ch_mult=[1, 2], num_res_blocks=1)
+    save_file(
+        ldm_vae_checkpoint(
+            AutoencoderKL(
+                block_out_channels=(32, 64),
+                down_block_types=("DownEncoderBlock2D",) * 2,
+                up_block_types=("UpDecoderBlock2D",) * 2,
+                layers_per_block=1,
+            )
+        ),
+        tmp_path / "vae.safetensors",
+    )
+    checkpoint = read_checkpoint(tmp_path / "vae.safetensors")
+    checkpoint_pointers = {t.data_ptr() for t in checkpoint.values()}
+
+    vae = convert_ldm_vae_to_diffusers(
+        checkpoint, config, image_size=512, precision=torch.float32, dump_path=tmp_path / "converted"
+    )
+
+    assert all(p.data_ptr() in checkpoint_pointers for p in vae.parameters())
+    saved = AutoencoderKL.from_pretrained(tmp_path / "converted")
+    assert all(torch.equal(p, q) for p, q in zip(vae.parameters(), saved.parameters(), strict=True))
+
+
+def test_raw_model_sizes_are_calculated(tmp_path: Path):
+    save_file(
+        {"lora_unet_down.lora_down.weight": torch.ones(4, 320), "lora_unet_down.lora_up.weight": torch.ones(320, 4)},
+        tmp_path / "lora.safetensors",
+    )
+    lora = LoRAModelRaw.from_checkpoint(tmp_path / "lora.safetensors")
+    assert calc_model_size_by_data(lora) == 2 * 4 * 320 * 4
+
+    save_file({"emb_params": torch.ones(2, 768)}, tmp_path / "embedding.safetensors")
+    embedding = TextualInversionModelRaw.from_checkpoint(tmp_path / "embedding.safetensors")
+    assert calc_model_size_by_data(embedding) == 2 * 768 * 4
+
+
+# Loads a model in a new process, printing its load time, the time to then read every weight, and the growth of the
+# process's private and file-backed (shared) memory
+LOAD_SCRIPT = """
+import json, sys, time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import torch
+from omegaconf import OmegaConf
+
+from invokeai.app.services.config.config_default import InvokeAIAppConfig
+from invokeai.backend.model_manager import SubModelType
+from invokeai.backend.model_manager.convert_ckpt_to_diffusers import convert_ldm_vae_to_diffusers
+from invokeai.backend.model_manager.load.model_loaders.stable_diffusion import StableDiffusionDiffusersModel
+from invokeai.backend.model_manager.util.model_util import read_checkpoint
+from invokeai.backend.lora import LoRAModelRaw  # after the model manager, to avoid a circular import
+
+
+def memory():
+    with open("/proc/self/status") as f:
+        return {l.split(":")[0]: int(l.split()[1]) for l in f if l.startswith(("RssAnon", "RssFile"))}
+
+
+def load(kind, path):
+    if kind == "vae":
+        # As VAELoader converts checkpoints
+        config = OmegaConf.load(path.with_suffix(".yaml"))
+        return convert_ldm_vae_to_diffusers(read_checkpoint(path), config, image_size=512, precision=torch.float32)
+    if kind == "lora":
+        return LoRAModelRaw.from_checkpoint(path, dtype=torch.float32)
+    loader = StableDiffusionDiffusersModel(InvokeAIAppConfig(), MagicMock(), MagicMock(), MagicMock())
+    return loader._load_model(SimpleNamespace(path=str(path)), SubModelType(kind))
+
+
+kind, path = sys.argv[1], Path(sys.argv[2])
+before = memory()
+start = time.perf_counter()
+model = load(kind, path)
+loaded = time.perf_counter()
+if isinstance(model, torch.nn.Module):
+    tensors = list(model.parameters())
+else:
+    tensors = [t for layer in model.layers.values() for t in vars(layer).values() if isinstance(t, torch.Tensor)]
+sum(float(t.sum()) for t in tensors)
+read = time.perf_counter()
+after = memory()
+print(json.dumps({
+    "load": loaded - start,
+    "read": read - loaded,
+    "private": (after["RssAnon"] - before["RssAnon"]) / 1024,
+    "shared": (after["RssFile"] - before["RssFile"]) / 1024,
+}))
+"""
+
+
+@requires_proc
+@pytest.mark.slow
+def test_model_memory_benchmark(tmp_path: Path):
+    from diffusers import UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel
+
+    # CPU inference uses float32, so the weights are stored as float32 and not converted when loaded
+    main = tmp_path / "main"
+    CLIPTextModel(CLIPTextConfig()).save_pretrained(main / "text_encoder")
+    UNet2DConditionModel(block_out_channels=(64, 128, 256, 256), cross_attention_dim=512).save_pretrained(main / "unet")
+    with open(main / "model_index.json", "w") as f:
+        json.dump({"text_encoder": ["transformers", "CLIPTextModel"], "unet": ["diffusers", "UNet2DConditionModel"]}, f)
+    # The SD-1 VAE, as a checkpoint that is converted when loaded
+    config = vae_config(ch=128, ch_mult=[1, 2, 4, 4], num_res_blocks=2)
+    OmegaConf.save(config, tmp_path / "vae.yaml")
+    save_file(
+        ldm_vae_checkpoint(
+            AutoencoderKL(
+                block_out_channels=(128, 256, 512, 512),
+                down_block_types=("DownEncoderBlock2D",) * 4,
+                up_block_types=("UpDecoderBlock2D",) * 4,
+                layers_per_block=2,
+            )
+        ),
+        tmp_path / "vae.safetensors",
+    )
+    # A rank 64 LoRA, as a pickle
+    lora = {}
+    for i in range(200):
+        lora[f"lora_unet_layer_{i}.lora_down.weight"] = torch.randn(64, 1280)
+        lora[f"lora_unet_layer_{i}.lora_up.weight"] = torch.randn(1280, 64)
+    torch.save(lora, tmp_path / "lora.pt")
+
+    for kind, path in [
+        ("text_encoder", main),
+        ("unet", main),
+        ("vae", tmp_path / "vae.safetensors"),
+        ("lora", tmp_path / "lora.pt"),
+    ]:
+        size = (
+            sum(f.stat().st_size for f in (path / kind).glob("*.safetensors")) if path == main else path.stat().st_size
+        )
+        # The first run reads the file into the page cache, so the second measures loading from memory
+        for _ in range(2):
+            result = subprocess.run(
+                [sys.executable, "-c", LOAD_SCRIPT, kind, str(path)], capture_output=True, text=True, check=True
+            )
+        stats = json.loads(result.stdout.splitlines()[-1])
+        print(
+            f"\n{kind} ({size / MB:.0f}MB): load {stats['load']:.2f}s, then read weights {stats['read']:.2f}s,"
+            f" private memory +{stats['private']:.0f}MB, shared file pages +{stats['shared']:.0f}MB"
+        )
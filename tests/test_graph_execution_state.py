@@ -1,6 +1,8 @@
+import time
 from typing import Optional
 from unittest.mock import Mock
 
+import networkx as nx
 import pytest
 
 # This import must happen before other invoke imports or test in other files(!!) break
@@ -78,6 +80,15 @@ def test_graph_is_not_complete(simple_graph: Graph):
 # TODO: test completion with iterators/subgraphs
 
 
+def test_graph_state_equality_ignores_scheduler(simple_graph: Graph):
+    g = GraphExecutionState(graph=simple_graph)
+    invoke_next(g)
+    restored = GraphExecutionState.model_validate_json(g.model_dump_json())
+    assert restored == g
+    invoke_next(g)
+    assert restored != g
+
+
 def test_graph_state_expands_iterator():
     graph = Graph()
     graph.add_node(RangeInvocation(id="0", start=0, stop=3, step=1))
@@ -222,3 +233,148 @@ def test_graph_iterate_execution_order(execution_number: int):
     _ = invoke_next(g)
     assert _[1].item == "Dinosaur Sushi"
     _ = invoke_next(g)
+
+
+def get_legacy_next_node_id(g: GraphExecutionState) -> Optional[str]:
+    """The original, non-incremental scheduling rule, visiting children in the order they were added"""
+    eg = nx.DiGraph()
+    eg.add_nodes_from(g.execution_graph.nodes)
+    eg.add_edges_from(dict.fromkeys((e.source.node_id, e.destination.node_id) for e in g.execution_graph.edges))
+
+    def is_ready(n: str) -> bool:
+        return n not in g.executed and all(e[0] in g.executed for e in eg.in_edges(n))
+
+    topo_order = list(nx.dfs_postorder_nodes(eg))
+    iterate_nodes = [n for n in topo_order if isinstance(g.execution_graph.nodes[n], IterateInvocation)]
+    iterate_nodes.sort(key=lambda n: g.execution_graph.nodes[n].index)
+    for iterate_node in iterate_nodes:
+        if is_ready(iterate_node):
+            return iterate_node
+        ready = next((n for n in nx.dfs_postorder_nodes(eg, iterate_node) if is_ready(n)), None)
+        if ready is not None:
+            return ready
+    return next((n for n in topo_order if is_ready(n)), None)
+
+
+def get_legacy_next_source_node_id(g: GraphExecutionState) -> Optional[str]:
+    """The original rule for choosing the next source node to prepare"""
+    sg = g.graph.nx_graph_flat()
+
+    def is_iterator(n: str) -> bool:
+        return isinstance(g.graph.get_node(n), IterateInvocation)
+
+    return next(
+        (
+            n
+            for n in nx.topological_sort(sg)
+            if n not in g.source_prepared_mapping
+            and not (is_iterator(n) and not all(e[0] in g.executed for e in sg.in_edges(n)))
+            and not any(is_iterator(a) and a not in g.executed for a in nx.ancestors(sg, n))
+        ),
+        None,
+    )
+
+
+class CheckedGraphExecutionState(GraphExecutionState):
+    """Checks every scheduling decision against the original algorithm"""
+
+    def _get_next_node(self) -> Optional[BaseInvocation]:
+        node = super()._get_next_node()
+        assert (node.id if node is not None else None) == get_legacy_next_node_id(self)
+        # A state rebuilt from its serialized form must make the same decision
+        restored = GraphExecutionState.model_validate_json(self.model_dump_json())
+        restored_node = restored._get_next_node()
+        assert (restored_node.id if restored_node is not None else None) == (node.id if node is not None else None)
+        return node
+
+    def _prepare(self) -> Optional[str]:
+        expected = get_legacy_next_source_node_id(self)
+        prepared = set(self.source_prepared_mapping)
+        prepared_id = super()._prepare()
+        assert set(self.source_prepared_mapping) - prepared == ({expected} if expected is not None else set())
+        return prepared_id
+
+
+def create_multi_iterator_graph() -> Graph:
+    graph = Graph()
+    graph.add_node(RangeInvocation(id="range_a", start=0, stop=3, step=1))
+    graph.add_node(RangeInvocation(id="range_b", start=0, stop=2, step=1))
+    graph.add_node(IterateInvocation(id="iterate_a"))
+    graph.add_node(IterateInvocation(id="iterate_b"))
+    graph.add_node(MultiplyInvocation(id="multiply", b=10))
+    graph.add_node(AddInvocation(id="add"))
+    graph.add_node(AddInvocation(id="add_twice", b=1))
+    graph.add_node(MultiplyInvocation(id="multiply_twice", b=2))
+    graph.add_node(CollectInvocation(id="collect"))
+    graph.add_node(AddInvocation(id="unrelated", a=1, b=2))
+    graph.add_node(MultiplyInvocation(id="unrelated_successor", b=3))
+    graph.add_edge(create_edge("range_a", "collection", "iterate_a", "collection"))
+    graph.add_edge(create_edge("range_b", "collection", "iterate_b", "collection"))
+    graph.add_edge(create_edge("iterate_a", "item", "multiply", "a"))
+    graph.add_edge(create_edge("multiply", "value", "add", "a"))
+    graph.add_edge(create_edge("iterate_b", "item", "add", "b"))
+    graph.add_edge(create_edge("add", "value", "add_twice", "a"))
+    graph.add_edge(create_edge("add", "value", "multiply_twice", "a"))
+    graph.add_edge(create_edge("add_twice", "value", "collect", "item"))
+    graph.add_edge(create_edge("unrelated", "value", "unrelated_successor", "a"))
+    return graph
+
+
+def create_parallel_iterators_graph() -> Graph:
+    graph = Graph()
+    for name in ["a", "b"]:
+        graph.add_node(PromptCollectionTestInvocation(id=f"prompts_{name}", collection=["Banana sushi", "Cat sushi"]))
+        graph.add_node(IterateInvocation(id=f"iterate_{name}"))
+        graph.add_node(PromptTestInvocation(id=f"prompt_{name}"))
+        graph.add_node(PromptTestInvocation(id=f"prompt_{name}_successor"))
+        graph.add_node(CollectInvocation(id=f"collect_{name}"))
+        graph.add_edge(create_edge(f"prompts_{name}", "collection", f"iterate_{name}", "collection"))
+        graph.add_edge(create_edge(f"iterate_{name}", "item", f"prompt_{name}", "prompt"))
+        graph.add_edge(create_edge(f"prompt_{name}", "prompt", f"prompt_{name}_successor", "prompt"))
+        graph.add_edge(create_edge(f"prompt_{name}_successor", "prompt", f"collect_{name}", "item"))
+    return graph
+
+
+@pytest.mark.parametrize("create_graph", [create_multi_iterator_graph, create_parallel_iterators_graph])
+def test_graph_execution_order_matches_original_scheduler(create_graph):
+    g = CheckedGraphExecutionState(graph=create_graph())
+    while not g.is_complete():
+        invoke_next(g)
+    assert len(g.executed_history) == len(g.graph.nodes)
+    assert g.next() is None
+
+
+def create_chain_graph(size: int) -> Graph:
+    graph = Graph()
+    graph.add_node(PromptTestInvocation(id="0", prompt="Banana sushi"))
+    for i in range(1, size):
+        graph.add_node(PromptTestInvocation(id=str(i)))
+        graph.add_edge(create_edge(str(i - 1), "prompt", str(i), "prompt"))
+    return graph
+
+
+def create_iterated_graph(size: int) -> Graph:
+    # Each iteration prepares an iterate node and a prompt node, so the execution graph has ~`size` nodes
+    graph = Graph()
+    graph.add_node(PromptCollectionTestInvocation(id="prompts", collection=[f"prompt {i}" for i in range(size // 2)]))
+    graph.add_node(IterateInvocation(id="iterate"))
+    graph.add_node(PromptTestInvocation(id="prompt"))
+    graph.add_node(CollectInvocation(id="collect"))
+    graph.add_edge(create_edge("prompts", "collection", "iterate", "collection"))
+    graph.add_edge(create_edge("iterate", "item", "prompt", "prompt"))
+    graph.add_edge(create_edge("prompt", "prompt", "collect", "item"))
+    return graph
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("create_graph", [create_chain_graph, create_iterated_graph])
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def test_graph_execution_state_scheduling_benchmark(create_graph, size: int):
+    g = GraphExecutionState(graph=create_graph(size))
+    start = time.perf_counter()
+    while not g.is_complete():
+        invoke_next(g)
+    elapsed = time.perf_counter() - start
+    steps = len(g.execution_graph.nodes)
+    print(f"\n{create_graph.__name__}({size}): {steps} steps in {elapsed:.3f}s ({elapsed / steps * 1000:.3f}ms/step)")
+    assert len(g.executed_history) == len(g.graph.nodes)
@@ -1,3 +1,6 @@
+import time
+
+import networkx as nx
 import pytest
 from pydantic import TypeAdapter
 
@@ -463,6 +466,43 @@ def test_graph_gets_networkx_graph():
     assert ("1", "2") in nxg.edges
 
 
+def test_graph_caches_networkx_graph_until_modified():
+    g = Graph()
+    g.add_node(TextToImageTestInvocation(id="1", prompt="Banana sushi"))
+    g.add_node(ESRGANInvocation(id="2"))
+
+    nxg = g.nx_graph_flat()
+    assert g.nx_graph_flat() is nxg
+    assert nx.is_frozen(nxg)
+
+    e = create_edge("1", "image", "2", "image")
+    g.add_edge(e)
+    assert ("1", "2") in g.nx_graph_flat().edges
+    g.delete_edge(e)
+    assert ("1", "2") not in g.nx_graph_flat().edges
+    g.update_node("2", ESRGANInvocation(id="3"))
+    assert set(g.nx_graph().nodes) == {"1", "3"}
+    g.delete_node("3")
+    assert set(g.nx_graph().nodes) == {"1"}
+
+    # Direct edits of the nodes and edges bypass the version, but are still picked up
+    g.nodes["4"] = ESRGANInvocation(id="4")
+    assert "4" in g.nx_graph().nodes
+
+
+def test_graph_equality_ignores_cached_networkx_graph():
+    g = Graph()
+    g.add_node(PromptTestInvocation(id="1", prompt="Banana sushi"))
+    g.add_node(TextToImageTestInvocation(id="2"))
+    g.add_edge(create_edge("1", "prompt", "2", "prompt"))
+    copy = Graph.model_validate_json(g.model_dump_json())
+    assert copy == g
+    g.nx_graph_flat()
+    assert copy == g
+    copy.delete_node("2")
+    assert copy != g
+
+
 # TODO: Graph serializes and deserializes
 def test_graph_can_serialize():
     g = Graph()
@@ -714,3 +754,34 @@ def test_graph_can_generate_schema():
     # Not throwing on this line is sufficient
     # NOTE: if this test fails, it's PROBABLY because a new invocation type is breaking schema generation
     _ = Graph.model_json_schema()
+
+
+def create_500_node_graph() -> Graph:
+    # 100 independent collection -> iterate -> prompt -> prompt -> collect pipelines
+    g = Graph()
+    for i in range(100):
+        g.add_node(PromptCollectionTestInvocation(id=f"{i}_prompts", collection=["Banana sushi", "Cat sushi"]))
+        g.add_node(IterateInvocation(id=f"{i}_iterate"))
+        g.add_node(PromptTestInvocation(id=f"{i}_prompt"))
+        g.add_node(PromptTestInvocation(id=f"{i}_prompt_successor"))
+        g.add_node(CollectInvocation(id=f"{i}_collect"))
+        g.add_edge(create_edge(f"{i}_prompts", "collection", f"{i}_iterate", "collection"))
+        g.add_edge(create_edge(f"{i}_iterate", "item", f"{i}_prompt", "prompt"))
+        g.add_edge(create_edge(f"{i}_prompt", "prompt", f"{i}_prompt_successor", "prompt"))
+        g.add_edge(create_edge(f"{i}_prompt_successor", "prompt", f"{i}_collect", "item"))
+    return g
+
+
+@pytest.mark.slow
+def test_graph_validate_self_benchmark():
+    g = create_500_node_graph()
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        g.validate_self()
+    elapsed = (time.perf_counter() - start) / runs
+    start = time.perf_counter()
+    for _ in range(runs):
+        g.nx_graph_flat()
+    nx_elapsed = (time.perf_counter() - start) / runs
+    print(f"\n500 nodes: validate_self={elapsed * 1000:.2f}ms nx_graph_flat={nx_elapsed * 1000:.3f}ms")
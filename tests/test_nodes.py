@@ -1,3 +1,4 @@
+import time
 from typing import Any, Callable, Union
 
 from pydantic import BaseModel
@@ -40,6 +41,15 @@ class PromptTestInvocation(BaseInvocation):
         return PromptTestInvocationOutput(prompt=self.prompt)
 
 
+@invocation("test_sleep", version="1.0.0")
+class SleepTestInvocation(BaseInvocation):
+    duration: float = InputField(default=0.0)
+
+    def invoke(self, context: InvocationContext) -> PromptTestInvocationOutput:
+        time.sleep(self.duration)
+        return PromptTestInvocationOutput(prompt=self.id)
+
+
 @invocation("test_error", version="1.0.0")
 class ErrorInvocation(BaseInvocation):
     def invoke(self, context: InvocationContext) -> PromptTestInvocationOutput:
@@ -137,8 +147,6 @@ class TestEventService(EventServiceBase):
 
 
 def wait_until(condition: Callable[[], bool], timeout: int = 10, interval: float = 0.1) -> None:
-    import time
-
     start_time = time.time()
     while time.time() - start_time < timeout:
         if condition():
@@ -1,16 +1,18 @@
 import pytest
-from pydantic import TypeAdapter, ValidationError
+from pydantic import ValidationError
 
 from invokeai.app.services.session_queue.session_queue_common import (
     Batch,
     BatchDataCollection,
     BatchDatum,
-    NodeFieldValue,
+    NodeFieldValueValidator,
+    SessionQueueWakeup,
     calc_session_count,
-    create_session_nfv_tuples,
-    prepare_values_to_insert,
+    create_nfv_permutations,
+    get_session,
+    prepare_batch_values_to_insert,
 )
-from invokeai.app.services.shared.graph import Graph, GraphExecutionState
+from invokeai.app.services.shared.graph import Graph
 
 from .test_nodes import PromptTestInvocation
 
@@ -39,78 +41,45 @@ def batch_graph() -> Graph:
     return g
 
 
-def test_create_sessions_from_batch_with_runs(batch_data_collection, batch_graph):
+def test_create_nfv_permutations_with_runs(batch_data_collection, batch_graph):
     b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
-    t = list(create_session_nfv_tuples(batch=b, maximum=1000))
+    t = [{nfv.node_path: nfv.value for nfv in nfvs} for nfvs in create_nfv_permutations(batch=b, maximum=1000)]
     # 2 list[BatchDatum] * length 2 * 2 runs = 8
     assert len(t) == 8
 
-    assert t[0][0].graph.get_node("1").prompt == "Banana sushi"
-    assert t[0][0].graph.get_node("2").prompt == "Strawberry sushi"
-    assert t[0][0].graph.get_node("3").prompt == "Orange sushi"
-    assert t[0][0].graph.get_node("4").prompt == "Nissan"
-
-    assert t[1][0].graph.get_node("1").prompt == "Banana sushi"
-    assert t[1][0].graph.get_node("2").prompt == "Strawberry sushi"
-    assert t[1][0].graph.get_node("3").prompt == "Apple sushi"
-    assert t[1][0].graph.get_node("4").prompt == "Nissan"
-
-    assert t[2][0].graph.get_node("1").prompt == "Grape sushi"
-    assert t[2][0].graph.get_node("2").prompt == "Blueberry sushi"
-    assert t[2][0].graph.get_node("3").prompt == "Orange sushi"
-    assert t[2][0].graph.get_node("4").prompt == "Nissan"
-
-    assert t[3][0].graph.get_node("1").prompt == "Grape sushi"
-    assert t[3][0].graph.get_node("2").prompt == "Blueberry sushi"
-    assert t[3][0].graph.get_node("3").prompt == "Apple sushi"
-    assert t[3][0].graph.get_node("4").prompt == "Nissan"
+    assert t[0] == {"1": "Banana sushi", "2": "Strawberry sushi", "3": "Orange sushi"}
+    assert t[1] == {"1": "Banana sushi", "2": "Strawberry sushi", "3": "Apple sushi"}
+    assert t[2] == {"1": "Grape sushi", "2": "Blueberry sushi", "3": "Orange sushi"}
+    assert t[3] == {"1": "Grape sushi", "2": "Blueberry sushi", "3": "Apple sushi"}
 
     # repeat for second run
-    assert t[4][0].graph.get_node("1").prompt == "Banana sushi"
-    assert t[4][0].graph.get_node("2").prompt == "Strawberry sushi"
-    assert t[4][0].graph.get_node("3").prompt == "Orange sushi"
-    assert t[4][0].graph.get_node("4").prompt == "Nissan"
-
-    assert t[5][0].graph.get_node("1").prompt == "Banana sushi"
-    assert t[5][0].graph.get_node("2").prompt == "Strawberry sushi"
-    assert t[5][0].graph.get_node("3").prompt == "Apple sushi"
-    assert t[5][0].graph.get_node("4").prompt == "Nissan"
-
-    assert t[6][0].graph.get_node("1").prompt == "Grape sushi"
-    assert t[6][0].graph.get_node("2").prompt == "Blueberry sushi"
-    assert t[6][0].graph.get_node("3").prompt == "Orange sushi"
-    assert t[6][0].graph.get_node("4").prompt == "Nissan"
-
-    assert t[7][0].graph.get_node("1").prompt == "Grape sushi"
-    assert t[7][0].graph.get_node("2").prompt == "Blueberry sushi"
-    assert t[7][0].graph.get_node("3").prompt == "Apple sushi"
-    assert t[7][0].graph.get_node("4").prompt == "Nissan"
+    assert t[4:] == t[:4]
 
 
-def test_create_sessions_from_batch_without_runs(batch_data_collection, batch_graph):
+def test_create_nfv_permutations_without_runs(batch_data_collection, batch_graph):
     b = Batch(graph=batch_graph, data=batch_data_collection)
-    t = list(create_session_nfv_tuples(batch=b, maximum=1000))
-    # 2 list[BatchDatum] * length 2 * 1 runs = 8
+    t = list(create_nfv_permutations(batch=b, maximum=1000))
+    # 2 list[BatchDatum] * length 2 * 1 runs = 4
     assert len(t) == 4
 
 
-def test_create_sessions_from_batch_without_batch(batch_graph):
+def test_create_nfv_permutations_without_batch(batch_graph):
     b = Batch(graph=batch_graph, runs=2)
-    t = list(create_session_nfv_tuples(batch=b, maximum=1000))
+    t = list(create_nfv_permutations(batch=b, maximum=1000))
     # 2 runs
-    assert len(t) == 2
+    assert t == [[], []]
 
 
-def test_create_sessions_from_batch_without_batch_or_runs(batch_graph):
+def test_create_nfv_permutations_without_batch_or_runs(batch_graph):
     b = Batch(graph=batch_graph)
-    t = list(create_session_nfv_tuples(batch=b, maximum=1000))
+    t = list(create_nfv_permutations(batch=b, maximum=1000))
     # 1 run
     assert len(t) == 1
 
 
-def test_create_sessions_from_batch_with_runs_and_max(batch_data_collection, batch_graph):
+def test_create_nfv_permutations_with_runs_and_max(batch_data_collection, batch_graph):
     b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
-    t = list(create_session_nfv_tuples(batch=b, maximum=5))
+    t = list(create_nfv_permutations(batch=b, maximum=5))
     # 2 list[BatchDatum] * length 2 * 2 runs = 8, but max is 5
     assert len(t) == 5
 
@@ -121,48 +90,61 @@ def test_calc_session_count(batch_data_collection, batch_graph):
     assert calc_session_count(batch=b) == 8
 
 
-def test_prepare_values_to_insert(batch_data_collection, batch_graph):
+def test_prepare_batch_values_to_insert(batch_data_collection, batch_graph):
     b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
-    values = prepare_values_to_insert(queue_id="default", batch=b, priority=0, max_new_queue_items=1000)
-    assert len(values) == 8
-
-    GraphExecutionStateValidator = TypeAdapter(GraphExecutionState)
-    # graph should be serialized
-    ges = GraphExecutionStateValidator.validate_json(values[0].session)
-
-    # graph values should be populated
-    assert ges.graph.get_node("1").prompt == "Banana sushi"
-    assert ges.graph.get_node("2").prompt == "Strawberry sushi"
-    assert ges.graph.get_node("3").prompt == "Orange sushi"
-    assert ges.graph.get_node("4").prompt == "Nissan"
-
-    # session ids should match deserialized graph
-    assert [v.session_id for v in values] == [GraphExecutionStateValidator.validate_json(v.session).id for v in values]
+    batch_value, values_iterator = prepare_batch_values_to_insert(
+        queue_id="default", batch=b, priority=0, max_new_queue_items=5
+    )
+    assert batch_value.batch_id == b.batch_id
+    # graph should be serialized once, without the batch data applied
+    assert Graph.model_validate_json(batch_value.graph).get_node("1").prompt == "Chevy"
+
+    # sessions should not be serialized
+    values = list(values_iterator)
+    assert len(values) == 5
+    assert all(v.session == "" and v.workflow is None for v in values)
+    assert len(NodeFieldValueValidator.validate_json(values[0].field_values)) == 3
 
     # should unique session ids
     sids = [v.session_id for v in values]
     assert len(sids) == len(set(sids))
 
-    NodeFieldValueValidator = TypeAdapter(list[NodeFieldValue])
-    # should have 3 node field values
-    assert isinstance(values[0].field_values, str)
-    assert len(NodeFieldValueValidator.validate_json(values[0].field_values)) == 3
 
-    # should have batch id and priority
-    assert all(v.batch_id == b.batch_id for v in values)
-    assert all(v.priority == 0 for v in values)
+def test_get_session_populates_batch_graph(batch_data_collection, batch_graph):
+    b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
+    batch_value, values_iterator = prepare_batch_values_to_insert(
+        queue_id="default", batch=b, priority=0, max_new_queue_items=1000
+    )
+    value = next(values_iterator)
+    session = get_session(
+        {
+            "session": value.session,
+            "session_id": value.session_id,
+            "field_values": value.field_values,
+            "batch_graph": batch_value.graph,
+        }
+    )
+
+    # session id should match the queue item
+    assert session.id == value.session_id
+    # graph values should be populated
+    assert session.graph.get_node("1").prompt == "Banana sushi"
+    assert session.graph.get_node("2").prompt == "Strawberry sushi"
+    assert session.graph.get_node("3").prompt == "Orange sushi"
+    assert session.graph.get_node("4").prompt == "Nissan"
 
 
-def test_prepare_values_to_insert_with_priority(batch_data_collection, batch_graph):
-    b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
-    values = prepare_values_to_insert(queue_id="default", batch=b, priority=1, max_new_queue_items=1000)
-    assert all(v.priority == 1 for v in values)
+def test_get_session_skips_missing_nodes(batch_graph):
+    field_values = '[{"node_path": "5", "field_name": "prompt", "value": "Banana sushi"}]'
+    session = get_session(
+        {"session": "", "session_id": "1", "field_values": field_values, "batch_graph": batch_graph.model_dump_json()}
+    )
+    assert session.graph == batch_graph
 
 
-def test_prepare_values_to_insert_with_max(batch_data_collection, batch_graph):
-    b = Batch(graph=batch_graph, data=batch_data_collection, runs=2)
-    values = prepare_values_to_insert(queue_id="default", batch=b, priority=1, max_new_queue_items=5)
-    assert len(values) == 5
+def test_get_session_requires_a_session_or_batch_graph():
+    with pytest.raises(ValueError, match="has no session or batch graph"):
+        get_session({"item_id": 1, "session": None, "session_id": "1", "batch_graph": None})
 
 
 def test_cannot_create_bad_batch_items_length(batch_graph):
@@ -231,3 +213,16 @@ def test_cannot_create_bad_batch_fields_exist(
                 ],
             ],
         )
+
+
+def test_wakeup_notification_before_wait_is_not_lost():
+    wakeup = SessionQueueWakeup()
+    seen = wakeup.count
+    wakeup.notify()
+    # The notification happened between observing the count and waiting - the wait must return immediately
+    assert wakeup.wait(since=seen, timeout=0)
+
+
+def test_wakeup_times_out_without_notification():
+    wakeup = SessionQueueWakeup()
+    assert not wakeup.wait(since=wakeup.count, timeout=0.01)